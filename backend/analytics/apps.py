@@ -5,3 +5,7 @@ class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
     verbose_name = 'Analytics y Predicciones ML'
+
+    def ready(self):
+        """Importar signals cuando la app esté lista"""
+        import analytics.signals  # noqa
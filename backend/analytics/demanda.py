@@ -0,0 +1,281 @@
+"""
+Pronóstico de demanda por producto (y por categoría)
+
+Pipeline por lotes, pensado para correr en el worker de entrenamiento
+(tarea analytics.entrenar_modelo con modelo='demanda'):
+
+    1. Matriz producto × día con las unidades vendidas, leída de los rollups
+       (VentaDiariaProducto) en una sola consulta; 0 en los días sin ventas
+    2. Un modelo global (RandomForest) para todos los productos, con rezagos
+       y medias móviles de cada serie más features de calendario
+    3. Pronóstico recursivo de HORIZONTE días: en cada paso se arman las
+       features de todos los productos a la vez y se hace un solo predict
+    4. Los pronósticos reemplazan los anteriores en PronosticoDemanda dentro
+       de una transacción (quien lea ve el lote anterior o el nuevo)
+
+Los pronósticos por categoría son la suma de los de sus productos.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Window
+from django.utils import timezone
+
+from . import registro
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_MODELO = 'demanda'
+REZAGOS = (1, 7, 14)
+VENTANAS = (7, 28)
+FEATURES = [f'rezago_{r}' for r in REZAGOS] + [f'media_{v}' for v in VENTANAS] + [
+    'dia_semana', 'dia_mes', 'mes', 'es_fin_semana',
+]
+# Días de historia necesarios para armar las features de un día
+HISTORIA_MINIMA = max(max(REZAGOS), max(VENTANAS))
+# Días finales que se reservan para evaluar el modelo
+DIAS_PRUEBA = 14
+# Filas máximas que ve cada árbol (acota el costo con miles de productos)
+MUESTRAS_POR_ARBOL = 100_000
+
+
+def _configuracion():
+    return (
+        getattr(settings, 'ANALYTICS_DEMANDA_HISTORIA_DIAS', 180),
+        getattr(settings, 'ANALYTICS_DEMANDA_HORIZONTE', 14),
+    )
+
+
+def matriz_demanda(desde, hasta):
+    """
+    Unidades vendidas por producto y día
+
+    Args:
+        desde, hasta: Fechas (date) incluidas
+
+    Returns:
+        DataFrame: índice producto_id, una columna por día (0 sin ventas)
+    """
+    from .models import VentaDiariaProducto
+
+    dias = pd.date_range(desde, hasta, freq='D')
+    filas = VentaDiariaProducto.objects.filter(
+        fecha__gte=desde, fecha__lte=hasta, producto__activo=True
+    ).values_list('producto_id', 'fecha', 'cantidad')
+    df = pd.DataFrame.from_records(list(filas), columns=['producto_id', 'fecha', 'cantidad'])
+    if df.empty:
+        return pd.DataFrame(columns=dias, dtype=float)
+
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    matriz = df.pivot_table(
+        index='producto_id', columns='fecha', values='cantidad', aggfunc='sum', fill_value=0
+    )
+    return matriz.reindex(columns=dias, fill_value=0).astype(float)
+
+
+def _features(valores, t, fecha):
+    """
+    Features de todos los productos para el día en la columna t
+
+    Args:
+        valores: ndarray productos × días (solo se usan las columnas < t)
+        t: Índice del día a predecir
+        fecha: Timestamp de ese día
+
+    Returns:
+        ndarray productos × len(FEATURES)
+    """
+    n = valores.shape[0]
+    columnas = [valores[:, t - r] for r in REZAGOS]
+    columnas += [valores[:, t - v:t].mean(axis=1) for v in VENTANAS]
+    columnas += [
+        np.full(n, fecha.weekday()),
+        np.full(n, fecha.day),
+        np.full(n, fecha.month),
+        np.full(n, int(fecha.weekday() >= 5)),
+    ]
+    return np.column_stack(columnas)
+
+
+def _dataset(valores, fechas, desde_t, hasta_t):
+    """Filas de entrenamiento (features, unidades) de los días desde_t..hasta_t-1"""
+    X = [_features(valores, t, fechas[t]) for t in range(desde_t, hasta_t)]
+    y = [valores[:, t] for t in range(desde_t, hasta_t)]
+    return np.vstack(X), np.concatenate(y)
+
+
+def _modelo(filas):
+    from sklearn.ensemble import RandomForestRegressor
+
+    from .ml_service import cpus_entrenamiento
+
+    return RandomForestRegressor(
+        n_estimators=50,
+        max_depth=12,
+        min_samples_leaf=5,
+        max_samples=min(filas, MUESTRAS_POR_ARBOL),
+        random_state=42,
+        n_jobs=cpus_entrenamiento(),
+    )
+
+
+def pronosticar(modelo, matriz, horizonte):
+    """
+    Pronóstico recursivo de todos los productos
+
+    Args:
+        modelo: Modelo entrenado con FEATURES
+        matriz: Resultado de matriz_demanda() (historia hasta ayer)
+        horizonte: Días a pronosticar a partir del día siguiente al último
+
+    Returns:
+        DataFrame: índice producto_id, una columna por día pronosticado
+    """
+    inicio = matriz.columns[-1] + pd.Timedelta(days=1)
+    futuras = pd.date_range(inicio, periods=horizonte, freq='D')
+    valores = np.hstack([matriz.to_numpy(), np.zeros((len(matriz), horizonte))])
+    historia = matriz.shape[1]
+
+    for paso, fecha in enumerate(futuras):
+        t = historia + paso
+        valores[:, t] = np.clip(modelo.predict(_features(valores, t, fecha)), 0, None)
+
+    return pd.DataFrame(valores[:, historia:], index=matriz.index, columns=futuras)
+
+
+@transaction.atomic
+def _guardar(pronostico, version):
+    from .models import PronosticoDemanda
+
+    PronosticoDemanda.objects.all().delete()
+    filas = [
+        PronosticoDemanda(
+            producto_id=producto_id, fecha=fecha.date(), cantidad=round(float(cantidad), 2), version=version
+        )
+        for producto_id, serie in pronostico.iterrows()
+        for fecha, cantidad in serie.items()
+    ]
+    PronosticoDemanda.objects.bulk_create(filas, batch_size=5000)
+    return len(filas)
+
+
+def entrenar_y_pronosticar(progreso=None):
+    """
+    Entrenar el modelo global de demanda y guardar los pronósticos
+
+    Args:
+        progreso: Callable(porcentaje, etapa) para informar el avance
+
+    Returns:
+        dict con métricas, versión y cantidad de pronósticos guardados
+    """
+    avisar = progreso or (lambda porcentaje, etapa: None)
+    historia_dias, horizonte = _configuracion()
+    hoy = timezone.now().date()
+
+    avisar(5, 'Armando matriz producto × día')
+    matriz = matriz_demanda(hoy - timedelta(days=historia_dias), hoy - timedelta(days=1))
+    matriz = matriz[matriz.to_numpy().sum(axis=1) > 0]
+    dias = matriz.shape[1]
+    if matriz.empty or dias < HISTORIA_MINIMA + DIAS_PRUEBA + 7:
+        return {'error': 'Datos insuficientes para pronosticar la demanda', 'productos': len(matriz)}
+
+    valores = matriz.to_numpy()
+    fechas = matriz.columns
+    corte = dias - DIAS_PRUEBA
+
+    # Evaluación con los últimos días fuera del entrenamiento
+    avisar(15, 'Evaluando')
+    X_train, y_train = _dataset(valores, fechas, HISTORIA_MINIMA, corte)
+    X_test, y_test = _dataset(valores, fechas, corte, dias)
+    evaluacion = _modelo(len(X_train)).fit(X_train, y_train)
+    estimado = evaluacion.predict(X_test)
+    metricas = {
+        'mae': round(float(np.abs(estimado - y_test).mean()), 3),
+        'test_score': round(float(evaluacion.score(X_test, y_test)), 3),
+    }
+
+    # Modelo final con toda la historia
+    avisar(50, f'Entrenando con {len(matriz)} productos')
+    X, y = _dataset(valores, fechas, HISTORIA_MINIMA, dias)
+    modelo = _modelo(len(X)).fit(X, y)
+
+    avisar(80, f'Pronosticando {horizonte} días')
+    pronostico = pronosticar(modelo, matriz, horizonte)
+
+    version = registro.registrar(NOMBRE_MODELO, {'modelo': modelo}, {
+        'algoritmo': 'RandomForestRegressor',
+        'features': FEATURES,
+        'ventana': {'desde': fechas[0].date(), 'hasta': fechas[-1].date()},
+        'productos': len(matriz),
+        'registros': len(X),
+        'horizonte': horizonte,
+        'metricas': metricas,
+    })
+    registro.limpiar(NOMBRE_MODELO, conservar=getattr(settings, 'ANALYTICS_MODELOS_CONSERVAR', 5))
+
+    avisar(90, 'Guardando pronósticos')
+    guardados = _guardar(pronostico, version)
+    logger.info(f'📦 Demanda {version}: {len(matriz)} productos, {guardados} pronósticos (MAE {metricas["mae"]})')
+    avisar(100, 'Completado')
+
+    return {
+        'exito': True,
+        'version': version,
+        'modo': 'completo',
+        'productos': len(matriz),
+        'registros': len(X),
+        'pronosticos': guardados,
+        **metricas,
+    }
+
+
+def quiebres_previstos():
+    """
+    Productos activos cuya demanda pronosticada agota el stock actual
+
+    La suma acumulada por producto se calcula en SQL (función de ventana) y
+    solo vuelve una fila por producto: el día en que el acumulado alcanza el
+    stock sin haberlo alcanzado el anterior (los pronósticos nunca son
+    negativos, así que el acumulado no decrece).
+
+    Returns:
+        dict: producto_id -> {'demanda_prevista', 'dias_hasta_quiebre'}
+              (dias_hasta_quiebre = 0 si se agota hoy)
+    """
+    from .models import PronosticoDemanda
+
+    hoy = timezone.now().date()
+    por_producto = {'partition_by': [F('producto_id')]}
+    filas = PronosticoDemanda.objects.filter(
+        fecha__gte=hoy, producto__activo=True
+    ).alias(
+        acumulado=Window(Sum('cantidad'), order_by=F('fecha').asc(), **por_producto),
+    ).annotate(
+        total=Window(Sum('cantidad'), **por_producto),
+    ).filter(
+        acumulado__gte=F('producto__stock'),
+        acumulado__lt=F('producto__stock') + F('cantidad'),
+    ).values_list('producto_id', 'fecha', 'total')
+
+    return {
+        producto_id: {'dias_hasta_quiebre': (fecha - hoy).days, 'demanda_prevista': round(float(total), 2)}
+        for producto_id, fecha, total in filas
+    }
+
+
+def pronostico_por_categoria(dias=14):
+    """Unidades pronosticadas por categoría y día (suma de sus productos)"""
+    from .models import PronosticoDemanda
+
+    hoy = timezone.now().date()
+    return list(
+        PronosticoDemanda.objects.filter(fecha__gte=hoy, fecha__lt=hoy + timedelta(days=dias))
+        .values('producto__categoria_id', 'producto__categoria__nombre', 'fecha')
+        .annotate(unidades=Sum('cantidad'))
+        .order_by('producto__categoria__nombre', 'fecha')
+    )
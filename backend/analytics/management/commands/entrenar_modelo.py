@@ -0,0 +1,67 @@
+"""
+Comando para entrenar el modelo de predicción de ventas.
+
+Uso:
+    python manage.py entrenar_modelo [--modelo ventas|demanda] [--incremental] [--ahora]
+
+    Por defecto encola la tarea analytics.entrenar_modelo para que la ejecute
+    el worker de entrenamiento. Pensado para el cron nocturno:
+
+        0 3 * * * python manage.py entrenar_modelo --incremental
+        30 3 * * * python manage.py entrenar_modelo --modelo demanda
+
+    Con --incremental se agregan árboles entrenados con los días nuevos a la
+    versión activa (o se reentrena completo si no se puede; solo para ventas).
+    --modelo demanda entrena el modelo global por producto y guarda los
+    pronósticos en PronosticoDemanda. Con --ahora se
+    entrena en este proceso, sin pasar por los workers.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.demanda import entrenar_y_pronosticar
+from analytics.ml_service import predictor
+from analytics.tareas import solicitar_entrenamiento
+
+
+class Command(BaseCommand):
+    help = 'Entrena (o encola el entrenamiento de) el modelo de predicción de ventas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelo',
+            choices=['ventas', 'demanda'],
+            default='ventas',
+            help='Modelo a entrenar'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Agregar árboles con los datos nuevos en lugar de reentrenar desde cero'
+        )
+        parser.add_argument(
+            '--ahora',
+            action='store_true',
+            help='Entrenar en este proceso en lugar de encolar la tarea'
+        )
+
+    def handle(self, *args, **options):
+        if not options['ahora']:
+            entrenamiento, creado = solicitar_entrenamiento(
+                incremental=options['incremental'], modelo=options['modelo']
+            )
+            if creado:
+                self.stdout.write(self.style.SUCCESS(f'✅ Entrenamiento #{entrenamiento.id} encolado'))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️ Ya hay un entrenamiento en curso (#{entrenamiento.id}, {entrenamiento.estado})'
+                ))
+            return
+
+        progreso = lambda porcentaje, etapa: self.stdout.write(f'  {porcentaje:3d}% {etapa}')
+        if options['modelo'] == 'demanda':
+            resultado = entrenar_y_pronosticar(progreso=progreso)
+        else:
+            resultado = predictor.entrenar_modelo(incremental=options['incremental'], progreso=progreso)
+        if resultado.get('error'):
+            raise CommandError(resultado['error'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Versión activa {resultado['version']} de {options['modelo']}"))
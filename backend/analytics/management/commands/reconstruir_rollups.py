@@ -0,0 +1,43 @@
+"""
+Comando para (re)construir los rollups de ventas del dashboard.
+
+Uso:
+    python manage.py reconstruir_rollups [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD] [--dias N]
+
+    Sin argumentos recalcula todo el historial (carga inicial). Con --dias
+    recalcula solo los últimos N días, útil como verificación nocturna.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics.rollups import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las tablas de resumen de ventas desde los pedidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha final incluida (YYYY-MM-DD)')
+        parser.add_argument('--dias', type=int, help='Recalcular solo los últimos N días')
+
+    def _fecha(self, valor):
+        if not valor:
+            return None
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise CommandError(f'Fecha inválida: {valor}')
+        return fecha
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options['desde'])
+        hasta = self._fecha(options['hasta'])
+        if options['dias']:
+            desde = timezone.now().date() - timedelta(days=options['dias'])
+
+        pedidos = reconstruir(desde, hasta)
+        rango = f" ({desde or 'inicio'} → {hasta or 'hoy'})" if desde or hasta else ''
+        self.stdout.write(self.style.SUCCESS(f'✅ Rollups reconstruidos con {pedidos} pedidos{rango}'))
@@ -0,0 +1,98 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('productos', '0003_favorito'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True, verbose_name='Fecha')),
+                ('pedidos', models.IntegerField(default=0, verbose_name='Pedidos')),
+                ('unidades', models.IntegerField(default=0, verbose_name='Unidades vendidas')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria',
+                'verbose_name_plural': 'Ventas diarias',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('pedidos', models.IntegerField(default=0)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='productos.categoria')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por categoría',
+                'verbose_name_plural': 'Ventas diarias por categoría',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('pedidos', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por cliente',
+                'verbose_name_plural': 'Ventas diarias por cliente',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('pedidos', models.IntegerField(default=0)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='productos.categoria')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por producto',
+                'verbose_name_plural': 'Ventas diarias por producto',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiariacategoria',
+            constraint=models.UniqueConstraint(fields=('fecha', 'categoria'), name='venta_diaria_categoria_unica', nulls_distinct=False),
+        ),
+        migrations.AddIndex(
+            model_name='ventadiariacliente',
+            index=models.Index(fields=['usuario', 'fecha'], name='analytics_v_usuario_446a04_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiariacliente',
+            constraint=models.UniqueConstraint(fields=('fecha', 'usuario'), name='venta_diaria_cliente_unica'),
+        ),
+        migrations.AddIndex(
+            model_name='ventadiariaproducto',
+            index=models.Index(fields=['producto', 'fecha'], name='analytics_v_product_380325_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiariaproducto',
+            constraint=models.UniqueConstraint(fields=('fecha', 'producto'), name='venta_diaria_producto_unica'),
+        ),
+    ]
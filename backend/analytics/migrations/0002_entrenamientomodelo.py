@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-19 04:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntrenamientoModelo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(default='ventas', max_length=50, verbose_name='Modelo')),
+                ('incremental', models.BooleanField(default=False, verbose_name='Incremental')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('progreso', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('etapa', models.CharField(blank=True, max_length=100, verbose_name='Etapa')),
+                ('version', models.CharField(blank=True, max_length=50, verbose_name='Versión generada')),
+                ('resultado', models.JSONField(blank=True, default=dict, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('creado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado el')),
+                ('finalizado_en', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado el')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Entrenamiento de modelo',
+                'verbose_name_plural': 'Entrenamientos de modelos',
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
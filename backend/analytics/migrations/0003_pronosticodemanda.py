@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-19 04:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_entrenamientomodelo'),
+        ('productos', '0003_favorito'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entrenamientomodelo',
+            name='modelo',
+            field=models.CharField(choices=[('ventas', 'Ventas diarias'), ('demanda', 'Demanda por producto')], default='ventas', max_length=50, verbose_name='Modelo'),
+        ),
+        migrations.CreateModel(
+            name='PronosticoDemanda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Unidades pronosticadas')),
+                ('version', models.CharField(max_length=50, verbose_name='Versión del modelo')),
+                ('generado', models.DateTimeField(auto_now_add=True, verbose_name='Generado el')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pronosticos_demanda', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de demanda',
+                'verbose_name_plural': 'Pronósticos de demanda',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pronosticodemanda',
+            constraint=models.UniqueConstraint(fields=('producto', 'fecha'), name='pronostico_demanda_unico'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-19 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_pronosticodemanda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrediccionVentas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=50, verbose_name='Versión del modelo')),
+                ('fecha', models.DateField(verbose_name='Fecha de cálculo')),
+                ('horizonte', models.PositiveSmallIntegerField(verbose_name='Días predichos')),
+                ('predicciones', models.JSONField(default=list, verbose_name='Predicciones')),
+                ('generado', models.DateTimeField(auto_now_add=True, verbose_name='Generado el')),
+            ],
+            options={
+                'verbose_name': 'Predicción de ventas',
+                'verbose_name_plural': 'Predicciones de ventas',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='prediccionventas',
+            constraint=models.UniqueConstraint(fields=('version', 'fecha', 'horizonte'), name='prediccion_ventas_unica'),
+        ),
+    ]
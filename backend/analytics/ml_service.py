@@ -2,12 +2,11 @@
 Servicio de Machine Learning para predicciones
 Usa scikit-learn con RandomForestRegressor
 """
-import os
-import joblib
+import copy
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from django.db.models import Sum, Count, Avg, F
+from datetime import date, timedelta
+from django.db.models import Sum, Count, F
 from django.utils import timezone
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
@@ -15,6 +14,48 @@ from sklearn.model_selection import train_test_split
 import warnings
 warnings.filterwarnings('ignore')
 
+from . import registro
+
+FEATURES = ['dia_semana', 'dia_mes', 'mes', 'trimestre', 'es_fin_semana', 'cantidad_items']
+DIAS_SEMANA = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+
+# Entrenamiento completo: árboles totales y cuántos se agregan por tramo (progreso)
+ARBOLES = 100
+ARBOLES_POR_TRAMO = 25
+# Entrenamiento incremental: árboles nuevos por corrida y tope antes de reentrenar completo
+ARBOLES_INCREMENTO = 20
+ARBOLES_MAXIMO = 300
+# Horizontes (días) que se precalculan al entrenar para los endpoints de predicción
+HORIZONTES_PREDICCION = (7, 14, 30)
+
+
+def cpus_entrenamiento():
+    """Procesos para RandomForest (presupuesto de CPU del entrenamiento)"""
+    from django.conf import settings
+    
+    return getattr(settings, 'ANALYTICS_ENTRENAMIENTO_CPUS', 1)
+
+
+def _hoy():
+    """
+    Día actual en TIME_ZONE, el mismo para las predicciones precalculadas y
+    las pedidas al momento (timezone.localdate() exige USE_TZ=True)
+    """
+    from django.conf import settings
+
+    return timezone.localdate() if settings.USE_TZ else timezone.now().date()
+
+
+def _prediccion(fecha, venta):
+    """Predicción de un día con el formato de los endpoints"""
+    dia_semana = date.fromisoformat(fecha).weekday()
+    return {
+        'fecha': fecha,
+        'dia_nombre': DIAS_SEMANA[dia_semana],
+        'venta_estimada': venta,
+        'confianza': 'alta' if dia_semana < 5 else 'media'  # Más confiable en días laborables
+    }
+
 
 class VentasPredictor:
     """
@@ -22,70 +63,71 @@ class VentasPredictor:
     Predice: ventas futuras, productos más vendidos, tendencias
     """
     
-    def __init__(self):
-        self.model = None
-        self.scaler = StandardScaler()
-        self.model_path = 'analytics/models/ventas_model.pkl'
-        self.scaler_path = 'analytics/models/scaler.pkl'
+    # Nombre en el registro de modelos (analytics.registro)
+    nombre = 'ventas'
         
-    def preparar_datos_historicos(self):
+    def preparar_datos_historicos(self, desde=None):
         """
         Prepara datos históricos de ventas para entrenamiento
         
+        Una sola consulta agrupada por día (total vendido e items por día) y
+        las features de calendario se calculan vectorizadas con pandas.
+        
+        Args:
+            desde: Fecha (date) inicial; por defecto los últimos 6 meses.
+                   Con `desde` no se generan datos de ejemplo si no hay ventas.
+        
         Returns:
             DataFrame con features: día_semana, mes, productos_vendidos, total_ventas, etc.
         """
-        from ventas.models import Pedido
-        from productos.models import Producto
-        
-        # Obtener pedidos de los últimos 6 meses
-        fecha_inicio = timezone.now() - timedelta(days=180)
-        ventas = Pedido.objects.filter(
-            creado__gte=fecha_inicio,
+        from django.db.models import OuterRef, Subquery
+        from django.db.models.functions import Coalesce, TruncDate
+        from ventas.models import ItemPedido, Pedido
+        
+        # Items por pedido como subconsulta: un JOIN con items repetiría el total del pedido
+        items_por_pedido = ItemPedido.objects.filter(
+            pedido=OuterRef('pk')
+        ).order_by().values('pedido').annotate(n=Count('id')).values('n')
+        
+        # Pedidos de los últimos 6 meses (o desde la fecha pedida), agrupados por día
+        if desde is None:
+            filtro_fecha = {'creado__gte': timezone.now() - timedelta(days=180)}
+        else:
+            filtro_fecha = {'creado__date__gte': desde}
+        filas = Pedido.objects.filter(
+            **filtro_fecha,
             estado__in=['ENTREGADO', 'PAGADO']
-        ).select_related('usuario').prefetch_related('items')
+        ).order_by().annotate(
+            fecha=TruncDate('creado'),
+            n_items=Coalesce(Subquery(items_por_pedido), 0)
+        ).values('fecha').annotate(
+            total_venta=Sum('total'),
+            cantidad_items=Sum('n_items')
+        ).order_by('fecha').values_list('fecha', 'total_venta', 'cantidad_items')
+        
+        df = pd.DataFrame.from_records(
+            list(filas), columns=['fecha', 'total_venta', 'cantidad_items']
+        )
         
-        if not ventas.exists():
+        if len(df) == 0 and desde is None:
             # Generar datos de ejemplo si no hay ventas
             return self._generar_datos_ejemplo()
         
-        # Convertir a DataFrame
-        datos = []
-        for venta in ventas:
-            fecha = venta.creado
-            datos.append({
-                'fecha': fecha,
-                'dia_semana': fecha.weekday(),  # 0=Lunes, 6=Domingo
-                'dia_mes': fecha.day,
-                'mes': fecha.month,
-                'trimestre': (fecha.month - 1) // 3 + 1,
-                'total_venta': float(venta.total),
-                'cantidad_items': venta.items.count(),
-                'es_fin_semana': 1 if fecha.weekday() >= 5 else 0,
-            })
-        
-        df = pd.DataFrame(datos)
+        fechas = pd.to_datetime(df['fecha'])
+        df['total_venta'] = df['total_venta'].astype(float)
+        df['cantidad_items'] = df['cantidad_items'].astype(int)
+        df['dia_semana'] = fechas.dt.weekday  # 0=Lunes, 6=Domingo
+        df['dia_mes'] = fechas.dt.day
+        df['mes'] = fechas.dt.month
+        df['trimestre'] = fechas.dt.quarter
+        df['es_fin_semana'] = (df['dia_semana'] >= 5).astype(int)
         
-        if len(df) == 0:
-            return self._generar_datos_ejemplo()
-        
-        # Agregar por día (sumar todas las ventas del mismo día)
-        df_agrupado = df.groupby(df['fecha'].dt.date).agg({
-            'total_venta': 'sum',
-            'cantidad_items': 'sum',
-            'dia_semana': 'first',
-            'dia_mes': 'first',
-            'mes': 'first',
-            'trimestre': 'first',
-            'es_fin_semana': 'first'
-        }).reset_index()
-        
-        return df_agrupado
+        return df
     
     def _generar_datos_ejemplo(self):
         """Genera datos sintéticos para demostración"""
         np.random.seed(42)
-        fechas = pd.date_range(end=datetime.now(), periods=180, freq='D')
+        fechas = pd.date_range(end=_hoy(), periods=180, freq='D')
         
         datos = []
         for fecha in fechas:
@@ -103,6 +145,7 @@ class VentasPredictor:
                 'total_venta': max(0, total),
                 'cantidad_items': max(1, items),
                 'dia_semana': dia_semana,
+                'dia_mes': fecha.day,
                 'mes': fecha.month,
                 'trimestre': (fecha.month - 1) // 3 + 1,
                 'es_fin_semana': 1 if dia_semana >= 5 else 0
@@ -110,14 +153,31 @@ class VentasPredictor:
         
         return pd.DataFrame(datos)
     
-    def entrenar_modelo(self):
+    def entrenar_modelo(self, incremental=False, progreso=None):
         """
-        Entrena el modelo de Random Forest con datos históricos
+        Entrena el modelo de Random Forest con datos históricos y lo
+        registra como nueva versión activa
+        
+        Pensado para correr en un worker (tarea analytics.entrenar_modelo):
+        la versión anterior se sigue sirviendo hasta que se promueve la nueva.
+        
+        Args:
+            incremental: Agregar árboles a la versión activa con los datos
+                         recientes en lugar de reentrenar desde cero (si se puede)
+            progreso: Callable(porcentaje, etapa) para informar el avance
         
         Returns:
             dict con métricas de entrenamiento
         """
+        avisar = progreso or (lambda porcentaje, etapa: None)
+        
+        if incremental:
+            resultado = self._entrenar_incremental(avisar)
+            if resultado is not None:
+                return resultado
+        
         print("📊 Preparando datos de entrenamiento...")
+        avisar(5, 'Preparando datos')
         df = self.preparar_datos_historicos()
         
         if len(df) < 30:
@@ -127,7 +187,7 @@ class VentasPredictor:
             }
         
         # Features (variables predictoras)
-        X = df[['dia_semana', 'dia_mes', 'mes', 'trimestre', 'es_fin_semana', 'cantidad_items']]
+        X = df[FEATURES]
         
         # Target (lo que queremos predecir)
         y = df['total_venta']
@@ -138,108 +198,250 @@ class VentasPredictor:
         )
         
         # Normalizar features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
         
-        # Entrenar Random Forest
+        # Entrenar Random Forest por tramos (warm_start) para poder informar el avance;
+        # con el mismo random_state el bosque resultante es el mismo que en un solo fit
         print("🌲 Entrenando Random Forest...")
-        self.model = RandomForestRegressor(
-            n_estimators=100,      # 100 árboles
+        model = RandomForestRegressor(
+            n_estimators=0,
             max_depth=10,          # Profundidad máxima
             min_samples_split=5,
             random_state=42,
-            n_jobs=-1              # Usar todos los cores
+            n_jobs=cpus_entrenamiento(),
+            warm_start=True
         )
-        
-        self.model.fit(X_train_scaled, y_train)
+        for arboles in range(ARBOLES_POR_TRAMO, ARBOLES + 1, ARBOLES_POR_TRAMO):
+            model.set_params(n_estimators=arboles)
+            model.fit(X_train_scaled, y_train)
+            avisar(10 + 75 * arboles // ARBOLES, f'Entrenando ({arboles}/{ARBOLES} árboles)')
+        model.set_params(warm_start=False)
         
         # Evaluar
-        train_score = self.model.score(X_train_scaled, y_train)
-        test_score = self.model.score(X_test_scaled, y_test)
+        avisar(90, 'Evaluando')
+        train_score = round(model.score(X_train_scaled, y_train), 3)
+        test_score = round(model.score(X_test_scaled, y_test), 3)
+        
+        return self._registrar(model, scaler, df, {
+            'modo': 'completo',
+            'ventana': {'desde': min(df['fecha']), 'hasta': max(df['fecha'])},
+            'registros': len(df),
+            'metricas': {'train_score': train_score, 'test_score': test_score},
+            # Se usa como valor de cantidad_items al predecir días futuros
+            'promedio_items': float(df['cantidad_items'].mean()),
+        }, avisar)
+    
+    def _entrenar_incremental(self, avisar):
+        """
+        Agregar ARBOLES_INCREMENTO árboles entrenados con la ventana reciente
         
-        # Guardar modelo
-        self._guardar_modelo()
+        Los árboles existentes y el scaler de la versión activa se conservan.
+        Retorna None cuando hace falta un entrenamiento completo (no hay
+        versión activa, cambiaron las features o se alcanzó ARBOLES_MAXIMO).
+        """
+        from django.conf import settings
+        
+        actual = registro.obtener(self.nombre)
+        if actual is None or actual.metadata.get('features') != FEATURES:
+            return None
+        
+        modelo_actual = actual.artefacto['modelo']
+        if modelo_actual.n_estimators + ARBOLES_INCREMENTO > ARBOLES_MAXIMO:
+            print(f"🔁 Modelo con {modelo_actual.n_estimators} árboles: reentrenamiento completo")
+            return None
+        
+        avisar(10, 'Preparando datos recientes')
+        hasta_anterior = date.fromisoformat(actual.metadata['ventana']['hasta'])
+        nuevos = self.preparar_datos_historicos(desde=hasta_anterior + timedelta(days=1))
+        if len(nuevos) == 0:
+            print(f"✅ Sin ventas nuevas desde {hasta_anterior}: se mantiene {actual.version}")
+            self.precalcular_predicciones()
+            return {
+                'exito': True,
+                'sin_cambios': True,
+                'version': actual.version,
+                'registros': 0,
+                'train_score': actual.metadata['metricas']['train_score'],
+                'test_score': actual.metadata['metricas'].get('test_score'),
+                'features_importance': actual.metadata['features_importance'],
+            }
         
-        print(f"✅ Modelo entrenado - Train R²: {train_score:.3f}, Test R²: {test_score:.3f}")
+        # Los árboles nuevos ven la ventana reciente completa (no solo los días nuevos)
+        dias = getattr(settings, 'ANALYTICS_VENTANA_INCREMENTAL', 30)
+        desde = min(hasta_anterior + timedelta(days=1), _hoy() - timedelta(days=dias))
+        df = self.preparar_datos_historicos(desde=desde)
+        scaler = actual.artefacto['scaler']
+        X = scaler.transform(df[FEATURES])
+        
+        print(f"🌱 Agregando {ARBOLES_INCREMENTO} árboles a {actual.version} ({len(nuevos)} días nuevos)...")
+        avisar(30, 'Entrenando árboles nuevos')
+        # Copia: la instancia cacheada puede estar sirviendo predicciones
+        model = copy.deepcopy(modelo_actual)
+        model.set_params(
+            warm_start=True,
+            n_estimators=modelo_actual.n_estimators + ARBOLES_INCREMENTO,
+            n_jobs=cpus_entrenamiento(),
+        )
+        model.fit(X, df['total_venta'])
+        model.set_params(warm_start=False)
+        
+        avisar(90, 'Evaluando')
+        registros = actual.metadata['registros'] + len(nuevos)
+        promedio = (
+            actual.metadata['promedio_items'] * actual.metadata['registros']
+            + float(nuevos['cantidad_items'].sum())
+        ) / registros
+        
+        return self._registrar(model, scaler, df, {
+            'modo': 'incremental',
+            'version_base': actual.version,
+            'ventana': {'desde': actual.metadata['ventana']['desde'], 'hasta': max(nuevos['fecha'])},
+            'registros': registros,
+            # Sin partición de prueba: el score es sobre la ventana reciente
+            'metricas': {'train_score': round(model.score(X, df['total_venta']), 3), 'test_score': None},
+            'promedio_items': promedio,
+        }, avisar)
+    
+    def _registrar(self, model, scaler, df, metadata, avisar):
+        """Registrar la versión entrenada y dejarla activa"""
+        from django.conf import settings
+        
+        avisar(95, 'Registrando versión')
+        importancia = self._get_feature_importance(model)
+        
+        # Registrar la versión (el cambio de versión activa es atómico)
+        version = registro.registrar(self.nombre, {'modelo': model, 'scaler': scaler}, {
+            'algoritmo': 'RandomForestRegressor',
+            'features': FEATURES,
+            'arboles': model.n_estimators,
+            'features_importance': importancia,
+            **metadata,
+        })
+        registro.limpiar(self.nombre, conservar=getattr(settings, 'ANALYTICS_MODELOS_CONSERVAR', 5))
+        self.precalcular_predicciones()
+        
+        metricas = metadata['metricas']
+        print(f"✅ Modelo {version} entrenado ({metadata['modo']}) - Train R²: {metricas['train_score']}")
+        avisar(100, 'Completado')
         
         return {
             'exito': True,
-            'registros': len(df),
-            'train_score': round(train_score, 3),
-            'test_score': round(test_score, 3),
-            'features_importance': self._get_feature_importance()
+            'version': version,
+            'modo': metadata['modo'],
+            'registros': metadata['registros'],
+            'train_score': metricas['train_score'],
+            'test_score': metricas['test_score'],
+            'features_importance': importancia
         }
     
-    def _get_feature_importance(self):
+    def _get_feature_importance(self, model):
         """Retorna importancia de cada feature"""
-        if self.model is None:
-            return {}
-        
-        features = ['dia_semana', 'dia_mes', 'mes', 'trimestre', 'es_fin_semana', 'cantidad_items']
-        importance = self.model.feature_importances_
-        
         return {
-            feature: round(imp, 3)
-            for feature, imp in zip(features, importance)
+            feature: round(float(imp), 3)
+            for feature, imp in zip(FEATURES, model.feature_importances_)
         }
     
     def predecir_proximos_dias(self, dias=7):
         """
         Predice ventas para los próximos N días
         
+        Las predicciones dependen solo de la versión del modelo y de la fecha:
+        se leen de PrediccionVentas por (versión activa, hoy, horizonte), que
+        se precalculan al entrenar. Si todavía no están (primer pedido del día
+        u horizonte no estándar) se calculan y se guardan.
+        
         Args:
             dias: Número de días a predecir
             
         Returns:
             Lista de predicciones con fecha y monto estimado
         """
+        from .models import PrediccionVentas
+        
         try:
-            if self.model is None:
-                self._cargar_modelo()
+            version = registro.version_actual(self.nombre)
             
-            if self.model is None:
+            if version is None:
                 # Si no hay modelo, retornar datos de ejemplo
                 print("⚠️ Modelo no entrenado. Retornando predicciones de ejemplo...")
                 return self._generar_predicciones_ejemplo(dias)
             
-            predicciones = []
-            hoy = datetime.now()
+            horizonte = next((h for h in HORIZONTES_PREDICCION if h >= dias), dias)
+            guardadas = PrediccionVentas.objects.filter(
+                version=version, fecha=_hoy(), horizonte=horizonte
+            ).values_list('predicciones', flat=True).first()
             
-            for i in range(dias):
-                fecha = hoy + timedelta(days=i)
-                
-                # Estimar cantidad de items (promedio histórico o valor por defecto)
-                cantidad_items_estimada = 15
-                
-                # Preparar features
-                features = pd.DataFrame([{
-                    'dia_semana': fecha.weekday(),
-                    'dia_mes': fecha.day,
-                    'mes': fecha.month,
-                    'trimestre': (fecha.month - 1) // 3 + 1,
-                    'es_fin_semana': 1 if fecha.weekday() >= 5 else 0,
-                    'cantidad_items': cantidad_items_estimada
-                }])
-                
-                # Normalizar y predecir
-                features_scaled = self.scaler.transform(features)
-                venta_predicha = self.model.predict(features_scaled)[0]
-                
-                predicciones.append({
-                    'fecha': fecha.strftime('%Y-%m-%d'),
-                    'dia_nombre': ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom'][fecha.weekday()],
-                    'venta_estimada': round(max(0, venta_predicha), 2),
-                    'confianza': 'alta' if fecha.weekday() < 5 else 'media'  # Más confiable en días laborables
-                })
+            if guardadas is None:
+                return self.precalcular_predicciones(horizontes=(horizonte,))[horizonte][:dias]
             
-            return predicciones
+            return [_prediccion(fecha, venta) for fecha, venta in guardadas[:dias]]
         except Exception as e:
             print(f"⚠️ Error en predicción: {str(e)}. Retornando datos de ejemplo...")
             return self._generar_predicciones_ejemplo(dias)
     
+    def precalcular_predicciones(self, horizontes=HORIZONTES_PREDICCION):
+        """
+        Calcular y guardar las predicciones de hoy con la versión activa
+        
+        Se llama al terminar cada entrenamiento. Un solo predict para el
+        horizonte más largo; los demás son prefijos de ese.
+        
+        Returns:
+            dict: horizonte -> lista de predicciones ({} si no hay modelo)
+        """
+        from .models import PrediccionVentas
+        
+        registrado = registro.obtener(self.nombre)
+        if registrado is None:
+            return {}
+        
+        predicciones = self._calcular_predicciones(registrado, max(horizontes))
+        por_horizonte = {h: predicciones[:h] for h in horizontes}
+        
+        hoy = _hoy()
+        PrediccionVentas.objects.filter(fecha__lt=hoy).delete()
+        PrediccionVentas.objects.bulk_create([
+            PrediccionVentas(
+                version=registrado.version, fecha=hoy, horizonte=h,
+                # Solo [fecha, venta]: el nombre del día y la confianza se derivan al leer
+                predicciones=[[p['fecha'], p['venta_estimada']] for p in datos]
+            )
+            for h, datos in por_horizonte.items()
+        ], ignore_conflicts=True)
+        return por_horizonte
+    
+    def _calcular_predicciones(self, registrado, dias):
+        """
+        Predicciones de una versión del modelo para los próximos N días
+        
+        Arma las N filas de features a la vez y hace una sola llamada a predict.
+        """
+        fechas = pd.date_range(_hoy(), periods=dias, freq='D')
+        features = pd.DataFrame({
+            'dia_semana': fechas.weekday,
+            'dia_mes': fechas.day,
+            'mes': fechas.month,
+            'trimestre': fechas.quarter,
+            'es_fin_semana': (fechas.weekday >= 5).astype(int),
+            # Promedio histórico de items por día
+            'cantidad_items': registrado.metadata.get('promedio_items', 15),
+        })[FEATURES]
+        
+        # Normalizar y predecir en una sola llamada
+        modelo = registrado.artefacto['modelo']
+        scaler = registrado.artefacto['scaler']
+        ventas = modelo.predict(scaler.transform(features))
+        
+        return [
+            _prediccion(fecha.strftime('%Y-%m-%d'), round(max(0, float(venta)), 2))
+            for fecha, venta in zip(fechas, ventas)
+        ]
+    
     def predecir_ventas_mes(self):
         """
-        Predice ventas totales del mes actual
+        Predice ventas totales de los próximos 30 días
         
         Returns:
             dict con predicción del mes
@@ -248,7 +450,7 @@ class VentasPredictor:
         total_predicho = sum(p['venta_estimada'] for p in predicciones_diarias)
         
         return {
-            'mes': datetime.now().strftime('%B %Y'),
+            'mes': _hoy().strftime('%B %Y'),
             'total_estimado': round(total_predicho, 2),
             'promedio_diario': round(total_predicho / 30, 2),
             'predicciones_diarias': predicciones_diarias[:7]  # Solo próximos 7 días
@@ -265,7 +467,7 @@ class VentasPredictor:
             Lista de predicciones de ejemplo
         """
         predicciones = []
-        hoy = datetime.now()
+        hoy = _hoy()
         base_venta = 50000  # Venta base de ejemplo
         
         for i in range(dias):
@@ -283,31 +485,12 @@ class VentasPredictor:
             
             predicciones.append({
                 'fecha': fecha.strftime('%Y-%m-%d'),
-                'dia_nombre': ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom'][dia_semana],
+                'dia_nombre': DIAS_SEMANA[dia_semana],
                 'venta_estimada': round(max(0, venta_estimada), 2),
                 'confianza': 'baja'  # Baja confianza porque son datos de ejemplo
             })
         
         return predicciones
-    
-    def _guardar_modelo(self):
-        """Guarda el modelo entrenado en disco"""
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-        joblib.dump(self.model, self.model_path)
-        joblib.dump(self.scaler, self.scaler_path)
-        print(f"💾 Modelo guardado en {self.model_path}")
-    
-    def _cargar_modelo(self):
-        """Carga el modelo desde disco"""
-        try:
-            if os.path.exists(self.model_path):
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
-                print("✅ Modelo cargado desde disco")
-                return True
-        except Exception as e:
-            print(f"⚠️ Error cargando modelo: {e}")
-        return False
 
 
 class ProductosAnalyzer:
@@ -338,24 +521,22 @@ class ProductosAnalyzer:
         Ventas históricas por producto
         Requisito: Ventas históricas por producto
         """
-        from ventas.models import ItemPedido
-        from django.utils import timezone
-        from datetime import timedelta
+        from .models import VentaDiariaProducto
         
-        fecha_inicio = timezone.now() - timedelta(days=dias)
+        fecha_inicio = _hoy() - timedelta(days=dias)
         
-        ventas = ItemPedido.objects.filter(
-            pedido__creado__gte=fecha_inicio,
-            venta__estado__in=['ENTREGADO', 'PAGADO']
+        ventas = VentaDiariaProducto.objects.filter(
+            fecha__gte=fecha_inicio
         ).values(
             'producto__id',
             'producto__nombre',
             'producto__categoria__nombre'
         ).annotate(
             cantidad_vendida=Sum('cantidad'),
-            ingresos=Sum(F('cantidad') * F('precio_unitario')),
-            total_ordenes=Count('venta', distinct=True)
-        ).order_by('-ingresos')
+            ingresos=Sum('ingresos'),
+            # Cada pedido pertenece a un solo día: la suma diaria no repite pedidos
+            total_ordenes=Sum('pedidos')
+        ).filter(total_ordenes__gt=0).order_by('-ingresos')
         
         return list(ventas)
     
@@ -364,22 +545,22 @@ class ProductosAnalyzer:
         """
         Ventas históricas por categoría
         Requisito: Ventas históricas por categoría
+        Para predicciones futuras por categoría
         """
-        from ventas.models import ItemPedido
-        from django.utils import timezone
-        from datetime import timedelta
+        from .models import VentaDiariaProducto
         
-        fecha_inicio = timezone.now() - timedelta(days=dias)
+        fecha_inicio = _hoy() - timedelta(days=dias)
         
-        ventas = ItemPedido.objects.filter(
-            pedido__creado__gte=fecha_inicio,
-            venta__estado__in=['ENTREGADO', 'PAGADO']
+        # Desde el rollup por producto para poder contar productos distintos
+        ventas = VentaDiariaProducto.objects.filter(
+            fecha__gte=fecha_inicio,
+            pedidos__gt=0
         ).values(
-            'producto__categoria__id',
-            'producto__categoria__nombre'
+            producto__categoria__id=F('categoria_id'),
+            producto__categoria__nombre=F('categoria__nombre')
         ).annotate(
             cantidad_vendida=Sum('cantidad'),
-            ingresos=Sum(F('cantidad') * F('precio_unitario')),
+            ingresos=Sum('ingresos'),
             total_productos=Count('producto', distinct=True)
         ).order_by('-ingresos')
         
@@ -391,61 +572,78 @@ class ProductosAnalyzer:
         Ventas históricas por cliente
         Requisito: Ventas históricas por cliente
         """
-        from ventas.models import Pedido
-        from django.utils import timezone
-        from datetime import timedelta
+        from .models import VentaDiariaCliente
         
-        fecha_inicio = timezone.now() - timedelta(days=dias)
+        fecha_inicio = _hoy() - timedelta(days=dias)
         
-        clientes = Pedido.objects.filter(
-            creado__gte=fecha_inicio,
-            estado__in=['ENTREGADO', 'PAGADO']
+        clientes = VentaDiariaCliente.objects.filter(
+            fecha__gte=fecha_inicio
         ).values(
             'usuario__id',
             'usuario__first_name',
             'usuario__last_name',
             'usuario__email'
         ).annotate(
-            total_ordenes=Count('id'),
-            total_gastado=Sum('total'),
-            ticket_promedio=Avg('total')
-        ).order_by('-total_gastado')[:limite]
-        
-        return list(clientes)
+            total_ordenes=Sum('pedidos'),
+            total_gastado=Sum('total')
+        ).filter(total_ordenes__gt=0).order_by('-total_gastado')[:limite]
+        
+        return [
+            {**cliente, 'ticket_promedio': cliente['total_gastado'] / cliente['total_ordenes']}
+            for cliente in clientes
+        ]
     
     @staticmethod
     def productos_bajo_stock(umbral=10):
-        """Productos con stock bajo que necesitan reabastecimiento"""
+        """
+        Productos con stock bajo que necesitan reabastecimiento
+        
+        Además del umbral fijo incluye los productos cuya demanda pronosticada
+        (analytics.demanda) agota el stock dentro del horizonte; primero los
+        que se agotan antes.
+        """
+        from django.db.models import Q
         from productos.models import Producto
+        from .demanda import quiebres_previstos
         
-        productos = Producto.objects.filter(
-            activo=True,
-            stock__lte=umbral
+        quiebres = quiebres_previstos()
+        productos = list(Producto.objects.filter(
+            Q(stock__lte=umbral) | Q(id__in=list(quiebres)),
+            activo=True
         ).values(
             'id', 'nombre', 'stock', 'precio', 'imagen'
-        ).order_by('stock')[:20]
-        
-        return list(productos)
+        ))
+        
+        for producto in productos:
+            quiebre = quiebres.get(producto['id'])
+            producto['quiebre_previsto'] = quiebre is not None
+            producto['dias_hasta_quiebre'] = quiebre['dias_hasta_quiebre'] if quiebre else None
+            producto['demanda_prevista'] = quiebre['demanda_prevista'] if quiebre else None
+        
+        productos.sort(key=lambda p: (
+            p['dias_hasta_quiebre'] if p['quiebre_previsto'] else float('inf'), p['stock']
+        ))
+        return productos[:20]
     
     @staticmethod
     def categorias_top():
         """Categorías más rentables"""
-        from productos.models import Categoria
-        from ventas.models import ItemPedido
+        from .models import VentaDiariaCategoria
         
-        categorias = Categoria.objects.annotate(
-            total_ventas=Count('productos__detalleventa'),
-            ingresos=Sum(
-                F('productos__detalleventa__cantidad') * 
-                F('productos__detalleventa__precio_unitario')
-            )
+        categorias = VentaDiariaCategoria.objects.filter(
+            categoria__isnull=False
+        ).values(
+            'categoria__id', 'categoria__nombre'
+        ).annotate(
+            total_ventas=Sum('cantidad'),
+            ingresos=Sum('ingresos')
         ).filter(total_ventas__gt=0).order_by('-ingresos')[:10]
         
         return [{
-            'id': c.id,
-            'nombre': c.nombre,
-            'total_ventas': c.total_ventas,
-            'ingresos': float(c.ingresos or 0)
+            'id': c['categoria__id'],
+            'nombre': c['categoria__nombre'],
+            'total_ventas': c['total_ventas'],
+            'ingresos': float(c['ingresos'] or 0)
         } for c in categorias]
 
 
@@ -0,0 +1,193 @@
+"""
+Tablas de resumen (rollups) de ventas por día
+
+Se mantienen de forma incremental desde ventas (ver analytics.rollups) y
+el dashboard las lee en lugar de agregar Pedido e ItemPedido en cada carga.
+Un pedido cuenta como venta mientras está en ESTADOS_VENTA; la fecha es la
+de creación del pedido.
+
+Nota: la carpeta analytics/models/ guarda las versiones de los modelos ML
+(ver analytics.registro), no código.
+"""
+from django.conf import settings
+from django.db import models
+
+
+class VentaDiaria(models.Model):
+    """Totales de ventas de un día"""
+
+    fecha = models.DateField(unique=True, verbose_name='Fecha')
+    pedidos = models.IntegerField(default=0, verbose_name='Pedidos')
+    unidades = models.IntegerField(default=0, verbose_name='Unidades vendidas')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Total')
+
+    class Meta:
+        verbose_name = 'Venta diaria'
+        verbose_name_plural = 'Ventas diarias'
+        ordering = ['fecha']
+
+    def __str__(self):
+        return f'{self.fecha}: {self.total} ({self.pedidos} pedidos)'
+
+
+class VentaDiariaProducto(models.Model):
+    """Ventas de un producto en un día"""
+
+    fecha = models.DateField(verbose_name='Fecha')
+    producto = models.ForeignKey(
+        'productos.Producto', on_delete=models.CASCADE, related_name='ventas_diarias'
+    )
+    # Categoría del producto al momento de la venta
+    categoria = models.ForeignKey(
+        'productos.Categoria', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    pedidos = models.IntegerField(default=0)
+    cantidad = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta diaria por producto'
+        verbose_name_plural = 'Ventas diarias por producto'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='venta_diaria_producto_unica'),
+        ]
+        indexes = [models.Index(fields=['producto', 'fecha'])]
+
+
+class VentaDiariaCategoria(models.Model):
+    """Ventas de una categoría en un día (categoria nula = sin categoría)"""
+
+    fecha = models.DateField(verbose_name='Fecha')
+    categoria = models.ForeignKey(
+        'productos.Categoria', on_delete=models.CASCADE, null=True, blank=True, related_name='+'
+    )
+    pedidos = models.IntegerField(default=0)
+    cantidad = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta diaria por categoría'
+        verbose_name_plural = 'Ventas diarias por categoría'
+        constraints = [
+            # NULLS NOT DISTINCT: una sola fila por día para "sin categoría"
+            models.UniqueConstraint(
+                fields=['fecha', 'categoria'],
+                name='venta_diaria_categoria_unica',
+                nulls_distinct=False,
+            ),
+        ]
+
+
+class VentaDiariaCliente(models.Model):
+    """Compras de un cliente en un día"""
+
+    fecha = models.DateField(verbose_name='Fecha')
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ventas_diarias'
+    )
+    pedidos = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta diaria por cliente'
+        verbose_name_plural = 'Ventas diarias por cliente'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'usuario'], name='venta_diaria_cliente_unica'),
+        ]
+        indexes = [models.Index(fields=['usuario', 'fecha'])]
+
+
+class PrediccionVentas(models.Model):
+    """
+    Predicciones de ventas precalculadas por (versión del modelo, fecha, horizonte)
+
+    Solo cambian cuando cambia el modelo o el día, así que se calculan al
+    entrenar y los endpoints de predicción las leen con una consulta.
+    """
+
+    version = models.CharField(max_length=50, verbose_name='Versión del modelo')
+    fecha = models.DateField(verbose_name='Fecha de cálculo')
+    horizonte = models.PositiveSmallIntegerField(verbose_name='Días predichos')
+    predicciones = models.JSONField(default=list, verbose_name='Predicciones')
+    generado = models.DateTimeField(auto_now_add=True, verbose_name='Generado el')
+
+    class Meta:
+        verbose_name = 'Predicción de ventas'
+        verbose_name_plural = 'Predicciones de ventas'
+        constraints = [
+            models.UniqueConstraint(fields=['version', 'fecha', 'horizonte'], name='prediccion_ventas_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.version} {self.fecha} ({self.horizonte} días)'
+
+
+class PronosticoDemanda(models.Model):
+    """
+    Unidades pronosticadas de un producto para un día
+
+    Se reemplazan completos en cada corrida de analytics.demanda
+    """
+
+    producto = models.ForeignKey(
+        'productos.Producto', on_delete=models.CASCADE, related_name='pronosticos_demanda'
+    )
+    fecha = models.DateField(verbose_name='Fecha')
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Unidades pronosticadas')
+    version = models.CharField(max_length=50, verbose_name='Versión del modelo')
+    generado = models.DateTimeField(auto_now_add=True, verbose_name='Generado el')
+
+    class Meta:
+        verbose_name = 'Pronóstico de demanda'
+        verbose_name_plural = 'Pronósticos de demanda'
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='pronostico_demanda_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.producto_id} {self.fecha}: {self.cantidad}'
+
+
+class EntrenamientoModelo(models.Model):
+    """
+    Entrenamiento de un modelo ML en segundo plano
+
+    Lo crea el endpoint o el comando entrenar_modelo y lo ejecuta la tarea
+    analytics.entrenar_modelo, que va actualizando progreso y etapa.
+    """
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+    ESTADOS_ACTIVOS = ('PENDIENTE', 'EN_PROCESO')
+
+    MODELO_CHOICES = [
+        ('ventas', 'Ventas diarias'),
+        ('demanda', 'Demanda por producto'),
+    ]
+
+    modelo = models.CharField(max_length=50, choices=MODELO_CHOICES, default='ventas', verbose_name='Modelo')
+    incremental = models.BooleanField(default=False, verbose_name='Incremental')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE', verbose_name='Estado')
+    progreso = models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')
+    etapa = models.CharField(max_length=100, blank=True, verbose_name='Etapa')
+    version = models.CharField(max_length=50, blank=True, verbose_name='Versión generada')
+    resultado = models.JSONField(default=dict, blank=True, verbose_name='Resultado')
+    error = models.TextField(blank=True, verbose_name='Error')
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    creado = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    iniciado_en = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado el')
+    finalizado_en = models.DateTimeField(null=True, blank=True, verbose_name='Finalizado el')
+
+    class Meta:
+        verbose_name = 'Entrenamiento de modelo'
+        verbose_name_plural = 'Entrenamientos de modelos'
+        ordering = ['-creado']
+
+    def __str__(self):
+        return f'{self.modelo} #{self.id} ({self.estado} {self.progreso}%)'
@@ -0,0 +1,187 @@
+"""
+Registro de modelos ML versionados
+
+Cada entrenamiento se guarda en su propia carpeta y un puntero indica la
+versión activa:
+
+    ANALYTICS_MODELOS_DIR/
+        ventas/
+            ACTUAL                      -> "v20261019-153000-a1b2"
+            v20261019-153000-a1b2/
+                artefacto.joblib        (modelo, scaler, ...)
+                metadata.json           (ventana de entrenamiento, métricas, ...)
+
+- registrar() escribe la versión en una carpeta temporal, la renombra y
+  luego reemplaza ACTUAL con os.replace: quien lea durante un
+  entrenamiento ve la versión anterior completa o la nueva, nunca una mezcla
+- obtener() mantiene el modelo cargado en memoria y solo relee el disco si
+  cambió la fecha de modificación de ACTUAL (otro proceso promovió otra versión)
+- promover() permite volver a una versión anterior
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+PUNTERO = 'ACTUAL'
+ARTEFACTO = 'artefacto.joblib'
+METADATA = 'metadata.json'
+
+
+@dataclass
+class ModeloRegistrado:
+    """Versión cargada de un modelo"""
+    nombre: str
+    version: str
+    artefacto: dict
+    metadata: dict
+
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def directorio_base():
+    return Path(getattr(settings, 'ANALYTICS_MODELOS_DIR', settings.BASE_DIR / 'analytics' / 'models'))
+
+
+def _directorio(nombre):
+    return directorio_base() / nombre
+
+
+def _escribir_atomico(ruta, contenido):
+    temporal = ruta.with_name(f'.{ruta.name}.{uuid.uuid4().hex[:8]}')
+    temporal.write_text(contenido, encoding='utf-8')
+    os.replace(temporal, ruta)
+
+
+def registrar(nombre, artefacto, metadata, promover_version=True):
+    """
+    Guardar una nueva versión de un modelo
+
+    Args:
+        nombre: Nombre del modelo (p. ej. 'ventas')
+        artefacto: Dict con los objetos a persistir (modelo, scaler, ...)
+        metadata: Dict serializable (ventana, métricas, features, ...)
+        promover_version: Dejarla como versión activa
+
+    Returns:
+        str: Versión creada
+    """
+    base = _directorio(nombre)
+    base.mkdir(parents=True, exist_ok=True)
+    version = f"v{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:4]}"
+
+    temporal = base / f'.tmp-{version}'
+    temporal.mkdir()
+    metadata = {**metadata, 'version': version, 'registrado_en': datetime.now().isoformat()}
+    joblib.dump(artefacto, temporal / ARTEFACTO)
+    (temporal / METADATA).write_text(
+        json.dumps(metadata, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2), encoding='utf-8'
+    )
+    temporal.rename(base / version)
+    logger.info(f'💾 Modelo {nombre} {version} registrado')
+
+    if promover_version:
+        promover(nombre, version)
+    return version
+
+
+def promover(nombre, version):
+    """Dejar una versión existente como activa (cambio atómico del puntero)"""
+    if not (_directorio(nombre) / version / ARTEFACTO).exists():
+        raise ValueError(f'La versión {version} de {nombre} no existe')
+    _escribir_atomico(_directorio(nombre) / PUNTERO, version)
+    logger.info(f'🚀 Modelo {nombre}: versión activa {version}')
+
+
+def version_actual(nombre):
+    try:
+        return (_directorio(nombre) / PUNTERO).read_text(encoding='utf-8').strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def obtener(nombre):
+    """
+    Versión activa de un modelo, cacheada en memoria
+
+    Returns:
+        ModeloRegistrado o None si no hay ninguna versión
+    """
+    puntero = _directorio(nombre) / PUNTERO
+    try:
+        mtime = puntero.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cacheado = _cache.get(nombre)
+    if cacheado and cacheado[0] == mtime:
+        return cacheado[1]
+
+    with _lock:
+        cacheado = _cache.get(nombre)
+        if cacheado and cacheado[0] == mtime:
+            return cacheado[1]
+
+        version = version_actual(nombre)
+        if cacheado and cacheado[1].version == version:
+            # Se reescribió el puntero con la misma versión: no hace falta recargar
+            _cache[nombre] = (mtime, cacheado[1])
+            return cacheado[1]
+
+        carpeta = _directorio(nombre) / version
+        modelo = ModeloRegistrado(
+            nombre=nombre,
+            version=version,
+            artefacto=joblib.load(carpeta / ARTEFACTO),
+            metadata=json.loads((carpeta / METADATA).read_text(encoding='utf-8')),
+        )
+        _cache[nombre] = (mtime, modelo)
+        logger.info(f'✅ Modelo {nombre} {version} cargado')
+        return modelo
+
+
+def versiones(nombre):
+    """
+    Metadata de todas las versiones, de la más reciente a la más antigua
+
+    Returns:
+        list[dict]: Metadata con 'activa' = True en la versión actual
+    """
+    base = _directorio(nombre)
+    if not base.exists():
+        return []
+    actual = version_actual(nombre)
+    resultado = []
+    for carpeta in base.iterdir():
+        if carpeta.is_dir() and not carpeta.name.startswith('.') and (carpeta / METADATA).exists():
+            metadata = json.loads((carpeta / METADATA).read_text(encoding='utf-8'))
+            resultado.append({**metadata, 'activa': carpeta.name == actual})
+    # registrado_en tiene microsegundos: ordena bien aunque dos versiones compartan segundo
+    return sorted(resultado, key=lambda v: v['registrado_en'], reverse=True)
+
+
+def limpiar(nombre, conservar=5):
+    """
+    Eliminar versiones antiguas (nunca la activa)
+
+    Returns:
+        int: Versiones eliminadas
+    """
+    actual = version_actual(nombre)
+    sobrantes = [v['version'] for v in versiones(nombre)[conservar:] if v['version'] != actual]
+    for version in sobrantes:
+        shutil.rmtree(_directorio(nombre) / version, ignore_errors=True)
+    return len(sobrantes)
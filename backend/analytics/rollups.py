@@ -0,0 +1,196 @@
+"""
+Mantenimiento incremental de los rollups de ventas
+
+Cuando un pedido entra en ESTADOS_VENTA se suman sus montos al día de su
+creación; cuando sale, se restan. Cada actualización es un único
+INSERT ... ON CONFLICT DO UPDATE SET campo = campo + EXCLUDED.campo por
+tabla, atómico frente a otros pedidos del mismo día.
+
+Puntos de entrada:
+    - analytics.signals: Pedido.save() / delete() (cambios de a uno)
+    - registrar_cambios(): cambios en lote (UPDATE masivo de ventas)
+    - reconstruir(): recalcular un rango desde cero (comando reconstruir_rollups)
+"""
+import logging
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from .models import VentaDiaria, VentaDiariaCategoria, VentaDiariaCliente, VentaDiariaProducto
+
+logger = logging.getLogger(__name__)
+
+# Estados en los que un pedido cuenta como venta (los mismos que usaba el dashboard)
+ESTADOS_VENTA = ('PAGADO', 'ENTREGADO')
+
+TAMANO_LOTE = 1000
+
+
+def es_venta(estado):
+    return estado in ESTADOS_VENTA
+
+
+def _acumular(modelo, claves, campos, filas, extras=()):
+    """
+    Sumar filas a una tabla de rollup (crea las que no existen)
+
+    Args:
+        modelo: Modelo de rollup
+        claves: Campos de la restricción única
+        campos: Campos que se suman
+        filas: Lista de dicts con claves + campos (+ extras)
+        extras: Campos que solo se escriben al crear la fila
+    """
+    if not filas:
+        return
+    opts = modelo._meta
+    qn = connection.ops.quote_name
+    tabla = qn(opts.db_table)
+    nombres = list(claves) + list(extras) + list(campos)
+    columnas = [qn(opts.get_field(c).column) for c in nombres]
+    col_claves = columnas[:len(claves)]
+    col_campos = columnas[len(claves) + len(extras):]
+    marcador = '(' + ', '.join(['%s'] * len(nombres)) + ')'
+    asignaciones = ', '.join(f'{c} = {tabla}.{c} + EXCLUDED.{c}' for c in col_campos)
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(filas), TAMANO_LOTE):
+            lote = filas[i:i + TAMANO_LOTE]
+            parametros = [fila[c] for fila in lote for c in nombres]
+            cursor.execute(
+                f'INSERT INTO {tabla} ({", ".join(columnas)}) '
+                f'VALUES {", ".join([marcador] * len(lote))} '
+                f'ON CONFLICT ({", ".join(col_claves)}) DO UPDATE SET {asignaciones}',
+                parametros,
+            )
+
+
+def _con_signo(filas, campos, signo):
+    if signo < 0:
+        for fila in filas:
+            for campo in campos:
+                fila[campo] = -fila[campo]
+    return filas
+
+
+def _aplicar(pedidos, signo):
+    """
+    Agregar los pedidos por día (3 consultas agrupadas) y sumarlos o restarlos
+
+    Args:
+        pedidos: QuerySet de Pedido
+        signo: 1 para sumar, -1 para restar
+    """
+    from ventas.models import ItemPedido
+
+    pedidos = pedidos.order_by().annotate(fecha=TruncDate('creado'))
+    items = (
+        ItemPedido.objects.filter(pedido__in=pedidos.values('id'))
+        .order_by()
+        .annotate(fecha=TruncDate('pedido__creado'))
+    )
+
+    por_cliente = list(
+        pedidos.values('fecha', 'usuario_id').annotate(pedidos=Count('id'), total=Sum('total'))
+    )
+    por_producto = list(
+        items.values('fecha', 'producto_id', categoria_id=F('producto__categoria_id')).annotate(
+            # ingresos antes que cantidad: la anotación 'cantidad' oculta el campo
+            pedidos=Count('pedido_id', distinct=True),
+            ingresos=Sum(F('cantidad') * F('precio_unitario')),
+            cantidad=Sum('cantidad'),
+        )
+    )
+    por_categoria = list(
+        items.values('fecha', categoria_id=F('producto__categoria_id')).annotate(
+            pedidos=Count('pedido_id', distinct=True),
+            ingresos=Sum(F('cantidad') * F('precio_unitario')),
+            cantidad=Sum('cantidad'),
+        )
+    )
+
+    # El total diario sale de los otros dos agregados, sin más consultas
+    por_dia = defaultdict(lambda: {'pedidos': 0, 'unidades': 0, 'total': 0})
+    for fila in por_cliente:
+        por_dia[fila['fecha']]['pedidos'] += fila['pedidos']
+        por_dia[fila['fecha']]['total'] += fila['total']
+    for fila in por_categoria:
+        por_dia[fila['fecha']]['unidades'] += fila['cantidad']
+    diarias = [{'fecha': fecha, **valores} for fecha, valores in por_dia.items()]
+
+    _acumular(VentaDiaria, ['fecha'], ['pedidos', 'unidades', 'total'],
+              _con_signo(diarias, ['pedidos', 'unidades', 'total'], signo))
+    _acumular(VentaDiariaCliente, ['fecha', 'usuario_id'], ['pedidos', 'total'],
+              _con_signo(por_cliente, ['pedidos', 'total'], signo))
+    # La categoría se guarda al crear la fila; en el conflicto solo se suman los campos
+    _acumular(VentaDiariaProducto, ['fecha', 'producto_id'], ['pedidos', 'cantidad', 'ingresos'],
+              _con_signo(por_producto, ['pedidos', 'cantidad', 'ingresos'], signo),
+              extras=['categoria_id'])
+    _acumular(VentaDiariaCategoria, ['fecha', 'categoria_id'], ['pedidos', 'cantidad', 'ingresos'],
+              _con_signo(por_categoria, ['pedidos', 'cantidad', 'ingresos'], signo))
+
+
+def registrar_cambios(entran=(), salen=()):
+    """
+    Actualizar los rollups con pedidos que empiezan o dejan de ser venta
+
+    Args:
+        entran: IDs de pedidos que pasaron a un estado de venta
+        salen: IDs de pedidos que dejaron de estar en un estado de venta
+    """
+    from ventas.models import Pedido
+
+    with transaction.atomic():
+        if entran:
+            _aplicar(Pedido.objects.filter(id__in=list(entran)), 1)
+        if salen:
+            _aplicar(Pedido.objects.filter(id__in=list(salen)), -1)
+
+
+def registrar_cambio_estado(pedidos, estado_nuevo):
+    """
+    Rollups para un cambio de estado en lote
+
+    Args:
+        pedidos: Lista de dicts {'id', 'estado'} con el estado anterior
+        estado_nuevo: Estado aplicado a todos
+    """
+    if es_venta(estado_nuevo):
+        registrar_cambios(entran=[p['id'] for p in pedidos if not es_venta(p['estado'])])
+    else:
+        registrar_cambios(salen=[p['id'] for p in pedidos if es_venta(p['estado'])])
+
+
+@transaction.atomic
+def reconstruir(desde=None, hasta=None):
+    """
+    Recalcular los rollups de un rango de fechas desde Pedido e ItemPedido
+
+    Args:
+        desde, hasta: Fechas (date) incluidas; None = sin límite
+
+    Returns:
+        int: Pedidos procesados
+    """
+    from ventas.models import Pedido
+
+    filtros = {}
+    if desde:
+        filtros['fecha__gte'] = desde
+    if hasta:
+        filtros['fecha__lte'] = hasta
+    for modelo in (VentaDiaria, VentaDiariaProducto, VentaDiariaCategoria, VentaDiariaCliente):
+        modelo.objects.filter(**filtros).delete()
+
+    pedidos = Pedido.objects.filter(estado__in=ESTADOS_VENTA)
+    if desde:
+        pedidos = pedidos.filter(creado__date__gte=desde)
+    if hasta:
+        pedidos = pedidos.filter(creado__date__lte=hasta)
+
+    _aplicar(pedidos, 1)
+    total = pedidos.count()
+    logger.info(f'📊 Rollups de ventas reconstruidos: {total} pedidos')
+    return total
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from .models import EntrenamientoModelo
+
 
 class PrediccionVentaSerializer(serializers.Serializer):
     """Serializer para predicción de ventas"""
@@ -34,6 +36,9 @@ class ProductoBajoStockSerializer(serializers.Serializer):
     stock = serializers.IntegerField()
     precio = serializers.FloatField()
     imagen = serializers.CharField(allow_null=True)
+    quiebre_previsto = serializers.BooleanField(default=False)
+    dias_hasta_quiebre = serializers.IntegerField(allow_null=True, default=None)
+    demanda_prevista = serializers.FloatField(allow_null=True, default=None)
 
 
 class CategoriaTopSerializer(serializers.Serializer):
@@ -47,7 +52,20 @@ class CategoriaTopSerializer(serializers.Serializer):
 class MetricasEntrenamientoSerializer(serializers.Serializer):
     """Serializer para métricas del modelo ML"""
     exito = serializers.BooleanField()
+    version = serializers.CharField(required=False)
     registros = serializers.IntegerField()
     train_score = serializers.FloatField()
-    test_score = serializers.FloatField()
+    test_score = serializers.FloatField(allow_null=True)
     features_importance = serializers.DictField()
+
+
+class EntrenamientoModeloSerializer(serializers.ModelSerializer):
+    """Serializer para el estado de un entrenamiento en segundo plano"""
+    solicitado_por = serializers.CharField(source='solicitado_por.username', default=None, read_only=True)
+
+    class Meta:
+        model = EntrenamientoModelo
+        fields = [
+            'id', 'modelo', 'incremental', 'estado', 'progreso', 'etapa', 'version',
+            'resultado', 'error', 'solicitado_por', 'creado', 'iniciado_en', 'finalizado_en',
+        ]
@@ -0,0 +1,89 @@
+"""
+Signals para mantener los rollups de ventas
+Un pedido suma al entrar en un estado de venta y resta al salir. Si cambian
+los items de un pedido que ya es venta, el pedido se resta con los items
+anteriores y se vuelve a sumar con los nuevos.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from ventas.models import ItemPedido, Pedido
+
+from .rollups import ESTADOS_VENTA, es_venta, registrar_cambios
+
+
+@receiver(pre_save, sender=Pedido)
+def pedido_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Guardar el estado anterior antes de guardar"""
+    if update_fields is not None and 'estado' not in update_fields:
+        instance._estado_anterior = instance.estado
+    elif instance.pk:
+        instance._estado_anterior = (
+            Pedido.objects.filter(pk=instance.pk).values_list('estado', flat=True).first()
+        )
+    else:
+        instance._estado_anterior = None
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_post_save(sender, instance, **kwargs):
+    """Sumar o restar el pedido si cambió su condición de venta"""
+    antes = es_venta(getattr(instance, '_estado_anterior', instance.estado))
+    ahora = es_venta(instance.estado)
+    if ahora and not antes:
+        registrar_cambios(entran=[instance.pk])
+    elif antes and not ahora:
+        registrar_cambios(salen=[instance.pk])
+    instance._estado_anterior = instance.estado
+
+
+@receiver(pre_delete, sender=Pedido)
+def pedido_pre_delete(sender, instance, **kwargs):
+    """Restar el pedido antes de que se eliminen sus items"""
+    if es_venta(instance.estado):
+        registrar_cambios(salen=[instance.pk])
+
+
+def _pedidos_en_venta(pedido_ids):
+    return list(
+        Pedido.objects.filter(id__in=[i for i in pedido_ids if i], estado__in=ESTADOS_VENTA)
+        .values_list('id', flat=True)
+    )
+
+
+@receiver(pre_save, sender=ItemPedido)
+def item_pre_save(sender, instance, **kwargs):
+    """Restar los pedidos en venta afectados, con sus items anteriores"""
+    pedido_ids = {instance.pedido_id}
+    if instance.pk:
+        pedido_ids.add(
+            ItemPedido.objects.filter(pk=instance.pk).values_list('pedido_id', flat=True).first()
+        )
+    instance._pedidos_venta = _pedidos_en_venta(pedido_ids)
+    if instance._pedidos_venta:
+        registrar_cambios(salen=instance._pedidos_venta)
+
+
+@receiver(post_save, sender=ItemPedido)
+def item_post_save(sender, instance, **kwargs):
+    """Volver a sumar los pedidos con el item guardado"""
+    if getattr(instance, '_pedidos_venta', None):
+        registrar_cambios(entran=instance._pedidos_venta)
+
+
+def _borrado_en_cascada(origin):
+    # Al eliminar el pedido ya lo resta pedido_pre_delete
+    return isinstance(origin, Pedido) or getattr(origin, 'model', None) is Pedido
+
+
+@receiver(pre_delete, sender=ItemPedido)
+def item_pre_delete(sender, instance, origin=None, **kwargs):
+    instance._pedidos_venta = [] if _borrado_en_cascada(origin) else _pedidos_en_venta([instance.pedido_id])
+    if instance._pedidos_venta:
+        registrar_cambios(salen=instance._pedidos_venta)
+
+
+@receiver(post_delete, sender=ItemPedido)
+def item_post_delete(sender, instance, **kwargs):
+    if getattr(instance, '_pedidos_venta', None):
+        registrar_cambios(entran=instance._pedidos_venta)
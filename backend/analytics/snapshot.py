@@ -0,0 +1,211 @@
+"""
+Snapshot del dashboard con caché stale-while-revalidate
+
+Todos los KPIs del panel en un solo cálculo, a partir de los rollups
+diarios y de dos consultas sobre Producto:
+
+    1. VentaDiaria de los últimos max(60, dias) días -> mes, semana, serie diaria
+    2. VentaDiariaCliente -> clientes activos (y top clientes para admins)
+    3. VentaDiariaProducto -> top productos del período
+    4. VentaDiariaCategoria -> categorías del período
+    5. Producto (agregado condicional) -> activos y bajo stock
+    6. Producto -> listado de bajo stock
+
+El resultado se guarda en caché por (rol, días). Mientras tenga menos de
+ANALYTICS_SNAPSHOT_TTL segundos se sirve tal cual; después se sigue
+sirviendo (marcado como obsoleto) y un hilo lo recalcula, hasta
+ANALYTICS_SNAPSHOT_MAX_EDAD segundos, cuando se recalcula en el request.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import VentaDiaria, VentaDiariaCategoria, VentaDiariaCliente, VentaDiariaProducto
+
+logger = logging.getLogger(__name__)
+
+UMBRAL_BAJO_STOCK = 10
+
+
+def _variacion(actual, anterior):
+    if anterior > 0:
+        return round((actual - anterior) / anterior * 100, 1)
+    return 100 if actual > 0 else 0
+
+
+def _totales(dias_por_fecha, desde, hasta):
+    filas = [fila for fecha, fila in dias_por_fecha.items() if desde <= fecha < hasta]
+    total = float(sum(fila['total'] for fila in filas))
+    pedidos = sum(fila['pedidos'] for fila in filas)
+    return total, pedidos
+
+
+def calcular_snapshot(dias=30, incluir_clientes=True):
+    """
+    Calcular todos los KPIs del dashboard
+
+    Args:
+        dias: Días de la serie diaria y de los rankings
+        incluir_clientes: Incluir el ranking de clientes (datos personales)
+
+    Returns:
+        dict: KPIs listos para serializar
+    """
+    from productos.models import Producto
+
+    hoy = timezone.now().date()
+    manana = hoy + timedelta(days=1)
+    inicio_periodo = hoy - timedelta(days=dias)
+    inicio = min(inicio_periodo, hoy - timedelta(days=60))
+
+    por_fecha = {
+        fila['fecha']: fila
+        for fila in VentaDiaria.objects.filter(fecha__gte=inicio).values('fecha', 'pedidos', 'unidades', 'total')
+    }
+
+    total_mes, pedidos_mes = _totales(por_fecha, hoy - timedelta(days=30), manana)
+    total_mes_anterior, _ = _totales(por_fecha, hoy - timedelta(days=60), hoy - timedelta(days=30))
+    total_semana, pedidos_semana = _totales(por_fecha, hoy - timedelta(days=7), manana)
+    total_semana_anterior, pedidos_semana_anterior = _totales(
+        por_fecha, hoy - timedelta(days=14), hoy - timedelta(days=7)
+    )
+    tendencia = _variacion(total_semana, total_semana_anterior)
+
+    clientes_activos = VentaDiariaCliente.objects.filter(
+        fecha__gte=hoy - timedelta(days=30), pedidos__gt=0
+    ).values('usuario_id').distinct().count()
+
+    productos = Producto.objects.filter(activo=True).aggregate(
+        activos=Count('id'),
+        bajo_stock=Count('id', filter=Q(stock__lte=UMBRAL_BAJO_STOCK)),
+    )
+
+    snapshot = {
+        'periodo_dias': dias,
+        'ventas_mes': {
+            'total': round(total_mes, 2),
+            'cantidad_ordenes': pedidos_mes,
+            'crecimiento': _variacion(total_mes, total_mes_anterior),
+            'ticket_promedio': round(total_mes / pedidos_mes, 2) if pedidos_mes else 0,
+        },
+        'tendencias': {
+            'semana_actual': {'total': round(total_semana, 2), 'cantidad': pedidos_semana},
+            'semana_anterior': {'total': round(total_semana_anterior, 2), 'cantidad': pedidos_semana_anterior},
+            'tendencia_porcentaje': tendencia,
+            'direccion': 'alza' if tendencia > 0 else 'baja' if tendencia < 0 else 'estable',
+        },
+        'ventas_diarias': [
+            {'fecha': fecha, 'total': float(fila['total']), 'cantidad': fila['pedidos']}
+            for fecha, fila in sorted(por_fecha.items())
+            if fecha >= inicio_periodo and fila['pedidos'] > 0
+        ],
+        'productos': {
+            'total_activos': productos['activos'],
+            'bajo_stock': productos['bajo_stock'],
+            'porcentaje_bajo_stock': round(
+                productos['bajo_stock'] / productos['activos'] * 100 if productos['activos'] else 0, 1
+            ),
+            'listado_bajo_stock': list(
+                Producto.objects.filter(activo=True, stock__lte=UMBRAL_BAJO_STOCK)
+                .values('id', 'nombre', 'stock')
+                .order_by('stock')[:20]
+            ),
+        },
+        'clientes': {'activos_mes': clientes_activos},
+        'productos_top': list(
+            VentaDiariaProducto.objects.filter(fecha__gte=inicio_periodo)
+            .values('producto__id', 'producto__nombre')
+            .annotate(cantidad_vendida=Sum('cantidad'), ingresos=Sum('ingresos'))
+            .filter(cantidad_vendida__gt=0)
+            .order_by('-ingresos')[:10]
+        ),
+        'categorias_top': list(
+            VentaDiariaCategoria.objects.filter(fecha__gte=inicio_periodo, categoria__isnull=False)
+            .values('categoria__id', 'categoria__nombre')
+            .annotate(cantidad_vendida=Sum('cantidad'), ingresos=Sum('ingresos'))
+            .filter(cantidad_vendida__gt=0)
+            .order_by('-ingresos')[:10]
+        ),
+    }
+    if incluir_clientes:
+        snapshot['clientes']['top'] = list(
+            VentaDiariaCliente.objects.filter(fecha__gte=inicio_periodo, pedidos__gt=0)
+            .values('usuario__id', 'usuario__first_name', 'usuario__last_name', 'usuario__email')
+            .annotate(total_ordenes=Sum('pedidos'), total_gastado=Sum('total'))
+            .order_by('-total_gastado')[:10]
+        )
+    return snapshot
+
+
+def _clave(rol, dias):
+    return f'analytics:snapshot:{rol}:{dias}'
+
+
+def _calcular_y_guardar(rol, dias, incluir_clientes):
+    inicio = time.monotonic()
+    datos = calcular_snapshot(dias, incluir_clientes)
+    entrada = {
+        'datos': datos,
+        'calculado_en': time.time(),
+        'duracion_ms': round((time.monotonic() - inicio) * 1000, 1),
+    }
+    cache.set(_clave(rol, dias), entrada, getattr(settings, 'ANALYTICS_SNAPSHOT_MAX_EDAD', 600))
+    return entrada
+
+
+def _revalidar(rol, dias, incluir_clientes):
+    try:
+        _calcular_y_guardar(rol, dias, incluir_clientes)
+    except Exception as e:
+        logger.error(f'❌ Error recalculando snapshot {rol}/{dias}: {e}')
+    finally:
+        cache.delete(_clave(rol, dias) + ':recalculando')
+        connection.close()
+
+
+def obtener_snapshot(rol, dias=30, incluir_clientes=True):
+    """
+    Snapshot en caché con stale-while-revalidate
+
+    Args:
+        rol: Parte de la clave de caché (p. ej. 'admin')
+        dias: Período de la serie y los rankings
+        incluir_clientes: Incluir el ranking de clientes
+
+    Returns:
+        dict: {'datos', 'meta': {'estado', 'calculado_en', 'edad_segundos', 'duracion_ms'}}
+              estado: 'calculado' (en este request), 'fresco' u 'obsoleto'
+    """
+    ttl = getattr(settings, 'ANALYTICS_SNAPSHOT_TTL', 60)
+    entrada = cache.get(_clave(rol, dias))
+
+    if entrada is None:
+        entrada = _calcular_y_guardar(rol, dias, incluir_clientes)
+        estado = 'calculado'
+    elif time.time() - entrada['calculado_en'] <= ttl:
+        estado = 'fresco'
+    else:
+        estado = 'obsoleto'
+        # cache.add es atómico: un solo recálculo en curso por clave
+        if cache.add(_clave(rol, dias) + ':recalculando', True, 60):
+            threading.Thread(
+                target=_revalidar, args=(rol, dias, incluir_clientes),
+                name='snapshot-dashboard', daemon=True,
+            ).start()
+
+    return {
+        'datos': entrada['datos'],
+        'meta': {
+            'estado': estado,
+            'calculado_en': datetime.fromtimestamp(entrada['calculado_en']).isoformat(),
+            'edad_segundos': round(time.time() - entrada['calculado_en'], 1),
+            'duracion_ms': entrada['duracion_ms'],
+        },
+    }
@@ -0,0 +1,140 @@
+"""
+Tareas en segundo plano de analytics
+
+El entrenamiento de modelos no corre en el request: el endpoint crea un
+EntrenamientoModelo y encola esta tarea. Conviene dedicarle su propio worker
+para que no compita con las demás tareas ni con la web:
+
+    python manage.py run_workers --tipos analytics.entrenar_modelo --procesos 1
+    python manage.py run_workers --excluir analytics.entrenar_modelo
+
+El presupuesto de CPU dentro del worker lo fija ANALYTICS_ENTRENAMIENTO_CPUS.
+La tarea tiene su propio timeout de huérfana (ANALYTICS_ENTRENAMIENTO_TIMEOUT),
+mucho mayor que TAREAS_TIMEOUT_HUERFANAS: un entrenamiento largo no se reencola
+mientras sigue corriendo.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import IntegerField, Q
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from tareas.registro import tarea
+
+logger = logging.getLogger(__name__)
+
+
+def solicitar_entrenamiento(incremental=False, usuario=None, modelo="ventas"):
+    """
+    Encolar un entrenamiento ('ventas' o 'demanda' por producto)
+
+    Si ya hay uno pendiente o en curso del mismo modelo se devuelve ese en
+    lugar de encolar otro.
+
+    Returns:
+        tuple: (EntrenamientoModelo, creado)
+    """
+    from .models import EntrenamientoModelo
+
+    cerrar_colgados(modelo)
+    with transaction.atomic():
+        activo = EntrenamientoModelo.objects.filter(
+            modelo=modelo, estado__in=EntrenamientoModelo.ESTADOS_ACTIVOS
+        ).first()
+        if activo:
+            return activo, False
+        entrenamiento = EntrenamientoModelo.objects.create(
+            modelo=modelo, incremental=incremental, solicitado_por=usuario
+        )
+        entrenar_modelo.encolar(entrenamiento_id=entrenamiento.id)
+    return entrenamiento, True
+
+
+def _timeout():
+    return getattr(settings, "ANALYTICS_ENTRENAMIENTO_TIMEOUT", 10800)
+
+
+def cerrar_colgados(modelo=None):
+    """
+    Marcar FALLIDO los entrenamientos que ya no van a terminar
+
+    Son los activos cuya tarea quedó MUERTA (el worker murió a mitad) y los
+    EN_PROCESO iniciados hace más de ANALYTICS_ENTRENAMIENTO_TIMEOUT segundos.
+    Sin esto solicitar_entrenamiento devolvería para siempre el colgado.
+
+    Returns:
+        int: Entrenamientos marcados
+    """
+    from tareas.models import Tarea
+
+    from .models import EntrenamientoModelo
+
+    activos = EntrenamientoModelo.objects.filter(estado__in=EntrenamientoModelo.ESTADOS_ACTIVOS)
+    if modelo is not None:
+        activos = activos.filter(modelo=modelo)
+    muertas = Tarea.objects.filter(tipo=entrenar_modelo.tipo, estado="MUERTA").values_list(
+        Cast(KeyTextTransform("entrenamiento_id", "payload"), IntegerField()), flat=True
+    )
+    vencido = timezone.now() - timedelta(seconds=_timeout())
+
+    cerrados = activos.filter(
+        Q(id__in=muertas) | Q(estado="EN_PROCESO", iniciado_en__lt=vencido)
+    ).update(
+        estado="FALLIDO",
+        error="El entrenamiento se interrumpió o superó el tiempo máximo",
+        finalizado_en=timezone.now(),
+    )
+    if cerrados:
+        logger.warning(f"⚠️ {cerrados} entrenamientos colgados marcados como fallidos")
+    return cerrados
+
+
+@tarea(
+    "analytics.entrenar_modelo", max_intentos=1, concurrencia=1,
+    timeout=getattr(settings, "ANALYTICS_ENTRENAMIENTO_TIMEOUT", 10800),
+)
+def entrenar_modelo(entrenamiento_id):
+    from .demanda import entrenar_y_pronosticar
+    from .ml_service import predictor
+    from .models import EntrenamientoModelo
+
+    entrenamiento = EntrenamientoModelo.objects.filter(
+        id=entrenamiento_id, estado="PENDIENTE"
+    ).first()
+    if entrenamiento is None:
+        return
+
+    filas = EntrenamientoModelo.objects.filter(id=entrenamiento.id)
+    filas.update(estado="EN_PROCESO", iniciado_en=timezone.now(), etapa="Iniciando")
+
+    def progreso(porcentaje, etapa):
+        filas.update(progreso=porcentaje, etapa=etapa)
+
+    try:
+        if entrenamiento.modelo == "demanda":
+            resultado = entrenar_y_pronosticar(progreso=progreso)
+        else:
+            resultado = predictor.entrenar_modelo(
+                incremental=entrenamiento.incremental, progreso=progreso
+            )
+    except Exception as e:
+        logger.error(f"❌ Entrenamiento #{entrenamiento.id} falló: {e}")
+        filas.update(estado="FALLIDO", error=str(e), finalizado_en=timezone.now())
+        raise
+
+    if resultado.get("error"):
+        filas.update(
+            estado="FALLIDO", error=resultado["error"], resultado=resultado,
+            finalizado_en=timezone.now(),
+        )
+        return
+
+    filas.update(
+        estado="COMPLETADO", progreso=100, etapa="Completado",
+        version=resultado["version"], resultado=resultado, finalizado_en=timezone.now(),
+    )
@@ -0,0 +1,501 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from productos.models import Categoria, Producto
+from ventas.models import ItemPedido, Pedido
+
+from .models import VentaDiaria, VentaDiariaCategoria, VentaDiariaCliente, VentaDiariaProducto
+from .rollups import reconstruir
+
+User = get_user_model()
+
+
+class RollupsVentasTest(APITestCase):
+    """Rollups diarios mantenidos al cambiar el estado de los pedidos"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.cliente = User.objects.create_user(username="cliente", password="x")
+        self.categoria = Categoria.objects.create(nombre="Electrónica")
+        self.producto = Producto.objects.create(
+            nombre="Mouse", descripcion="Mouse óptico", precio=Decimal("50.00"),
+            stock=100, categoria=self.categoria,
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.hoy = timezone.now().date()
+
+    def _crear_pedido(self, cantidad=2):
+        pedido = Pedido.objects.create(
+            usuario=self.cliente,
+            subtotal=Decimal("50.00") * cantidad,
+            total=Decimal("50.00") * cantidad,
+        )
+        ItemPedido.objects.create(
+            pedido=pedido, producto=self.producto,
+            precio_unitario=Decimal("50.00"), cantidad=cantidad,
+        )
+        return pedido
+
+    def _diaria(self):
+        fila = VentaDiaria.objects.filter(fecha=self.hoy).first()
+        return (fila.pedidos, fila.unidades, fila.total) if fila else (0, 0, 0)
+
+    def test_pago_suma_y_cancelacion_resta(self):
+        pedido = self._crear_pedido(cantidad=2)
+        self.assertEqual(self._diaria(), (0, 0, 0))
+
+        pedido.actualizar_estado("PAGADO")
+        self.assertEqual(self._diaria(), (1, 2, Decimal("100.00")))
+        producto = VentaDiariaProducto.objects.get(fecha=self.hoy, producto=self.producto)
+        self.assertEqual((producto.cantidad, producto.categoria_id), (2, self.categoria.id))
+        self.assertEqual(
+            VentaDiariaCategoria.objects.get(fecha=self.hoy, categoria=self.categoria).ingresos,
+            Decimal("100.00"),
+        )
+        self.assertEqual(VentaDiariaCliente.objects.get(fecha=self.hoy, usuario=self.cliente).pedidos, 1)
+
+        # Un segundo pedido el mismo día se acumula en las mismas filas
+        self._crear_pedido(cantidad=1).actualizar_estado("PAGADO")
+        self.assertEqual(self._diaria(), (2, 3, Decimal("150.00")))
+
+        pedido.actualizar_estado("CANCELADO")
+        self.assertEqual(self._diaria(), (1, 1, Decimal("50.00")))
+
+    def test_items_de_un_pedido_ya_pagado(self):
+        """Los items agregados, editados o borrados en un pedido en venta se reflejan"""
+        pedido = Pedido.objects.create(
+            usuario=self.cliente, estado="PAGADO", subtotal=Decimal("150.00"), total=Decimal("150.00"),
+        )
+        self.assertEqual(self._diaria(), (1, 0, Decimal("150.00")))
+
+        item = ItemPedido.objects.create(
+            pedido=pedido, producto=self.producto, precio_unitario=Decimal("50.00"), cantidad=2,
+        )
+        producto = VentaDiariaProducto.objects.get(fecha=self.hoy, producto=self.producto)
+        self.assertEqual((producto.pedidos, producto.cantidad, producto.ingresos), (1, 2, Decimal("100.00")))
+        self.assertEqual(self._diaria(), (1, 2, Decimal("150.00")))
+
+        item.cantidad = 3
+        item.save()
+        self.assertEqual(self._diaria(), (1, 3, Decimal("150.00")))
+        self.assertEqual(
+            VentaDiariaCategoria.objects.get(fecha=self.hoy, categoria=self.categoria).ingresos,
+            Decimal("150.00"),
+        )
+
+        item.delete()
+        self.assertEqual(VentaDiariaProducto.objects.get(fecha=self.hoy, producto=self.producto).cantidad, 0)
+        self.assertEqual(self._diaria(), (1, 0, Decimal("150.00")))
+
+        # Eliminar el pedido lo resta una sola vez
+        ItemPedido.objects.create(pedido=pedido, producto=self.producto, precio_unitario=Decimal("50.00"), cantidad=1)
+        pedido.delete()
+        self.assertEqual(self._diaria(), (0, 0, Decimal("0.00")))
+
+    def test_cambio_masivo_actualiza_rollups(self):
+        pedidos = [self._crear_pedido() for _ in range(3)]
+        for pedido in pedidos:
+            pedido.actualizar_estado("PAGADO")
+        self.assertEqual(self._diaria()[0], 3)
+
+        # PAGADO -> PROCESANDO deja de contar (mismos estados que el dashboard)
+        respuesta = self.client.post(
+            "/api/ventas/pedidos/bulk-estado/",
+            {"pedidos": [p.id for p in pedidos[:2]], "estado": "PROCESANDO"},
+            format="json",
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self._diaria(), (1, 2, Decimal("100.00")))
+
+    def test_reconstruir_coincide_con_incremental(self):
+        for cantidad in (1, 3):
+            self._crear_pedido(cantidad).actualizar_estado("PAGADO")
+        self._crear_pedido(5)  # PENDIENTE: no cuenta
+        incremental = self._diaria()
+
+        VentaDiaria.objects.all().delete()
+        self.assertEqual(reconstruir(), 2)
+        self.assertEqual(self._diaria(), incremental)
+        self.assertEqual(VentaDiariaProducto.objects.get(fecha=self.hoy).pedidos, 2)
+
+    def test_dashboard_lee_rollups(self):
+        self._crear_pedido(cantidad=2).actualizar_estado("PAGADO")
+
+        respuesta = self.client.get("/api/analytics/dashboard/metricas-generales/")
+        self.assertEqual(respuesta.data["ventas_mes"]["cantidad_ordenes"], 1)
+        self.assertEqual(respuesta.data["clientes"]["activos_mes"], 1)
+
+        respuesta = self.client.get("/api/analytics/dashboard/grafico-ventas-diarias/")
+        self.assertEqual(respuesta.data["datos"][0]["cantidad"], 1)
+
+        respuesta = self.client.get("/api/analytics/dashboard/ventas-por-periodo/", {"periodo": "mensual"})
+        self.assertEqual(respuesta.data["datos"][0]["total"], Decimal("100.00"))
+
+        respuesta = self.client.get("/api/analytics/dashboard/ventas-por-categoria/")
+        self.assertEqual(respuesta.data["categorias"][0]["total_productos"], 1)
+
+        respuesta = self.client.get("/api/analytics/dashboard/ventas-por-cliente/")
+        self.assertEqual(respuesta.data["clientes"][0]["ticket_promedio"], Decimal("100.00"))
+
+
+class SnapshotDashboardTest(APITestCase):
+    """Snapshot del dashboard con caché stale-while-revalidate"""
+
+    url = "/api/analytics/snapshot/"
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        cliente = User.objects.create_user(username="cliente", password="x", email="c@test.com")
+        categoria = Categoria.objects.create(nombre="Hogar")
+        producto = Producto.objects.create(
+            nombre="Lámpara", descripcion="Lámpara LED", precio=Decimal("20.00"),
+            stock=5, categoria=categoria,
+        )
+        pedido = Pedido.objects.create(usuario=cliente, subtotal=Decimal("40.00"), total=Decimal("40.00"))
+        ItemPedido.objects.create(pedido=pedido, producto=producto, precio_unitario=Decimal("20.00"), cantidad=2)
+        pedido.actualizar_estado("PAGADO")
+        self.client.force_authenticate(user=self.admin)
+
+    def test_kpis_en_una_respuesta(self):
+        respuesta = self.client.get(self.url)
+        datos = respuesta.data["datos"]
+        self.assertEqual(respuesta.data["meta"]["estado"], "calculado")
+        self.assertIn("duracion_ms", respuesta.data["meta"])
+        self.assertEqual(datos["ventas_mes"]["cantidad_ordenes"], 1)
+        self.assertEqual(datos["tendencias"]["semana_actual"]["total"], 40.0)
+        self.assertEqual(datos["productos"]["bajo_stock"], 1)
+        self.assertEqual(datos["productos_top"][0]["cantidad_vendida"], 2)
+        self.assertEqual(datos["categorias_top"][0]["categoria__nombre"], "Hogar")
+        self.assertEqual(datos["clientes"]["top"][0]["usuario__email"], "c@test.com")
+
+    def test_segunda_consulta_desde_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.data["meta"]["estado"], "fresco")
+
+    @override_settings(ANALYTICS_SNAPSHOT_TTL=0)
+    def test_obsoleto_se_sirve_y_recalcula_en_segundo_plano(self):
+        self.client.get(self.url)
+        with mock.patch("analytics.snapshot.threading.Thread") as hilo:
+            respuesta = self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual(respuesta.data["meta"]["estado"], "obsoleto")
+        # Un solo recálculo aunque lleguen varias consultas
+        hilo.return_value.start.assert_called_once()
+
+    def test_no_admin_sin_ranking_de_clientes(self):
+        usuario = User.objects.create_user(username="vendedor", password="x")
+        self.client.force_authenticate(user=usuario)
+        respuesta = self.client.get(self.url)
+        self.assertNotIn("top", respuesta.data["datos"]["clientes"])
+
+
+class DatosEntrenamientoTest(APITestCase):
+    """Extracción de datos de entrenamiento en una consulta agrupada"""
+
+    def test_una_consulta_agrupada_por_dia(self):
+        from .ml_service import VentasPredictor
+
+        cliente = User.objects.create_user(username="cliente", password="x")
+        producto = Producto.objects.create(
+            nombre="Taza", descripcion="Taza", precio=Decimal("10.00"), stock=100,
+        )
+        for items in (1, 2, 3):
+            pedido = Pedido.objects.create(
+                usuario=cliente, estado="PAGADO", subtotal=Decimal("30.00"), total=Decimal("30.00"),
+            )
+            for _ in range(items):
+                ItemPedido.objects.create(
+                    pedido=pedido, producto=producto, precio_unitario=Decimal("10.00"), cantidad=1,
+                )
+
+        with self.assertNumQueries(1):
+            df = VentasPredictor().preparar_datos_historicos()
+
+        self.assertEqual(len(df), 1)
+        # El total no se multiplica por la cantidad de items de cada pedido
+        self.assertEqual(df.loc[0, "total_venta"], 90.0)
+        self.assertEqual(df.loc[0, "cantidad_items"], 6)
+        self.assertEqual(df.loc[0, "dia_semana"], timezone.now().weekday())
+
+
+class RegistroModelosTest(APITestCase):
+    """Versiones de modelos con caché en memoria y predicción vectorizada"""
+
+    def setUp(self):
+        import tempfile
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(ANALYTICS_MODELOS_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _entrenar(self):
+        from .ml_service import VentasPredictor
+
+        predictor = VentasPredictor()
+        with mock.patch.object(predictor, "preparar_datos_historicos", predictor._generar_datos_ejemplo):
+            resultado = predictor.entrenar_modelo()
+        self.assertTrue(resultado["exito"])
+        return predictor, resultado["version"]
+
+    def test_entrenar_registra_version_con_metadata(self):
+        from . import registro
+
+        _, version = self._entrenar()
+        self.assertEqual(registro.version_actual("ventas"), version)
+        metadata = registro.obtener("ventas").metadata
+        self.assertEqual(metadata["registros"], 180)
+        self.assertIn("test_score", metadata["metricas"])
+        self.assertIn("desde", metadata["ventana"])
+
+    def test_obtener_usa_cache_y_promover_cambia_version(self):
+        from . import registro
+
+        _, anterior = self._entrenar()
+        cargado = registro.obtener("ventas")
+        with mock.patch("analytics.registro.joblib.load") as cargar:
+            self.assertIs(registro.obtener("ventas"), cargado)
+        cargar.assert_not_called()
+
+        _, nueva = self._entrenar()
+        self.assertEqual(registro.obtener("ventas").version, nueva)
+        registro.promover("ventas", anterior)
+        self.assertEqual(registro.obtener("ventas").version, anterior)
+        self.assertEqual([v["activa"] for v in registro.versiones("ventas")], [False, True])
+
+    def test_prediccion_en_una_sola_llamada(self):
+        from . import registro
+
+        predictor, _ = self._entrenar()
+        modelo = registro.obtener("ventas").artefacto["modelo"]
+        with mock.patch.object(modelo, "predict", wraps=modelo.predict) as predecir:
+            por_horizonte = predictor.precalcular_predicciones()
+        predecir.assert_called_once()
+        self.assertEqual(len(por_horizonte[14]), 14)
+        self.assertTrue(all(p["venta_estimada"] >= 0 for p in por_horizonte[30]))
+
+    def test_predicciones_precalculadas_al_entrenar(self):
+        from .models import PrediccionVentas
+
+        predictor, version = self._entrenar()
+        self.assertEqual(
+            sorted(PrediccionVentas.objects.filter(version=version).values_list("horizonte", flat=True)),
+            [7, 14, 30],
+        )
+        # Lectura: archivo del puntero + una consulta, sin llamar al modelo
+        with mock.patch.object(predictor, "_calcular_predicciones") as calcular, self.assertNumQueries(1):
+            mes = predictor.predecir_ventas_mes()
+        calcular.assert_not_called()
+        self.assertEqual(len(mes["predicciones_diarias"]), 7)
+
+        # Horizonte no estándar: se calcula una vez y queda guardado
+        self.assertEqual(len(predictor.predecir_proximos_dias(45)), 45)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(predictor.predecir_proximos_dias(45)), 45)
+
+
+class EntrenamientoSegundoPlanoTest(APITestCase):
+    """Entrenamiento encolado, con progreso y versión anterior activa hasta promover"""
+
+    def setUp(self):
+        import tempfile
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(ANALYTICS_MODELOS_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        from .ml_service import predictor
+
+        # Historial sintético que termina hace 5 días; las consultas con `desde` ven los días nuevos
+        completo = predictor._generar_datos_ejemplo()
+        historial = completo.iloc[:-5].reset_index(drop=True)
+        parche = mock.patch.object(
+            type(predictor), "preparar_datos_historicos",
+            lambda _self, desde=None: historial if desde is None
+            else completo[completo["fecha"] >= desde].reset_index(drop=True),
+        )
+        parche.start()
+        self.addCleanup(parche.stop)
+
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+
+    def _drenar(self):
+        from tareas.worker import drenar
+
+        return drenar(tipos=["analytics.entrenar_modelo"])
+
+    def test_endpoint_encola_y_worker_entrena(self):
+        from .models import EntrenamientoModelo
+
+        respuesta = self.client.post("/api/analytics/dashboard/entrenar-modelo/")
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertEqual(respuesta.data["entrenamiento"]["estado"], "PENDIENTE")
+
+        # Un segundo pedido no encola otro entrenamiento
+        repetido = self.client.post("/api/analytics/dashboard/entrenar-modelo/")
+        self.assertEqual(repetido.data["entrenamiento"]["id"], respuesta.data["entrenamiento"]["id"])
+
+        estado = self.client.get("/api/analytics/dashboard/entrenamiento-estado/")
+        self.assertIsNone(estado.data["modelo_activo"])
+
+        self.assertEqual(self._drenar(), 1)
+        entrenamiento = EntrenamientoModelo.objects.get()
+        self.assertEqual((entrenamiento.estado, entrenamiento.progreso), ("COMPLETADO", 100))
+
+        estado = self.client.get(
+            "/api/analytics/dashboard/entrenamiento-estado/", {"id": entrenamiento.id}
+        )
+        self.assertEqual(estado.data["entrenamiento"]["version"], entrenamiento.version)
+        self.assertEqual(estado.data["modelo_activo"]["version"], entrenamiento.version)
+
+    def test_entrenamiento_colgado_no_bloquea_nuevos(self):
+        """Un entrenamiento con la tarea muerta o vencido pasa a FALLIDO y se puede pedir otro"""
+        from datetime import timedelta
+
+        from tareas.models import Tarea
+        from tareas.worker import reclamar, recuperar_huerfanas
+
+        from .tareas import solicitar_entrenamiento
+
+        colgado, _ = solicitar_entrenamiento()
+        reclamar("worker-1", tipos=["analytics.entrenar_modelo"])
+        colgado.__class__.objects.filter(id=colgado.id).update(
+            estado="EN_PROCESO", iniciado_en=timezone.now()
+        )
+
+        # Pasado TAREAS_TIMEOUT_HUERFANAS la tarea de entrenamiento sigue en curso
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Tarea.objects.update(tomada_en=hace_una_hora)
+        recuperar_huerfanas(timeout=600)
+        self.assertEqual(Tarea.objects.get().estado, "EN_PROCESO")
+        self.assertEqual(solicitar_entrenamiento(), (colgado, False))
+
+        # El worker murió: la tarea queda MUERTA y el entrenamiento FALLIDO
+        Tarea.objects.update(tomada_en=hace_una_hora - timedelta(hours=3))
+        recuperar_huerfanas()
+        self.assertEqual(Tarea.objects.get().estado, "MUERTA")
+        nuevo, creado = solicitar_entrenamiento()
+        self.assertTrue(creado)
+        colgado.refresh_from_db()
+        self.assertEqual(colgado.estado, "FALLIDO")
+
+        # Uno que supera ANALYTICS_ENTRENAMIENTO_TIMEOUT también se da por fallido
+        colgado.__class__.objects.filter(id=nuevo.id).update(
+            estado="EN_PROCESO", iniciado_en=timezone.now() - timedelta(hours=4)
+        )
+        self.assertNotEqual(solicitar_entrenamiento()[0], nuevo)
+        nuevo.refresh_from_db()
+        self.assertEqual(nuevo.estado, "FALLIDO")
+
+    def test_incremental_agrega_arboles_a_la_version_activa(self):
+        from . import registro
+        from .ml_service import ARBOLES, ARBOLES_INCREMENTO, predictor
+
+        base = predictor.entrenar_modelo()["version"]
+        avances = []
+        resultado = predictor.entrenar_modelo(
+            incremental=True, progreso=lambda porcentaje, etapa: avances.append(porcentaje)
+        )
+
+        self.assertEqual(resultado["modo"], "incremental")
+        self.assertEqual(avances[-1], 100)
+        activo = registro.obtener("ventas")
+        self.assertEqual(activo.version, resultado["version"])
+        self.assertEqual(activo.metadata["version_base"], base)
+        self.assertEqual(activo.artefacto["modelo"].n_estimators, ARBOLES + ARBOLES_INCREMENTO)
+        self.assertEqual(activo.metadata["registros"], 180)
+
+        # Sin días nuevos no se crea otra versión
+        self.assertTrue(predictor.entrenar_modelo(incremental=True)["sin_cambios"])
+        self.assertEqual(registro.version_actual("ventas"), resultado["version"])
+
+
+class PronosticoDemandaTest(APITestCase):
+    """Pronóstico de demanda por producto y quiebres de stock previstos"""
+
+    def setUp(self):
+        import tempfile
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(ANALYTICS_MODELOS_DIR=directorio.name, ANALYTICS_DEMANDA_HISTORIA_DIAS=90)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.categoria = Categoria.objects.create(nombre="Bebidas")
+        self.escaso = Producto.objects.create(
+            nombre="Agua", descripcion="Agua", precio=Decimal("1.00"), stock=12, categoria=self.categoria,
+        )
+        self.holgado = Producto.objects.create(
+            nombre="Jugo", descripcion="Jugo", precio=Decimal("2.00"), stock=1000, categoria=self.categoria,
+        )
+        hoy = timezone.now().date()
+        filas = []
+        for dias in range(1, 91):
+            fecha = hoy - timezone.timedelta(days=dias)
+            extra = 2 if fecha.weekday() >= 5 else 0
+            filas.append(VentaDiariaProducto(fecha=fecha, producto=self.escaso, cantidad=6 + extra, ingresos=6))
+            filas.append(VentaDiariaProducto(fecha=fecha, producto=self.holgado, cantidad=1, ingresos=2))
+        VentaDiariaProducto.objects.bulk_create(filas)
+
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+
+    def test_quiebre_previsto_en_sql(self):
+        """Una consulta y una fila por producto: el primer día en que se agota"""
+        from .demanda import quiebres_previstos
+        from .models import PronosticoDemanda
+
+        hoy = timezone.now().date()
+        PronosticoDemanda.objects.bulk_create(
+            PronosticoDemanda(
+                producto=producto, fecha=hoy + timezone.timedelta(days=dias), cantidad=cantidad, version="v"
+            )
+            for producto, cantidad in ((self.escaso, Decimal("5")), (self.holgado, Decimal("1")))
+            for dias in range(-1, 7)
+        )
+
+        with self.assertNumQueries(1):
+            quiebres = quiebres_previstos()
+        # 5 + 5 + 5 >= 12 al tercer día (el de ayer no cuenta)
+        self.assertEqual(quiebres, {self.escaso.id: {"dias_hasta_quiebre": 2, "demanda_prevista": 35.0}})
+
+    def test_pronostico_y_quiebre_previsto(self):
+        from .demanda import entrenar_y_pronosticar, matriz_demanda
+        from .ml_service import ProductosAnalyzer
+        from .models import PronosticoDemanda
+
+        hoy = timezone.now().date()
+        with self.assertNumQueries(1):
+            matriz = matriz_demanda(hoy - timezone.timedelta(days=90), hoy - timezone.timedelta(days=1))
+        self.assertEqual(matriz.shape, (2, 90))
+
+        resultado = entrenar_y_pronosticar()
+        self.assertEqual((resultado["productos"], resultado["pronosticos"]), (2, 28))
+        self.assertEqual(PronosticoDemanda.objects.filter(fecha=hoy).count(), 2)
+        self.assertGreater(PronosticoDemanda.objects.get(producto=self.escaso, fecha=hoy).cantidad, 4)
+
+        # El producto escaso supera el umbral fijo pero se agota en pocos días
+        productos = ProductosAnalyzer.productos_bajo_stock(umbral=10)
+        self.assertEqual([p["id"] for p in productos], [self.escaso.id])
+        self.assertTrue(productos[0]["quiebre_previsto"])
+        self.assertLessEqual(productos[0]["dias_hasta_quiebre"], 2)
+
+        respuesta = self.client.get("/api/analytics/dashboard/pronostico-demanda/", {"agrupar": "categoria"})
+        self.assertEqual(len(respuesta.data["categorias"]), 14)
+        respuesta = self.client.get("/api/analytics/dashboard/pronostico-demanda/", {"dias": 7})
+        self.assertEqual(respuesta.data["productos"][0]["producto_id"], self.escaso.id)
+        self.assertEqual(len(respuesta.data["productos"][0]["pronostico"]), 7)
@@ -6,5 +6,6 @@ router = DefaultRouter()
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
+    path('snapshot/', DashboardViewSet.as_view({'get': 'snapshot'}), name='dashboard-snapshot'),
     path('', include(router.urls)),
 ]
@@ -8,23 +8,40 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Sum, Count, Avg, F, Q
-from django.db.models.functions import TruncDate
+from django.db.models import Sum, F
+from django.db.models.functions import TruncMonth, TruncWeek
 
+from . import registro
 from .ml_service import predictor, ProductosAnalyzer
+from .demanda import pronostico_por_categoria
+from .models import EntrenamientoModelo, PronosticoDemanda, VentaDiaria, VentaDiariaCliente
+from .snapshot import obtener_snapshot
 from .serializers import (
     PrediccionVentaSerializer,
     PrediccionMesSerializer,
     ProductoTopSerializer,
     ProductoBajoStockSerializer,
     CategoriaTopSerializer,
-    MetricasEntrenamientoSerializer
+    EntrenamientoModeloSerializer
 )
+from .tareas import solicitar_entrenamiento
+
+
+def _ventas_entre(desde, hasta=None):
+    """Total y cantidad de pedidos vendidos entre dos fechas (hasta excluida)"""
+    filas = VentaDiaria.objects.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lt=hasta)
+    return filas.aggregate(total=Sum('total'), cantidad=Sum('pedidos'))
 
 
 class DashboardViewSet(viewsets.ViewSet):
     """
     ViewSet para analytics y predicciones del dashboard
+
+    Las ventas se leen de los rollups diarios (analytics.models), que se
+    mantienen al cambiar el estado de los pedidos: cada consulta recorre a lo
+    sumo una fila por día en lugar de todos los pedidos del período.
     """
     permission_classes = [IsAuthenticated]
     
@@ -34,32 +51,15 @@ class DashboardViewSet(viewsets.ViewSet):
         GET /api/analytics/metricas-generales/
         Retorna métricas generales del negocio
         """
-        from ventas.models import Pedido
         from productos.models import Producto
-        from django.contrib.auth import get_user_model
-        
-        # Fecha de hace 30 días
-        hace_30_dias = timezone.now() - timedelta(days=30)
-        hace_60_dias = timezone.now() - timedelta(days=60)
         
-        # Ventas del mes actual
-        ventas_mes_actual = Pedido.objects.filter(
-            creado__gte=hace_30_dias,
-            estado__in=['ENTREGADO', 'PAGADO']
-        ).aggregate(
-            total=Sum('total'),
-            cantidad=Count('id')
-        )
+        hoy = timezone.now().date()
+        hace_30_dias = hoy - timedelta(days=30)
+        hace_60_dias = hoy - timedelta(days=60)
         
-        # Ventas del mes anterior (para comparación)
-        ventas_mes_anterior = Pedido.objects.filter(
-            creado__gte=hace_60_dias,
-            creado__lt=hace_30_dias,
-            estado__in=['ENTREGADO', 'PAGADO']
-        ).aggregate(
-            total=Sum('total'),
-            cantidad=Count('id')
-        )
+        # Ventas del mes actual y del anterior (para comparación)
+        ventas_mes_actual = _ventas_entre(hace_30_dias)
+        ventas_mes_anterior = _ventas_entre(hace_60_dias, hace_30_dias)
         
         # Calcular crecimiento
         total_actual = float(ventas_mes_actual['total'] or 0)
@@ -71,10 +71,9 @@ class DashboardViewSet(viewsets.ViewSet):
             crecimiento = 100 if total_actual > 0 else 0
         
         # Clientes activos (compraron en últimos 30 días)
-        clientes_activos = get_user_model().objects.filter(
-            pedidos__creado__gte=hace_30_dias,
-            pedidos__estado__in=['ENTREGADO', 'PAGADO']
-        ).distinct().count()
+        clientes_activos = VentaDiariaCliente.objects.filter(
+            fecha__gte=hace_30_dias, pedidos__gt=0
+        ).values('usuario_id').distinct().count()
         
         # Productos activos
         productos_activos = Producto.objects.filter(activo=True).count()
@@ -103,13 +102,38 @@ class DashboardViewSet(viewsets.ViewSet):
             }
         })
     
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        """
+        GET /api/analytics/snapshot/?dias=30
+        Todos los KPIs del dashboard en una respuesta (ventas del mes,
+        tendencia semanal, serie diaria, productos, bajo stock, categorías y
+        clientes), servidos desde caché por (rol, días).
+
+        meta.estado: 'calculado', 'fresco' u 'obsoleto' (se está recalculando)
+        meta.duracion_ms: Tiempo que tomó el último cálculo
+        """
+        try:
+            dias = int(request.query_params.get('dias', 30))
+        except ValueError:
+            return Response({'error': 'dias debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        dias = max(1, min(dias, 365))
+
+        # El ranking de clientes (con emails) solo lo ven los administradores
+        es_admin = request.user.is_staff
+        rol = 'admin' if es_admin else f'rol_{request.user.rol_id or 0}'
+        return Response(obtener_snapshot(rol, dias, incluir_clientes=es_admin))
+    
     @action(detail=False, methods=['get'], url_path='prediccion-ventas')
     def prediccion_ventas(self, request):
         """
         GET /api/analytics/prediccion-ventas/?dias=7
-        Predice ventas para los próximos N días usando ML
+        Predice ventas para los próximos N días usando ML (precalculadas al entrenar)
         """
-        dias = int(request.query_params.get('dias', 7))
+        try:
+            dias = min(max(int(request.query_params.get('dias', 7)), 1), 90)
+        except ValueError:
+            return Response({'error': 'dias debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
         
         predicciones = predictor.predecir_proximos_dias(dias=dias)
         serializer = PrediccionVentaSerializer(predicciones, many=True)
@@ -144,20 +168,51 @@ class DashboardViewSet(viewsets.ViewSet):
     def entrenar_modelo(self, request):
         """
         POST /api/analytics/entrenar-modelo/
-        Entrena/re-entrena el modelo de ML con datos históricos
+        Body opcional: {"modelo": "ventas" | "demanda", "incremental": true}
+        Encola el entrenamiento/re-entrenamiento del modelo de ML (lo ejecuta
+        un worker); mientras tanto se sigue usando la versión activa.
+        Si ya hay un entrenamiento en curso devuelve ese.
         """
-        try:
-            resultados = predictor.entrenar_modelo()
-            serializer = MetricasEntrenamientoSerializer(resultados)
-            
-            return Response({
-                'mensaje': 'Modelo entrenado exitosamente',
-                'metricas': serializer.data
-            })
-        except Exception as e:
-            return Response({
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        modelo = request.data.get('modelo', 'ventas')
+        if modelo not in dict(EntrenamientoModelo.MODELO_CHOICES):
+            return Response({'error': f'Modelo inválido: {modelo}'}, status=status.HTTP_400_BAD_REQUEST)
+        incremental = str(request.data.get('incremental', '')).lower() in ('1', 'true')
+        entrenamiento, creado = solicitar_entrenamiento(
+            incremental=incremental, usuario=request.user, modelo=modelo
+        )
+        
+        return Response({
+            'mensaje': 'Entrenamiento encolado' if creado else 'Ya hay un entrenamiento en curso',
+            'entrenamiento': EntrenamientoModeloSerializer(entrenamiento).data
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path='entrenamiento-estado')
+    def entrenamiento_estado(self, request):
+        """
+        GET /api/analytics/entrenamiento-estado/?id=15&modelo=ventas
+        Estado y progreso de un entrenamiento (sin id: el último del modelo) y versión activa del modelo
+        """
+        modelo = request.query_params.get('modelo', 'ventas')
+        entrenamientos = EntrenamientoModelo.objects.select_related('solicitado_por').filter(modelo=modelo)
+        id_entrenamiento = request.query_params.get('id')
+        if id_entrenamiento:
+            entrenamiento = entrenamientos.filter(id=id_entrenamiento).first()
+            if entrenamiento is None:
+                return Response({'error': 'Entrenamiento no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            entrenamiento = entrenamientos.first()
+        
+        activo = registro.obtener(modelo)
+        return Response({
+            'entrenamiento': EntrenamientoModeloSerializer(entrenamiento).data if entrenamiento else None,
+            'modelo_activo': {
+                'version': activo.version,
+                'modo': activo.metadata.get('modo'),
+                'ventana': activo.metadata.get('ventana'),
+                'metricas': activo.metadata.get('metricas'),
+                'registrado_en': activo.metadata.get('registrado_en'),
+            } if activo else None
+        })
     
     @action(detail=False, methods=['get'], url_path='productos-top')
     def productos_top(self, request):
@@ -192,6 +247,49 @@ class DashboardViewSet(viewsets.ViewSet):
             'umbral': umbral
         })
     
+    @action(detail=False, methods=['get'], url_path='pronostico-demanda')
+    def pronostico_demanda(self, request):
+        """
+        GET /api/analytics/dashboard/pronostico-demanda/?dias=14&producto=5
+        GET /api/analytics/dashboard/pronostico-demanda/?agrupar=categoria
+        Unidades pronosticadas por producto o por categoría (calculadas por el worker)
+        """
+        try:
+            dias = min(max(int(request.query_params.get('dias', 14)), 1), 90)
+        except ValueError:
+            return Response({'error': 'dias debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.query_params.get('agrupar') == 'categoria':
+            return Response({'dias': dias, 'categorias': pronostico_por_categoria(dias)})
+        
+        hoy = timezone.now().date()
+        pronosticos = PronosticoDemanda.objects.filter(
+            fecha__gte=hoy, fecha__lt=hoy + timedelta(days=dias)
+        )
+        producto = request.query_params.get('producto')
+        if producto:
+            pronosticos = pronosticos.filter(producto_id=producto)
+        
+        productos = {}
+        for fila in pronosticos.order_by('producto_id', 'fecha').values(
+            'producto_id', 'producto__nombre', 'producto__stock', 'fecha', 'cantidad'
+        )[:5000]:
+            serie = productos.setdefault(fila['producto_id'], {
+                'producto_id': fila['producto_id'],
+                'nombre': fila['producto__nombre'],
+                'stock': fila['producto__stock'],
+                'total': 0,
+                'pronostico': []
+            })
+            serie['total'] += float(fila['cantidad'])
+            serie['pronostico'].append({'fecha': fila['fecha'], 'cantidad': float(fila['cantidad'])})
+        
+        return Response({
+            'dias': dias,
+            'version': registro.version_actual('demanda'),
+            'productos': sorted(productos.values(), key=lambda p: -p['total'])
+        })
+    
     @action(detail=False, methods=['get'], url_path='categorias-top')
     def categorias_top(self, request):
         """
@@ -212,20 +310,12 @@ class DashboardViewSet(viewsets.ViewSet):
         GET /api/analytics/grafico-ventas-diarias/?dias=30
         Datos para gráfico de ventas por día (últimos N días)
         """
-        from ventas.models import Pedido
-        
         dias = int(request.query_params.get('dias', 30))
-        fecha_inicio = timezone.now() - timedelta(days=dias)
+        fecha_inicio = timezone.now().date() - timedelta(days=dias)
         
-        ventas_por_dia = Pedido.objects.filter(
-            creado__gte=fecha_inicio,
-            estado__in=['ENTREGADO', 'PAGADO']
-        ).annotate(
-            fecha=TruncDate('creado')
-        ).values('fecha').annotate(
-            total=Sum('total'),
-            cantidad=Count('id')
-        ).order_by('fecha')
+        ventas_por_dia = VentaDiaria.objects.filter(
+            fecha__gte=fecha_inicio, pedidos__gt=0
+        ).values('fecha', 'total', cantidad=F('pedidos')).order_by('fecha')
         
         return Response({
             'datos': list(ventas_por_dia),
@@ -238,23 +328,13 @@ class DashboardViewSet(viewsets.ViewSet):
         GET /api/analytics/tendencias/
         Análisis de tendencias generales
         """
-        from ventas.models import Pedido
-        
         # Comparar últimos 7 días vs 7 días anteriores
-        hoy = timezone.now()
+        hoy = timezone.now().date()
         hace_7 = hoy - timedelta(days=7)
         hace_14 = hoy - timedelta(days=14)
         
-        ventas_semana_actual = Pedido.objects.filter(
-            creado__gte=hace_7,
-            estado__in=['ENTREGADO', 'PAGADO']
-        ).aggregate(total=Sum('total'), cantidad=Count('id'))
-        
-        ventas_semana_anterior = Pedido.objects.filter(
-            creado__gte=hace_14,
-            creado__lt=hace_7,
-            estado__in=['ENTREGADO', 'PAGADO']
-        ).aggregate(total=Sum('total'), cantidad=Count('id'))
+        ventas_semana_actual = _ventas_entre(hace_7)
+        ventas_semana_anterior = _ventas_entre(hace_14, hace_7)
         
         total_actual = float(ventas_semana_actual['total'] or 0)
         total_anterior = float(ventas_semana_anterior['total'] or 0)
@@ -337,44 +417,29 @@ class DashboardViewSet(viewsets.ViewSet):
         - periodo: 'diario', 'semanal', 'mensual' (default: semanal)
         - dias: últimos N días para analizar (default: 90)
         """
-        from ventas.models import Pedido
-        from django.db.models.functions import TruncWeek, TruncMonth
-        
         periodo = request.query_params.get('periodo', 'semanal')
         dias = int(request.query_params.get('dias', 90))
-        fecha_inicio = timezone.now() - timedelta(days=dias)
-        
-        ventas_query = Pedido.objects.filter(
-            creado__gte=fecha_inicio,
-            estado__in=['ENTREGADO', 'PAGADO']
-        )
-        
-        if periodo == 'diario':
-            ventas = ventas_query.annotate(
-                periodo=TruncDate('creado')
-            ).values('periodo').annotate(
-                total=Sum('total'),
-                cantidad=Count('id')
-            ).order_by('periodo')
-        elif periodo == 'semanal':
-            ventas = ventas_query.annotate(
-                periodo=TruncWeek('creado')
-            ).values('periodo').annotate(
-                total=Sum('total'),
-                cantidad=Count('id')
-            ).order_by('periodo')
-        elif periodo == 'mensual':
-            ventas = ventas_query.annotate(
-                periodo=TruncMonth('creado')
-            ).values('periodo').annotate(
-                total=Sum('total'),
-                cantidad=Count('id')
-            ).order_by('periodo')
-        else:
+        fecha_inicio = timezone.now().date() - timedelta(days=dias)
+        
+        truncados = {
+            'diario': F('fecha'),
+            'semanal': TruncWeek('fecha'),
+            'mensual': TruncMonth('fecha'),
+        }
+        if periodo not in truncados:
             return Response({
                 'error': 'Período inválido. Use: diario, semanal, mensual'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        ventas = VentaDiaria.objects.filter(
+            fecha__gte=fecha_inicio, pedidos__gt=0
+        ).annotate(
+            periodo=truncados[periodo]
+        ).values('periodo').annotate(
+            total=Sum('total'),
+            cantidad=Sum('pedidos')
+        ).order_by('periodo')
+        
         return Response({
             'periodo_tipo': periodo,
             'datos': list(ventas),
@@ -0,0 +1,138 @@
+"""
+Escritor en segundo plano para la bitácora
+
+registrar_bitacora ya no hace un INSERT por evento dentro del request: deja
+la entrada en una cola en memoria y un hilo del proceso las guarda con
+bulk_create cada BITACORA_LOTE entradas o cada BITACORA_INTERVALO_MS
+milisegundos, lo que ocurra primero.
+
+- Al terminar el proceso (atexit) se guardan las entradas pendientes
+- Si la cola se llena, la entrada se guarda en el momento: nunca se descarta
+- Tras un fork (workers de gunicorn) el hijo crea su propia cola e hilo
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+_DETENER = object()
+
+
+class EscritorBitacora:
+    """Cola de entradas de bitácora vaciada por un hilo en lotes"""
+
+    def __init__(self, tamano_lote=200, intervalo=0.5, capacidad=10000):
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._pid = None
+        self._cola = None
+        self._hilo = None
+
+    def _asegurar_hilo(self):
+        # Tras un fork el hilo del padre no existe en el hijo
+        if self._pid == os.getpid() and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo.is_alive():
+                return
+            self._cola = queue.Queue(maxsize=self.capacidad)
+            self._hilo = threading.Thread(
+                target=self._bucle, name="escritor-bitacora", daemon=True
+            )
+            self._hilo.start()
+            if self._pid is None:
+                atexit.register(self.detener)
+            self._pid = os.getpid()
+
+    def agregar(self, entrada):
+        """Encolar una instancia de Bitacora sin guardar"""
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(entrada)
+        except queue.Full:
+            logger.warning("⚠️ Cola de bitácora llena, guardando la entrada en el momento")
+            self._escribir([entrada])
+
+    def vaciar(self, timeout=5):
+        """
+        Guardar ya las entradas encoladas
+
+        Returns:
+            bool: True si el hilo confirmó el guardado antes del timeout
+        """
+        if self._hilo is None or self._pid != os.getpid():
+            return True
+        listo = threading.Event()
+        self._cola.put(listo)
+        return listo.wait(timeout)
+
+    def detener(self, timeout=5):
+        """Guardar lo pendiente y terminar el hilo"""
+        if self._hilo is None or self._pid != os.getpid() or not self._hilo.is_alive():
+            return
+        self._cola.put(_DETENER)
+        self._hilo.join(timeout)
+
+    def _bucle(self):
+        lote = []
+        limite = None
+        while True:
+            espera = self.intervalo if not lote else max(0, limite - time.monotonic())
+            try:
+                item = self._cola.get(timeout=espera)
+            except queue.Empty:
+                item = None
+
+            if item is _DETENER:
+                self._escribir(lote)
+                connection.close()
+                return
+            if isinstance(item, threading.Event):
+                self._escribir(lote)
+                lote = []
+                item.set()
+                continue
+            if item is not None:
+                if not lote:
+                    limite = time.monotonic() + self.intervalo
+                lote.append(item)
+
+            if lote and (len(lote) >= self.tamano_lote or time.monotonic() >= limite):
+                self._escribir(lote)
+                lote = []
+
+    def _escribir(self, lote):
+        from .models import Bitacora
+
+        if not lote:
+            return
+        try:
+            close_old_connections()
+            Bitacora.objects.bulk_create(lote, batch_size=self.tamano_lote)
+        except Exception as e:
+            logger.error(f"❌ Error guardando {len(lote)} entradas de bitácora: {e}")
+
+
+_escritor = None
+
+
+def obtener_escritor():
+    """Escritor del proceso, configurado con BITACORA_LOTE y BITACORA_INTERVALO_MS"""
+    global _escritor
+    if _escritor is None:
+        _escritor = EscritorBitacora(
+            tamano_lote=getattr(settings, "BITACORA_LOTE", 200),
+            intervalo=getattr(settings, "BITACORA_INTERVALO_MS", 500) / 1000,
+            capacidad=getattr(settings, "BITACORA_CAPACIDAD", 10000),
+        )
+    return _escritor
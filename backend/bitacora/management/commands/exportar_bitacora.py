@@ -0,0 +1,55 @@
+"""
+Comando para exportar la bitácora a un archivo.
+
+Uso:
+    python manage.py exportar_bitacora --desde 2026-01-01 --hasta 2026-06-30 \
+        [--modulo PAGOS] [--usuario 12] [--formato csv|jsonl] [--gzip] [--salida archivo]
+
+    Recorre los registros con un cursor del servidor y escribe por trozos,
+    por lo que la memoria no depende del número de filas. Sin --salida el
+    archivo se crea en el directorio actual con un nombre por defecto.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from bitacora import exportacion
+from bitacora.models import Bitacora
+from bitacora.views import _parsear_fecha, filtrar_bitacora
+
+
+class Command(BaseCommand):
+    help = 'Exporta registros de la bitácora a CSV o JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD o ISO 8601)')
+        parser.add_argument('--hasta', help='Fecha final, incluida')
+        parser.add_argument('--modulo', help='Módulo (USUARIOS, PAGOS, ...)')
+        parser.add_argument('--usuario', help='ID de usuario')
+        parser.add_argument('--formato', choices=list(exportacion.FORMATOS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Comprimir la salida')
+        parser.add_argument('--salida', help='Ruta del archivo a crear')
+
+    def handle(self, *args, **options):
+        filtros = {
+            'fecha_inicio': options['desde'] or '',
+            'fecha_fin': options['hasta'] or '',
+            'modulo': options['modulo'] or '',
+            'usuario': options['usuario'] or '',
+        }
+        try:
+            queryset = filtrar_bitacora(Bitacora.objects.all(), filtros)
+            desde = _parsear_fecha(filtros['fecha_inicio'])
+            hasta = _parsear_fecha(filtros['fecha_fin'])
+        except ValidationError as e:
+            raise CommandError(str(e.detail))
+
+        ruta = options['salida'] or exportacion.nombre_archivo(
+            options['formato'], options['gzip'], desde, hasta
+        )
+        total = 0
+        with open(ruta, 'wb') as archivo:
+            for trozo in exportacion.generar(queryset, options['formato'], options['gzip']):
+                archivo.write(trozo)
+                total += len(trozo)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Bitácora exportada en {ruta} ({total} bytes)'))
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:55
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitacora', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['fecha_hora'], name='bitacora_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['usuario', 'fecha_hora'], name='bitacora_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=models.Index(fields=['modulo', 'fecha_hora'], name='bitacora_modulo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bitacora',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('accion', 'descripcion', config='simple'), name='bitacora_busqueda_gin'),
+        ),
+    ]
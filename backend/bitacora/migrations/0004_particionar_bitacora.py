@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:56
+
+from django.db import migrations
+
+from core.particiones import convertir_a_particionada
+
+
+def particionar(apps, schema_editor):
+    convertir_a_particionada(schema_editor, 'bitacora_bitacora', columna='fecha_hora')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitacora', '0003_indices'),
+    ]
+
+    operations = [
+        # Solo PostgreSQL; en otras bases no hace nada
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
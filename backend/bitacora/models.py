@@ -1,7 +1,14 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 from django.conf import settings
 from django.utils.timezone import now
 
+def vector_busqueda():
+    """tsvector de accion + descripcion; configuración 'simple' porque accion son códigos"""
+    return SearchVector('accion', 'descripcion', config='simple')
+
+
 class Bitacora(models.Model):
     MODULOS = [
         ('USUARIOS', 'Usuarios'),
@@ -24,6 +31,16 @@ class Bitacora(models.Model):
     user_agent = models.TextField(blank=True)
     modulo = models.CharField(max_length=50, choices=MODULOS, default='GENERAL')
 
-def __str__(self):
-    usuario = getattr(self.usuario, "username", "Sistema")
-    return f"{self.fecha_hora} | {usuario} | {self.accion} | {self.modulo}"
\ No newline at end of file
+    class Meta:
+        # La tabla está particionada por mes en fecha_hora (migración 0004)
+        indexes = [
+            models.Index(fields=['fecha_hora'], name='bitacora_fecha_idx'),
+            models.Index(fields=['usuario', 'fecha_hora'], name='bitacora_usuario_fecha_idx'),
+            models.Index(fields=['modulo', 'fecha_hora'], name='bitacora_modulo_fecha_idx'),
+            # Búsqueda de texto: la consulta debe usar la misma expresión (vector_busqueda)
+            GinIndex(vector_busqueda(), name='bitacora_busqueda_gin'),
+        ]
+
+    def __str__(self):
+        usuario = getattr(self.usuario, "username", "Sistema")
+        return f"{self.fecha_hora} | {usuario} | {self.accion} | {self.modulo}"
@@ -1,3 +1,210 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import Rol
+
+from .escritor import EscritorBitacora
+from .models import Bitacora
+from .utils import registrar_bitacora
+
+User = get_user_model()
+
+
+class EscritorBitacoraTest(TransactionTestCase):
+    """Escritor en segundo plano: lotes, vaciado y cierre"""
+
+    def setUp(self):
+        self.escritor = EscritorBitacora(tamano_lote=3, intervalo=10)
+
+    def tearDown(self):
+        self.escritor.detener()
+
+    def _entrada(self, n):
+        return Bitacora(accion=f"ACCION_{n}", descripcion="prueba", modulo="GENERAL")
+
+    def test_guarda_al_completar_lote(self):
+        for n in range(3):
+            self.escritor.agregar(self._entrada(n))
+        # El intervalo es de 10 s: solo el tamaño del lote puede dispararlo
+        self.escritor.vaciar()
+        self.assertEqual(Bitacora.objects.count(), 3)
+
+    def test_vaciar_guarda_lote_incompleto(self):
+        self.escritor.agregar(self._entrada(1))
+        self.assertTrue(self.escritor.vaciar())
+        self.assertEqual(Bitacora.objects.count(), 1)
+
+    def test_detener_guarda_pendientes(self):
+        for n in range(2):
+            self.escritor.agregar(self._entrada(n))
+        self.escritor.detener()
+        self.assertFalse(self.escritor._hilo.is_alive())
+        self.assertEqual(Bitacora.objects.count(), 2)
+
+
+class RegistrarBitacoraTest(TestCase):
+    """Elección entre guardado síncrono y encolado"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username="auditor", password="x")
+
+    def test_pagos_se_guarda_en_el_momento(self):
+        registrar_bitacora(usuario=self.usuario, accion="PAGO", modulo="PAGOS")
+        self.assertTrue(Bitacora.objects.filter(accion="PAGO", usuario=self.usuario).exists())
+
+    def test_asincrona_se_encola_al_confirmar(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            entrada = registrar_bitacora(usuario=self.usuario, accion="LOGIN", modulo="USUARIOS")
+        self.assertIsNone(entrada.pk)
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Bitacora.objects.filter(accion="LOGIN").exists())
+
+    @override_settings(BITACORA_ASINCRONA=False)
+    def test_modo_sincrono_global(self):
+        registrar_bitacora(usuario=self.usuario, accion="LOGIN", modulo="USUARIOS")
+        self.assertTrue(Bitacora.objects.filter(accion="LOGIN").exists())
+
+
+class BusquedaBitacoraTest(APITestCase):
+    """Búsqueda de texto y paginación por cursor en /api/bitacora/buscar/"""
+
+    def setUp(self):
+        rol = Rol.objects.create(nombre="Supervisor")
+        self.usuario = User.objects.create_user(
+            username="mlopez", password="x", first_name="Marta", rol=rol
+        )
+        ahora = timezone.now()
+        Bitacora.objects.bulk_create([
+            Bitacora(accion="CREACION_USUARIO", descripcion="Alta del usuario jperez", fecha_hora=ahora),
+            Bitacora(accion="LOGIN", descripcion="Inicio de sesión", usuario=self.usuario,
+                     modulo="USUARIOS", fecha_hora=ahora - timedelta(hours=1)),
+            Bitacora(accion="PAGO", descripcion="Pago confirmado del pedido 12", modulo="PAGOS",
+                     fecha_hora=ahora - timedelta(days=40)),
+        ])
+        self.client.force_authenticate(User.objects.create_user(username="admin", password="x", is_staff=True))
+
+    def _acciones(self, respuesta):
+        return [fila["accion"] for fila in respuesta.data["results"]]
+
+    def test_busqueda_por_prefijo_de_palabra(self):
+        respuesta = self.client.get("/api/bitacora/buscar/", {"search": "creac"})
+        self.assertEqual(self._acciones(respuesta), ["CREACION_USUARIO"])
+
+    def test_busqueda_por_usuario_y_rol(self):
+        for texto in ("marta", "supervisor"):
+            respuesta = self.client.get("/api/bitacora/buscar/", {"search": texto})
+            self.assertEqual(self._acciones(respuesta), ["LOGIN"])
+
+    def test_rango_por_defecto_y_explicito(self):
+        respuesta = self.client.get("/api/bitacora/buscar/")
+        self.assertEqual(self._acciones(respuesta), ["CREACION_USUARIO", "LOGIN"])
+
+        desde = (timezone.now() - timedelta(days=60)).date().isoformat()
+        respuesta = self.client.get("/api/bitacora/buscar/", {"fecha_inicio": desde, "modulo": "pagos"})
+        self.assertEqual(self._acciones(respuesta), ["PAGO"])
+
+    def test_rango_excesivo_rechazado(self):
+        respuesta = self.client.get(
+            "/api/bitacora/buscar/", {"fecha_inicio": "2020-01-01", "fecha_fin": "2026-01-01"}
+        )
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_usuario_invalido_rechazado(self):
+        respuesta = self.client.get("/api/bitacora/buscar/", {"usuario": "abc"})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("usuario", respuesta.data)
+
+    def test_paginacion_por_cursor(self):
+        respuesta = self.client.get("/api/bitacora/buscar/", {"page_size": 1})
+        self.assertEqual(self._acciones(respuesta), ["CREACION_USUARIO"])
+        self.assertNotIn("count", respuesta.data)
+        siguiente = self.client.get(respuesta.data["next"])
+        self.assertEqual(self._acciones(siguiente), ["LOGIN"])
+
+
+class ExportacionBitacoraTest(APITestCase):
+    """Exportación por streaming (endpoint y comando)"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username="auditor", password="x")
+        ahora = timezone.now()
+        Bitacora.objects.bulk_create([
+            Bitacora(accion="PAGO", descripcion="Pago, con coma", modulo="PAGOS",
+                     usuario=self.usuario, fecha_hora=ahora - timedelta(days=2)),
+            Bitacora(accion="LOGIN", descripcion="Inicio", modulo="USUARIOS", fecha_hora=ahora),
+        ])
+        self.client.force_authenticate(User.objects.create_user(username="admin", password="x", is_staff=True))
+
+    def _contenido(self, respuesta):
+        return b"".join(respuesta.streaming_content)
+
+    def test_csv_por_defecto(self):
+        respuesta = self.client.get("/api/bitacora/exportar/")
+        self.assertEqual(respuesta["Content-Type"], "text/csv")
+        filas = list(csv.reader(io.StringIO(self._contenido(respuesta).decode())))
+        self.assertEqual(filas[0][0], "id")
+        self.assertEqual([f[5] for f in filas[1:]], ["PAGO", "LOGIN"])
+        self.assertEqual(filas[1][6], "Pago, con coma")
+
+    def test_jsonl_gzip_con_filtro(self):
+        respuesta = self.client.get(
+            "/api/bitacora/exportar/", {"formato": "jsonl", "gzip": "1", "modulo": "pagos"}
+        )
+        self.assertTrue(respuesta["Content-Disposition"].endswith('.jsonl.gz"'))
+        lineas = gzip.decompress(self._contenido(respuesta)).decode().splitlines()
+        self.assertEqual(len(lineas), 1)
+        self.assertEqual(json.loads(lineas[0])["usuario"], "auditor")
+
+    def test_formato_invalido(self):
+        respuesta = self.client.get("/api/bitacora/exportar/", {"formato": "xml"})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_solo_admin(self):
+        for usuario, codigo in ((None, 401), (self.usuario, 403)):
+            self.client.force_authenticate(usuario)
+            for url in ("/api/bitacora/exportar/", "/api/bitacora/buscar/"):
+                self.assertEqual(self.client.get(url).status_code, codigo, (url, usuario))
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, "bitacora.csv.gz")
+            call_command(
+                "exportar_bitacora", "--usuario", str(self.usuario.id), "--gzip",
+                "--salida", ruta, stdout=io.StringIO(),
+            )
+            with gzip.open(ruta, "rt") as archivo:
+                filas = list(csv.reader(archivo))
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][5], "PAGO")
+
+
+class ParticionesBitacoraTest(TestCase):
+    """La bitácora recibe particiones nuevas aunque no tenga retención"""
+
+    def test_aplicar_retencion_crea_particiones_sin_politica(self):
+        from django.conf import settings
+
+        from core.particiones import (
+            _inicio_mes, _sumar_meses, eliminar_particion, nombre_particion, particiones,
+        )
+
+        self.assertNotIn("bitacora.Bitacora", settings.RETENCION_TABLAS)
+        proximo = nombre_particion("bitacora_bitacora", _sumar_meses(_inicio_mes(timezone.now()), 3))
+        if proximo in [p[0] for p in particiones("bitacora_bitacora")]:
+            eliminar_particion("bitacora_bitacora", proximo)
+
+        call_command("aplicar_retencion", stdout=io.StringIO())
+
+        self.assertIn(proximo, [p[0] for p in particiones("bitacora_bitacora")])
+        self.assertEqual(Bitacora.objects.count(), 0)
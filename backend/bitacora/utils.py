@@ -1,6 +1,10 @@
-from .models import Bitacora
+from django.conf import settings
+from django.db import transaction
 from django.utils.timezone import now
 
+from .escritor import obtener_escritor
+from .models import Bitacora
+
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
@@ -12,10 +16,15 @@ def get_client_ip(request):
 def get_user_agent(request):
     return request.META.get('HTTP_USER_AGENT', 'Desconocido')
 
-def registrar_bitacora(request=None, usuario=None, accion="", descripcion="", modulo="GENERAL"):
+def registrar_bitacora(request=None, usuario=None, accion="", descripcion="", modulo="GENERAL", sincrono=None):
     """
     Crea un registro en la bitácora.
     Puede recibir el request o directamente el usuario.
+
+    La entrada se encola al confirmar la transacción y la guarda el escritor
+    en segundo plano (bitacora.escritor). Se guarda en el momento, dentro de
+    la transacción, si sincrono=True, si el módulo está en
+    BITACORA_MODULOS_SINCRONOS (pagos) o si BITACORA_ASINCRONA es False.
     """
     if request and usuario is None:
         usuario = getattr(request, 'user', None)
@@ -23,7 +32,7 @@ def registrar_bitacora(request=None, usuario=None, accion="", descripcion="", mo
     ip = get_client_ip(request) if request else None
     user_agent = get_user_agent(request) if request else ""
 
-    Bitacora.objects.create(
+    entrada = Bitacora(
         usuario=usuario if usuario and usuario.is_authenticated else None,
         accion=accion,
         descripcion=descripcion,
@@ -31,4 +40,15 @@ def registrar_bitacora(request=None, usuario=None, accion="", descripcion="", mo
         ip=ip,
         user_agent=user_agent,
         modulo=modulo
-    )
\ No newline at end of file
+    )
+
+    if sincrono is None:
+        sincrono = (
+            not getattr(settings, 'BITACORA_ASINCRONA', True)
+            or modulo in getattr(settings, 'BITACORA_MODULOS_SINCRONOS', [])
+        )
+    if sincrono:
+        entrada.save()
+    else:
+        transaction.on_commit(lambda: obtener_escritor().agregar(entrada))
+    return entrada
@@ -1,28 +1,177 @@
+import re
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery
 from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets, filters
-from .models import Bitacora
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from . import exportacion
+from .models import Bitacora, vector_busqueda
 from .serializers import BitacoraSerializer
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+
+User = get_user_model()
+
+
+class BitacoraCursorPagination(CursorPagination):
+    """Paginación por clave (fecha_hora, id): el costo no crece con la página"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-fecha_hora', '-id')
+
+
+def _parsear_fecha(valor, fin_del_dia=False):
+    if not valor:
+        return None
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValidationError({'fecha': f'Fecha inválida: {valor}'})
+        fecha = datetime.combine(dia, time.max if fin_del_dia else time.min)
+    if settings.USE_TZ and timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def filtrar_bitacora(queryset, params):
+    """
+    Aplicar los filtros de la bitácora
+
+    Params:
+        search: Texto en accion/descripcion (por prefijo de palabras) o en el
+                usuario (username, nombre, apellido, rol)
+        rol, modulo, usuario: Filtros exactos
+        fecha_inicio, fecha_fin: Rango de fecha_hora (fecha o fecha y hora)
+    """
+    search = params.get('search', '').strip()
+    if search:
+        condicion = Q()
+        palabras = re.findall(r'[^\W_]+', search.lower())
+        if palabras:
+            consulta = SearchQuery(
+                ' & '.join(f'{palabra}:*' for palabra in palabras),
+                config='simple',
+                search_type='raw',
+            )
+            queryset = queryset.annotate(busqueda=vector_busqueda())
+            condicion |= Q(busqueda=consulta)
+
+        # Los usuarios que coinciden se resuelven antes (tabla pequeña) para
+        # que el filtro use el índice (usuario, fecha_hora) y no un JOIN
+        usuarios = list(
+            User.objects.filter(
+                Q(username__icontains=search)
+                | Q(first_name__icontains=search)
+                | Q(last_name__icontains=search)
+                | Q(rol__nombre__icontains=search)
+            ).values_list('id', flat=True)
+        )
+        if usuarios:
+            condicion |= Q(usuario_id__in=usuarios)
+        queryset = queryset.filter(condicion) if condicion else queryset.none()
+
+    rol = params.get('rol', '').strip()
+    if rol:
+        queryset = queryset.filter(usuario__rol__nombre__iexact=rol)
+    modulo = params.get('modulo', '').strip()
+    if modulo:
+        queryset = queryset.filter(modulo=modulo.upper())
+    usuario = params.get('usuario', '').strip()
+    if usuario:
+        try:
+            queryset = queryset.filter(usuario_id=int(usuario))
+        except ValueError:
+            raise ValidationError({'usuario': f'Usuario inválido: {usuario}'})
+
+    fecha_inicio = _parsear_fecha(params.get('fecha_inicio'))
+    fecha_fin = _parsear_fecha(params.get('fecha_fin'), fin_del_dia=True)
+    if fecha_inicio:
+        queryset = queryset.filter(fecha_hora__gte=fecha_inicio)
+    if fecha_fin:
+        queryset = queryset.filter(fecha_hora__lte=fecha_fin)
+    return queryset
+
 
 class BitacoraViewSet(viewsets.ModelViewSet):
+    """
+    Registros de auditoría
+
+    buscar: Búsqueda acotada por fechas con paginación por cursor; es la que
+            debe usarse sobre tablas grandes (no hace COUNT ni OFFSET)
+    exportar: Descarga CSV/JSONL (opcionalmente gzip) de los registros filtrados
+
+    buscar y exportar exponen IPs y acciones de los usuarios: solo admin.
+    """
     serializer_class = BitacoraSerializer
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter]
 
     def get_queryset(self):
-        queryset = Bitacora.objects.all().order_by('-fecha_hora')
-        search = self.request.GET.get('search', '').strip()
-        if search:
-            queryset = queryset.filter(
-                Q(accion__icontains=search) |
-                Q(descripcion__icontains=search) |
-                Q(usuario__username__icontains=search) |
-                Q(usuario__first_name__icontains=search) |   
-                Q(usuario__last_name__icontains=search) | 
-                Q(usuario__rol__nombre__icontains=search)
-            )
-        rol = self.request.GET.get('rol', '').strip()
-        if rol:
-            queryset = queryset.filter(usuario__rol__nombre__iexact=rol)
+        queryset = Bitacora.objects.select_related('usuario__rol').order_by('-fecha_hora')
+        return filtrar_bitacora(queryset, self.request.GET)
+
+    @action(detail=False, methods=['get'], pagination_class=BitacoraCursorPagination,
+            permission_classes=[IsAdminUser])
+    def buscar(self, request):
+        """
+        Buscar en un rango de fechas
+        GET /api/bitacora/buscar/?fecha_inicio=2026-10-01&fecha_fin=2026-10-15&search=login
+
+        Sin fecha_inicio se buscan los últimos BITACORA_DIAS_BUSQUEDA días; el
+        rango no puede superar BITACORA_RANGO_MAXIMO_DIAS, así la consulta solo
+        recorre las particiones de esos meses.
+        """
+        maximo = getattr(settings, 'BITACORA_RANGO_MAXIMO_DIAS', 366)
+        fin = _parsear_fecha(request.GET.get('fecha_fin'), fin_del_dia=True) or timezone.now()
+        inicio = _parsear_fecha(request.GET.get('fecha_inicio')) or (
+            fin - timedelta(days=getattr(settings, 'BITACORA_DIAS_BUSQUEDA', 30))
+        )
+        if inicio > fin:
+            raise ValidationError({'fecha_inicio': 'Debe ser anterior a fecha_fin'})
+        if fin - inicio > timedelta(days=maximo):
+            raise ValidationError({'fecha_inicio': f'El rango no puede superar {maximo} días'})
+
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            fecha_hora__gte=inicio, fecha_hora__lte=fin
+        )
+        pagina = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(pagina, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def exportar(self, request):
+        """
+        Descargar los registros filtrados sin paginar
+        GET /api/bitacora/exportar/?formato=jsonl&gzip=1&fecha_inicio=2026-01-01&modulo=PAGOS
+
+        Acepta los mismos filtros que el listado; formato csv (por defecto) o
+        jsonl. La respuesta se genera por trozos con memoria constante.
+        """
+        formato = request.GET.get('formato', 'csv').lower()
+        if formato not in exportacion.FORMATOS:
+            raise ValidationError({'formato': f"Formatos válidos: {', '.join(exportacion.FORMATOS)}"})
+        comprimir = request.GET.get('gzip', '').lower() in ('1', 'true')
 
-        return queryset
\ No newline at end of file
+        queryset = filtrar_bitacora(Bitacora.objects.all(), request.GET)
+        respuesta = StreamingHttpResponse(
+            exportacion.generar(queryset, formato, comprimir),
+            content_type='application/gzip' if comprimir else exportacion.FORMATOS[formato],
+        )
+        nombre = exportacion.nombre_archivo(
+            formato,
+            comprimir,
+            _parsear_fecha(request.GET.get('fecha_inicio')),
+            _parsear_fecha(request.GET.get('fecha_fin')),
+        )
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        respuesta['X-Accel-Buffering'] = 'no'
+        return respuesta
@@ -0,0 +1,71 @@
+"""
+Comando para aplicar la política de retención de datos.
+
+Uso:
+    python manage.py aplicar_retencion [--simular] [--sin-archivo] [--tablas app.Modelo ...]
+
+    Archiva en ARCHIVO_DIR (JSONL comprimido) y elimina los meses que superan
+    la retención definida en settings.RETENCION_TABLAS. Antes crea las
+    particiones de los próximos meses de settings.PARTICIONES_TABLAS, tengan
+    o no retención. Pensado para ejecutarse una vez al mes (cron).
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.retencion import aplicar_politica, asegurar_particiones_configuradas
+
+
+class Command(BaseCommand):
+    help = 'Archiva y elimina los datos que superan la retención configurada'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tablas',
+            nargs='*',
+            help='Modelos a procesar (app_label.Modelo); por defecto todos los configurados'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo mostrar qué se eliminaría'
+        )
+        parser.add_argument(
+            '--sin-archivo',
+            action='store_true',
+            help='Eliminar sin guardar una copia en ARCHIVO_DIR'
+        )
+
+    def handle(self, *args, **options):
+        politicas = getattr(settings, 'RETENCION_TABLAS', {})
+        particionadas = getattr(settings, 'PARTICIONES_TABLAS', {})
+        etiquetas = options['tablas'] or list(politicas)
+
+        desconocidas = set(etiquetas) - set(politicas) - set(particionadas)
+        if desconocidas:
+            raise CommandError(f"Sin política de retención: {', '.join(sorted(desconocidas))}")
+
+        if not options['simular']:
+            creadas = asegurar_particiones_configuradas(options['tablas'] or None)
+            for etiqueta, total in creadas.items():
+                if total:
+                    self.stdout.write(f'🗂️ {etiqueta}: {total} particiones nuevas')
+
+        for etiqueta in etiquetas:
+            if etiqueta not in politicas:
+                continue
+            resultados = aplicar_politica(
+                etiqueta,
+                politicas[etiqueta],
+                archivar_datos=not options['sin_archivo'],
+                simular=options['simular'],
+            )
+            for resultado in resultados:
+                if options['simular']:
+                    self.stdout.write(f"🔍 {resultado['nombre']}: se eliminarían {resultado['filas']} filas")
+                else:
+                    destino = f" → {resultado['archivo']}" if resultado['archivo'] else ''
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✅ {resultado['nombre']}: {resultado['filas']} filas{destino}"
+                    ))
+            if not resultados:
+                self.stdout.write(f'✔️ {etiqueta}: nada que eliminar')
@@ -0,0 +1,240 @@
+"""
+Particionado mensual de tablas append-only en PostgreSQL
+
+Las tablas que solo crecen (notificaciones, logs de webhooks) se convierten
+en tablas particionadas por rango de fecha, con una partición por mes:
+
+    <tabla>_p202610   [2026-10-01, 2026-11-01)
+    <tabla>_default   filas fuera de los meses creados
+
+Así las consultas por fecha recientes solo tocan las particiones calientes y
+la retención elimina un mes entero con DROP en lugar de un DELETE masivo.
+
+Django no conoce el particionado: el modelo sigue igual y la clave primaria
+de la tabla pasa a ser (id, columna de fecha), requisito de PostgreSQL. Por
+eso ninguna otra tabla puede tener una FK con restricción hacia una tabla
+particionada (usar db_constraint=False).
+
+En bases que no son PostgreSQL todas las funciones son no-op.
+"""
+
+import logging
+import re
+from datetime import date, datetime
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+PATRON_PARTICION = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def es_postgres(conexion=None):
+    return (conexion or connection).vendor == "postgresql"
+
+
+def _inicio_mes(fecha):
+    return date(fecha.year, fecha.month, 1)
+
+
+def _sumar_meses(mes, cantidad):
+    indice = mes.year * 12 + mes.month - 1 + cantidad
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nombre_particion(tabla, mes):
+    return f"{tabla}_p{mes:%Y%m}"
+
+
+def esta_particionada(tabla, conexion=None):
+    """True si la tabla es una tabla particionada de PostgreSQL"""
+    conexion = conexion or connection
+    if not es_postgres(conexion):
+        return False
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [tabla],
+        )
+        return cursor.fetchone() is not None
+
+
+def particiones(tabla, conexion=None):
+    """
+    Particiones mensuales de una tabla
+
+    Returns:
+        list[tuple]: (nombre, desde, hasta) ordenadas por fecha; no incluye
+                     la partición por defecto
+    """
+    conexion = conexion or connection
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND pg_table_is_visible(p.oid)",
+            [tabla],
+        )
+        nombres = [fila[0] for fila in cursor.fetchall()]
+
+    resultado = []
+    for nombre in nombres:
+        coincidencia = PATRON_PARTICION.search(nombre)
+        if coincidencia:
+            desde = date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)
+            resultado.append((nombre, desde, _sumar_meses(desde, 1)))
+    return sorted(resultado, key=lambda p: p[1])
+
+
+def crear_particion(tabla, mes, columna="created_at", conexion=None):
+    """
+    Crear la partición de un mes si no existe
+
+    Si la partición por defecto ya tiene filas de ese mes se mueven a la
+    nueva partición antes de adjuntarla.
+
+    Returns:
+        bool: True si se creó
+    """
+    conexion = conexion or connection
+    mes = _inicio_mes(mes)
+    nombre = nombre_particion(tabla, mes)
+    if any(p[0] == nombre for p in particiones(tabla, conexion)):
+        return False
+
+    desde, hasta = mes.isoformat(), _sumar_meses(mes, 1).isoformat()
+    qn = conexion.ops.quote_name
+    with transaction.atomic(using=conexion.alias), conexion.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {qn(nombre)} (LIKE {qn(tabla)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        por_defecto = f"{tabla}_default"
+        cursor.execute("SELECT to_regclass(%s)", [por_defecto])
+        if cursor.fetchone()[0]:
+            condicion = f"{qn(columna)} >= %s AND {qn(columna)} < %s"
+            cursor.execute(
+                f"WITH movidas AS (DELETE FROM {qn(por_defecto)} WHERE {condicion} RETURNING *) "
+                f"INSERT INTO {qn(nombre)} SELECT * FROM movidas",
+                [desde, hasta],
+            )
+        cursor.execute(
+            f"ALTER TABLE {qn(tabla)} ATTACH PARTITION {qn(nombre)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [desde, hasta],
+        )
+    logger.info(f"🗂️ Partición {nombre} creada")
+    return True
+
+
+def asegurar_particiones(tabla, meses_adelante=3, desde=None, columna="created_at", conexion=None):
+    """
+    Crear las particiones desde `desde` (por defecto el mes actual) hasta
+    `meses_adelante` meses en el futuro
+
+    Returns:
+        int: Particiones creadas
+    """
+    conexion = conexion or connection
+    if not esta_particionada(tabla, conexion):
+        return 0
+
+    mes = _inicio_mes(desde or datetime.now())
+    ultimo = _sumar_meses(_inicio_mes(datetime.now()), meses_adelante)
+    creadas = 0
+    while mes <= ultimo:
+        creadas += crear_particion(tabla, mes, columna, conexion)
+        mes = _sumar_meses(mes, 1)
+    return creadas
+
+
+def eliminar_particion(tabla, nombre, conexion=None):
+    """Separar y eliminar una partición"""
+    conexion = conexion or connection
+    qn = conexion.ops.quote_name
+    with transaction.atomic(using=conexion.alias), conexion.cursor() as cursor:
+        # Comprobar ya las FKs diferidas: DROP falla si quedan eventos pendientes
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"ALTER TABLE {qn(tabla)} DETACH PARTITION {qn(nombre)}")
+        cursor.execute(f"DROP TABLE {qn(nombre)}")
+    logger.info(f"🗑️ Partición {nombre} eliminada")
+
+
+def convertir_a_particionada(schema_editor, tabla, columna="created_at", columna_id="id", meses_adelante=3):
+    """
+    Convertir una tabla existente en particionada por mes (para migraciones)
+
+    Copia los datos, conserva índices, FKs salientes y la secuencia del id, y
+    crea las particiones desde el mes de la fila más antigua. Ninguna FK con
+    restricción puede apuntar a la tabla (la eliminación fallaría).
+
+    Uso en una migración:
+        migrations.RunPython(convertir, migrations.RunPython.noop)
+    """
+    conexion = schema_editor.connection
+    if not es_postgres(conexion) or esta_particionada(tabla, conexion):
+        return
+
+    qn = conexion.ops.quote_name
+    antigua = f"{tabla}_sin_particionar"
+
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, %s) IS NOT NULL", [tabla, columna_id]
+        )
+        usa_secuencia = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {qn(tabla)} RENAME TO {qn(antigua)}")
+
+        # Índices (salvo la PK) y FKs salientes para recrearlos en la nueva tabla
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u'))",
+            [antigua, antigua],
+        )
+        indices = [fila[0] for fila in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [antigua],
+        )
+        fks = cursor.fetchall()
+
+        cursor.execute(
+            f"CREATE TABLE {qn(tabla)} (LIKE {qn(antigua)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({qn(columna)})"
+        )
+        cursor.execute(f"CREATE TABLE {qn(tabla + '_default')} PARTITION OF {qn(tabla)} DEFAULT")
+
+        cursor.execute(f"SELECT min({qn(columna)}), max({qn(columna_id)}) FROM {qn(antigua)}")
+        mas_antigua, id_maximo = cursor.fetchone()
+
+    asegurar_particiones(tabla, meses_adelante, desde=mas_antigua, columna=columna, conexion=conexion)
+
+    with conexion.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {qn(tabla)} SELECT * FROM {qn(antigua)}")
+        cursor.execute(f"DROP TABLE {qn(antigua)}")
+
+        # Después de eliminar la antigua para conservar el nombre <tabla>_pkey
+        cursor.execute(
+            f"ALTER TABLE {qn(tabla)} ADD PRIMARY KEY ({qn(columna_id)}, {qn(columna)})"
+        )
+
+        if usa_secuencia:
+            secuencia = f"{tabla}_{columna_id}_seq"
+            cursor.execute(f"CREATE SEQUENCE {qn(secuencia)} OWNED BY {qn(tabla)}.{qn(columna_id)}")
+            cursor.execute(
+                f"ALTER TABLE {qn(tabla)} ALTER COLUMN {qn(columna_id)} "
+                f"SET DEFAULT nextval('{secuencia}')"
+            )
+            if id_maximo is not None:
+                cursor.execute("SELECT setval(%s, %s)", [secuencia, id_maximo])
+
+        patron_tabla = re.compile(rf" ON (ONLY )?(\S+\.)?{re.escape(antigua)} ")
+        for indexdef in indices:
+            cursor.execute(patron_tabla.sub(f" ON {qn(tabla)} ", indexdef, count=1))
+        for nombre, definicion in fks:
+            cursor.execute(f"ALTER TABLE {qn(tabla)} ADD CONSTRAINT {qn(nombre)} {definicion}")
@@ -0,0 +1,168 @@
+"""
+Retención y archivado de tablas que crecen sin límite
+
+La política se define en settings.RETENCION_TABLAS:
+
+    RETENCION_TABLAS = {
+        "notifications.Notification": {
+            "meses": 12,                   # meses completos que se conservan
+            "columna": "created_at",       # opcional, por defecto created_at
+            "al_purgar": "ruta.funcion",   # opcional, recibe el queryset a borrar
+        },
+    }
+
+Los datos vencidos se archivan en ARCHIVO_DIR/<tabla>/<nombre>.jsonl.gz (una
+fila JSON por línea) y después se eliminan: en tablas particionadas se
+elimina la partición completa del mes; en el resto se borra por lotes.
+"""
+
+import gzip
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from .particiones import (
+    _inicio_mes,
+    _sumar_meses,
+    asegurar_particiones,
+    eliminar_particion,
+    esta_particionada,
+    particiones,
+)
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 2000
+
+
+def archivar(queryset, ruta):
+    """
+    Escribir las filas de un queryset en un archivo JSONL comprimido
+
+    Returns:
+        int: Filas escritas
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    filas = 0
+    with gzip.open(ruta, "wt", encoding="utf-8") as archivo:
+        for fila in queryset.values().iterator(chunk_size=TAMANO_LOTE):
+            archivo.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False))
+            archivo.write("\n")
+            filas += 1
+    return filas
+
+
+def _borrar_por_lotes(queryset):
+    modelo = queryset.model
+    borradas = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:TAMANO_LOTE])
+        if not ids:
+            return borradas
+        borradas += modelo._base_manager.filter(pk__in=ids).delete()[0]
+
+
+def asegurar_particiones_configuradas(etiquetas=None):
+    """
+    Crear las particiones de los próximos meses de settings.PARTICIONES_TABLAS
+
+    Es independiente de la retención: una tabla particionada sin política
+    (p. ej. la bitácora) también necesita sus particiones nuevas, si no las
+    filas caen en la partición por defecto.
+
+    Args:
+        etiquetas: Restringir a estos modelos ('app_label.Modelo')
+
+    Returns:
+        dict: etiqueta -> particiones creadas
+    """
+    creadas = {}
+    for etiqueta, columna in getattr(settings, "PARTICIONES_TABLAS", {}).items():
+        if etiquetas is not None and etiqueta not in etiquetas:
+            continue
+        try:
+            modelo = apps.get_model(etiqueta)
+        except LookupError:
+            logger.warning(f"⚠️ {etiqueta} no está instalado, se omiten sus particiones")
+            continue
+        creadas[etiqueta] = asegurar_particiones(modelo._meta.db_table, columna=columna)
+    return creadas
+
+
+def aplicar_politica(etiqueta, politica, archivar_datos=True, simular=False, hoy=None):
+    """
+    Aplicar la política de retención a un modelo
+
+    Args:
+        etiqueta: 'app_label.Modelo'
+        politica: Dict de RETENCION_TABLAS
+        archivar_datos: Guardar las filas en ARCHIVO_DIR antes de eliminarlas
+        simular: Solo informar qué se eliminaría
+        hoy: Fecha de referencia (por defecto hoy)
+
+    Returns:
+        list[dict]: Un elemento por bloque eliminado {'nombre', 'filas', 'archivo'}
+    """
+    try:
+        modelo = apps.get_model(etiqueta)
+    except LookupError:
+        logger.warning(f"⚠️ {etiqueta} no está instalado, se omite la retención")
+        return []
+
+    tabla = modelo._meta.db_table
+    columna = politica.get("columna", "created_at")
+    limite = _sumar_meses(_inicio_mes(hoy or datetime.now()), -politica["meses"])
+    al_purgar = import_string(politica["al_purgar"]) if politica.get("al_purgar") else None
+    directorio = Path(getattr(settings, "ARCHIVO_DIR", settings.BASE_DIR / "archivo")) / tabla
+
+    # Cada bloque: (nombre, queryset, partición o None)
+    if esta_particionada(tabla):
+        if not simular:
+            asegurar_particiones(tabla, columna=columna)
+        bloques = [
+            (nombre, modelo._base_manager.filter(**{f"{columna}__gte": desde, f"{columna}__lt": hasta}), nombre)
+            for nombre, desde, hasta in particiones(tabla)
+            if hasta <= limite
+        ]
+        if not simular:
+            # Lo vencido que quede después de eliminar las particiones está en
+            # la partición por defecto: se borra por lotes
+            bloques.append(
+                (f"{tabla}_default_hasta_{limite:%Y%m}", modelo._base_manager.filter(**{f"{columna}__lt": limite}), None)
+            )
+    else:
+        bloques = [
+            (f"{tabla}_hasta_{limite:%Y%m}", modelo._base_manager.filter(**{f"{columna}__lt": limite}), None)
+        ]
+
+    resultados = []
+    for nombre, queryset, particion in bloques:
+        filas = queryset.count()
+        if not filas and particion is None:
+            continue
+        if simular:
+            resultados.append({"nombre": nombre, "filas": filas, "archivo": None})
+            continue
+
+        ruta = None
+        if archivar_datos and filas:
+            ruta = directorio / f"{nombre}.jsonl.gz"
+            archivar(queryset, ruta)
+        if al_purgar and filas:
+            al_purgar(queryset)
+
+        if particion:
+            eliminar_particion(tabla, particion)
+        else:
+            _borrar_por_lotes(queryset)
+
+        logger.info(f"🧹 {nombre}: {filas} filas eliminadas" + (f", archivadas en {ruta}" if ruta else ""))
+        resultados.append({"nombre": nombre, "filas": filas, "archivo": str(ruta) if ruta else None})
+    return resultados
@@ -150,6 +150,7 @@ INSTALLED_APPS = [
     # "dj_rest_auth.jwt_auth",
     "rest_framework_simplejwt.token_blacklist",
     "bitacora",
+    "tareas",  # 🆕 Outbox y workers para tareas en segundo plano
 ]
 
 AUTH_USER_MODEL = "users.CustomUser"
@@ -379,6 +380,136 @@ CACHES = {
     }
 }
 
+# ====== TAREAS EN SEGUNDO PLANO ======
+# Los efectos secundarios (notificaciones push, etc.) se guardan en el outbox
+# y los ejecuta `python manage.py run_workers`.
+# TAREAS_SINCRONO=True las ejecuta al confirmar la transacción (desarrollo sin workers)
+TAREAS_SINCRONO = os.getenv("TAREAS_SINCRONO", "False") == "True"
+TAREAS_PROCESOS = int(os.getenv("TAREAS_PROCESOS", "2"))
+# Segundos en EN_PROCESO tras los que una tarea se considera abandonada
+TAREAS_TIMEOUT_HUERFANAS = int(os.getenv("TAREAS_TIMEOUT_HUERFANAS", "600"))
+# Días que se conservan las tareas COMPLETADA y MUERTA (los workers las purgan
+# cada hora; también `python manage.py purgar_tareas`)
+TAREAS_DIAS_COMPLETADAS = int(os.getenv("TAREAS_DIAS_COMPLETADAS", "7"))
+TAREAS_DIAS_MUERTAS = int(os.getenv("TAREAS_DIAS_MUERTAS", "30"))
+# Limpiezas que los workers ejecutan cada hora junto con la de tareas
+TAREAS_PURGAS = [
+    "notifications.agrupacion.purgar_enviadas",
+]
+
+# ====== NOTIFICACIONES PUSH ======
+# Transporte de envío (notifications.envio.TransporteFalso para pruebas sin Firebase)
+NOTIFICACIONES_TRANSPORTE = os.getenv(
+    "NOTIFICACIONES_TRANSPORTE", "notifications.envio.TransporteFirebase"
+)
+# Hilos para enviar en paralelo los lotes de 500 tokens
+NOTIFICACIONES_HILOS_ENVIO = int(os.getenv("NOTIFICACIONES_HILOS_ENVIO", "4"))
+# Días sin envíos exitosos tras los que `purgar_tokens` elimina un token
+NOTIFICACIONES_DIAS_TOKEN_INACTIVO = int(
+    os.getenv("NOTIFICACIONES_DIAS_TOKEN_INACTIVO", "60")
+)
+# Segundos en que las notificaciones del mismo destino y tipo se juntan en un resumen
+NOTIFICACIONES_VENTANA_AGRUPACION = int(
+    os.getenv("NOTIFICACIONES_VENTANA_AGRUPACION", "60")
+)
+# Máximo de envíos por hora a un mismo destino (usuario o grupo de admins)
+NOTIFICACIONES_MAX_POR_HORA = int(os.getenv("NOTIFICACIONES_MAX_POR_HORA", "20"))
+# Stream SSE del badge: queda abierto y envía un evento por cada cambio
+# (LISTEN/NOTIFY de PostgreSQL). Cierra a los NOTIFICACIONES_SSE_DURACION
+# segundos y el navegador reconecta tras NOTIFICACIONES_SSE_INTERVALO
+NOTIFICACIONES_SSE_DURACION = float(os.getenv("NOTIFICACIONES_SSE_DURACION", "300"))
+NOTIFICACIONES_SSE_INTERVALO = float(os.getenv("NOTIFICACIONES_SSE_INTERVALO", "3"))
+# Segundos entre latidos (mantienen viva la conexión y releen el badge)
+NOTIFICACIONES_SSE_LATIDO = float(os.getenv("NOTIFICACIONES_SSE_LATIDO", "15"))
+# Hilo con LISTEN por proceso; sin él los cambios llegan con el latido
+NOTIFICACIONES_SSE_ESCUCHAR = os.getenv("NOTIFICACIONES_SSE_ESCUCHAR", "True") == "True"
+
+# ====== BITÁCORA ======
+# Las entradas se encolan y un hilo las guarda con bulk_create cada
+# BITACORA_LOTE entradas o BITACORA_INTERVALO_MS milisegundos
+BITACORA_ASINCRONA = os.getenv("BITACORA_ASINCRONA", "True") == "True"
+BITACORA_LOTE = int(os.getenv("BITACORA_LOTE", "200"))
+BITACORA_INTERVALO_MS = int(os.getenv("BITACORA_INTERVALO_MS", "500"))
+BITACORA_CAPACIDAD = int(os.getenv("BITACORA_CAPACIDAD", "10000"))
+# Módulos que se guardan siempre en el momento, dentro de la transacción
+BITACORA_MODULOS_SINCRONOS = ["PAGOS"]
+# /api/bitacora/buscar/: días por defecto sin fecha_inicio y rango máximo permitido
+BITACORA_DIAS_BUSQUEDA = int(os.getenv("BITACORA_DIAS_BUSQUEDA", "30"))
+BITACORA_RANGO_MAXIMO_DIAS = int(os.getenv("BITACORA_RANGO_MAXIMO_DIAS", "366"))
+
+# ====== DASHBOARD ======
+# /api/analytics/snapshot/: segundos en que el snapshot se sirve sin recalcular y
+# edad máxima en que todavía se sirve obsoleto mientras se recalcula en segundo plano
+ANALYTICS_SNAPSHOT_TTL = int(os.getenv("ANALYTICS_SNAPSHOT_TTL", "60"))
+ANALYTICS_SNAPSHOT_MAX_EDAD = int(os.getenv("ANALYTICS_SNAPSHOT_MAX_EDAD", "600"))
+
+# ====== MODELOS ML ======
+# Carpeta de versiones de modelos (analytics.registro) y versiones que se conservan
+ANALYTICS_MODELOS_DIR = Path(os.getenv("ANALYTICS_MODELOS_DIR", str(BASE_DIR / "analytics" / "models")))
+ANALYTICS_MODELOS_CONSERVAR = int(os.getenv("ANALYTICS_MODELOS_CONSERVAR", "5"))
+# Procesos que usa RandomForest al entrenar (presupuesto de CPU del worker de entrenamiento)
+ANALYTICS_ENTRENAMIENTO_CPUS = int(os.getenv("ANALYTICS_ENTRENAMIENTO_CPUS", "1"))
+# Segundos que puede durar un entrenamiento; pasado ese tiempo (o si su tarea
+# murió) se marca FALLIDO para poder solicitar otro
+ANALYTICS_ENTRENAMIENTO_TIMEOUT = int(os.getenv("ANALYTICS_ENTRENAMIENTO_TIMEOUT", "10800"))
+# Entrenamiento incremental: días recientes con los que se entrenan los árboles nuevos
+ANALYTICS_VENTANA_INCREMENTAL = int(os.getenv("ANALYTICS_VENTANA_INCREMENTAL", "30"))
+# Pronóstico de demanda por producto: días de historia y días pronosticados
+ANALYTICS_DEMANDA_HISTORIA_DIAS = int(os.getenv("ANALYTICS_DEMANDA_HISTORIA_DIAS", "180"))
+ANALYTICS_DEMANDA_HORIZONTE = int(os.getenv("ANALYTICS_DEMANDA_HORIZONTE", "14"))
+
+# ====== REPORTES ======
+# Procesos con que se renderizan en paralelo las secciones de un PDF con
+# varios reportes (requiere pypdf para concatenarlas; 1 = en el mismo proceso)
+REPORTES_PDF_PROCESOS = int(os.getenv("REPORTES_PDF_PROCESOS", "1"))
+# /api/reportes/solicitar/: minutos en que un reporte con los mismos parámetros
+# reutiliza el archivo ya generado en lugar de encolar otro
+REPORTES_REUTILIZAR_MINUTOS = int(os.getenv("REPORTES_REUTILIZAR_MINUTOS", "10"))
+# Caché de datos de reportes: los rangos que incluyen hoy se recalculan cada
+# REPORTES_CACHE_BLOQUE segundos; los cerrados duran REPORTES_CACHE_HISTORICO_TTL
+# (un pedido antiguo que cambia de estado aparece al vencer).
+# Reportes con más de REPORTES_CACHE_MAX_FILAS filas no se guardan.
+REPORTES_CACHE_BLOQUE = int(os.getenv("REPORTES_CACHE_BLOQUE", "300"))
+REPORTES_CACHE_HISTORICO_TTL = int(os.getenv("REPORTES_CACHE_HISTORICO_TTL", "86400"))
+REPORTES_CACHE_MAX_FILAS = int(os.getenv("REPORTES_CACHE_MAX_FILAS", "5000"))
+# Estados de pedido que cuentan como venta en los reportes. Con "PAGADO,ENTREGADO"
+# (los de los rollups de analytics) los reportes de ventas por día de rangos
+# completos se leen de las tablas ya agregadas
+REPORTES_ESTADOS_VENTA = os.getenv(
+    "REPORTES_ESTADOS_VENTA", "PAGADO,PROCESANDO,ENVIADO,ENTREGADO"
+).split(",")
+
+# ====== RETENCIÓN DE DATOS ======
+# `python manage.py aplicar_retencion` (cron mensual) archiva en ARCHIVO_DIR y
+# elimina los meses vencidos; en tablas particionadas borra la partición entera
+ARCHIVO_DIR = Path(os.getenv("ARCHIVO_DIR", BASE_DIR / "archivo"))
+RETENCION_TABLAS = {
+    "notifications.Notification": {
+        "meses": int(os.getenv("RETENCION_MESES_NOTIFICACIONES", "12")),
+        "al_purgar": "notifications.contadores.purgar_notificaciones",
+    },
+    "payments.WebhookLog": {
+        "meses": int(os.getenv("RETENCION_MESES_WEBHOOKS", "6")),
+    },
+}
+# La bitácora de auditoría no se purga salvo que se pida expresamente: con
+# RETENCION_MESES_BITACORA definida, aplicar_retencion archiva y ELIMINA los
+# registros (particiones) más antiguos que esos meses
+if os.getenv("RETENCION_MESES_BITACORA"):
+    RETENCION_TABLAS["bitacora.Bitacora"] = {
+        "meses": int(os.getenv("RETENCION_MESES_BITACORA")),
+        "columna": "fecha_hora",
+    }
+# Tablas particionadas por mes y su columna de fecha: aplicar_retencion crea
+# siempre las particiones de los próximos meses, tengan o no retención
+PARTICIONES_TABLAS = {
+    "notifications.Notification": "created_at",
+    "payments.WebhookLog": "created_at",
+    "bitacora.Bitacora": "fecha_hora",
+}
+# Días de notificaciones que muestran la API y el admin (particiones calientes)
+NOTIFICACIONES_DIAS_VISIBLES = int(os.getenv("NOTIFICACIONES_DIAS_VISIBLES", "90"))
+
 # ====== EMAIL BACKENDS ======
 # Backend de email personalizado para verificación móvil
 EMAIL_BACKENDS = {
@@ -2,16 +2,16 @@
 Configuración del admin para el módulo de notificaciones
 """
 from django.contrib import admin
-from .models import DeviceToken, Notification
+from .models import DeviceToken, Notification, NotificacionAgrupada, SuscripcionTopic
 
 
 @admin.register(DeviceToken)
 class DeviceTokenAdmin(admin.ModelAdmin):
     """Administración de tokens de dispositivos"""
-    list_display = ['user', 'device_type', 'device_name', 'is_active', 'created_at', 'updated_at']
-    list_filter = ['device_type', 'is_active', 'created_at']
+    list_display = ['user', 'device_type', 'device_name', 'is_active', 'recibir_promos', 'last_success_at', 'created_at', 'updated_at']
+    list_filter = ['device_type', 'is_active', 'recibir_promos', 'created_at']
     search_fields = ['user__username', 'user__email', 'token', 'device_name']
-    readonly_fields = ['token', 'created_at', 'updated_at']
+    readonly_fields = ['token', 'last_success_at', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
     
     fieldsets = (
@@ -19,7 +19,7 @@ class DeviceTokenAdmin(admin.ModelAdmin):
             'fields': ('user', 'token', 'device_type', 'device_name')
         }),
         ('Estado', {
-            'fields': ('is_active',)
+            'fields': ('is_active', 'recibir_promos', 'last_success_at')
         }),
         ('Fechas', {
             'fields': ('created_at', 'updated_at'),
@@ -58,8 +58,11 @@ class NotificationAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
+        # Solo las particiones recientes; lo antiguo se consulta en el archivo
         qs = super().get_queryset(request)
-        return qs.select_related('user')
+        return qs.select_related('user').filter(
+            created_at__gte=Notification.fecha_minima_visible()
+        )
     
     def get_recipient(self, obj):
         """Mostrar destinatario: usuario o topic"""
@@ -81,3 +84,21 @@ class NotificationAdmin(admin.ModelAdmin):
         )
         self.message_user(request, f'{updated} notificaciones marcadas como leídas')
     mark_as_read.short_description = 'Marcar seleccionadas como leídas'
+
+
+@admin.register(NotificacionAgrupada)
+class NotificacionAgrupadaAdmin(admin.ModelAdmin):
+    """Administración del buffer de notificaciones agrupadas"""
+    list_display = ['titulo', 'destino', 'tipo', 'sent_at', 'created_at']
+    list_filter = ['tipo', 'sent_at', 'created_at']
+    search_fields = ['destino', 'titulo', 'mensaje']
+    readonly_fields = ['created_at']
+
+
+@admin.register(SuscripcionTopic)
+class SuscripcionTopicAdmin(admin.ModelAdmin):
+    """Administración de suscripciones de dispositivos a topics"""
+    list_display = ['topic', 'token', 'created_at']
+    list_filter = ['topic']
+    search_fields = ['topic', 'token__token', 'token__user__email']
+    list_select_related = ['token__user']
@@ -0,0 +1,226 @@
+"""
+Agrupación de notificaciones y límite de envíos por destino
+
+Las notificaciones ruidosas (stock, cambios de estado, inicios de sesión) no
+se envían directamente: se guardan en NotificacionAgrupada y una tarea las
+vacía. La primera de una ventana sale de inmediato; las que llegan mientras
+la ventana está abierta se juntan en un único resumen al cerrarse. Además
+cada destino tiene un máximo de envíos por hora; al superarlo las
+notificaciones siguen acumulándose hasta que haya cupo.
+
+Destinos:
+    'usuario:<id>'  -> un usuario
+    'admins'        -> todos los administradores activos
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from tareas.models import Tarea
+
+from .models import Notification, NotificacionAgrupada
+
+logger = logging.getLogger(__name__)
+
+DESTINO_ADMINS = "admins"
+TIPO_TAREA_VACIADO = "notificaciones.vaciar_agrupadas"
+
+# Mensajes incluidos textualmente en un resumen; el resto se cuenta
+MAX_MENSAJES_RESUMEN = 3
+
+TITULOS_RESUMEN = {
+    "alerta": "🔔 {n} alertas nuevas",
+    "pedido": "📦 {n} actualizaciones de pedidos",
+    "sistema": "🔐 {n} avisos de tu cuenta",
+}
+
+
+def destino_usuario(usuario_id):
+    return f"usuario:{usuario_id}"
+
+
+def _ventana():
+    return timedelta(seconds=getattr(settings, "NOTIFICACIONES_VENTANA_AGRUPACION", 60))
+
+
+def _max_por_hora():
+    return getattr(settings, "NOTIFICACIONES_MAX_POR_HORA", 20)
+
+
+def agrupar(destino, titulo, mensaje, tipo="info", data=None):
+    """
+    Guardar una notificación para enviarla agrupada
+
+    Args:
+        destino: 'usuario:<id>' o 'admins'
+        titulo: Título de la notificación
+        mensaje: Mensaje de la notificación
+        tipo: Tipo de notificación
+        data: Datos adicionales (opcional)
+
+    Returns:
+        NotificacionAgrupada: Registro creado
+    """
+    notificacion = NotificacionAgrupada.objects.create(
+        destino=destino, tipo=tipo, titulo=titulo, mensaje=mensaje, data=data
+    )
+    programar_vaciado(destino, tipo)
+    return notificacion
+
+
+def programar_vaciado(destino, tipo, retraso=0):
+    """
+    Encolar el vaciado de un grupo salvo que ya haya uno pendiente que
+    se ejecute antes
+    """
+    from .tareas import vaciar_agrupadas
+
+    limite = timezone.now() + timedelta(seconds=retraso)
+    pendiente = Tarea.objects.filter(
+        tipo=TIPO_TAREA_VACIADO,
+        estado="PENDIENTE",
+        payload__destino=destino,
+        payload__tipo_notificacion=tipo,
+        disponible_en__lte=limite,
+    ).exists()
+    if not pendiente:
+        vaciar_agrupadas.encolar(retraso=retraso, destino=destino, tipo_notificacion=tipo)
+
+
+def componer_resumen(notificaciones, tipo):
+    """
+    Combinar varias notificaciones en una sola
+
+    Returns:
+        tuple: (titulo, mensaje, data)
+    """
+    if len(notificaciones) == 1:
+        unica = notificaciones[0]
+        return unica.titulo, unica.mensaje, unica.data
+
+    total = len(notificaciones)
+    titulo = TITULOS_RESUMEN.get(tipo, "📬 {n} notificaciones nuevas").format(n=total)
+
+    mensajes = [n.mensaje for n in notificaciones[-MAX_MENSAJES_RESUMEN:]]
+    mensaje = " • ".join(reversed(mensajes))
+    if total > MAX_MENSAJES_RESUMEN:
+        mensaje += f" y {total - MAX_MENSAJES_RESUMEN} más"
+
+    # Conservar la pantalla de destino si todas coinciden
+    pantallas = {(n.data or {}).get("screen") for n in notificaciones}
+    data = {
+        "agrupadas": str(total),
+        "screen": pantallas.pop() if len(pantallas) == 1 else "notificaciones",
+    }
+    return titulo, mensaje, data
+
+
+def _enviar(destino, titulo, mensaje, tipo, data):
+    from .envio import enviar_a_usuarios
+    from .utils import notificar_admins
+
+    if destino == DESTINO_ADMINS:
+        return notificar_admins(titulo, mensaje, tipo, data)
+
+    usuario_id = int(destino.split(":", 1)[1])
+    return enviar_a_usuarios([usuario_id], titulo, mensaje, tipo, data)
+
+
+def _ya_enviado(reclamo, desde):
+    """Un intento anterior del mismo resumen ya guardó (y quizá envió) la Notification"""
+    return Notification.objects.filter(data__agrupacion=reclamo, created_at__gte=desde).exists()
+
+
+def vaciar(destino, tipo):
+    """
+    Enviar las notificaciones pendientes de un grupo
+
+    Si la ventana de agrupación sigue abierta o el destino alcanzó su límite
+    por hora, deja las notificaciones pendientes y reprograma el vaciado.
+
+    Las notificaciones se reclaman (sent_at y un id de reclamo) en una
+    transacción corta y el envío (FCM) se hace después, sin locks tomados.
+    Si el envío falla se quita sent_at pero se conserva el reclamo: el
+    reintento envía el mismo resumen, y si el intento fallido ya había
+    guardado la Notification (lleva el reclamo en su data) no lo repite.
+
+    Returns:
+        int: Notificaciones incluidas en el envío (0 si se pospuso)
+    """
+    ahora = timezone.now()
+    ventana = _ventana()
+    una_hora = timedelta(hours=1)
+
+    with transaction.atomic():
+        # skip_locked: si otro worker ya vacía este grupo no hay nada que hacer
+        pendientes = list(
+            NotificacionAgrupada.objects.select_for_update(skip_locked=True)
+            .filter(destino=destino, tipo=tipo, sent_at__isnull=True)
+            .order_by("created_at", "id")
+        )
+        if not pendientes:
+            return 0
+
+        reclamo = next((n.reclamo for n in pendientes if n.reclamo), "")
+        if reclamo:
+            # Reintento de un envío fallido: las mismas notificaciones, sin esperar
+            siguientes = [n for n in pendientes if n.reclamo != reclamo]
+            pendientes = [n for n in pendientes if n.reclamo == reclamo]
+            if siguientes:
+                programar_vaciado(destino, tipo, retraso=ventana.total_seconds())
+        else:
+            enviadas = NotificacionAgrupada.objects.filter(
+                destino=destino, sent_at__gte=ahora - una_hora
+            )
+
+            ultimo_envio = enviadas.filter(tipo=tipo).aggregate(ultimo=Max("sent_at"))["ultimo"]
+            if ultimo_envio and ultimo_envio > ahora - ventana:
+                espera = (ultimo_envio + ventana - ahora).total_seconds()
+                programar_vaciado(destino, tipo, retraso=espera)
+                return 0
+
+            # Cada envío marca sus notificaciones con el mismo sent_at
+            envios = enviadas.values("sent_at").distinct()
+            if envios.count() >= _max_por_hora():
+                primero = enviadas.aggregate(primero=Min("sent_at"))["primero"]
+                espera = (primero + una_hora - ahora).total_seconds()
+                logger.info(f"⏳ Límite de notificaciones alcanzado para {destino}, reintento en {espera:.0f}s")
+                programar_vaciado(destino, tipo, retraso=espera)
+                return 0
+            reclamo = uuid.uuid4().hex
+
+        reclamadas = NotificacionAgrupada.objects.filter(id__in=[n.id for n in pendientes])
+        reclamadas.update(sent_at=ahora, reclamo=reclamo)
+
+    titulo, mensaje, data = componer_resumen(pendientes, tipo)
+    if _ya_enviado(reclamo, desde=min(n.created_at for n in pendientes)):
+        logger.info(f"↩️ Resumen {reclamo} de {destino} ya enviado en un intento anterior")
+        return len(pendientes)
+    try:
+        _enviar(destino, titulo, mensaje, tipo, {**(data or {}), "agrupacion": reclamo})
+    except Exception:
+        reclamadas.update(sent_at=None)
+        raise
+
+    return len(pendientes)
+
+
+def purgar_enviadas():
+    """
+    Eliminar las notificaciones enviadas hace más de una hora, de todos los
+    destinos (ya no cuentan para el límite). La ejecutan los workers cada hora
+    (TAREAS_PURGAS).
+
+    Returns:
+        int: Notificaciones eliminadas
+    """
+    eliminadas, _ = NotificacionAgrupada.objects.filter(
+        sent_at__lt=timezone.now() - timedelta(hours=1)
+    ).delete()
+    return eliminadas
@@ -7,6 +7,7 @@ class NotificationsConfig(AppConfig):
     verbose_name = 'Notificaciones Push'
 
     def ready(self):
-        """Inicializa Firebase cuando la app está lista"""
+        """Inicializa Firebase y registra los signals cuando la app está lista"""
         from .firebase_config import initialize_firebase
+        from . import signals  # noqa: F401
         initialize_firebase()
@@ -0,0 +1,295 @@
+"""
+Contadores de notificaciones no leídas
+
+El badge de la app se lee de ContadorNotificaciones (una fila por usuario)
+en lugar de contar Notification en cada consulta:
+
+- Al enviar a usuarios se incrementa con un UPDATE ... SET no_leidas = no_leidas + n
+- Al enviar a un topic solo se incrementa su SecuenciaTopic: cada usuario
+  suma al leer el badge los envíos posteriores a la secuencia que ya tiene
+  vista (topics_vistos), así un envío masivo no escribe una fila por usuario
+- Al leer se descuenta; "marcar todo" lo pone a cero y da los topics por vistos
+- updated_at y las secuencias de los topics forman la versión del badge
+- Cada cambio se publica con eventos.publicar para los streams SSE abiertos
+
+Leer el badge son tres lecturas por clave (contador, secuencias y preferencia
+de promociones). Los usuarios sin contador (anteriores a esta tabla) lo
+obtienen recalculado en su primera consulta; solo entonces se cuentan una a
+una las notificaciones de topics.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Value, When
+from django.utils import timezone
+
+from .eventos import publicar
+from .models import ContadorNotificaciones, LecturaNotificacion, Notification, SecuenciaTopic
+from .topics import topics_del_usuario
+
+
+def incrementar(usuario_ids):
+    """
+    Sumar notificaciones no leídas
+
+    Los usuarios sin contador no se tocan: su primera consulta lo recalcula
+    desde Notification.
+
+    Args:
+        usuario_ids: IDs de usuarios; un ID repetido suma una vez por aparición
+    """
+    cantidades = Counter(usuario_ids)
+    if not cantidades:
+        return
+
+    por_cantidad = defaultdict(list)
+    for user_id, cantidad in cantidades.items():
+        por_cantidad[cantidad].append(user_id)
+
+    if len(por_cantidad) == 1:
+        incremento = Value(next(iter(por_cantidad)))
+    else:
+        incremento = Case(
+            *[When(user_id__in=ids, then=Value(cantidad)) for cantidad, ids in por_cantidad.items()],
+            output_field=IntegerField(),
+        )
+    ContadorNotificaciones.objects.filter(user_id__in=cantidades).update(
+        no_leidas=F("no_leidas") + incremento, updated_at=timezone.now()
+    )
+    publicar(cantidades)
+
+
+def incrementar_topic(topic):
+    """Registrar un envío a un topic (una fila, sin importar cuántos usuarios tenga)"""
+    SecuenciaTopic.objects.bulk_create([SecuenciaTopic(topic=topic)], ignore_conflicts=True)
+    SecuenciaTopic.objects.filter(topic=topic).update(
+        enviadas=F("enviadas") + 1, updated_at=timezone.now()
+    )
+    publicar()
+
+
+def _secuencias():
+    """Envíos realizados por topic"""
+    return dict(SecuenciaTopic.objects.values_list("topic", "enviadas"))
+
+
+def _vistos(topics, secuencias):
+    return {topic: secuencias.get(topic, 0) for topic in sorted(topics)}
+
+
+def descontar(usuario_id, cantidad=1):
+    """Restar notificaciones leídas"""
+    ContadorNotificaciones.objects.filter(user_id=usuario_id).update(
+        no_leidas=F("no_leidas") - cantidad,
+        updated_at=timezone.now(),
+    )
+    publicar([usuario_id])
+
+
+def marcar_todo_leido(usuario):
+    """Poner a cero el contador y dar por vistos los topics del usuario"""
+    ahora = timezone.now()
+    ContadorNotificaciones.objects.update_or_create(
+        user_id=usuario.id,
+        defaults={
+            "no_leidas": 0,
+            "topics_leidos_hasta": ahora,
+            "topics_vistos": _vistos(topics_del_usuario(usuario), _secuencias()),
+            "updated_at": ahora,
+        },
+    )
+    publicar([usuario.id])
+
+
+def marcar_leida(notification, usuario):
+    """
+    Marcar una notificación como leída por el usuario
+
+    Returns:
+        bool: True si no estaba leída
+    """
+    if notification.user_id is None:
+        _, creada = LecturaNotificacion.objects.get_or_create(
+            notification=notification, user=usuario
+        )
+        # Solo se descuenta si estaba contada (recalculada o pendiente en su
+        # secuencia); el contador puede quedar negativo frente a las pendientes
+        if creada and notification.estado == "enviada" and notification.created_at >= usuario.date_joined:
+            ContadorNotificaciones.objects.filter(user_id=usuario.id).exclude(
+                topics_leidos_hasta__gte=notification.created_at
+            ).update(
+                no_leidas=F("no_leidas") - 1,
+                updated_at=timezone.now(),
+            )
+            publicar([usuario.id])
+        return creada
+
+    # UPDATE condicional: dos lecturas simultáneas no descuentan dos veces
+    ahora = timezone.now()
+    marcada = Notification.objects.filter(id=notification.id, estado="enviada").update(
+        estado="leida", read_at=ahora
+    )
+    if not marcada:
+        return False
+    notification.estado = "leida"
+    notification.read_at = ahora
+    descontar(usuario.id)
+    return True
+
+
+def _no_leidas_de_topics(usuario, topics_leidos_hasta):
+    """Notificaciones de topics que el usuario no leyó (desde que se registró)"""
+    desde = usuario.date_joined
+    if topics_leidos_hasta and topics_leidos_hasta > desde:
+        desde = topics_leidos_hasta
+    return (
+        Notification.objects.filter(
+            user__isnull=True,
+            topic__in=topics_del_usuario(usuario),
+            estado="enviada",
+            created_at__gte=desde,
+        )
+        .exclude(lecturas__user=usuario)
+        .count()
+    )
+
+
+def recalcular(usuario_ids=None):
+    """
+    Reconstruir los contadores desde la tabla Notification
+
+    Args:
+        usuario_ids: Usuarios a recalcular (None = todos los que tienen contador
+                     o notificaciones sin leer)
+
+    Returns:
+        int: Contadores escritos
+    """
+    from django.contrib.auth import get_user_model
+
+    no_leidas = Notification.objects.filter(user__isnull=False, estado="enviada")
+    existentes = ContadorNotificaciones.objects.all()
+    if usuario_ids is not None:
+        no_leidas = no_leidas.filter(user_id__in=usuario_ids)
+        existentes = existentes.filter(user_id__in=usuario_ids)
+
+    # Antes de contar: un envío simultáneo queda contado de más, nunca de menos
+    secuencias = _secuencias()
+    leidos_hasta = dict(existentes.values_list("user_id", "topics_leidos_hasta"))
+    totales = dict.fromkeys(leidos_hasta, 0)
+    if usuario_ids is not None:
+        totales.update(dict.fromkeys(usuario_ids, 0))
+    totales.update(
+        no_leidas.order_by().values("user_id").annotate(total=Count("id")).values_list("user_id", "total")
+    )
+    # Las de topics se cuentan por usuario (una consulta cada uno): solo al recalcular
+    vistos = {}
+    for usuario in get_user_model().objects.filter(id__in=list(totales)):
+        totales[usuario.id] += _no_leidas_de_topics(usuario, leidos_hasta.get(usuario.id))
+        vistos[usuario.id] = _vistos(topics_del_usuario(usuario), secuencias)
+
+    ahora = timezone.now()
+    ContadorNotificaciones.objects.bulk_create(
+        [
+            ContadorNotificaciones(
+                user_id=user_id, no_leidas=total, topics_vistos=vistos.get(user_id, {}), updated_at=ahora
+            )
+            for user_id, total in totales.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["no_leidas", "topics_vistos", "updated_at"],
+    )
+    publicar(totales)
+    return len(totales)
+
+
+def contador(usuario):
+    """
+    Contador del usuario (se recalcula si todavía no tiene)
+
+    Returns:
+        ContadorNotificaciones: no_leidas sin las pendientes de topics
+    """
+    fila = ContadorNotificaciones.objects.filter(user_id=usuario.id).first()
+    if fila is None:
+        recalcular([usuario.id])
+        fila = ContadorNotificaciones.objects.get(user_id=usuario.id)
+    return fila
+
+
+def badge(usuario):
+    """
+    Total de no leídas del usuario y versión del badge
+
+    Suma al contador los envíos a sus topics posteriores a los ya vistos. Un
+    topic nuevo para el usuario (cambio de rol o de preferencia de promociones)
+    empieza visto en su secuencia actual y los que dejó se olvidan.
+
+    Returns:
+        tuple: (no_leidas, versión); la versión cambia con el contador o con
+        un envío a alguno de sus topics
+    """
+    fila = contador(usuario)
+    secuencias = _secuencias()
+    topics = topics_del_usuario(usuario)
+
+    vistos = {
+        topic: fila.topics_vistos.get(topic, secuencias.get(topic, 0))
+        for topic in sorted(topics)
+    }
+    if vistos.keys() != fila.topics_vistos.keys():
+        ContadorNotificaciones.objects.filter(user_id=usuario.id).update(topics_vistos=vistos)
+
+    pendientes = sum(max(secuencias.get(topic, 0) - visto, 0) for topic, visto in vistos.items())
+    version = f"{fila.updated_at.timestamp()}:{sum(secuencias.get(topic, 0) for topic in topics)}"
+    return max(fila.no_leidas + pendientes, 0), version
+
+
+def no_leidas(usuario):
+    """
+    Notificaciones no leídas del usuario (propias + topics)
+
+    Returns:
+        int: Total para el badge
+    """
+    return badge(usuario)[0]
+
+
+def purgar_notificaciones(queryset):
+    """
+    Limpiar lecturas y contadores de notificaciones que se van a eliminar
+
+    Se usa como 'al_purgar' de la política de retención: al eliminar una
+    partición entera no se ejecutan los CASCADE del ORM.
+    """
+    # Las de topics sin leer están contadas en quienes no marcaron todo
+    # después de enviarse: esos contadores se eliminan y se recalculan en su
+    # siguiente consulta (una vez por purga, no un UPDATE por notificación)
+    ultima = queryset.filter(user__isnull=True, estado="enviada").aggregate(ultima=Max("created_at"))["ultima"]
+    if ultima:
+        ContadorNotificaciones.objects.filter(
+            Q(topics_leidos_hasta__isnull=True) | Q(topics_leidos_hasta__lt=ultima)
+        ).delete()
+
+    LecturaNotificacion.objects.filter(
+        notification_id__in=queryset.filter(user__isnull=True).values("id")
+    ).delete()
+
+    # Restar las no leídas que desaparecen (agrupadas por cantidad: un UPDATE por valor)
+    por_cantidad = defaultdict(list)
+    for user_id, total in (
+        queryset.filter(user__isnull=False, estado="enviada")
+        .order_by()
+        .values("user_id")
+        .annotate(total=Count("id"))
+        .values_list("user_id", "total")
+    ):
+        por_cantidad[total].append(user_id)
+
+    for total, ids in por_cantidad.items():
+        ContadorNotificaciones.objects.filter(user_id__in=ids).update(
+            no_leidas=F("no_leidas") - total,
+            updated_at=timezone.now(),
+        )
+    publicar()
@@ -0,0 +1,427 @@
+"""
+Pipeline de envío de notificaciones push en lote
+
+Resuelve los tokens de todos los destinatarios en una sola consulta, crea los
+registros de Notification con bulk_create, reparte los tokens en lotes de
+500 (límite de FCM por multicast) que se envían en paralelo desde un pool de
+hilos y actualiza el estado de las notificaciones con unos pocos UPDATE.
+
+El transporte es configurable para poder probar sin conexión a Firebase:
+
+    NOTIFICACIONES_TRANSPORTE = "notifications.envio.TransporteFalso"
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Case, CharField, Q, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import DeviceToken, Notification
+
+logger = logging.getLogger(__name__)
+
+# Firebase acepta como máximo 500 tokens por envío multicast
+MAX_TOKENS_MULTICAST = 500
+
+# Errores que indican que el token ya no sirve (app desinstalada, token de otro proyecto)
+CODIGOS_TOKEN_MUERTO = {"UNREGISTERED", "SENDER_ID_MISMATCH"}
+# INVALID_ARGUMENT también puede deberse al payload: solo cuenta como token
+# inválido si otro token del mismo lote se envió bien
+CODIGO_TOKEN_MALFORMADO = "INVALID_ARGUMENT"
+
+# Frecuencia máxima con la que se actualiza last_success_at de un token
+INTERVALO_ULTIMO_EXITO = timedelta(hours=12)
+
+
+class ResultadoToken:
+    """Resultado del envío a un token concreto"""
+
+    __slots__ = ("token", "exito", "message_id", "error", "codigo_error")
+
+    def __init__(self, token, exito, message_id=None, error=None, codigo_error=None):
+        self.token = token
+        self.exito = exito
+        self.message_id = message_id
+        self.error = error
+        self.codigo_error = codigo_error
+
+    def __repr__(self):
+        estado = "ok" if self.exito else self.codigo_error or "error"
+        return f"<ResultadoToken {self.token[:12]}... {estado}>"
+
+
+class TransporteFirebase:
+    """Envía los lotes con Firebase Cloud Messaging"""
+
+    def enviar_multicast(self, tokens, titulo, mensaje, data):
+        from .firebase_config import send_multicast_notification
+
+        response = send_multicast_notification(tokens, titulo, mensaje, data)
+        if response is None:
+            return [
+                ResultadoToken(token, False, error="Firebase no disponible")
+                for token in tokens
+            ]
+
+        resultados = []
+        for token, resp in zip(tokens, response.responses):
+            if resp.success:
+                resultados.append(ResultadoToken(token, True, message_id=resp.message_id))
+            else:
+                resultados.append(
+                    ResultadoToken(
+                        token,
+                        False,
+                        error=str(resp.exception),
+                        codigo_error=self._codigo_error(resp.exception),
+                    )
+                )
+        return resultados
+
+    def enviar_topic(self, topic, titulo, mensaje, data):
+        """Envía un mensaje a un topic; devuelve el message_id o None"""
+        from .firebase_config import send_topic_notification
+
+        return send_topic_notification(topic, titulo, mensaje, data)
+
+    def suscribir(self, tokens, topic):
+        """Suscribe hasta 1000 tokens; devuelve los tokens que fallaron"""
+        from .firebase_config import subscribe_to_topic
+
+        return self._tokens_fallidos(tokens, subscribe_to_topic(tokens, topic))
+
+    def desuscribir(self, tokens, topic):
+        """Desuscribe hasta 1000 tokens; devuelve los tokens que fallaron"""
+        from .firebase_config import unsubscribe_from_topic
+
+        return self._tokens_fallidos(tokens, unsubscribe_from_topic(tokens, topic))
+
+    @staticmethod
+    def _tokens_fallidos(tokens, response):
+        if response is None:
+            return list(tokens)
+        return [tokens[error.index] for error in response.errors]
+
+    @staticmethod
+    def _codigo_error(excepcion):
+        """Código de error normalizado a partir de la excepción de firebase_admin"""
+        from firebase_admin import messaging
+
+        if isinstance(excepcion, messaging.UnregisteredError):
+            return "UNREGISTERED"
+        if isinstance(excepcion, messaging.SenderIdMismatchError):
+            return "SENDER_ID_MISMATCH"
+        return getattr(excepcion, "code", None)
+
+
+class TransporteFalso:
+    """
+    Transporte en memoria para tests y desarrollo sin Firebase
+
+    Registra cada lote en `enviados` (los envíos a topics en `enviados_topic`
+    y las altas/bajas en `suscripciones`) y responde éxito salvo para los
+    tokens listados en `tokens_fallidos` ({token: codigo_error}).
+    """
+
+    enviados = []
+    tokens_fallidos = {}
+    enviados_topic = []
+    suscripciones = []
+    _lock = threading.Lock()
+
+    @classmethod
+    def reiniciar(cls):
+        with cls._lock:
+            cls.enviados = []
+            cls.tokens_fallidos = {}
+            cls.enviados_topic = []
+            cls.suscripciones = []
+
+    def enviar_topic(self, topic, titulo, mensaje, data):
+        with self._lock:
+            self.enviados_topic.append(
+                {"topic": topic, "titulo": titulo, "mensaje": mensaje, "data": data}
+            )
+            return f"fake-topic-{len(self.enviados_topic)}"
+
+    def suscribir(self, tokens, topic):
+        return self._registrar_suscripcion("alta", tokens, topic)
+
+    def desuscribir(self, tokens, topic):
+        return self._registrar_suscripcion("baja", tokens, topic)
+
+    def _registrar_suscripcion(self, operacion, tokens, topic):
+        with self._lock:
+            self.suscripciones.append(
+                {"operacion": operacion, "topic": topic, "tokens": list(tokens)}
+            )
+        return [token for token in tokens if token in self.tokens_fallidos]
+
+    def enviar_multicast(self, tokens, titulo, mensaje, data):
+        with self._lock:
+            self.enviados.append(
+                {"tokens": list(tokens), "titulo": titulo, "mensaje": mensaje, "data": data}
+            )
+        resultados = []
+        for i, token in enumerate(tokens):
+            codigo = self.tokens_fallidos.get(token)
+            if codigo:
+                resultados.append(
+                    ResultadoToken(token, False, error=f"Error simulado: {codigo}", codigo_error=codigo)
+                )
+            else:
+                resultados.append(ResultadoToken(token, True, message_id=f"fake-{len(self.enviados)}-{i}"))
+        return resultados
+
+
+@lru_cache(maxsize=None)
+def _instanciar_transporte(ruta):
+    return import_string(ruta)()
+
+
+def obtener_transporte():
+    """Transporte configurado en settings.NOTIFICACIONES_TRANSPORTE"""
+    ruta = getattr(
+        settings, "NOTIFICACIONES_TRANSPORTE", "notifications.envio.TransporteFirebase"
+    )
+    return _instanciar_transporte(ruta)
+
+
+def enviar_tokens(tokens, titulo, mensaje, data_strings=None):
+    """
+    Enviar un mismo mensaje a muchos tokens en lotes paralelos
+
+    Args:
+        tokens: Lista de tokens FCM
+        titulo: Título de la notificación
+        mensaje: Cuerpo de la notificación
+        data_strings: Datos ya convertidos a strings
+
+    Returns:
+        list[ResultadoToken]: Un resultado por token, en el mismo orden
+    """
+    if not tokens:
+        return []
+
+    transporte = obtener_transporte()
+    lotes = [
+        tokens[i:i + MAX_TOKENS_MULTICAST]
+        for i in range(0, len(tokens), MAX_TOKENS_MULTICAST)
+    ]
+
+    def enviar_lote(lote):
+        try:
+            return transporte.enviar_multicast(lote, titulo, mensaje, data_strings or {})
+        except Exception as e:
+            logger.error(f"Error enviando lote de {len(lote)} tokens: {e}")
+            return [ResultadoToken(token, False, error=str(e)) for token in lote]
+
+    if len(lotes) == 1:
+        respuestas = [enviar_lote(lotes[0])]
+    else:
+        hilos = min(getattr(settings, "NOTIFICACIONES_HILOS_ENVIO", 4), len(lotes))
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="fcm") as pool:
+            respuestas = list(pool.map(enviar_lote, lotes))
+
+    actualizar_tokens(respuestas)
+    return [resultado for respuesta in respuestas for resultado in respuesta]
+
+
+def tokens_invalidos(respuesta):
+    """
+    Tokens de un lote que Firebase reporta como inválidos
+
+    Args:
+        respuesta: Lista de ResultadoToken de un mismo multicast
+    """
+    hubo_exito = any(r.exito for r in respuesta)
+    return [
+        r.token
+        for r in respuesta
+        if r.codigo_error in CODIGOS_TOKEN_MUERTO
+        or (hubo_exito and r.codigo_error == CODIGO_TOKEN_MALFORMADO)
+    ]
+
+
+def actualizar_tokens(respuestas):
+    """
+    Desactivar los tokens inválidos y registrar el último envío exitoso
+
+    last_success_at se escribe como mucho cada INTERVALO_ULTIMO_EXITO para
+    no convertir cada broadcast en un UPDATE de todos los tokens.
+
+    Args:
+        respuestas: Lista de lotes (listas de ResultadoToken)
+
+    Returns:
+        int: Tokens desactivados
+    """
+    invalidos = [token for respuesta in respuestas for token in tokens_invalidos(respuesta)]
+    exitosos = [r.token for respuesta in respuestas for r in respuesta if r.exito]
+
+    desactivados = 0
+    if invalidos:
+        desactivados = DeviceToken.objects.filter(
+            token__in=invalidos, is_active=True
+        ).update(is_active=False)
+        logger.info(f"🧹 {desactivados} tokens inválidos desactivados")
+
+    if exitosos:
+        ahora = timezone.now()
+        DeviceToken.objects.filter(token__in=exitosos).filter(
+            Q(last_success_at__isnull=True)
+            | Q(last_success_at__lt=ahora - INTERVALO_ULTIMO_EXITO)
+        ).update(last_success_at=ahora)
+
+    return desactivados
+
+
+def enviar_a_usuarios(usuario_ids, titulo, mensaje, tipo="info", data=None):
+    """
+    Enviar la misma notificación a varios usuarios
+
+    Crea un registro de Notification por usuario con tokens activos y envía a
+    todos sus dispositivos.
+
+    Args:
+        usuario_ids: IDs de los usuarios destinatarios
+        titulo: Título de la notificación
+        mensaje: Mensaje de la notificación
+        tipo: Tipo de notificación
+        data: Datos adicionales (se guardan tal cual y se envían como strings)
+
+    Returns:
+        dict: {'enviados': int, 'fallidos': int, 'total': int,
+               'detalle': {user_id: {'success': bool, ...}}}
+    """
+    from .contadores import incrementar
+    from .utils import _convert_data_to_strings
+
+    usuario_ids = list(dict.fromkeys(usuario_ids))
+    resultados = {"enviados": 0, "fallidos": 0, "total": len(usuario_ids), "detalle": {}}
+    if not usuario_ids:
+        return resultados
+
+    # 1. Tokens de todos los destinatarios en una consulta
+    tokens_por_usuario = defaultdict(list)
+    for user_id, token in DeviceToken.objects.filter(
+        user_id__in=usuario_ids, is_active=True
+    ).order_by().values_list("user_id", "token"):
+        tokens_por_usuario[user_id].append(token)
+
+    for user_id in usuario_ids:
+        if user_id not in tokens_por_usuario:
+            resultados["detalle"][user_id] = {"success": False, "error": "Usuario sin tokens"}
+            resultados["fallidos"] += 1
+
+    if not tokens_por_usuario:
+        return resultados
+
+    # 2. Registros de notificación en un solo INSERT
+    notificaciones = Notification.objects.bulk_create(
+        [
+            Notification(user_id=user_id, tipo=tipo, titulo=titulo, mensaje=mensaje, data=data or {})
+            for user_id in tokens_por_usuario
+        ]
+    )
+    notificacion_de_usuario = {n.user_id: n.id for n in notificaciones}
+
+    # 3. Envío en lotes paralelos
+    usuario_de_token = {
+        token: user_id for user_id, tokens in tokens_por_usuario.items() for token in tokens
+    }
+    exitos = defaultdict(int)
+    for resultado in enviar_tokens(
+        list(usuario_de_token), titulo, mensaje, _convert_data_to_strings(data or {})
+    ):
+        if resultado.exito:
+            exitos[usuario_de_token[resultado.token]] += 1
+
+    # 4. Estado de las notificaciones: un UPDATE para enviadas y otro para fallidas
+    enviadas_por_exitos = defaultdict(list)
+    fallidas = []
+    for user_id, tokens in tokens_por_usuario.items():
+        enviados = exitos.get(user_id, 0)
+        if enviados:
+            enviadas_por_exitos[enviados].append(notificacion_de_usuario[user_id])
+            resultados["detalle"][user_id] = {
+                "success": True,
+                "sent_to": enviados,
+                "failed": len(tokens) - enviados,
+            }
+            resultados["enviados"] += 1
+        else:
+            fallidas.append(notificacion_de_usuario[user_id])
+            resultados["detalle"][user_id] = {"success": False, "error": "Error en Firebase"}
+            resultados["fallidos"] += 1
+
+    if enviadas_por_exitos:
+        Notification.objects.filter(
+            id__in=[i for ids in enviadas_por_exitos.values() for i in ids]
+        ).update(
+            estado="enviada",
+            message_id=Case(
+                *[
+                    When(id__in=ids, then=Value(f"multicast_{enviados}"))
+                    for enviados, ids in enviadas_por_exitos.items()
+                ],
+                output_field=CharField(),
+            ),
+            sent_at=timezone.now(),
+        )
+        incrementar(
+            user_id for user_id in tokens_por_usuario if user_id in exitos
+        )
+    if fallidas:
+        Notification.objects.filter(id__in=fallidas).update(
+            estado="fallida", error_message="No se pudo enviar a ningún dispositivo"
+        )
+
+    logger.info(
+        f"Envío '{titulo}': {resultados['enviados']}/{resultados['total']} usuarios, "
+        f"{sum(exitos.values())}/{len(usuario_de_token)} dispositivos"
+    )
+    return resultados
+
+
+def purgar_tokens_inactivos(dias=None, simular=False):
+    """
+    Eliminar tokens desactivados o sin envíos exitosos en los últimos `dias`
+
+    Un token cuenta como usado si tuvo un envío exitoso o si la app lo volvió
+    a registrar (updated_at) dentro del período.
+
+    Args:
+        dias: Días sin uso tras los que se elimina (por defecto
+            settings.NOTIFICACIONES_DIAS_TOKEN_INACTIVO)
+        simular: Solo contar, sin eliminar
+
+    Returns:
+        int: Tokens eliminados (o que se eliminarían)
+    """
+    from django.db.models.functions import Coalesce, Greatest
+
+    if dias is None:
+        dias = getattr(settings, "NOTIFICACIONES_DIAS_TOKEN_INACTIVO", 60)
+    limite = timezone.now() - timedelta(days=dias)
+
+    candidatos = DeviceToken.objects.annotate(
+        # Un token re-registrado hace poco cuenta como usado aunque su último éxito sea viejo
+        ultimo_uso=Greatest(Coalesce("last_success_at", "updated_at"), "updated_at")
+    ).filter(Q(is_active=False, updated_at__lt=limite) | Q(ultimo_uso__lt=limite))
+
+    if simular:
+        return candidatos.count()
+
+    eliminados, _ = DeviceToken.objects.filter(
+        id__in=candidatos.values("id")
+    ).delete()
+    logger.info(f"🧹 {eliminados} tokens sin uso en {dias} días eliminados")
+    return eliminados
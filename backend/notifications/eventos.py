@@ -0,0 +1,189 @@
+"""
+Avisos de cambios del badge para el stream SSE
+
+Cada cambio de un contador publica un NOTIFY de PostgreSQL en el canal
+CANAL_BADGE (se entrega al confirmar la transacción, también desde el worker
+de tareas u otro proceso). En cada proceso web un hilo hace LISTEN con una
+conexión propia y despierta los streams abiertos del usuario afectado:
+
+- payload "1,2,3" -> usuarios cuyo contador cambió
+- payload "*"     -> todos (envío a un topic, purgas, recálculo masivo)
+
+Un stream abierto no consulta la base mientras no haya avisos, salvo un
+latido cada NOTIFICACIONES_SSE_LATIDO segundos que además relee el badge por
+si se perdió algún aviso (reconexión del hilo, base sin LISTEN).
+"""
+
+import asyncio
+import logging
+import os
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+CANAL_BADGE = "notificaciones_badge"
+TODOS = "*"
+
+# PostgreSQL admite payloads de hasta 8000 bytes
+MAX_PAYLOAD = 7900
+
+
+def publicar(usuario_ids=None):
+    """
+    Avisar que cambió el badge de unos usuarios
+
+    Args:
+        usuario_ids: IDs de usuarios (None = todos)
+    """
+    if connection.vendor != "postgresql":
+        return
+    payload = TODOS if usuario_ids is None else ",".join(str(i) for i in sorted(set(usuario_ids)))
+    if not payload:
+        return
+    if len(payload) > MAX_PAYLOAD:
+        payload = TODOS
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CANAL_BADGE, payload])
+
+
+class Suscripcion:
+    """Avisos para un stream abierto de un usuario"""
+
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self._evento = threading.Event()
+        self._evento_async = None
+        self._loop = None
+
+    def avisar(self):
+        """Llamado desde el hilo del oyente"""
+        self._evento.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._evento_async.set)
+
+    def esperar(self, timeout):
+        """
+        Bloquear el hilo hasta un aviso (WSGI)
+
+        Returns:
+            bool: True si hubo aviso, False si venció el timeout
+        """
+        avisada = self._evento.wait(timeout)
+        self._evento.clear()
+        return avisada
+
+    async def esperar_async(self, timeout):
+        """Esperar un aviso sin ocupar un hilo (ASGI)"""
+        if self._loop is None:
+            self._evento_async = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+            if self._evento.is_set():
+                self._evento_async.set()
+        try:
+            await asyncio.wait_for(self._evento_async.wait(), timeout)
+            avisada = True
+        except asyncio.TimeoutError:
+            avisada = False
+        self._evento_async.clear()
+        self._evento.clear()
+        return avisada
+
+
+class OyenteBadge:
+    """Hilo con LISTEN sobre CANAL_BADGE que reparte los avisos a los streams"""
+
+    def __init__(self, reintento=5):
+        self.reintento = reintento
+        self._lock = threading.Lock()
+        self._suscripciones = defaultdict(set)
+        self._pid = None
+        self._hilo = None
+
+    def _asegurar_hilo(self):
+        # Tras un fork el hilo del padre no existe en el hijo
+        if self._pid == os.getpid() and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._bucle, name="oyente-badge", daemon=True)
+            self._hilo.start()
+            self._pid = os.getpid()
+
+    def suscribir(self, usuario_id):
+        """
+        Registrar un stream abierto del usuario
+
+        Returns:
+            Suscripcion: se libera con cancelar()
+        """
+        if getattr(settings, "NOTIFICACIONES_SSE_ESCUCHAR", True) and connection.vendor == "postgresql":
+            self._asegurar_hilo()
+        suscripcion = Suscripcion(usuario_id)
+        with self._lock:
+            self._suscripciones[usuario_id].add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            abiertas = self._suscripciones.get(suscripcion.usuario_id)
+            if abiertas is not None:
+                abiertas.discard(suscripcion)
+                if not abiertas:
+                    del self._suscripciones[suscripcion.usuario_id]
+
+    def despachar(self, payload):
+        """Despertar los streams de los usuarios del payload"""
+        with self._lock:
+            if payload == TODOS:
+                avisar = [s for abiertas in self._suscripciones.values() for s in abiertas]
+            else:
+                avisar = []
+                for parte in payload.split(","):
+                    if parte.isdigit():
+                        avisar.extend(self._suscripciones.get(int(parte), ()))
+        for suscripcion in avisar:
+            suscripcion.avisar()
+
+    def _bucle(self):
+        while True:
+            conexion = None
+            try:
+                conexion = connections.create_connection("default")
+                conexion.ensure_connection()
+                conexion.set_autocommit(True)
+                with conexion.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL_BADGE}")
+                # Lo cambiado mientras no se escuchaba se recupera releyendo
+                self.despachar(TODOS)
+
+                crudo = conexion.connection
+                while True:
+                    if select.select([crudo], [], [], 60) == ([], [], []):
+                        continue
+                    crudo.poll()
+                    while crudo.notifies:
+                        self.despachar(crudo.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning(f"⚠️ Oyente del badge desconectado: {e}")
+            finally:
+                if conexion is not None:
+                    conexion.close()
+            time.sleep(self.reintento)
+
+
+_oyente = None
+
+
+def obtener_oyente():
+    """Oyente del proceso"""
+    global _oyente
+    if _oyente is None:
+        _oyente = OyenteBadge()
+    return _oyente
@@ -143,7 +143,11 @@ def send_multicast_notification(tokens, title, body, data=None):
             ),
         )
         
-        response = messaging.send_multicast(message)
+        # firebase-admin >= 6.2 reemplaza send_multicast por send_each_for_multicast
+        if hasattr(messaging, 'send_each_for_multicast'):
+            response = messaging.send_each_for_multicast(message)
+        else:
+            response = messaging.send_multicast(message)
         print(f'✅ Notificaciones enviadas: {response.success_count}/{len(tokens)}')
         
         if response.failure_count > 0:
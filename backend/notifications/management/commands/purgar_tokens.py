@@ -0,0 +1,37 @@
+"""
+Comando para eliminar tokens FCM que ya no se usan.
+
+Uso:
+    python manage.py purgar_tokens [--dias N] [--simular]
+
+    Pensado para ejecutarse periódicamente (cron): mantiene los lotes
+    multicast libres de tokens muertos.
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.envio import purgar_tokens_inactivos
+
+
+class Command(BaseCommand):
+    help = 'Elimina tokens de dispositivos desactivados o sin uso en los últimos N días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=None,
+            help='Días sin uso (por defecto NOTIFICACIONES_DIAS_TOKEN_INACTIVO)'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo mostrar cuántos tokens se eliminarían'
+        )
+
+    def handle(self, *args, **options):
+        total = purgar_tokens_inactivos(options['dias'], simular=options['simular'])
+
+        if options['simular']:
+            self.stdout.write(f'🔍 Se eliminarían {total} tokens')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} tokens eliminados'))
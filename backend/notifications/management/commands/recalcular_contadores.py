@@ -0,0 +1,28 @@
+"""
+Comando para reconstruir los contadores de notificaciones no leídas.
+
+Uso:
+    python manage.py recalcular_contadores [--usuarios 1 2 3]
+
+    Los contadores se mantienen solos al enviar y leer; este comando corrige
+    diferencias tras cargas o borrados manuales de notificaciones.
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.contadores import recalcular
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el contador de notificaciones no leídas de los usuarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuarios',
+            nargs='*',
+            type=int,
+            help='IDs de usuarios a recalcular (por defecto todos)'
+        )
+
+    def handle(self, *args, **options):
+        total = recalcular(options['usuarios'] or None)
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} contadores recalculados'))
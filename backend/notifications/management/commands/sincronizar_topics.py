@@ -0,0 +1,31 @@
+"""
+Comando para alinear las suscripciones a topics de FCM con usuarios y tokens.
+
+Uso:
+    python manage.py sincronizar_topics [--usuarios 1 2 3]
+
+    Los cambios de rol y de tokens se sincronizan solos; este comando sirve
+    para la carga inicial o para corregir diferencias.
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.topics import sincronizar_topics
+
+
+class Command(BaseCommand):
+    help = 'Suscribe y desuscribe tokens de los topics que les corresponden'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuarios',
+            nargs='*',
+            type=int,
+            help='IDs de usuarios a sincronizar (por defecto todos)'
+        )
+
+    def handle(self, *args, **options):
+        resultado = sincronizar_topics(options['usuarios'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['altas']} altas, {resultado['bajas']} bajas, "
+            f"{resultado['fallidas']} fallidas"
+        ))
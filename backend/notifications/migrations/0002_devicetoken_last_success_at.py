@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicetoken',
+            name='last_success_at',
+            field=models.DateTimeField(blank=True, help_text='Se usa para purgar tokens sin uso', null=True, verbose_name='Último envío exitoso'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_devicetoken_last_success_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionAgrupada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destino', models.CharField(help_text="'usuario:<id>' o 'admins'", max_length=50, verbose_name='Destino')),
+                ('tipo', models.CharField(choices=[('info', 'Información'), ('promo', 'Promoción'), ('pedido', 'Pedido'), ('mensaje', 'Mensaje'), ('alerta', 'Alerta'), ('sistema', 'Sistema')], default='info', max_length=20, verbose_name='Tipo')),
+                ('titulo', models.CharField(max_length=100, verbose_name='Título')),
+                ('mensaje', models.TextField(verbose_name='Mensaje')),
+                ('data', models.JSONField(blank=True, null=True, verbose_name='Datos adicionales')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de envío')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Notificación agrupada',
+                'verbose_name_plural': 'Notificaciones agrupadas',
+                'db_table': 'notificaciones_agrupadas',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['destino', 'tipo', 'sent_at'], name='notificacio_destino_d0a168_idx'), models.Index(fields=['destino', 'sent_at'], name='notificacio_destino_2a0121_idx')],
+            },
+        ),
+    ]
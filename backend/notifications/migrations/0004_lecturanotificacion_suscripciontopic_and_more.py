@@ -0,0 +1,77 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notificacionagrupada'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LecturaNotificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de lectura')),
+            ],
+            options={
+                'verbose_name': 'Lectura de notificación',
+                'verbose_name_plural': 'Lecturas de notificaciones',
+                'db_table': 'lecturas_notificaciones',
+            },
+        ),
+        migrations.CreateModel(
+            name='SuscripcionTopic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=100, verbose_name='Topic')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de suscripción')),
+            ],
+            options={
+                'verbose_name': 'Suscripción a topic',
+                'verbose_name_plural': 'Suscripciones a topics',
+                'db_table': 'suscripciones_topic',
+            },
+        ),
+        migrations.AddField(
+            model_name='devicetoken',
+            name='recibir_promos',
+            field=models.BooleanField(default=True, help_text='Suscribe el dispositivo al topic de promociones', verbose_name='Recibir promociones'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['topic', 'created_at'], name='notificatio_topic_aceb6b_idx'),
+        ),
+        migrations.AddField(
+            model_name='lecturanotificacion',
+            name='notification',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas', to='notifications.notification', verbose_name='Notificación'),
+        ),
+        migrations.AddField(
+            model_name='lecturanotificacion',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas_notificaciones', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AddField(
+            model_name='suscripciontopic',
+            name='token',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suscripciones', to='notifications.devicetoken', verbose_name='Token'),
+        ),
+        migrations.AddConstraint(
+            model_name='lecturanotificacion',
+            constraint=models.UniqueConstraint(fields=('notification', 'user'), name='lectura_notificacion_usuario_unica'),
+        ),
+        migrations.AddIndex(
+            model_name='suscripciontopic',
+            index=models.Index(fields=['topic'], name='suscripcion_topic_8d8495_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='suscripciontopic',
+            constraint=models.UniqueConstraint(fields=('token', 'topic'), name='suscripcion_token_topic_unica'),
+        ),
+    ]
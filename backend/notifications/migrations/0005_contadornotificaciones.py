@@ -0,0 +1,31 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_lecturanotificacion_suscripciontopic_and_more'),
+        ('users', '0002_remove_duplicate_date_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNotificaciones',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contador_notificaciones', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+                ('no_leidas', models.PositiveIntegerField(default=0, verbose_name='No leídas')),
+                ('topics_leidos_hasta', models.DateTimeField(blank=True, help_text='Última vez que el usuario marcó todo como leído', null=True, verbose_name='Topics leídos hasta')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Última actualización')),
+            ],
+            options={
+                'verbose_name': 'Contador de notificaciones',
+                'verbose_name_plural': 'Contadores de notificaciones',
+                'db_table': 'contadores_notificaciones',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.particiones import convertir_a_particionada
+
+
+def particionar(apps, schema_editor):
+    convertir_a_particionada(schema_editor, 'notifications')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_contadornotificaciones'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lecturanotificacion',
+            name='notification',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='lecturas', to='notifications.notification', verbose_name='Notificación'),
+        ),
+        # Solo PostgreSQL; en otras bases no hace nada
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
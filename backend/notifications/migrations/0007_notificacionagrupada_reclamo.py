@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-19 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_particionar_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacionagrupada',
+            name='reclamo',
+            field=models.CharField(blank=True, help_text='Envío que reclamó la notificación (vacío si aún no se intentó)', max_length=32, verbose_name='Resumen'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-19 05:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_notificacionagrupada_reclamo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaTopic',
+            fields=[
+                ('topic', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Topic')),
+                ('enviadas', models.PositiveBigIntegerField(default=0, verbose_name='Enviadas')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Último envío')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de topic',
+                'verbose_name_plural': 'Secuencias de topics',
+                'db_table': 'secuencias_topic',
+            },
+        ),
+        migrations.AddField(
+            model_name='contadornotificaciones',
+            name='topics_vistos',
+            field=models.JSONField(blank=True, default=dict, help_text='Secuencia de cada topic ya incluida en no_leidas', verbose_name='Topics vistos'),
+        ),
+        migrations.AlterField(
+            model_name='contadornotificaciones',
+            name='no_leidas',
+            field=models.IntegerField(default=0, verbose_name='No leídas'),
+        ),
+    ]
@@ -44,6 +44,17 @@ class DeviceToken(models.Model):
         verbose_name='Activo',
         help_text='Desactivar si el token ya no es válido'
     )
+    recibir_promos = models.BooleanField(
+        default=True,
+        verbose_name='Recibir promociones',
+        help_text='Suscribe el dispositivo al topic de promociones'
+    )
+    last_success_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Último envío exitoso',
+        help_text='Se usa para purgar tokens sin uso'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Fecha de registro'
@@ -71,6 +82,9 @@ class Notification(models.Model):
     """
     Registro de notificaciones enviadas
     Útil para auditoría y reenvío
+
+    En PostgreSQL la tabla está particionada por mes de created_at
+    (ver core.particiones y el comando aplicar_retencion).
     """
     TIPO_CHOICES = [
         ('info', 'Información'),
@@ -165,12 +179,26 @@ class Notification(models.Model):
             models.Index(fields=['user', 'estado']),
             models.Index(fields=['tipo', 'estado']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['topic', 'created_at']),
         ]
 
     def __str__(self):
         recipient = self.topic if self.topic else (self.user.email if self.user else 'Sin destinatario')
         return f'{self.titulo} - {recipient} ({self.estado})'
 
+    @staticmethod
+    def fecha_minima_visible():
+        """
+        Fecha desde la que la API y el admin muestran notificaciones
+
+        Limitar las consultas a este rango hace que PostgreSQL solo lea las
+        particiones recientes.
+        """
+        from datetime import timedelta
+
+        dias = getattr(settings, 'NOTIFICACIONES_DIAS_VISIBLES', 90)
+        return timezone.now() - timedelta(days=dias)
+
     def mark_as_sent(self, message_id):
         """Marca la notificación como enviada"""
         self.estado = 'enviada'
@@ -189,3 +217,219 @@ class Notification(models.Model):
         self.estado = 'leida'
         self.read_at = timezone.now()
         self.save(update_fields=['estado', 'read_at'])
+
+
+class ContadorNotificaciones(models.Model):
+    """
+    Contador de notificaciones no leídas por usuario
+
+    Se actualiza al enviar y al leer para que el badge de la app no tenga que
+    contar filas de Notification. Las notificaciones de topics no se suman
+    aquí al enviarlas: al leer el badge se compara la secuencia de cada topic
+    (SecuenciaTopic) con la vista por el usuario (topics_vistos).
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='contador_notificaciones',
+        verbose_name='Usuario'
+    )
+    # Puede quedar negativo: las lecturas de topics se descuentan aquí y las
+    # pendientes de topics se suman al leer el badge
+    no_leidas = models.IntegerField(
+        default=0,
+        verbose_name='No leídas'
+    )
+    topics_leidos_hasta = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Topics leídos hasta',
+        help_text='Última vez que el usuario marcó todo como leído'
+    )
+    topics_vistos = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Topics vistos',
+        help_text='Secuencia de cada topic ya incluida en no_leidas'
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Última actualización'
+    )
+
+    class Meta:
+        db_table = 'contadores_notificaciones'
+        verbose_name = 'Contador de notificaciones'
+        verbose_name_plural = 'Contadores de notificaciones'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.no_leidas} no leídas'
+
+
+class SecuenciaTopic(models.Model):
+    """
+    Envíos realizados a un topic
+
+    Un envío a un topic es un UPDATE de esta fila; cada usuario compara la
+    secuencia con la que ya tiene vista al leer su badge.
+    """
+    topic = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Topic'
+    )
+    enviadas = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Enviadas'
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Último envío'
+    )
+
+    class Meta:
+        db_table = 'secuencias_topic'
+        verbose_name = 'Secuencia de topic'
+        verbose_name_plural = 'Secuencias de topics'
+
+    def __str__(self):
+        return f'{self.topic}: {self.enviadas} enviadas'
+
+
+class SuscripcionTopic(models.Model):
+    """
+    Suscripción de un dispositivo a un topic de Firebase
+
+    Refleja lo que se suscribió en FCM para poder calcular altas y bajas
+    sin consultar a Firebase.
+    """
+    token = models.ForeignKey(
+        DeviceToken,
+        on_delete=models.CASCADE,
+        related_name='suscripciones',
+        verbose_name='Token'
+    )
+    topic = models.CharField(
+        max_length=100,
+        verbose_name='Topic'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de suscripción'
+    )
+
+    class Meta:
+        db_table = 'suscripciones_topic'
+        verbose_name = 'Suscripción a topic'
+        verbose_name_plural = 'Suscripciones a topics'
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'topic'], name='suscripcion_token_topic_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['topic']),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} - {self.token}'
+
+
+class LecturaNotificacion(models.Model):
+    """
+    Lectura de una notificación enviada a un topic
+
+    Las notificaciones a topics se guardan una sola vez; cada usuario que la
+    lee deja aquí su registro en lugar de tener una fila propia.
+    """
+    # Sin restricción en la base: notifications está particionada y PostgreSQL
+    # no admite FKs hacia ella sin incluir la columna de partición
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='lecturas',
+        verbose_name='Notificación'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='lecturas_notificaciones',
+        verbose_name='Usuario'
+    )
+    read_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de lectura'
+    )
+
+    class Meta:
+        db_table = 'lecturas_notificaciones'
+        verbose_name = 'Lectura de notificación'
+        verbose_name_plural = 'Lecturas de notificaciones'
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'user'], name='lectura_notificacion_usuario_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} leyó {self.notification_id}'
+
+
+class NotificacionAgrupada(models.Model):
+    """
+    Notificación retenida para agruparla con otras del mismo destino y tipo
+
+    Las pendientes (sent_at vacío) se envían juntas como un resumen al cerrar
+    la ventana de agrupación. Las enviadas se conservan una hora para aplicar
+    el límite de envíos por destino. `reclamo` identifica el resumen en que
+    salieron (se guarda también en la data de la Notification enviada).
+    """
+    destino = models.CharField(
+        max_length=50,
+        verbose_name='Destino',
+        help_text="'usuario:<id>' o 'admins'"
+    )
+    tipo = models.CharField(
+        max_length=20,
+        choices=Notification.TIPO_CHOICES,
+        default='info',
+        verbose_name='Tipo'
+    )
+    titulo = models.CharField(
+        max_length=100,
+        verbose_name='Título'
+    )
+    mensaje = models.TextField(
+        verbose_name='Mensaje'
+    )
+    data = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Datos adicionales'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Fecha de envío'
+    )
+    reclamo = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name='Resumen',
+        help_text='Envío que reclamó la notificación (vacío si aún no se intentó)'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de creación'
+    )
+
+    class Meta:
+        db_table = 'notificaciones_agrupadas'
+        verbose_name = 'Notificación agrupada'
+        verbose_name_plural = 'Notificaciones agrupadas'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['destino', 'tipo', 'sent_at']),
+            models.Index(fields=['destino', 'sent_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.titulo} - {self.destino} ({"enviada" if self.sent_at else "pendiente"})'
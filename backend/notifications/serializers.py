@@ -10,7 +10,7 @@ class DeviceTokenSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = DeviceToken
-        fields = ['id', 'token', 'device_type', 'device_name', 'is_active', 'created_at']
+        fields = ['id', 'token', 'device_type', 'device_name', 'is_active', 'recibir_promos', 'created_at']
         read_only_fields = ['id', 'created_at']
 
     def create(self, validated_data):
@@ -21,15 +21,20 @@ class DeviceTokenSerializer(serializers.ModelSerializer):
         token = validated_data['token']
         user = self.context['request'].user
         
+        defaults = {
+            'user': user,
+            'device_type': validated_data.get('device_type', 'android'),
+            'device_name': validated_data.get('device_name', ''),
+            'is_active': True,
+        }
+        # Al re-registrar no se pisa la preferencia de promociones si no viene
+        if 'recibir_promos' in validated_data:
+            defaults['recibir_promos'] = validated_data['recibir_promos']
+
         # Buscar si el token ya existe
         device_token, created = DeviceToken.objects.update_or_create(
             token=token,
-            defaults={
-                'user': user,
-                'device_type': validated_data.get('device_type', 'android'),
-                'device_name': validated_data.get('device_name', ''),
-                'is_active': True,
-            }
+            defaults=defaults
         )
         
         return device_token
@@ -52,6 +57,13 @@ class NotificationSerializer(serializers.ModelSerializer):
             'sent_at', 'read_at', 'created_at'
         ]
 
+    def to_representation(self, instance):
+        """Las notificaciones de topics muestran la lectura del usuario actual"""
+        data = super().to_representation(instance)
+        if instance.user_id is None and getattr(instance, 'leida_por_usuario', False):
+            data['estado'] = 'leida'
+        return data
+
 
 class SendNotificationSerializer(serializers.Serializer):
     """Serializer para enviar notificaciones"""
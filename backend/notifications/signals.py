@@ -0,0 +1,42 @@
+"""
+Signals para mantener sincronizados los topics de FCM
+Un cambio de rol, de staff o de estado del usuario resuscribe sus tokens
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+User = get_user_model()
+
+CAMPOS_TOPICS = ('rol', 'rol_id', 'is_staff', 'is_active')
+
+
+def _estado_topics(usuario):
+    return (usuario.rol_id, usuario.is_staff, usuario.is_active)
+
+
+@receiver(pre_save, sender=User)
+def usuario_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Guardar los campos que determinan los topics antes de guardar"""
+    instance._estado_topics_anterior = None
+    if not instance.pk:
+        return
+    # Guardados parciales ajenos (p. ej. last_login) no cambian los topics
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_TOPICS):
+        return
+
+    anterior = User.objects.filter(pk=instance.pk).only('rol', 'is_staff', 'is_active').first()
+    if anterior:
+        instance._estado_topics_anterior = _estado_topics(anterior)
+
+
+@receiver(post_save, sender=User)
+def usuario_post_save(sender, instance, created, **kwargs):
+    """Encolar la sincronización de topics si cambió rol, staff o estado"""
+    anterior = getattr(instance, '_estado_topics_anterior', None)
+    if created or anterior is None or anterior == _estado_topics(instance):
+        return
+
+    from .tareas import sincronizar_topics
+
+    sincronizar_topics.encolar(usuario_ids=[instance.pk])
@@ -0,0 +1,143 @@
+"""
+Tareas en segundo plano para el envío de notificaciones push
+
+Los módulos encolan estas tareas en lugar de llamar a Firebase dentro del
+request. Reciben IDs y recargan los objetos al ejecutarse; si el objeto ya
+no existe la tarea termina sin hacer nada.
+"""
+
+import logging
+
+from tareas.registro import tarea
+
+logger = logging.getLogger(__name__)
+
+
+@tarea("notificaciones.nuevo_pedido", concurrencia=4)
+def nuevo_pedido(pedido_id):
+    from ventas.models import Pedido
+    from .utils import notificar_nuevo_pedido
+
+    pedido = Pedido.objects.select_related("usuario").filter(id=pedido_id).first()
+    if pedido:
+        notificar_nuevo_pedido(pedido)
+
+
+@tarea("notificaciones.cambio_estado_pedido", concurrencia=4)
+def cambio_estado_pedido(pedido_id, estado_anterior, estado_nuevo):
+    from ventas.models import Pedido
+    from .utils import notificar_cambio_estado_pedido
+
+    pedido = Pedido.objects.select_related("usuario").filter(id=pedido_id).first()
+    if pedido:
+        notificar_cambio_estado_pedido(pedido, estado_anterior, estado_nuevo)
+
+
+@tarea("notificaciones.cambio_estado_pedidos", concurrencia=2)
+def cambio_estado_pedidos(pedidos, estado_nuevo):
+    from .utils import notificar_cambio_estado_pedidos
+
+    notificar_cambio_estado_pedidos(pedidos, estado_nuevo)
+
+
+@tarea("notificaciones.login_exitoso", max_intentos=2, concurrencia=4)
+def login_exitoso(usuario_id, dispositivo_info=None):
+    from django.contrib.auth import get_user_model
+    from .utils import notificar_login_exitoso
+
+    usuario = get_user_model().objects.filter(id=usuario_id).first()
+    if usuario:
+        notificar_login_exitoso(usuario, dispositivo_info)
+
+
+@tarea("notificaciones.pago_exitoso", concurrencia=4)
+def pago_exitoso(transaccion_id):
+    from pagos.models import TransaccionPago
+    from .utils import notificar_pago_exitoso
+
+    transaccion = (
+        TransaccionPago.objects.select_related("pedido__usuario")
+        .filter(id=transaccion_id)
+        .first()
+    )
+    if transaccion:
+        notificar_pago_exitoso(transaccion)
+
+
+@tarea("notificaciones.pago_fallido", concurrencia=4)
+def pago_fallido(transaccion_id, error_mensaje=None):
+    from pagos.models import TransaccionPago
+    from .utils import notificar_pago_fallido
+
+    transaccion = (
+        TransaccionPago.objects.select_related("pedido__usuario")
+        .filter(id=transaccion_id)
+        .first()
+    )
+    if transaccion:
+        notificar_pago_fallido(transaccion, error_mensaje)
+
+
+@tarea("notificaciones.nuevo_producto", concurrencia=2)
+def nuevo_producto(producto_id, creado_por_id=None):
+    from django.contrib.auth import get_user_model
+    from productos.models import Producto
+    from .utils import notificar_nuevo_producto
+
+    producto = Producto.objects.select_related("categoria").filter(id=producto_id).first()
+    if not producto:
+        return
+    creado_por = None
+    if creado_por_id:
+        creado_por = get_user_model().objects.filter(id=creado_por_id).first()
+    notificar_nuevo_producto(producto, creado_por)
+
+
+@tarea("notificaciones.stock_producto", concurrencia=2)
+def stock_producto(producto_id, evento, stock_anterior, stock_actual):
+    """
+    Avisar un cambio de stock relevante
+
+    Args:
+        evento: 'sin_stock' | 'bajo_stock' | 'restaurado'
+    """
+    from productos.models import Producto
+    from .utils import (
+        notificar_producto_bajo_stock,
+        notificar_producto_sin_stock,
+        notificar_stock_restaurado,
+    )
+
+    producto = Producto.objects.select_related("categoria").filter(id=producto_id).first()
+    if not producto:
+        return
+
+    if evento == "sin_stock":
+        notificar_producto_sin_stock(producto)
+    elif evento == "bajo_stock":
+        notificar_producto_bajo_stock(producto, stock_actual)
+    elif evento == "restaurado":
+        notificar_stock_restaurado(producto, stock_anterior, stock_actual)
+    else:
+        logger.warning(f"Evento de stock desconocido: {evento}")
+
+
+@tarea("notificaciones.vaciar_agrupadas", concurrencia=4)
+def vaciar_agrupadas(destino, tipo_notificacion):
+    from .agrupacion import vaciar
+
+    vaciar(destino, tipo_notificacion)
+
+
+@tarea("notificaciones.sincronizar_topics", concurrencia=2)
+def sincronizar_topics(usuario_ids=None):
+    from .topics import sincronizar_topics as sincronizar
+
+    sincronizar(usuario_ids)
+
+
+@tarea("notificaciones.desuscribir_token", max_intentos=3)
+def desuscribir_token(token, topics):
+    from .topics import desuscribir_token as desuscribir
+
+    desuscribir(token, topics)
@@ -0,0 +1,611 @@
+from datetime import timedelta
+import asyncio
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.particiones import crear_particion, esta_particionada, particiones
+from core.retencion import aplicar_politica
+from tareas.models import Tarea
+from users.models import Rol
+from tareas.worker import drenar
+
+from .agrupacion import DESTINO_ADMINS, agrupar, destino_usuario, vaciar
+from .envio import (
+    MAX_TOKENS_MULTICAST,
+    TransporteFalso,
+    enviar_a_usuarios,
+    purgar_tokens_inactivos,
+)
+from .contadores import badge, incrementar, no_leidas
+from .eventos import OyenteBadge, obtener_oyente
+from .models import (
+    ContadorNotificaciones,
+    DeviceToken,
+    LecturaNotificacion,
+    NotificacionAgrupada,
+    Notification,
+    SuscripcionTopic,
+)
+from .topics import MAX_TOKENS_TOPIC, sincronizar_topics, topic_rol
+from .views import _stream_no_leidas_async
+from .utils import notificar_admins, notificar_promocion_masiva, notificar_topic, notificar_usuario
+
+User = get_user_model()
+
+
+@override_settings(NOTIFICACIONES_TRANSPORTE="notifications.envio.TransporteFalso")
+class EnvioNotificacionesTest(TestCase):
+    """Tests para el pipeline de envío en lote"""
+
+    def setUp(self):
+        TransporteFalso.reiniciar()
+        self.usuarios = [
+            User.objects.create_user(
+                username=f"usuario{i}", email=f"usuario{i}@test.com", password="clave123"
+            )
+            for i in range(3)
+        ]
+        DeviceToken.objects.create(user=self.usuarios[0], token="token-a1")
+        DeviceToken.objects.create(user=self.usuarios[0], token="token-a2")
+        DeviceToken.objects.create(user=self.usuarios[1], token="token-b1")
+
+    def test_envio_en_lote(self):
+        """Un solo multicast y un registro por usuario con tokens"""
+        ids = [u.id for u in self.usuarios]
+
+        # tokens + INSERT + last_success_at + UPDATE + UPDATE de contadores + NOTIFY
+        with self.assertNumQueries(6):
+            resultado = enviar_a_usuarios(ids, "Hola", "Mensaje", data={"id": 1})
+
+        self.assertEqual(resultado["enviados"], 2)
+        self.assertEqual(resultado["fallidos"], 1)
+        self.assertEqual(resultado["detalle"][self.usuarios[0].id]["sent_to"], 2)
+        self.assertEqual(resultado["detalle"][self.usuarios[2].id]["error"], "Usuario sin tokens")
+        self.assertEqual(len(TransporteFalso.enviados), 1)
+        self.assertEqual(TransporteFalso.enviados[0]["data"], {"id": "1"})
+        self.assertEqual(Notification.objects.filter(estado="enviada").count(), 2)
+
+    def test_lotes_de_500_tokens(self):
+        """Los tokens se reparten en lotes de como máximo 500"""
+        DeviceToken.objects.bulk_create(
+            DeviceToken(user=self.usuarios[2], token=f"token-c{i}") for i in range(1100)
+        )
+
+        resultado = enviar_a_usuarios([self.usuarios[2].id], "Hola", "Mensaje")
+
+        self.assertEqual(resultado["enviados"], 1)
+        tamanos = sorted(len(lote["tokens"]) for lote in TransporteFalso.enviados)
+        self.assertEqual(tamanos, [100, MAX_TOKENS_MULTICAST, MAX_TOKENS_MULTICAST])
+
+    def test_usuario_sin_envios_exitosos(self):
+        """Si fallan todos los tokens de un usuario su notificación queda fallida"""
+        TransporteFalso.tokens_fallidos = {"token-b1": "internal"}
+
+        resultado = enviar_a_usuarios(
+            [self.usuarios[0].id, self.usuarios[1].id], "Hola", "Mensaje"
+        )
+
+        self.assertEqual(resultado["enviados"], 1)
+        notificacion = Notification.objects.get(user=self.usuarios[1])
+        self.assertEqual(notificacion.estado, "fallida")
+
+    def test_notificar_usuario_y_admins(self):
+        """Las funciones de utils usan el pipeline"""
+        self.usuarios[1].is_staff = True
+        self.usuarios[1].save()
+
+        self.assertTrue(notificar_usuario(self.usuarios[0], "Hola", "Mensaje"))
+        self.assertFalse(notificar_usuario(self.usuarios[2], "Hola", "Mensaje"))
+        self.assertTrue(notificar_admins("Alerta", "Stock bajo"))
+
+        self.assertEqual(TransporteFalso.enviados_topic[0]["topic"], "admins")
+
+
+@override_settings(NOTIFICACIONES_TRANSPORTE="notifications.envio.TransporteFalso")
+class TokensInvalidosTest(TestCase):
+    """Tests para la limpieza de tokens muertos"""
+
+    def setUp(self):
+        TransporteFalso.reiniciar()
+        self.usuario = User.objects.create_user(
+            username="usuario", email="usuario@test.com", password="clave123"
+        )
+        self.token_ok = DeviceToken.objects.create(user=self.usuario, token="token-ok")
+        self.token_muerto = DeviceToken.objects.create(user=self.usuario, token="token-muerto")
+
+    def test_desactiva_tokens_no_registrados(self):
+        """Los tokens UNREGISTERED se desactivan y los exitosos registran su uso"""
+        TransporteFalso.tokens_fallidos = {"token-muerto": "UNREGISTERED"}
+
+        enviar_a_usuarios([self.usuario.id], "Hola", "Mensaje")
+
+        self.token_ok.refresh_from_db()
+        self.token_muerto.refresh_from_db()
+        self.assertTrue(self.token_ok.is_active)
+        self.assertIsNotNone(self.token_ok.last_success_at)
+        self.assertFalse(self.token_muerto.is_active)
+
+    def test_invalid_argument_en_todo_el_lote(self):
+        """Si todo el lote falla con INVALID_ARGUMENT no se culpa a los tokens"""
+        TransporteFalso.tokens_fallidos = {
+            "token-ok": "INVALID_ARGUMENT",
+            "token-muerto": "INVALID_ARGUMENT",
+        }
+
+        enviar_a_usuarios([self.usuario.id], "Hola", "Mensaje")
+
+        self.assertEqual(DeviceToken.objects.filter(is_active=True).count(), 2)
+
+    def test_purgar_tokens_sin_uso(self):
+        """Se eliminan los tokens sin envíos exitosos en el período"""
+        hace_90_dias = timezone.now() - timedelta(days=90)
+        DeviceToken.objects.filter(id=self.token_muerto.id).update(
+            last_success_at=hace_90_dias, updated_at=hace_90_dias
+        )
+        # Re-registrado por la app hace poco, con el último éxito antiguo
+        reregistrado = DeviceToken.objects.create(user=self.usuario, token="token-reregistrado")
+        DeviceToken.objects.filter(id=reregistrado.id).update(last_success_at=hace_90_dias)
+
+        self.assertEqual(purgar_tokens_inactivos(dias=60, simular=True), 1)
+        call_command("purgar_tokens", dias=60, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(DeviceToken.objects.values_list("token", flat=True)), ["token-ok", "token-reregistrado"]
+        )
+
+
+@override_settings(
+    NOTIFICACIONES_TRANSPORTE="notifications.envio.TransporteFalso",
+    NOTIFICACIONES_VENTANA_AGRUPACION=60,
+    NOTIFICACIONES_MAX_POR_HORA=2,
+)
+class AgrupacionNotificacionesTest(TestCase):
+    """Tests para la agrupación y el límite de envíos por destino"""
+
+    def setUp(self):
+        TransporteFalso.reiniciar()
+        self.usuario = User.objects.create_user(
+            username="usuario", email="usuario@test.com", password="clave123"
+        )
+        DeviceToken.objects.create(user=self.usuario, token="token-u")
+        self.destino = destino_usuario(self.usuario.id)
+
+    def _pendientes(self):
+        return NotificacionAgrupada.objects.filter(sent_at__isnull=True).count()
+
+    def test_primera_sale_y_siguientes_se_agrupan(self):
+        """La primera se envía; las de la ventana salen en un solo resumen"""
+        agrupar(self.destino, "Pedido", "Pedido 1 enviado", tipo="pedido")
+        drenar()
+        self.assertEqual(len(TransporteFalso.enviados), 1)
+
+        for i in range(2, 6):
+            agrupar(self.destino, "Pedido", f"Pedido {i} enviado", tipo="pedido")
+        drenar()
+
+        # Ventana abierta: nada más enviado y un único vaciado programado
+        self.assertEqual(len(TransporteFalso.enviados), 1)
+        self.assertEqual(self._pendientes(), 4)
+        programadas = Tarea.objects.filter(
+            tipo="notificaciones.vaciar_agrupadas", estado="PENDIENTE"
+        )
+        self.assertEqual(programadas.count(), 1)
+
+        NotificacionAgrupada.objects.exclude(sent_at=None).update(
+            sent_at=timezone.now() - timedelta(minutes=2)
+        )
+        drenar(incluir_programadas=True)
+
+        self.assertEqual(len(TransporteFalso.enviados), 2)
+        resumen = TransporteFalso.enviados[1]
+        self.assertEqual(resumen["titulo"], "📦 4 actualizaciones de pedidos")
+        self.assertIn("Pedido 5 enviado", resumen["mensaje"])
+        self.assertIn("y 1 más", resumen["mensaje"])
+        self.assertEqual(Notification.objects.filter(user=self.usuario).count(), 2)
+
+    def test_limite_por_hora(self):
+        """Alcanzado el límite las notificaciones esperan en el buffer"""
+        hace_media_hora = timezone.now() - timedelta(minutes=30)
+        for i in range(2):
+            NotificacionAgrupada.objects.create(
+                destino=self.destino,
+                tipo="alerta",
+                titulo="Aviso",
+                mensaje=f"Aviso {i}",
+                sent_at=hace_media_hora - timedelta(minutes=i),
+            )
+        agrupar(self.destino, "Login", "Nuevo inicio de sesión", tipo="sistema")
+
+        self.assertEqual(vaciar(self.destino, "sistema"), 0)
+        self.assertEqual(TransporteFalso.enviados, [])
+        self.assertEqual(self._pendientes(), 1)
+
+    def test_envio_fuera_de_la_transaccion(self):
+        """El envío corre sin locks y, si falla, las notificaciones quedan para el reintento"""
+        agrupar(self.destino, "Login", "Nuevo inicio de sesión", tipo="sistema")
+        bloques = len(connection.atomic_blocks)
+
+        def enviar(*args):
+            # Ya reclamadas y fuera del atomic de vaciar()
+            self.assertEqual(len(connection.atomic_blocks), bloques)
+            self.assertEqual(self._pendientes(), 0)
+            raise RuntimeError("FCM no disponible")
+
+        with mock.patch("notifications.agrupacion._enviar", enviar):
+            with self.assertRaises(RuntimeError):
+                vaciar(self.destino, "sistema")
+        self.assertEqual(self._pendientes(), 1)
+
+        self.assertEqual(vaciar(self.destino, "sistema"), 1)
+        self.assertEqual(len(TransporteFalso.enviados), 1)
+        self.assertEqual(self._pendientes(), 0)
+
+    def test_reintento_no_duplica_lo_ya_guardado(self):
+        """Si el intento fallido ya guardó la Notification el reintento no la repite"""
+        agrupar(self.destino, "Login", "Nuevo inicio de sesión", tipo="sistema")
+
+        with mock.patch("notifications.envio.enviar_tokens", side_effect=RuntimeError("FCM cortado")):
+            with self.assertRaises(RuntimeError):
+                vaciar(self.destino, "sistema")
+        self.assertEqual(Notification.objects.filter(user=self.usuario).count(), 1)
+
+        # Lo que llega después no se mezcla con el resumen que se reintenta
+        agrupar(self.destino, "Login", "Otro inicio de sesión", tipo="sistema")
+        self.assertEqual(vaciar(self.destino, "sistema"), 1)
+        self.assertEqual(Notification.objects.filter(user=self.usuario).count(), 1)
+        self.assertEqual(TransporteFalso.enviados, [])
+        self.assertEqual(self._pendientes(), 1)
+
+    def test_purga_periodica_de_todos_los_destinos(self):
+        """Las enviadas hace más de una hora se eliminan aunque el destino no vuelva a vaciarse"""
+        hace_dos_horas = timezone.now() - timedelta(hours=2)
+        for destino in (self.destino, DESTINO_ADMINS, destino_usuario(999)):
+            NotificacionAgrupada.objects.create(
+                destino=destino, tipo="alerta", titulo="Aviso", mensaje="Viejo", sent_at=hace_dos_horas
+            )
+        reciente = NotificacionAgrupada.objects.create(
+            destino=self.destino, tipo="alerta", titulo="Aviso", mensaje="Reciente", sent_at=timezone.now()
+        )
+
+        call_command("purgar_tareas", stdout=StringIO())
+
+        self.assertEqual(list(NotificacionAgrupada.objects.values_list("id", flat=True)), [reciente.id])
+
+    def test_stock_para_admins(self):
+        """Las alertas de stock se envían agrupadas a los admins"""
+        self.usuario.is_staff = True
+        self.usuario.save()
+
+        agrupar(DESTINO_ADMINS, "Stock", "Producto A sin stock", tipo="alerta")
+        drenar()
+
+        self.assertEqual(len(TransporteFalso.enviados_topic), 1)
+        self.assertEqual(TransporteFalso.enviados_topic[0]["topic"], "admins")
+
+
+@override_settings(NOTIFICACIONES_TRANSPORTE="notifications.envio.TransporteFalso")
+class TopicsTest(APITestCase):
+    """Tests para la suscripción a topics y la lectura diferida"""
+
+    def setUp(self):
+        TransporteFalso.reiniciar()
+        self.rol = Rol.objects.create(nombre="Conductor")
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@test.com", password="clave123",
+            is_staff=True, rol=self.rol,
+        )
+        self.cliente = User.objects.create_user(
+            username="cliente", email="cliente@test.com", password="clave123"
+        )
+        DeviceToken.objects.create(user=self.admin, token="token-admin")
+        DeviceToken.objects.create(user=self.cliente, token="token-cliente", recibir_promos=False)
+
+    def _topics(self, token):
+        return set(
+            SuscripcionTopic.objects.filter(token__token=token).values_list("topic", flat=True)
+        )
+
+    def test_sincronizar_y_cambio_de_rol(self):
+        """Los tokens siguen los topics de su usuario"""
+        sincronizar_topics()
+
+        self.assertEqual(
+            self._topics("token-admin"),
+            {"all_users", "admins", "promos", topic_rol(self.rol.id)},
+        )
+        self.assertEqual(self._topics("token-cliente"), {"all_users"})
+
+        # Quitar staff encola la sincronización del usuario
+        self.admin.is_staff = False
+        self.admin.save()
+        drenar()
+
+        self.assertNotIn("admins", self._topics("token-admin"))
+        self.assertEqual(
+            TransporteFalso.suscripciones[-1],
+            {"operacion": "baja", "topic": "admins", "tokens": ["token-admin"]},
+        )
+
+    def test_suscripcion_en_lotes(self):
+        """Cada llamada de suscripción lleva como máximo 1000 tokens"""
+        DeviceToken.objects.bulk_create(
+            DeviceToken(user=self.cliente, token=f"token-c{i}", recibir_promos=False)
+            for i in range(1500)
+        )
+
+        sincronizar_topics(usuario_ids=[self.cliente.id])
+
+        tamanos = sorted(len(s["tokens"]) for s in TransporteFalso.suscripciones)
+        self.assertEqual(tamanos, [501, MAX_TOKENS_TOPIC])
+
+    def test_broadcast_con_lectura_diferida(self):
+        """Una promoción es un solo envío y un solo registro"""
+        DeviceToken.objects.filter(user=self.cliente).update(recibir_promos=True)
+        self.assertTrue(notificar_promocion_masiva("Oferta", "50% de descuento"))
+
+        self.assertEqual(TransporteFalso.enviados_topic[0]["topic"], "promos")
+        self.assertEqual(Notification.objects.count(), 1)
+
+        self.client.force_authenticate(user=self.cliente)
+        respuesta = self.client.get("/api/notifications/my_notifications/")
+        self.assertEqual(respuesta.data["count"], 1)
+        notificacion_id = respuesta.data["notifications"][0]["id"]
+
+        self.client.post(f"/api/notifications/{notificacion_id}/mark_as_read/")
+        respuesta = self.client.get("/api/notifications/my_notifications/")
+        self.assertEqual(respuesta.data["count"], 0)
+        self.assertEqual(LecturaNotificacion.objects.count(), 1)
+
+        # Para el resto de usuarios sigue sin leer
+        self.client.force_authenticate(user=self.admin)
+        respuesta = self.client.get("/api/notifications/my_notifications/")
+        self.assertEqual(respuesta.data["count"], 1)
+
+
+@override_settings(NOTIFICACIONES_TRANSPORTE="notifications.envio.TransporteFalso")
+class ContadoresTest(APITestCase):
+    """Tests para el contador de no leídas y sus endpoints"""
+
+    def setUp(self):
+        TransporteFalso.reiniciar()
+        self.usuario = User.objects.create_user(
+            username="usuario", email="usuario@test.com", password="clave123"
+        )
+        DeviceToken.objects.create(user=self.usuario, token="token-u")
+        self.client.force_authenticate(user=self.usuario)
+
+    def _badge(self):
+        return self.client.get("/api/notifications/unread-count/").data["no_leidas"]
+
+    def test_contador_al_enviar_y_leer(self):
+        """El contador sube al enviar y baja al leer"""
+        enviar_a_usuarios([self.usuario.id], "Hola", "Mensaje 1")
+        enviar_a_usuarios([self.usuario.id], "Hola", "Mensaje 2")
+        self.assertEqual(self._badge(), 2)
+
+        notificacion = Notification.objects.filter(user=self.usuario).first()
+        self.client.post(f"/api/notifications/{notificacion.id}/mark_as_read/")
+        self.client.post(f"/api/notifications/{notificacion.id}/mark_as_read/")
+        self.assertEqual(self._badge(), 1)
+
+        # Las de topics se suman al contador de cada usuario del topic
+        notificar_promocion_masiva("Oferta", "50% de descuento")
+        notificar_promocion_masiva("Oferta", "2x1")
+        self.assertEqual(self._badge(), 3)
+
+        promo = Notification.objects.filter(user__isnull=True).first()
+        self.client.post(f"/api/notifications/{promo.id}/mark_as_read/")
+        self.client.post(f"/api/notifications/{promo.id}/mark_as_read/")
+        self.assertEqual(self._badge(), 2)
+
+        self.client.post("/api/notifications/mark_all_as_read/")
+        self.assertEqual(self._badge(), 0)
+
+    def test_badge_en_lecturas_por_clave(self):
+        """Un envío a un topic no escribe contadores; el badge lo suma al leerse"""
+        self.assertEqual(no_leidas(self.usuario), 0)
+        incrementar([self.usuario.id, self.usuario.id])
+        version = ContadorNotificaciones.objects.get(user=self.usuario).updated_at
+
+        notificar_promocion_masiva("Oferta", "50% de descuento")
+        self.assertEqual(ContadorNotificaciones.objects.get(user=self.usuario).updated_at, version)
+
+        with self.assertNumQueries(3):
+            self.assertEqual(no_leidas(self.usuario), 3)
+
+    def test_promos_respetan_la_preferencia(self):
+        """Sin dispositivos que acepten promociones no suben el badge ni se listan"""
+        DeviceToken.objects.filter(user=self.usuario).update(recibir_promos=False)
+        self.assertEqual(self._badge(), 0)
+
+        notificar_promocion_masiva("Oferta", "50% de descuento")
+        notificar_topic("all_users", "Aviso", "Para todos")
+        self.assertEqual(self._badge(), 1)
+        respuesta = self.client.get("/api/notifications/my_notifications/")
+        self.assertEqual([n["titulo"] for n in respuesta.data["notifications"]], ["Aviso"])
+
+        # Al volver a aceptarlas solo cuentan las siguientes
+        DeviceToken.objects.filter(user=self.usuario).update(recibir_promos=True)
+        self.assertEqual(self._badge(), 1)
+        notificar_promocion_masiva("Oferta", "2x1")
+        self.assertEqual(self._badge(), 2)
+
+    def test_recalcular_usuario_sin_contador(self):
+        """Los usuarios anteriores al contador lo obtienen en la primera consulta"""
+        Notification.objects.create(user=self.usuario, titulo="Hola", mensaje="Antigua", estado="enviada")
+        Notification.objects.create(topic="promos", titulo="Promo", mensaje="Antigua", estado="enviada")
+
+        self.assertEqual(no_leidas(self.usuario), 2)
+        self.assertTrue(ContadorNotificaciones.objects.filter(user=self.usuario).exists())
+
+        ContadorNotificaciones.objects.filter(user=self.usuario).update(no_leidas=7)
+        call_command("recalcular_contadores", stdout=StringIO())
+        self.assertEqual(no_leidas(self.usuario), 2)
+
+    def _siguiente_evento(self, partes):
+        for parte in partes:
+            parte = parte.decode() if isinstance(parte, bytes) else parte
+            if parte.startswith("id: "):
+                return parte
+        return None
+
+    @override_settings(
+        NOTIFICACIONES_SSE_ESCUCHAR=False, NOTIFICACIONES_SSE_LATIDO=0.01, NOTIFICACIONES_SSE_DURACION=1
+    )
+    def test_stream_sse(self):
+        """El stream queda abierto y envía un evento cuando cambia el badge"""
+        self.assertEqual(no_leidas(self.usuario), 0)
+        incrementar([self.usuario.id])
+
+        respuesta = self.client.get("/api/notifications/stream/", HTTP_ACCEPT="text/event-stream")
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(respuesta["Content-Type"], "text/event-stream")
+        partes = iter(respuesta.streaming_content)
+        self.assertIn(b"retry: ", next(partes))
+        evento = self._siguiente_evento(partes)
+        self.assertIn('event: no_leidas\ndata: {"no_leidas": 1}', evento)
+        version = evento.split("id: ")[1].split("\n")[0]
+
+        # Sin cambios solo hay latidos; el cambio llega por la misma conexión
+        self.assertEqual(next(partes), b": latido\n\n")
+        incrementar([self.usuario.id])
+        self.assertIn('data: {"no_leidas": 2}', self._siguiente_evento(partes))
+        # Pasada la duración el stream termina y el navegador reconecta
+        self.assertIsNone(self._siguiente_evento(partes))
+
+        # Al reconectar con Last-Event-ID no se repite el último evento
+        with override_settings(NOTIFICACIONES_SSE_DURACION=0.05):
+            incrementar([self.usuario.id])
+            total, version = badge(self.usuario)
+            reconexion = self.client.get(
+                "/api/notifications/stream/", HTTP_ACCEPT="text/event-stream", HTTP_LAST_EVENT_ID=version
+            )
+            contenido = b"".join(reconexion.streaming_content).decode()
+        self.assertNotIn("event:", contenido)
+        self.assertIn(": latido", contenido)
+
+    @override_settings(NOTIFICACIONES_SSE_ESCUCHAR=False, NOTIFICACIONES_SSE_LATIDO=5)
+    async def test_stream_sse_asgi(self):
+        """Bajo ASGI un aviso del oyente despierta el stream sin esperar el latido"""
+        await sync_to_async(no_leidas)(self.usuario)
+        stream = _stream_no_leidas_async(self.usuario, None)
+        await anext(stream)
+        self.assertIn('"no_leidas": 0', await anext(stream))
+
+        await sync_to_async(incrementar)([self.usuario.id])
+        obtener_oyente().despachar(str(self.usuario.id))
+        evento = await asyncio.wait_for(anext(stream), 1)
+        self.assertIn('"no_leidas": 1', evento)
+        await stream.aclose()
+
+    def test_oyente_reparte_avisos(self):
+        """Cada aviso despierta solo los streams de sus usuarios ("*" a todos)"""
+        oyente = OyenteBadge()
+        with override_settings(NOTIFICACIONES_SSE_ESCUCHAR=False):
+            propia = oyente.suscribir(self.usuario.id)
+            ajena = oyente.suscribir(self.usuario.id + 1)
+
+        oyente.despachar(f"{self.usuario.id},999")
+        self.assertTrue(propia.esperar(0))
+        self.assertFalse(ajena.esperar(0))
+
+        oyente.despachar("*")
+        self.assertTrue(propia.esperar(0))
+        self.assertTrue(ajena.esperar(0))
+
+        oyente.cancelar(propia)
+        oyente.despachar(str(self.usuario.id))
+        self.assertFalse(propia.esperar(0))
+
+
+@override_settings(NOTIFICACIONES_TRANSPORTE="notifications.envio.TransporteFalso")
+class RetencionNotificacionesTest(TestCase):
+    """Tests para el particionado y la retención de notificaciones"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(
+            username="usuario", email="usuario@test.com", password="clave123"
+        )
+        self.archivo = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archivo.cleanup)
+
+    def _crear_antiguas(self, fecha, cantidad):
+        crear_particion("notifications", fecha)
+        Notification.objects.bulk_create(
+            Notification(user=self.usuario, titulo="Vieja", mensaje=f"Mensaje {i}", estado="enviada")
+            for i in range(cantidad)
+        )
+        Notification.objects.filter(titulo="Vieja").update(created_at=fecha)
+        incrementar([self.usuario.id] * cantidad)
+
+    def test_tabla_particionada(self):
+        """La migración deja la tabla particionada por mes"""
+        self.assertTrue(esta_particionada("notifications"))
+        mes_actual = f"notifications_p{timezone.now():%Y%m}"
+        self.assertIn(mes_actual, [p[0] for p in particiones("notifications")])
+
+    def test_archiva_y_elimina_particion_vencida(self):
+        """Los meses vencidos se archivan en JSONL y su partición se elimina"""
+        hace_dos_anios = timezone.now() - timedelta(days=730)
+        self._crear_antiguas(hace_dos_anios, 3)
+        Notification.objects.create(user=self.usuario, titulo="Nueva", mensaje="Reciente", estado="enviada")
+        incrementar([self.usuario.id])
+
+        with override_settings(ARCHIVO_DIR=Path(self.archivo.name)):
+            resultados = aplicar_politica(
+                "notifications.Notification",
+                {"meses": 12, "al_purgar": "notifications.contadores.purgar_notificaciones"},
+            )
+
+        nombre = f"notifications_p{hace_dos_anios:%Y%m}"
+        self.assertEqual([(r["nombre"], r["filas"]) for r in resultados], [(nombre, 3)])
+        self.assertNotIn(nombre, [p[0] for p in particiones("notifications")])
+        self.assertEqual(list(Notification.objects.values_list("titulo", flat=True)), ["Nueva"])
+        self.assertEqual(no_leidas(self.usuario), 1)
+
+        with gzip.open(resultados[0]["archivo"], "rt", encoding="utf-8") as archivo:
+            filas = [json.loads(linea) for linea in archivo]
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[0]["user_id"], self.usuario.id)
+
+    def test_purga_de_topics_recalcula_contadores(self):
+        """Las notificaciones de topics purgadas dejan de contar en el badge"""
+        hace_dos_anios = timezone.now() - timedelta(days=730)
+        User.objects.filter(id=self.usuario.id).update(date_joined=hace_dos_anios - timedelta(days=1))
+        self.usuario.refresh_from_db()
+        crear_particion("notifications", hace_dos_anios)
+        Notification.objects.create(topic="all_users", titulo="Vieja", mensaje="Aviso", estado="enviada")
+        Notification.objects.filter(titulo="Vieja").update(created_at=hace_dos_anios)
+        self.assertEqual(no_leidas(self.usuario), 1)
+
+        with override_settings(ARCHIVO_DIR=Path(self.archivo.name)):
+            aplicar_politica(
+                "notifications.Notification",
+                {"meses": 12, "al_purgar": "notifications.contadores.purgar_notificaciones"},
+            )
+
+        self.assertEqual(no_leidas(self.usuario), 0)
+
+    def test_api_limitada_a_particiones_recientes(self):
+        """El listado de la API no muestra notificaciones fuera de la ventana visible"""
+        self._crear_antiguas(timezone.now() - timedelta(days=200), 1)
+        Notification.objects.create(user=self.usuario, titulo="Nueva", mensaje="Reciente", estado="enviada")
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get("/api/notifications/")
+
+        datos = respuesta.json()
+        titulos = [n["titulo"] for n in datos.get("results", datos)]
+        self.assertEqual(titulos, ["Nueva"])
@@ -0,0 +1,170 @@
+"""
+Topics de Firebase y sincronización de suscripciones
+
+Los envíos masivos (promociones, alertas a admins, avisos por rol) se hacen
+con una sola llamada a un topic en lugar de un multicast por usuario. Para
+eso cada token debe estar suscrito a los topics que le corresponden:
+
+    all_users   -> todo token activo de un usuario activo
+    admins      -> tokens de usuarios staff
+    rol_<id>    -> tokens de usuarios con ese rol
+    promos      -> tokens con recibir_promos activado
+
+SuscripcionTopic guarda lo suscrito en FCM; sincronizar_topics calcula la
+diferencia con lo esperado y la aplica en lotes de 1000 tokens.
+"""
+
+import logging
+from collections import defaultdict
+
+from .envio import obtener_transporte
+from .models import DeviceToken, SuscripcionTopic
+
+logger = logging.getLogger(__name__)
+
+TOPIC_TODOS = "all_users"
+TOPIC_ADMINS = "admins"
+TOPIC_PROMOS = "promos"
+
+# Firebase acepta como máximo 1000 tokens por llamada de (des)suscripción
+MAX_TOKENS_TOPIC = 1000
+
+
+def topic_rol(rol_id):
+    # Por id y no por nombre: renombrar un rol no obliga a resuscribir
+    return f"rol_{rol_id}"
+
+
+def topics_de_usuario(usuario, recibir_promos=True):
+    """
+    Topics que corresponden a un usuario
+
+    Args:
+        usuario: Instancia del modelo User
+        recibir_promos: Incluir el topic de promociones
+
+    Returns:
+        set: Nombres de los topics
+    """
+    if not usuario.is_active:
+        return set()
+
+    topics = {TOPIC_TODOS}
+    if usuario.is_staff:
+        topics.add(TOPIC_ADMINS)
+    if usuario.rol_id:
+        topics.add(topic_rol(usuario.rol_id))
+    if recibir_promos:
+        topics.add(TOPIC_PROMOS)
+    return topics
+
+
+def recibe_promos(usuario):
+    """
+    Preferencia de promociones del usuario
+
+    Las recibe si alguno de sus dispositivos activos las acepta; sin
+    dispositivos vale el valor por defecto de recibir_promos.
+
+    Returns:
+        bool
+    """
+    preferencias = list(
+        DeviceToken.objects.filter(user=usuario, is_active=True).values_list("recibir_promos", flat=True)
+    )
+    return not preferencias or any(preferencias)
+
+
+def topics_del_usuario(usuario):
+    """Topics del usuario según su rol y su preferencia de promociones"""
+    return topics_de_usuario(usuario, recibe_promos(usuario))
+
+
+def _por_topic(pares):
+    agrupados = defaultdict(list)
+    for token_id, topic in pares:
+        agrupados[topic].append(token_id)
+    return agrupados
+
+
+def _lotes(ids):
+    ids = sorted(ids)
+    for i in range(0, len(ids), MAX_TOKENS_TOPIC):
+        yield ids[i:i + MAX_TOKENS_TOPIC]
+
+
+def sincronizar_topics(usuario_ids=None):
+    """
+    Alinear las suscripciones de FCM con el rol y los tokens de los usuarios
+
+    Args:
+        usuario_ids: Usuarios a sincronizar (None = todos)
+
+    Returns:
+        dict: {'altas': int, 'bajas': int, 'fallidas': int}
+    """
+    tokens = DeviceToken.objects.select_related("user").only(
+        "id", "token", "is_active", "recibir_promos",
+        "user__is_active", "user__is_staff", "user__rol_id",
+    )
+    suscripciones = SuscripcionTopic.objects.all()
+    if usuario_ids is not None:
+        tokens = tokens.filter(user_id__in=usuario_ids)
+        suscripciones = suscripciones.filter(token__user_id__in=usuario_ids)
+
+    valor_token = {}
+    esperadas = set()
+    for device_token in tokens:
+        valor_token[device_token.id] = device_token.token
+        if device_token.is_active:
+            for topic in topics_de_usuario(device_token.user, device_token.recibir_promos):
+                esperadas.add((device_token.id, topic))
+
+    actuales = set(suscripciones.values_list("token_id", "topic"))
+    altas = esperadas - actuales
+    bajas = actuales - esperadas
+
+    transporte = obtener_transporte()
+    resultado = {"altas": 0, "bajas": 0, "fallidas": 0}
+
+    nuevas = []
+    for topic, ids in _por_topic(altas).items():
+        for lote in _lotes(ids):
+            fallidos = set(transporte.suscribir([valor_token[i] for i in lote], topic))
+            resultado["fallidas"] += len(fallidos)
+            nuevas.extend(
+                SuscripcionTopic(token_id=i, topic=topic)
+                for i in lote
+                if valor_token[i] not in fallidos
+            )
+    SuscripcionTopic.objects.bulk_create(nuevas, ignore_conflicts=True)
+    resultado["altas"] = len(nuevas)
+
+    for topic, ids in _por_topic(bajas).items():
+        for lote in _lotes(ids):
+            # Los tokens inactivos suelen estar muertos y FCM rechaza la baja:
+            # el registro se elimina igual para no reintentarlo en cada sincronización
+            fallidos = transporte.desuscribir([valor_token[i] for i in lote], topic)
+            resultado["fallidas"] += len(fallidos)
+            SuscripcionTopic.objects.filter(topic=topic, token_id__in=lote).delete()
+            resultado["bajas"] += len(lote)
+
+    if altas or bajas:
+        logger.info(
+            f"🔁 Topics sincronizados: {resultado['altas']} altas, "
+            f"{resultado['bajas']} bajas, {resultado['fallidas']} fallidas"
+        )
+    return resultado
+
+
+def desuscribir_token(token, topics):
+    """
+    Quitar un token de sus topics antes de eliminarlo
+
+    Args:
+        token: Token FCM
+        topics: Topics a los que estaba suscrito
+    """
+    transporte = obtener_transporte()
+    for topic in topics:
+        transporte.desuscribir([token], topic)
@@ -3,7 +3,10 @@ Utilidades para enviar notificaciones push desde cualquier módulo
 """
 
 from .models import DeviceToken, Notification
-from .firebase_config import send_multicast_notification, send_topic_notification
+from .envio import enviar_a_usuarios, enviar_tokens, obtener_transporte
+from .topics import TOPIC_ADMINS, TOPIC_PROMOS, topic_rol
+from .agrupacion import DESTINO_ADMINS, agrupar, destino_usuario
+from .contadores import incrementar, incrementar_topic
 import logging
 
 logger = logging.getLogger(__name__)
@@ -66,32 +69,16 @@ def notificar_usuario(usuario, titulo, mensaje, tipo="info", data=None):
         )
     """
     try:
-        # Obtener tokens activos del usuario
-        tokens = DeviceToken.objects.filter(user=usuario, is_active=True).values_list(
-            "token", flat=True
-        )
-
-        if not tokens:
-            logger.warning(f"Usuario {usuario.username} no tiene tokens registrados")
-            return False
-
-        # Crear registro de notificación (guardar data original, no strings)
-        notification = Notification.objects.create(
-            user=usuario, tipo=tipo, titulo=titulo, mensaje=mensaje, data=data or {}
-        )
-
-        # Enviar notificación push (convertir data a strings para Firebase)
-        data_strings = _convert_data_to_strings(data or {})
-        response = send_multicast_notification(
-            list(tokens), titulo, mensaje, data_strings
-        )
+        resultado = enviar_a_usuarios([usuario.id], titulo, mensaje, tipo, data)
+        detalle = resultado["detalle"][usuario.id]
 
-        if response and response.success_count > 0:
-            notification.mark_as_sent(f"multicast_{response.success_count}")
+        if detalle["success"]:
             logger.info(f"Notificación enviada a {usuario.username}: {titulo}")
             return True
+        elif detalle["error"] == "Usuario sin tokens":
+            logger.warning(f"Usuario {usuario.username} no tiene tokens registrados")
+            return False
         else:
-            notification.mark_as_failed("No se pudo enviar a ningún dispositivo")
             logger.error(f"Error enviando notificación a {usuario.username}")
             return False
 
@@ -129,13 +116,18 @@ def notificar_usuarios(usuarios, titulo, mensaje, tipo="info", data=None):
             data={'screen': 'conductores'}
         )
     """
-    resultados = {"enviados": 0, "fallidos": 0, "total": len(usuarios)}
+    # Solo se necesitan los IDs: tokens y registros se resuelven en lote
+    if hasattr(usuarios, "values_list"):
+        usuario_ids = list(usuarios.values_list("id", flat=True))
+    else:
+        usuario_ids = [usuario.id for usuario in usuarios]
 
-    for usuario in usuarios:
-        if notificar_usuario(usuario, titulo, mensaje, tipo, data):
-            resultados["enviados"] += 1
-        else:
-            resultados["fallidos"] += 1
+    try:
+        resultados = enviar_a_usuarios(usuario_ids, titulo, mensaje, tipo, data)
+        resultados.pop("detalle")
+    except Exception as e:
+        logger.error(f"Excepción en notificación masiva: {str(e)}")
+        resultados = {"enviados": 0, "fallidos": len(usuario_ids), "total": len(usuario_ids)}
 
     logger.info(
         f"Notificación masiva: {resultados['enviados']} enviadas, {resultados['fallidos']} fallidas"
@@ -147,6 +139,9 @@ def notificar_por_rol(rol_nombre, titulo, mensaje, tipo="info", data=None):
     """
     Enviar notificación a todos los usuarios con un rol específico
 
+    Se envía al topic del rol: una sola llamada a FCM sin importar cuántos
+    usuarios tenga.
+
     Args:
         rol_nombre: Nombre del rol (ej: 'CONDUCTOR', 'ADMIN')
         titulo: Título de la notificación
@@ -155,7 +150,7 @@ def notificar_por_rol(rol_nombre, titulo, mensaje, tipo="info", data=None):
         data: Datos adicionales
 
     Returns:
-        dict: Resultado del envío
+        bool: True si se envió exitosamente
 
     Ejemplo:
         from notifications.utils import notificar_por_rol
@@ -168,31 +163,23 @@ def notificar_por_rol(rol_nombre, titulo, mensaje, tipo="info", data=None):
             data={'screen': 'calendario'}
         )
     """
-    from django.contrib.auth import get_user_model
+    from users.models import Rol
 
-    User = get_user_model()
-
-    try:
-        # Obtener usuarios con el rol especificado
-        usuarios = User.objects.filter(
-            grupos__nombre=rol_nombre, is_active=True
-        ).distinct()
-
-        if not usuarios.exists():
-            logger.warning(f"No se encontraron usuarios con el rol {rol_nombre}")
-            return {"enviados": 0, "fallidos": 0, "total": 0}
+    rol = Rol.objects.filter(nombre__iexact=rol_nombre).first()
+    if not rol:
+        logger.warning(f"No existe el rol {rol_nombre}")
+        return False
 
-        return notificar_usuarios(usuarios, titulo, mensaje, tipo, data)
-
-    except Exception as e:
-        logger.error(f"Error al notificar por rol {rol_nombre}: {str(e)}")
-        return {"enviados": 0, "fallidos": 1, "total": 1}
+    return notificar_topic(topic_rol(rol.id), titulo, mensaje, tipo, data)
 
 
 def notificar_topic(topic, titulo, mensaje, tipo="info", data=None):
     """
     Enviar notificación a un topic (broadcast)
 
+    Se guarda un único registro de Notification; la lectura de cada usuario
+    se registra al marcarla como leída (LecturaNotificacion).
+
     Args:
         topic: Nombre del topic (ej: 'all_users', 'promos')
         titulo: Título de la notificación
@@ -222,10 +209,11 @@ def notificar_topic(topic, titulo, mensaje, tipo="info", data=None):
 
         # Enviar a topic (convertir data a strings para Firebase)
         data_strings = _convert_data_to_strings(data or {})
-        message_id = send_topic_notification(topic, titulo, mensaje, data_strings)
+        message_id = obtener_transporte().enviar_topic(topic, titulo, mensaje, data_strings)
 
         if message_id:
             notification.mark_as_sent(message_id)
+            incrementar_topic(topic)
             logger.info(f"Notificación enviada al topic {topic}: {titulo}")
             return True
         else:
@@ -240,7 +228,7 @@ def notificar_topic(topic, titulo, mensaje, tipo="info", data=None):
 
 def notificar_admins(titulo, mensaje, tipo="info", data=None):
     """
-    Enviar notificación a todos los administradores
+    Enviar notificación a todos los administradores (topic 'admins')
 
     Args:
         titulo: Título de la notificación
@@ -249,7 +237,7 @@ def notificar_admins(titulo, mensaje, tipo="info", data=None):
         data: Datos adicionales
 
     Returns:
-        dict: Resultado del envío
+        bool: True si se envió exitosamente
 
     Ejemplo:
         from notifications.utils import notificar_admins
@@ -261,12 +249,7 @@ def notificar_admins(titulo, mensaje, tipo="info", data=None):
             data={'screen': 'inventario'}
         )
     """
-    from django.contrib.auth import get_user_model
-
-    User = get_user_model()
-
-    admins = User.objects.filter(is_staff=True, is_active=True)
-    return notificar_usuarios(admins, titulo, mensaje, tipo, data)
+    return notificar_topic(TOPIC_ADMINS, titulo, mensaje, tipo, data)
 
 
 def notificar_con_retry(
@@ -403,7 +386,7 @@ def notificar_cambio_estado_personal(personal, nuevo_estado, cambiado_por):
 
 
 def notificar_promocion_masiva(titulo, mensaje, descuento=None, producto_id=None):
-    """Enviar promoción a todos los usuarios"""
+    """Enviar promoción a los dispositivos suscritos al topic de promociones"""
     data = {"type": "promo", "screen": "productos", "action": "view_promos"}
 
     if descuento:
@@ -412,7 +395,7 @@ def notificar_promocion_masiva(titulo, mensaje, descuento=None, producto_id=None
         data["producto_id"] = str(producto_id)
 
     return notificar_topic(
-        topic="all_users", titulo=titulo, mensaje=mensaje, tipo="promo", data=data
+        topic=TOPIC_PROMOS, titulo=titulo, mensaje=mensaje, tipo="promo", data=data
     )
 
 
@@ -423,12 +406,15 @@ def notificar_login_exitoso(usuario, dispositivo_info=None):
     """
     Notificar al usuario sobre login exitoso
 
+    Los avisos de inicio de sesión se agrupan para no saturar al usuario
+    si inicia sesión varias veces seguidas.
+
     Args:
         usuario: Instancia del modelo User
         dispositivo_info: Dict con info del dispositivo (opcional)
 
     Returns:
-        bool: True si se envió exitosamente
+        bool: True si quedó encolada para envío
     """
     from django.utils import timezone
 
@@ -444,8 +430,8 @@ def notificar_login_exitoso(usuario, dispositivo_info=None):
         mensaje += f" en {ubicacion}"
     mensaje += f" a las {timezone.now().strftime('%H:%M')}"
 
-    return notificar_usuario(
-        usuario=usuario,
+    agrupar(
+        destino=destino_usuario(usuario.id),
         titulo="🔐 Inicio de Sesión",
         mensaje=mensaje,
         tipo="sistema",
@@ -456,6 +442,7 @@ def notificar_login_exitoso(usuario, dispositivo_info=None):
             "device_info": str(dispositivo_info) if dispositivo_info else "",
         },
     )
+    return True
 
 
 def notificar_nuevo_pedido(pedido):
@@ -469,7 +456,7 @@ def notificar_nuevo_pedido(pedido):
     Returns:
         dict: Resultados del envío
     """
-    resultados = {"cliente": False, "admins": {"enviados": 0, "fallidos": 0}}
+    resultados = {"cliente": False, "admins": True}
 
     # Notificar al cliente
     if pedido.usuario:
@@ -487,8 +474,9 @@ def notificar_nuevo_pedido(pedido):
             },
         )
 
-    # Notificar a administradores
-    resultados["admins"] = notificar_admins(
+    # Notificar a administradores (agrupado: en ventas masivas llega un resumen)
+    agrupar(
+        destino=DESTINO_ADMINS,
         titulo="🛒 Nuevo Pedido",
         mensaje=f"Nuevo pedido #{pedido.numero_pedido} por ${pedido.total} de {pedido.usuario.get_full_name() or pedido.usuario.email}",
         tipo="pedido",
@@ -505,59 +493,69 @@ def notificar_nuevo_pedido(pedido):
     return resultados
 
 
+# Mapeo de estados de pedido a mensajes ({numero} = número de pedido)
+MENSAJES_ESTADO_PEDIDO = {
+    "PAGADO": {
+        "titulo": "✅ Pago Confirmado",
+        "mensaje": "Tu pedido #{numero} ha sido pagado exitosamente. Preparándolo para envío...",
+        "mensaje_masivo": "Tu pago fue confirmado. Estamos preparando tu pedido.",
+    },
+    "PROCESANDO": {
+        "titulo": "🔄 Pedido en Proceso",
+        "mensaje": "Tu pedido #{numero} está siendo procesado",
+        "mensaje_masivo": "Tu pedido está siendo procesado",
+    },
+    "ENVIADO": {
+        "titulo": "🚚 Pedido Enviado",
+        "mensaje": "Tu pedido #{numero} ha sido enviado. ¡Estará pronto en tu domicilio!",
+        "mensaje_masivo": "Tu pedido ha sido enviado. ¡Estará pronto en tu domicilio!",
+    },
+    "ENTREGADO": {
+        "titulo": "🎉 Pedido Entregado",
+        "mensaje": "¡Tu pedido #{numero} ha sido entregado! Gracias por tu compra.",
+        "mensaje_masivo": "¡Tu pedido ha sido entregado! Gracias por tu compra.",
+    },
+    "CANCELADO": {
+        "titulo": "❌ Pedido Cancelado",
+        "mensaje": "Tu pedido #{numero} ha sido cancelado",
+        "mensaje_masivo": "Tu pedido ha sido cancelado",
+    },
+    "REEMBOLSADO": {
+        "titulo": "💰 Reembolso Procesado",
+        "mensaje": "El reembolso de tu pedido #{numero} ha sido procesado",
+        "mensaje_masivo": "El reembolso de tu pedido ha sido procesado",
+    },
+}
+
+
 def notificar_cambio_estado_pedido(pedido, estado_anterior, estado_nuevo):
     """
     Notificar al cliente cuando cambia el estado de su pedido
 
+    Los cambios seguidos del mismo pedido o de varios pedidos del cliente se
+    agrupan en un resumen.
+
     Args:
         pedido: Instancia del modelo Pedido
         estado_anterior: Estado anterior del pedido
         estado_nuevo: Nuevo estado del pedido
 
     Returns:
-        bool: True si se envió exitosamente
+        bool: True si quedó encolada para envío
     """
     if not pedido.usuario:
         return False
 
-    # Mapeo de estados a mensajes
-    mensajes_estado = {
-        "PAGADO": {
-            "titulo": "✅ Pago Confirmado",
-            "mensaje": f"Tu pedido #{pedido.numero_pedido} ha sido pagado exitosamente. Preparándolo para envío...",
-        },
-        "PROCESANDO": {
-            "titulo": "🔄 Pedido en Proceso",
-            "mensaje": f"Tu pedido #{pedido.numero_pedido} está siendo procesado",
-        },
-        "ENVIADO": {
-            "titulo": "🚚 Pedido Enviado",
-            "mensaje": f"Tu pedido #{pedido.numero_pedido} ha sido enviado. ¡Estará pronto en tu domicilio!",
-        },
-        "ENTREGADO": {
-            "titulo": "🎉 Pedido Entregado",
-            "mensaje": f"¡Tu pedido #{pedido.numero_pedido} ha sido entregado! Gracias por tu compra.",
-        },
-        "CANCELADO": {
-            "titulo": "❌ Pedido Cancelado",
-            "mensaje": f"Tu pedido #{pedido.numero_pedido} ha sido cancelado",
-        },
-        "REEMBOLSADO": {
-            "titulo": "💰 Reembolso Procesado",
-            "mensaje": f"El reembolso de tu pedido #{pedido.numero_pedido} ha sido procesado",
-        },
-    }
-
-    if estado_nuevo not in mensajes_estado:
+    if estado_nuevo not in MENSAJES_ESTADO_PEDIDO:
         return False
 
-    info = mensajes_estado[estado_nuevo]
+    info = MENSAJES_ESTADO_PEDIDO[estado_nuevo]
     tipo = "alerta" if estado_nuevo in ["CANCELADO", "REEMBOLSADO"] else "pedido"
 
-    return notificar_usuario(
-        usuario=pedido.usuario,
+    agrupar(
+        destino=destino_usuario(pedido.usuario_id),
         titulo=info["titulo"],
-        mensaje=info["mensaje"],
+        mensaje=info["mensaje"].format(numero=pedido.numero_pedido),
         tipo=tipo,
         data={
             "pedido_id": str(pedido.id),
@@ -568,6 +566,97 @@ def notificar_cambio_estado_pedido(pedido, estado_anterior, estado_nuevo):
             "action": "view_detail",
         },
     )
+    return True
+
+
+def notificar_cambio_estado_pedidos(pedidos, estado_nuevo):
+    """
+    Notificar en lote el cambio de estado de muchos pedidos
+
+    Crea un registro de Notification por pedido (con su número) en un solo
+    INSERT y envía un único mensaje genérico a todos los dispositivos de los
+    clientes afectados (en lotes de 500 tokens).
+
+    Args:
+        pedidos: Lista de dicts con 'id', 'numero_pedido', 'usuario_id' y
+            'estado' (estado anterior)
+        estado_nuevo: Nuevo estado de los pedidos
+
+    Returns:
+        dict: {'enviados': int, 'fallidos': int, 'total': int}
+    """
+    from django.utils import timezone
+
+    resultados = {"enviados": 0, "fallidos": 0, "total": len(pedidos)}
+    info = MENSAJES_ESTADO_PEDIDO.get(estado_nuevo)
+    if not info or not pedidos:
+        return resultados
+
+    usuario_ids = {p["usuario_id"] for p in pedidos}
+    tokens_por_usuario = {}
+    for user_id, token in DeviceToken.objects.filter(
+        user_id__in=usuario_ids, is_active=True
+    ).values_list("user_id", "token"):
+        tokens_por_usuario.setdefault(user_id, []).append(token)
+
+    tipo = "alerta" if estado_nuevo in ["CANCELADO", "REEMBOLSADO"] else "pedido"
+    notificaciones = Notification.objects.bulk_create(
+        [
+            Notification(
+                user_id=p["usuario_id"],
+                tipo=tipo,
+                titulo=info["titulo"],
+                mensaje=info["mensaje"].format(numero=p["numero_pedido"]),
+                data={
+                    "pedido_id": str(p["id"]),
+                    "numero_pedido": p["numero_pedido"],
+                    "estado_anterior": p["estado"],
+                    "estado_nuevo": estado_nuevo,
+                    "screen": "pedidos",
+                    "action": "view_detail",
+                },
+            )
+            for p in pedidos
+            if p["usuario_id"] in tokens_por_usuario
+        ]
+    )
+    resultados["fallidos"] = resultados["total"] - len(notificaciones)
+    if not notificaciones:
+        return resultados
+
+    # Un único mensaje genérico para todos los dispositivos, en lotes paralelos
+    usuario_de_token = {
+        token: user_id for user_id, tokens in tokens_por_usuario.items() for token in tokens
+    }
+    data_strings = _convert_data_to_strings(
+        {"estado_nuevo": estado_nuevo, "screen": "pedidos", "action": "list"}
+    )
+    usuarios_alcanzados = set()
+    for resultado in enviar_tokens(
+        list(usuario_de_token), info["titulo"], info["mensaje_masivo"], data_strings
+    ):
+        if resultado.exito:
+            usuarios_alcanzados.add(usuario_de_token[resultado.token])
+
+    enviadas = [n.id for n in notificaciones if n.user_id in usuarios_alcanzados]
+    fallidas = [n.id for n in notificaciones if n.user_id not in usuarios_alcanzados]
+    if enviadas:
+        Notification.objects.filter(id__in=enviadas).update(
+            estado="enviada", message_id="multicast_estado", sent_at=timezone.now()
+        )
+        incrementar(n.user_id for n in notificaciones if n.user_id in usuarios_alcanzados)
+    if fallidas:
+        Notification.objects.filter(id__in=fallidas).update(
+            estado="fallida", error_message="No se pudo enviar a ningún dispositivo"
+        )
+    resultados["enviados"] = len(enviadas)
+    resultados["fallidos"] += len(fallidas)
+
+    logger.info(
+        f"Cambio de estado masivo a {estado_nuevo}: {len(notificaciones)} notificaciones, "
+        f"{len(usuarios_alcanzados)} clientes alcanzados"
+    )
+    return resultados
 
 
 def notificar_pago_exitoso(transaccion):
@@ -643,9 +732,10 @@ def notificar_producto_bajo_stock(producto, stock_actual):
         stock_actual: Stock actual del producto
 
     Returns:
-        dict: Resultado del envío a admins
+        bool: True si quedó encolada para envío
     """
-    return notificar_admins(
+    agrupar(
+        destino=DESTINO_ADMINS,
         titulo="⚠️ Stock Bajo",
         mensaje=f'El producto "{producto.nombre}" tiene bajo stock: {stock_actual} unidades (mínimo: {producto.stock_minimo})',
         tipo="alerta",
@@ -659,6 +749,7 @@ def notificar_producto_bajo_stock(producto, stock_actual):
             "action": "view_detail",
         },
     )
+    return True
 
 
 def notificar_producto_sin_stock(producto):
@@ -669,9 +760,10 @@ def notificar_producto_sin_stock(producto):
         producto: Instancia del modelo Producto
 
     Returns:
-        dict: Resultado del envío a admins
+        bool: True si quedó encolada para envío
     """
-    return notificar_admins(
+    agrupar(
+        destino=DESTINO_ADMINS,
         titulo="🚨 Producto Sin Stock",
         mensaje=f'El producto "{producto.nombre}" se ha quedado sin stock',
         tipo="alerta",
@@ -683,6 +775,7 @@ def notificar_producto_sin_stock(producto):
             "action": "view_detail",
         },
     )
+    return True
 
 
 def notificar_nuevo_producto(producto, creado_por):
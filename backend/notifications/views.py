@@ -1,12 +1,21 @@
 """
 Views para el sistema de notificaciones push
 """
+import json
+import time
+
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Exists, OuterRef, Q
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from .models import DeviceToken, Notification
+from .models import DeviceToken, LecturaNotificacion, Notification
 from .serializers import (
     DeviceTokenSerializer,
     NotificationSerializer,
@@ -14,9 +23,13 @@ from .serializers import (
 )
 from .firebase_config import (
     send_push_notification,
-    send_multicast_notification,
     send_topic_notification
 )
+from .contadores import badge, marcar_leida, marcar_todo_leido, no_leidas
+from .envio import enviar_a_usuarios
+from .eventos import obtener_oyente
+from .tareas import desuscribir_token, sincronizar_topics
+from .topics import topics_del_usuario
 
 
 class DeviceTokenViewSet(viewsets.ModelViewSet):
@@ -39,6 +52,23 @@ class DeviceTokenViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Asignar el usuario actual al crear token"""
         serializer.save(user=self.request.user)
+        sincronizar_topics.encolar(usuario_ids=[self.request.user.id])
+
+    def perform_update(self, serializer):
+        """Resuscribir si cambió el estado o la preferencia de promociones"""
+        serializer.save()
+        sincronizar_topics.encolar(usuario_ids=[self.request.user.id])
+
+    def perform_destroy(self, instance):
+        """Quitar el token de sus topics antes de eliminarlo"""
+        self._desuscribir(instance)
+        instance.delete()
+
+    @staticmethod
+    def _desuscribir(device_token):
+        topics = list(device_token.suscripciones.values_list('topic', flat=True))
+        if topics:
+            desuscribir_token.encolar(token=device_token.token, topics=topics)
 
     @action(detail=False, methods=['post'])
     def register(self, request):
@@ -54,6 +84,7 @@ class DeviceTokenViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        sincronizar_topics.encolar(usuario_ids=[request.user.id])
         
         return Response({
             'message': 'Token registrado exitosamente',
@@ -74,12 +105,14 @@ class DeviceTokenViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        deleted_count, _ = DeviceToken.objects.filter(
+        device_token = DeviceToken.objects.filter(
             token=token,
             user=request.user
-        ).delete()
+        ).first()
         
-        if deleted_count > 0:
+        if device_token:
+            self._desuscribir(device_token)
+            device_token.delete()
             return Response({'message': 'Token eliminado exitosamente'})
         else:
             return Response(
@@ -88,6 +121,80 @@ class DeviceTokenViewSet(viewsets.ModelViewSet):
             )
 
 
+class EventStreamRenderer(BaseRenderer):
+    """Permite negociar text/event-stream en el endpoint de eventos"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data)
+
+
+def _evento_no_leidas(total, version):
+    return f'id: {version}\nevent: no_leidas\ndata: {json.dumps({"no_leidas": total})}\n\n'
+
+
+def _parametros_stream():
+    return (
+        getattr(settings, 'NOTIFICACIONES_SSE_DURACION', 300),
+        getattr(settings, 'NOTIFICACIONES_SSE_LATIDO', 15),
+        f'retry: {int(getattr(settings, "NOTIFICACIONES_SSE_INTERVALO", 3) * 1000)}\n\n',
+    )
+
+
+def _stream_no_leidas(usuario, ultima_version):
+    """
+    Stream SSE del badge para WSGI (ocupa el hilo mientras está abierto)
+
+    Envía el badge si su versión difiere del Last-Event-ID y después espera
+    avisos del oyente; cada aviso o latido relee el badge y solo se envía un
+    evento si cambió. A los NOTIFICACIONES_SSE_DURACION segundos cierra y el
+    navegador reconecta con Last-Event-ID.
+    """
+    duracion, latido, reintento = _parametros_stream()
+    oyente = obtener_oyente()
+    # Suscrito antes de la primera lectura: un cambio intermedio no se pierde
+    suscripcion = oyente.suscribir(usuario.id)
+    try:
+        yield reintento
+        fin = time.monotonic() + duracion
+        while True:
+            total, version = badge(usuario)
+            if version != ultima_version:
+                ultima_version = version
+                yield _evento_no_leidas(total, version)
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            if not suscripcion.esperar(min(latido, restante)):
+                yield ': latido\n\n'
+    finally:
+        oyente.cancelar(suscripcion)
+
+
+async def _stream_no_leidas_async(usuario, ultima_version):
+    """Igual que _stream_no_leidas, para ASGI: la espera no ocupa un hilo"""
+    duracion, latido, reintento = _parametros_stream()
+    oyente = obtener_oyente()
+    suscripcion = await sync_to_async(oyente.suscribir)(usuario.id)
+    try:
+        yield reintento
+        fin = time.monotonic() + duracion
+        while True:
+            total, version = await sync_to_async(badge)(usuario)
+            if version != ultima_version:
+                ultima_version = version
+                yield _evento_no_leidas(total, version)
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            if not await suscripcion.esperar_async(min(latido, restante)):
+                yield ': latido\n\n'
+    finally:
+        oyente.cancelar(suscripcion)
+
+
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para consultar notificaciones
@@ -95,14 +202,41 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     list: Listar notificaciones del usuario
     retrieve: Ver detalle de notificación
     my_notifications: Notificaciones no leídas
+    unread_count: Número de no leídas (badge)
+    stream: Eventos SSE con el número de no leídas
     mark_as_read: Marcar como leída
+
+    Incluye las notificaciones enviadas a los topics del usuario desde que se
+    registró; su lectura se guarda en LecturaNotificacion. Solo se muestran
+    los últimos NOTIFICACIONES_DIAS_VISIBLES días.
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """Solo mostrar notificaciones del usuario actual"""
-        return Notification.objects.filter(user=self.request.user)
+        """Notificaciones propias y de los topics del usuario actual"""
+        user = self.request.user
+        topics = topics_del_usuario(user)
+        lecturas = LecturaNotificacion.objects.filter(
+            notification=OuterRef('pk'), user=user
+        )
+        desde = Notification.fecha_minima_visible()
+        return Notification.objects.filter(
+            Q(user=user)
+            | Q(
+                user__isnull=True,
+                topic__in=topics,
+                estado='enviada',
+                created_at__gte=user.date_joined,
+            ),
+            created_at__gte=desde,
+        ).annotate(leida_por_usuario=Exists(lecturas))
+
+    def _no_leidas(self):
+        return self.get_queryset().filter(
+            Q(user=self.request.user, estado='enviada')
+            | Q(user__isnull=True, leida_por_usuario=False)
+        )
 
     @action(detail=False, methods=['get'])
     def my_notifications(self, request):
@@ -110,13 +244,47 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         Obtener notificaciones no leídas del usuario
         GET /api/notifications/my_notifications/
         """
-        unread = self.get_queryset().filter(estado='enviada')
+        unread = self._no_leidas()
         serializer = self.get_serializer(unread, many=True)
         return Response({
             'count': unread.count(),
             'notifications': serializer.data
         })
 
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Número de notificaciones no leídas, leído del contador del usuario
+        GET /api/notifications/unread-count/
+        """
+        return Response({'no_leidas': no_leidas(request.user)})
+
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer])
+    def stream(self, request):
+        """
+        Eventos Server-Sent Events con los cambios del badge
+        GET /api/notifications/stream/
+
+        id: <versión>
+        event: no_leidas
+        data: {"no_leidas": 3}
+
+        La conexión queda abierta y recibe un evento cada vez que cambia el
+        badge (avisos de eventos.OyenteBadge). Bajo ASGI el stream es
+        asíncrono; bajo WSGI ocupa un hilo por conexión abierta.
+        """
+        ultima_version = request.headers.get('Last-Event-ID')
+        if isinstance(request._request, ASGIRequest):
+            contenido = _stream_no_leidas_async(request.user, ultima_version)
+        else:
+            contenido = _stream_no_leidas(request.user, ultima_version)
+
+        respuesta = StreamingHttpResponse(contenido, content_type='text/event-stream')
+        respuesta['Cache-Control'] = 'no-cache'
+        # Que nginx no acumule el stream en su buffer
+        respuesta['X-Accel-Buffering'] = 'no'
+        return respuesta
+
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         """
@@ -124,7 +292,9 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         POST /api/notifications/{id}/mark_as_read/
         """
         notification = self.get_object()
-        notification.mark_as_read()
+        marcar_leida(notification, request.user)
+        if notification.user_id is None:
+            notification.leida_por_usuario = True
         
         return Response({
             'message': 'Notificación marcada como leída',
@@ -137,10 +307,24 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         Marcar todas las notificaciones como leídas
         POST /api/notifications/mark_all_as_read/
         """
-        updated = self.get_queryset().filter(estado='enviada').update(
+        no_leidas = self._no_leidas()
+        topic_ids = list(
+            no_leidas.filter(user__isnull=True).values_list('id', flat=True)
+        )
+        LecturaNotificacion.objects.bulk_create(
+            [
+                LecturaNotificacion(notification_id=notification_id, user=request.user)
+                for notification_id in topic_ids
+            ],
+            ignore_conflicts=True
+        )
+        updated = Notification.objects.filter(
+            user=request.user, estado='enviada'
+        ).update(
             estado='leida',
             read_at=timezone.now()
-        )
+        ) + len(topic_ids)
+        marcar_todo_leido(request.user)
         
         return Response({
             'message': f'{updated} notificaciones marcadas como leídas'
@@ -174,55 +358,17 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         data = serializer.validated_data
         results = []
         
-        # Enviar a usuarios específicos
+        # Enviar a usuarios específicos (tokens y registros se resuelven en lote)
         if 'user_ids' in data:
-            for user_id in data['user_ids']:
-                # Obtener tokens activos del usuario
-                tokens = DeviceToken.objects.filter(
-                    user_id=user_id,
-                    is_active=True
-                ).values_list('token', flat=True)
-                
-                if not tokens:
-                    results.append({
-                        'user_id': user_id,
-                        'success': False,
-                        'error': 'Usuario sin tokens'
-                    })
-                    continue
-                
-                # Crear registro de notificación
-                notification = Notification.objects.create(
-                    user_id=user_id,
-                    tipo=data['tipo'],
-                    titulo=data['titulo'],
-                    mensaje=data['mensaje'],
-                    data=data.get('data', {})
-                )
-                
-                # Enviar a todos los dispositivos del usuario
-                response = send_multicast_notification(
-                    list(tokens),
-                    data['titulo'],
-                    data['mensaje'],
-                    data.get('data', {})
-                )
-                
-                if response and response.success_count > 0:
-                    notification.mark_as_sent(f'multicast_{response.success_count}')
-                    results.append({
-                        'user_id': user_id,
-                        'success': True,
-                        'sent_to': response.success_count,
-                        'failed': response.failure_count
-                    })
-                else:
-                    notification.mark_as_failed('Error enviando notificación')
-                    results.append({
-                        'user_id': user_id,
-                        'success': False,
-                        'error': 'Error en Firebase'
-                    })
+            envio = enviar_a_usuarios(
+                data['user_ids'],
+                data['titulo'],
+                data['mensaje'],
+                data['tipo'],
+                data.get('data', {})
+            )
+            for user_id in dict.fromkeys(data['user_ids']):
+                results.append({'user_id': user_id, **envio['detalle'][user_id]})
         
         # Enviar a topic
         elif 'topic' in data:
@@ -273,12 +273,9 @@ class PagoViewSet(viewsets.GenericViewSet):
                 modulo='PAGOS'
             )
             
-            # Enviar notificación de pago exitoso
-            try:
-                from notifications.utils import notificar_pago_exitoso
-                notificar_pago_exitoso(transaccion)
-            except Exception as e:
-                print(f'⚠️ Error enviando notificación de pago exitoso: {e}')
+            # Encolar notificación de pago exitoso (la envía un worker)
+            from notifications.tareas import pago_exitoso
+            pago_exitoso.encolar(transaccion_id=transaccion.id)
             
             # Vaciar el carrito del usuario después de confirmar el pago exitoso
             try:
@@ -296,12 +293,9 @@ class PagoViewSet(viewsets.GenericViewSet):
             error_msg = f"Estado: {resultado['status']}"
             transaccion.marcar_como_fallido(error_msg)
             
-            # Enviar notificación de pago fallido
-            try:
-                from notifications.utils import notificar_pago_fallido
-                notificar_pago_fallido(transaccion, error_msg)
-            except Exception as e:
-                print(f'⚠️ Error enviando notificación de pago fallido: {e}')
+            # Encolar notificación de pago fallido (la envía un worker)
+            from notifications.tareas import pago_fallido
+            pago_fallido.encolar(transaccion_id=transaccion.id, error_mensaje=error_msg)
             mensaje = 'El pago no pudo ser procesado'
         
         # Serializar la transacción actualizada
@@ -364,12 +358,9 @@ def stripe_webhook(request):
             )
             transaccion.marcar_como_exitoso()
             
-            # Enviar notificación de pago exitoso (desde webhook)
-            try:
-                from notifications.utils import notificar_pago_exitoso
-                notificar_pago_exitoso(transaccion)
-            except Exception as e:
-                print(f'⚠️ Error enviando notificación de pago exitoso (webhook): {e}')
+            # Encolar notificación de pago exitoso (desde webhook)
+            from notifications.tareas import pago_exitoso
+            pago_exitoso.encolar(transaccion_id=transaccion.id)
         except TransaccionPago.DoesNotExist:
             pass
     
@@ -385,12 +376,9 @@ def stripe_webhook(request):
             )
             transaccion.marcar_como_fallido(error_message)
             
-            # Enviar notificación de pago fallido (desde webhook)
-            try:
-                from notifications.utils import notificar_pago_fallido
-                notificar_pago_fallido(transaccion, error_message)
-            except Exception as e:
-                print(f'⚠️ Error enviando notificación de pago fallido (webhook): {e}')
+            # Encolar notificación de pago fallido (desde webhook)
+            from notifications.tareas import pago_fallido
+            pago_fallido.encolar(transaccion_id=transaccion.id, error_mensaje=error_message)
         except TransaccionPago.DoesNotExist:
             pass
     
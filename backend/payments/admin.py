@@ -1,7 +1,10 @@
 """
 Admin para el sistema de pagos
 """
+from datetime import timedelta
+
 from django.contrib import admin
+from django.utils import timezone
 from .models import MetodoPago, Pago, Transaccion, Reembolso, WebhookLog
 
 
@@ -222,6 +225,9 @@ class WebhookLogAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     readonly_fields = ['id', 'created_at', 'procesado_at']
     
+    # Logs de los últimos días (particiones recientes); lo antiguo está archivado
+    dias_visibles = 30
+    
     fieldsets = (
         ('Información del Webhook', {
             'fields': ('id', 'proveedor', 'evento_tipo', 'procesado', 'pago')
@@ -239,6 +245,10 @@ class WebhookLogAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.filter(created_at__gte=timezone.now() - timedelta(days=self.dias_visibles))
+    
     def has_add_permission(self, request):
         """No permitir crear logs desde el admin"""
         return False
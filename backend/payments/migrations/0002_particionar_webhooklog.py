@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from core.particiones import convertir_a_particionada
+
+
+def particionar(apps, schema_editor):
+    convertir_a_particionada(schema_editor, 'payments_webhooklog')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        # Solo PostgreSQL; en otras bases no hace nada
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 """
 Signals para el modelo Producto
-Notificaciones automáticas cuando cambia el stock
+Notificaciones automáticas cuando cambia el stock (se encolan como tareas)
 """
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
@@ -26,64 +26,51 @@ def producto_pre_save(sender, instance, **kwargs):
 
 @receiver(post_save, sender=Producto)
 def producto_post_save(sender, instance, created, **kwargs):
-    """Notificar cambios importantes en productos"""
+    """Encolar notificaciones por cambios importantes en productos"""
     
     # Usar cache para evitar notificaciones duplicadas (15 minutos)
     cache_key_stock = f'producto_notificado_stock_{instance.id}_{instance.stock}'
     cache_key_creado = f'producto_notificado_creado_{instance.id}'
     
     try:
-        from notifications.utils import (
-            notificar_producto_bajo_stock,
-            notificar_producto_sin_stock,
-            notificar_stock_restaurado,
-            notificar_nuevo_producto
-        )
+        from notifications.tareas import nuevo_producto, stock_producto
         
         stock_anterior = getattr(instance, '_stock_anterior', instance.stock)
         stock_actual = instance.stock
         
         # Si es un nuevo producto y está activo
         if created and instance.activo:
-            # Verificar si ya se notificó
-            if not cache.get(cache_key_creado):
-                try:
-                    # Intentar obtener el usuario que creó (si hay request context)
-                    creado_por = getattr(instance, '_creado_por', None)
-                    if notificar_nuevo_producto(instance, creado_por):
-                        cache.set(cache_key_creado, True, 900)  # 15 minutos
-                except Exception as e:
-                    logger.warning(f'Error notificando nuevo producto: {e}')
+            # cache.add solo escribe si la clave no existe: evita encolar dos veces
+            if cache.add(cache_key_creado, True, 900):  # 15 minutos
+                # Usuario que creó el producto (si hay request context)
+                creado_por = getattr(instance, '_creado_por', None)
+                nuevo_producto.encolar(
+                    producto_id=instance.id,
+                    creado_por_id=creado_por.id if creado_por else None,
+                )
         
         # Verificar cambios en stock (solo si no es creación)
         if not created and stock_anterior != stock_actual:
-            # Verificar si ya se notificó este estado
-            if cache.get(cache_key_stock):
-                return
-            
             # Producto sin stock (pasó de >0 a 0)
             if stock_anterior > 0 and stock_actual == 0:
-                try:
-                    if notificar_producto_sin_stock(instance):
-                        cache.set(cache_key_stock, True, 900)  # 15 minutos
-                except Exception as e:
-                    logger.warning(f'Error notificando producto sin stock: {e}')
-            
+                evento = 'sin_stock'
             # Producto con bajo stock (pasó de >= mínimo a < mínimo)
             elif stock_anterior >= instance.stock_minimo and stock_actual < instance.stock_minimo and stock_actual > 0:
-                try:
-                    if notificar_producto_bajo_stock(instance, stock_actual):
-                        cache.set(cache_key_stock, True, 900)  # 15 minutos
-                except Exception as e:
-                    logger.warning(f'Error notificando producto bajo stock: {e}')
-            
+                evento = 'bajo_stock'
             # Stock restaurado (pasó de 0 a >0)
             elif stock_anterior == 0 and stock_actual > 0:
-                try:
-                    if notificar_stock_restaurado(instance, stock_anterior, stock_actual):
-                        cache.set(cache_key_stock, True, 900)  # 15 minutos
-                except Exception as e:
-                    logger.warning(f'Error notificando stock restaurado: {e}')
+                evento = 'restaurado'
+            else:
+                return
+            
+            # Verificar si ya se notificó este estado
+            if cache.add(cache_key_stock, True, 900):  # 15 minutos
+                stock_producto.encolar(
+                    producto_id=instance.id,
+                    evento=evento,
+                    stock_anterior=stock_anterior,
+                    stock_actual=stock_actual,
+                )
     
     except ImportError:
         # Si el módulo de notificaciones no está disponible, solo loggear
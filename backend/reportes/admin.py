@@ -11,6 +11,7 @@ class ReporteGeneradoAdmin(admin.ModelAdmin):
         'tipo',
         'usuario',
         'formato',
+        'estado',
         'agrupacion',
         'periodo_inicio',
         'periodo_fin',
@@ -20,6 +21,7 @@ class ReporteGeneradoAdmin(admin.ModelAdmin):
     list_filter = [
         'tipo',
         'formato',
+        'estado',
         'agrupacion',
         'created_at',
     ]
@@ -34,6 +36,8 @@ class ReporteGeneradoAdmin(admin.ModelAdmin):
         'created_at',
         'prompt_original',
         'datos_json',
+        'clave',
+        'finalizado_en',
     ]
     
     fieldsets = (
@@ -47,7 +51,7 @@ class ReporteGeneradoAdmin(admin.ModelAdmin):
             'fields': ('periodo_inicio', 'periodo_fin')
         }),
         ('Resultado', {
-            'fields': ('archivo', 'datos_json')
+            'fields': ('estado', 'archivo', 'datos_json', 'error', 'finalizado_en')
         }),
     )
     
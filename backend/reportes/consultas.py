@@ -0,0 +1,330 @@
+"""
+Motor declarativo de consultas de reportes
+
+Un reporte se describe con dimensiones (por qué se agrupa), medidas (qué se
+suma o cuenta) y filtros (rango de fechas, estados) sobre una fuente:
+
+    Consulta('items', dimensiones=['categoria'], medidas=['cantidad_vendida', 'total_ventas'],
+             desde=inicio, hasta=fin, estados=['PAGADO', 'ENTREGADO'], orden=['-total_ventas'])
+
+compilar() la traduce a un único values().annotate() (un GROUP BY en SQL) y
+filas() la devuelve como FilasReporte, que los exportadores recorren sin
+cargar el reporte en memoria.
+
+Cada fuente tiene su tabla de hechos y, opcionalmente, rollups de analytics
+(tablas ya agregadas por día). Se lee del primer rollup que cubre todas las
+dimensiones y medidas, si la consulta pide exactamente los estados que el
+rollup acumula y el rango es de días completos (desde a las 00:00, hasta a
+las 23:59:59.999999 o fechas sin hora). Si no, se agrega la tabla de hechos.
+Las columnas de salida se llaman igual en ambos casos.
+
+Fuentes:
+    - pedidos: Pedido (rollups VentaDiaria y VentaDiariaCliente)
+    - items: ItemPedido (rollups VentaDiariaCategoria y VentaDiariaProducto;
+      en VentaDiariaCategoria la categoría es la del producto al venderse)
+    - transacciones: TransaccionPago, sin rollups
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from django.apps import apps
+from django.db.models import Avg, Count, F, Max, Min, Sum
+from django.db.models.functions import NullIf, TruncDate
+
+from analytics.rollups import ESTADOS_VENTA as ESTADOS_ROLLUP
+
+
+class FilasReporte:
+    """
+    Filas de un reporte leídas bajo demanda
+
+    Recorre el queryset con .iterator() y convierte cada fila al iterar, así
+    los exportadores escriben reportes grandes sin tenerlos en memoria.
+    len() hace un COUNT la primera vez, sobre consulta_total si se indica
+    (una consulta más barata con las mismas filas, sin las agregaciones).
+    """
+
+    TAMANO_LOTE = 2000
+
+    def __init__(self, queryset, convertir, consulta_total=None):
+        self.queryset = queryset
+        self.convertir = convertir
+        self.consulta_total = consulta_total if consulta_total is not None else queryset
+        self._total = None
+
+    def __iter__(self):
+        for fila in self.queryset.iterator(chunk_size=self.TAMANO_LOTE):
+            yield self.convertir(fila)
+
+    def __len__(self):
+        if self._total is None:
+            self._total = self.consulta_total.count()
+        return self._total
+
+
+@dataclass
+class Tabla:
+    """
+    Tabla de la que se puede leer una fuente
+
+    Args:
+        modelo: 'app.Modelo'
+        fecha: Campo por el que se filtra el rango
+        dimensiones: Nombre -> {columna de salida: ruta ORM o expresión}
+        medidas: Nombre -> agregación
+        estado: Campo de estado (solo tablas de hechos; los rollups acumulan
+                los pedidos en ESTADOS_ROLLUP)
+        rollup: Tabla de analytics agregada por día (fecha es un DateField)
+        existe: Campo que vale 0 en las filas sin ventas (en los rollups no se
+                borran al restar pedidos)
+    """
+    modelo: str
+    fecha: str
+    dimensiones: Dict[str, Dict]
+    medidas: Dict[str, object]
+    estado: Optional[str] = None
+    rollup: bool = False
+    existe: Optional[str] = None
+
+
+@dataclass
+class Fuente:
+    hechos: Tabla
+    rollups: List[Tabla] = field(default_factory=list)
+
+
+def _cliente(ruta_usuario):
+    return {
+        'cliente_id': f'{ruta_usuario}_id',
+        'cliente_email': f'{ruta_usuario}__email',
+        'cliente_nombre': f'{ruta_usuario}__first_name',
+        'cliente_apellido': f'{ruta_usuario}__last_name',
+    }
+
+
+FUENTES = {
+    'pedidos': Fuente(
+        hechos=Tabla(
+            modelo='ventas.Pedido',
+            fecha='creado',
+            estado='estado',
+            dimensiones={
+                'fecha': {'fecha': TruncDate('creado')},
+                'cliente': _cliente('usuario'),
+            },
+            medidas={
+                'cantidad_pedidos': Count('id'),
+                'monto_total': Sum('total'),
+                'ticket_promedio': Avg('total'),
+                'primera_compra': Min('creado'),
+                'ultima_compra': Max('creado'),
+            },
+        ),
+        rollups=[
+            Tabla(
+                modelo='analytics.VentaDiaria',
+                fecha='fecha',
+                rollup=True,
+                existe='pedidos',
+                dimensiones={'fecha': {'fecha': 'fecha'}},
+                medidas={
+                    'cantidad_pedidos': Sum('pedidos'),
+                    'monto_total': Sum('total'),
+                    'ticket_promedio': Sum('total') / NullIf(Sum('pedidos'), 0),
+                },
+            ),
+            Tabla(
+                modelo='analytics.VentaDiariaCliente',
+                fecha='fecha',
+                rollup=True,
+                existe='pedidos',
+                dimensiones={'fecha': {'fecha': 'fecha'}, 'cliente': _cliente('usuario')},
+                medidas={
+                    'cantidad_pedidos': Sum('pedidos'),
+                    'monto_total': Sum('total'),
+                    'ticket_promedio': Sum('total') / NullIf(Sum('pedidos'), 0),
+                    'primera_compra': Min('fecha'),
+                    'ultima_compra': Max('fecha'),
+                },
+            ),
+        ],
+    ),
+    'items': Fuente(
+        hechos=Tabla(
+            modelo='ventas.ItemPedido',
+            fecha='pedido__creado',
+            estado='pedido__estado',
+            dimensiones={
+                'fecha': {'fecha': TruncDate('pedido__creado')},
+                'producto': {'producto_nombre': 'producto__nombre'},
+                'categoria': {'categoria_nombre': 'producto__categoria__nombre'},
+            },
+            medidas={
+                'cantidad_vendida': Sum('cantidad'),
+                'total_ventas': Sum(F('cantidad') * F('precio_unitario')),
+                'precio_promedio': Avg('precio_unitario'),
+            },
+        ),
+        rollups=[
+            Tabla(
+                modelo='analytics.VentaDiariaCategoria',
+                fecha='fecha',
+                rollup=True,
+                existe='pedidos',
+                dimensiones={
+                    'fecha': {'fecha': 'fecha'},
+                    'categoria': {'categoria_nombre': 'categoria__nombre'},
+                },
+                medidas={'cantidad_vendida': Sum('cantidad'), 'total_ventas': Sum('ingresos')},
+            ),
+            Tabla(
+                modelo='analytics.VentaDiariaProducto',
+                fecha='fecha',
+                rollup=True,
+                existe='pedidos',
+                dimensiones={
+                    'fecha': {'fecha': 'fecha'},
+                    'producto': {'producto_nombre': 'producto__nombre'},
+                    'categoria': {'categoria_nombre': 'producto__categoria__nombre'},
+                },
+                medidas={'cantidad_vendida': Sum('cantidad'), 'total_ventas': Sum('ingresos')},
+            ),
+        ],
+    ),
+    'transacciones': Fuente(
+        hechos=Tabla(
+            modelo='pagos.TransaccionPago',
+            fecha='creado',
+            estado='estado',
+            dimensiones={
+                'fecha': {'fecha': TruncDate('creado')},
+                'cliente': _cliente('pedido__usuario'),
+            },
+            medidas={
+                'total_vendido': Sum('monto'),
+                'cantidad_ventas': Count('id'),
+                'cantidad_compras': Count('id', distinct=True),
+                'ticket_promedio': Avg('monto'),
+            },
+        ),
+    ),
+}
+
+
+def _es_inicio_de_dia(valor):
+    return not isinstance(valor, datetime) or valor.time() == time.min
+
+
+def _es_fin_de_dia(valor):
+    return not isinstance(valor, datetime) or valor.time() == time.max
+
+
+@dataclass
+class Consulta:
+    """
+    Consulta de reporte: dimensiones + medidas + filtros sobre una fuente
+
+    Args:
+        fuente: Clave de FUENTES
+        dimensiones: Agrupación (sin dimensiones usar totales())
+        medidas: Agregaciones a calcular
+        desde, hasta: Rango incluido (datetime, o date = día completo)
+        estados: Estados a incluir (None = todos; nunca usa rollups)
+        orden: Columnas de salida o medidas, con '-' para descendente
+        limite: Máximo de filas
+    """
+    fuente: str
+    dimensiones: Sequence[str] = ()
+    medidas: Sequence[str] = ()
+    desde: Optional[date] = None
+    hasta: Optional[date] = None
+    estados: Optional[Sequence[str]] = None
+    orden: Sequence[str] = ()
+    limite: Optional[int] = None
+
+    def tabla(self) -> Tabla:
+        """Rollup que puede responder la consulta o, si no hay, la tabla de hechos"""
+        fuente = FUENTES[self.fuente]
+        if self.estados is not None and set(self.estados) == set(ESTADOS_ROLLUP) \
+                and (self.desde is None or _es_inicio_de_dia(self.desde)) \
+                and (self.hasta is None or _es_fin_de_dia(self.hasta)):
+            for rollup in fuente.rollups:
+                if set(self.dimensiones) <= set(rollup.dimensiones) and set(self.medidas) <= set(rollup.medidas):
+                    return rollup
+        return fuente.hechos
+
+    def _filtrada(self, tabla):
+        queryset = apps.get_model(tabla.modelo).objects.order_by()
+        if tabla.rollup:
+            desde = self.desde.date() if isinstance(self.desde, datetime) else self.desde
+            hasta = self.hasta.date() if isinstance(self.hasta, datetime) else self.hasta
+        else:
+            # Una fecha sin hora es el día completo
+            desde = self.desde if isinstance(self.desde, datetime) or self.desde is None \
+                else datetime.combine(self.desde, time.min)
+            hasta = self.hasta if isinstance(self.hasta, datetime) or self.hasta is None \
+                else datetime.combine(self.hasta, time.max)
+            if self.estados is not None:
+                queryset = queryset.filter(**{f'{tabla.estado}__in': list(self.estados)})
+        if desde is not None:
+            queryset = queryset.filter(**{f'{tabla.fecha}__gte': desde})
+        if hasta is not None:
+            queryset = queryset.filter(**{f'{tabla.fecha}__lte': hasta})
+        return queryset
+
+    def _agrupada(self, tabla):
+        columnas = {}
+        for dimension in self.dimensiones:
+            columnas.update(tabla.dimensiones[dimension])
+        campos = [columna for columna, ruta in columnas.items() if ruta == columna]
+        expresiones = {
+            columna: F(ruta) if isinstance(ruta, str) else ruta
+            for columna, ruta in columnas.items() if ruta != columna
+        }
+        queryset = self._filtrada(tabla).values(*campos, **expresiones)
+        if tabla.existe:
+            queryset = queryset.alias(_existe=Sum(tabla.existe)).filter(_existe__gt=0)
+        return queryset
+
+    def compilar(self):
+        """
+        Queryset de la consulta (una sola consulta SQL con GROUP BY)
+
+        Returns:
+            QuerySet de dicts con las columnas de las dimensiones y las medidas
+        """
+        if not self.dimensiones:
+            raise ValueError('Una consulta sin dimensiones se calcula con totales()')
+        tabla = self.tabla()
+        queryset = self._agrupada(tabla).annotate(
+            **{medida: tabla.medidas[medida] for medida in self.medidas}
+        )
+        if self.orden:
+            queryset = queryset.order_by(*self.orden)
+        if self.limite is not None:
+            queryset = queryset[:self.limite]
+        return queryset
+
+    def filas(self, convertir: Callable[[Dict], Dict]) -> FilasReporte:
+        """
+        Filas de la consulta para los exportadores
+
+        Args:
+            convertir: Función fila de compilar() -> fila del reporte
+
+        Returns:
+            FilasReporte; len() cuenta los grupos sin calcular las medidas
+        """
+        total = self._agrupada(self.tabla()).distinct()
+        if self.limite is not None:
+            total = total[:self.limite]
+        return FilasReporte(self.compilar(), convertir, consulta_total=total)
+
+    def totales(self) -> Dict:
+        """Medidas sobre todas las filas filtradas (sin agrupar)"""
+        tabla = self.tabla()
+        queryset = self._filtrada(tabla)
+        if tabla.existe:
+            queryset = queryset.filter(**{f'{tabla.existe}__gt': 0})
+        return queryset.aggregate(**{medida: tabla.medidas[medida] for medida in self.medidas})
@@ -1,7 +1,11 @@
 """
 Exportadores de reportes a diferentes formatos (PDF, Excel)
 """
-from io import BytesIO
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 from typing import Dict
 from datetime import datetime
 from reportlab.lib import colors
@@ -12,129 +16,182 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import openpyxl
-from openpyxl.cell.cell import MergedCell
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
+from django.conf import settings
+
+try:
+    from pypdf import PdfWriter
+except ImportError:  # sin pypdf, generar_multiple() renderiza todo en este proceso
+    PdfWriter = None
+
+
+def _seccion_pdf(datos_reporte: Dict, indice: int, total: int, ruta: str) -> str:
+    """Renderizar una sección de un PDF múltiple en su propio archivo (proceso hijo)"""
+    exporter = PDFExporter()
+    doc = exporter._documento_multiple(ruta)
+    doc.build(exporter._elementos_seccion(datos_reporte, indice, total, doc.width))
+    return ruta
 
 
 class PDFExporter:
-    """Exportador a PDF usando ReportLab"""
+    """
+    Exportador a PDF usando ReportLab
+    
+    El costo de maquetar una Table crece más que linealmente con sus filas,
+    así que los datos se parten en tablas de FILAS_POR_TABLA filas (cada una
+    con su encabezado y las mismas columnas), leídas de datos_reporte['datos']
+    a medida que se arman. El PDF se escribe en un archivo temporal.
+    
+    generar_multiple() puede renderizar cada reporte en un proceso aparte y
+    concatenar las secciones con pypdf (REPORTES_PDF_PROCESOS).
+    """
     
-    def generar(self, datos_reporte: Dict) -> BytesIO:
+    FILAS_POR_TABLA = 40
+    FILAS_MUESTRA = 200
+    # Ancho aproximado de un carácter en Helvetica 9 y relleno de cada celda (puntos)
+    ANCHO_CARACTER = 5
+    RELLENO_CELDA = 12
+    ANCHO_MAXIMO_COLUMNA = 50
+    
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        self.estilo_tabla = TableStyle([
+            # Encabezado
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            
+            # Datos
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('TOPPADDING', (0, 1), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+            
+            # Bordes
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#1e40af')),
+            
+            # Alternar colores de fila
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f4f6')]),
+        ])
+        self.estilo_titulo = ParagraphStyle(
+            'CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=18,
+            textColor=colors.HexColor('#1e40af'),
+            spaceAfter=12,
+            alignment=1  # Centrado
+        )
+    
+    def generar(self, datos_reporte: Dict, destino=None):
         """
         Generar PDF del reporte
         
         Args:
             datos_reporte: Diccionario con datos, columnas, título, etc.
+            destino: Archivo binario donde escribir (por defecto uno temporal)
         
         Returns:
-            BytesIO con el contenido del PDF
+            Archivo con el contenido del PDF, posicionado al inicio
         """
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
+        destino = destino if destino is not None else tempfile.TemporaryFile(suffix='.pdf')
+        doc = SimpleDocTemplate(destino, pagesize=A4)
         elementos = []
-        styles = getSampleStyleSheet()
-        
-        # Estilo para título
-        style_titulo = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=12,
-            alignment=1  # Centrado
-        )
-        
-        # Estilo para subtítulo
-        style_subtitulo = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.grey,
-            spaceAfter=20,
-            alignment=1
-        )
         
         # Agregar título
-        titulo = Paragraph(datos_reporte['titulo'], style_titulo)
-        elementos.append(titulo)
+        elementos.append(Paragraph(datos_reporte['titulo'], self.estilo_titulo))
         
         # Agregar subtítulo
         if datos_reporte.get('subtitulo'):
-            subtitulo = Paragraph(datos_reporte['subtitulo'], style_subtitulo)
-            elementos.append(subtitulo)
+            style_subtitulo = ParagraphStyle(
+                'CustomSubtitle',
+                parent=self.styles['Normal'],
+                fontSize=10,
+                textColor=colors.grey,
+                spaceAfter=20,
+                alignment=1
+            )
+            elementos.append(Paragraph(datos_reporte['subtitulo'], style_subtitulo))
         
         # Agregar información de generación
         info = Paragraph(
             f"Generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')} | "
             f"Total de registros: {datos_reporte['total_registros']}",
-            styles['Normal']
+            self.styles['Normal']
         )
         elementos.append(info)
         elementos.append(Spacer(1, 0.3 * inch))
         
-        # Crear tabla de datos
-        if datos_reporte['datos']:
-            # Preparar datos para la tabla
-            columnas = datos_reporte['columnas']
-            datos_tabla = [columnas]  # Primera fila: encabezados
-            
-            # Agregar filas de datos
-            for registro in datos_reporte['datos']:
-                fila = []
-                for col in columnas:
-                    # Mapear nombres de columnas a claves del diccionario
-                    key = self._normalizar_key(col)
-                    valor = registro.get(key, '')
-                    
-                    # Formatear valores
-                    if isinstance(valor, float):
-                        if 'total' in key or 'monto' in key or 'precio' in key or 'vendido' in key:
-                            valor = f"Bs {valor:,.2f}"
-                        else:
-                            valor = f"{valor:,.2f}"
-                    
-                    fila.append(str(valor))
-                datos_tabla.append(fila)
-            
-            # Crear tabla
-            tabla = Table(datos_tabla)
-            
-            # Estilo de la tabla
-            tabla.setStyle(TableStyle([
-                # Encabezado
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                
-                # Datos
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('TOPPADDING', (0, 1), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-                
-                # Bordes
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#1e40af')),
-                
-                # Alternar colores de fila
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f4f6')]),
-            ]))
-            
-            elementos.append(tabla)
-        else:
-            elementos.append(Paragraph("No hay datos para mostrar", styles['Normal']))
+        # Tablas de datos
+        elementos.extend(self._tablas(datos_reporte, doc.width, formatear_enteros=False))
         
         # Construir PDF
         doc.build(elementos)
-        buffer.seek(0)
-        return buffer
+        destino.seek(0)
+        return destino
+    
+    def _tablas(self, datos_reporte: Dict, ancho: float, formatear_enteros: bool) -> list:
+        """
+        Tablas de FILAS_POR_TABLA filas con los datos del reporte
+        
+        Los anchos de columna se calculan con las primeras FILAS_MUESTRA filas
+        y son los mismos en todas las tablas.
+        """
+        columnas = datos_reporte['columnas']
+        claves = [self._normalizar_key(columna) for columna in columnas]
+        filas = iter(datos_reporte['datos'])
+        muestra = [self._formatear_fila(r, claves, formatear_enteros) for r in islice(filas, self.FILAS_MUESTRA)]
+        if not muestra:
+            return [Paragraph("No hay datos para mostrar", self.styles['Normal'])]
+        
+        anchos = self._anchos_columna(columnas, muestra, ancho)
+        restantes = (self._formatear_fila(r, claves, formatear_enteros) for r in filas)
+        tablas = []
+        todas = chain(muestra, restantes)
+        while True:
+            bloque = list(islice(todas, self.FILAS_POR_TABLA))
+            if not bloque:
+                break
+            # repeatRows: si una tabla no entra en lo que queda de la página, la parte siguiente repite el encabezado
+            tabla = Table([columnas] + bloque, colWidths=anchos, repeatRows=1)
+            tabla.setStyle(self.estilo_tabla)
+            tablas.append(tabla)
+        return tablas
+    
+    def _anchos_columna(self, columnas: list, muestra: list, ancho: float) -> list:
+        """Ancho de cada columna según su texto más largo, reducidos si no entran en la página"""
+        anchos = [
+            min(max([len(columna)] + [len(fila[i]) for fila in muestra]), self.ANCHO_MAXIMO_COLUMNA)
+            * self.ANCHO_CARACTER + self.RELLENO_CELDA
+            for i, columna in enumerate(columnas)
+        ]
+        escala = min(1, ancho / sum(anchos))
+        return [a * escala for a in anchos]
+    
+    def _formatear_fila(self, registro: Dict, claves: list, formatear_enteros: bool) -> list:
+        """Valores de un registro como texto, en el orden de las columnas"""
+        tipos = (int, float) if formatear_enteros else float
+        fila = []
+        for key in claves:
+            valor = registro.get(key, '')
+            
+            # Formatear valores monetarios
+            if isinstance(valor, tipos):
+                if 'total' in key or 'monto' in key or 'precio' in key or 'vendido' in key:
+                    valor = f"Bs {valor:,.2f}"
+                else:
+                    valor = f"{valor:,.2f}"
+            
+            fila.append(str(valor))
+        return fila
     
     def _normalizar_key(self, columna: str) -> str:
         """Convertir nombre de columna a key del diccionario"""
@@ -149,416 +206,268 @@ class PDFExporter:
         normalized = normalized.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
         return normalized
     
-    def generar_multiple(self, reportes: list) -> BytesIO:
-        """
-        Generar PDF con múltiples reportes en el mismo documento
-        
-        Args:
-            reportes: Lista de diccionarios con datos de reportes
-        
-        Returns:
-            BytesIO con el contenido del PDF
-        """
-        buffer = BytesIO()
-        
-        # Configuración del documento (usando el tamaño de página del primer reporte)
-        tamaño_pagina = letter
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=tamaño_pagina,
+    def _documento_multiple(self, destino):
+        return SimpleDocTemplate(
+            destino,
+            pagesize=letter,
             rightMargin=30,
             leftMargin=30,
             topMargin=30,
             bottomMargin=30
         )
+    
+    def _elementos_seccion(self, datos_reporte: Dict, indice: int, total: int, ancho: float) -> list:
+        """Encabezado y tablas de un reporte dentro de un PDF múltiple"""
+        elementos = [Paragraph(datos_reporte['titulo'], self.estilo_titulo)]
         
-        elementos = []
-        styles = getSampleStyleSheet()
-        
-        # Agregar cada reporte
-        for idx, datos_reporte in enumerate(reportes):
-            # Si no es el primer reporte, agregar salto de página
-            if idx > 0:
-                elementos.append(PageBreak())
-            
-            # Encabezado del documento
-            titulo_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=18,
-                textColor=colors.HexColor('#1e40af'),
-                spaceAfter=12,
-                alignment=1  # Centrado
-            )
-            
-            titulo = Paragraph(datos_reporte['titulo'], titulo_style)
-            elementos.append(titulo)
-            
-            # Subtítulo
-            if datos_reporte.get('subtitulo'):
-                subtitulo_style = ParagraphStyle(
-                    'CustomSubtitle',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    textColor=colors.grey,
-                    spaceAfter=8,
-                    alignment=1
-                )
-                subtitulo = Paragraph(datos_reporte['subtitulo'], subtitulo_style)
-                elementos.append(subtitulo)
-            
-            # Información adicional
-            info_style = ParagraphStyle(
-                'CustomInfo',
-                parent=styles['Normal'],
-                fontSize=9,
-                spaceAfter=20,
+        # Subtítulo
+        if datos_reporte.get('subtitulo'):
+            subtitulo_style = ParagraphStyle(
+                'CustomSubtitle',
+                parent=self.styles['Normal'],
+                fontSize=10,
+                textColor=colors.grey,
+                spaceAfter=8,
                 alignment=1
             )
-            info = Paragraph(
-                f"Generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')} | Total de registros: {datos_reporte['total_registros']}",
-                info_style
+            elementos.append(Paragraph(datos_reporte['subtitulo'], subtitulo_style))
+        
+        # Información adicional
+        info_style = ParagraphStyle(
+            'CustomInfo',
+            parent=self.styles['Normal'],
+            fontSize=9,
+            spaceAfter=20,
+            alignment=1
+        )
+        elementos.append(Paragraph(
+            f"Generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')} | Total de registros: {datos_reporte['total_registros']}",
+            info_style
+        ))
+        
+        # Indicador de reporte múltiple
+        if total > 1:
+            indicador_style = ParagraphStyle(
+                'Indicador',
+                parent=self.styles['Normal'],
+                fontSize=10,
+                textColor=colors.HexColor('#1e40af'),
+                spaceAfter=10,
+                alignment=1,
+                fontName='Helvetica-Bold'
             )
-            elementos.append(info)
-            
-            # Indicador de reporte múltiple
-            if len(reportes) > 1:
-                indicador_style = ParagraphStyle(
-                    'Indicador',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    textColor=colors.HexColor('#1e40af'),
-                    spaceAfter=10,
-                    alignment=1,
-                    fontName='Helvetica-Bold'
-                )
-                indicador = Paragraph(f"Reporte {idx + 1} de {len(reportes)}", indicador_style)
-                elementos.append(indicador)
-            
-            # Tabla de datos
-            if datos_reporte['datos']:
-                # Encabezados
-                datos_tabla = [datos_reporte['columnas']]
-                
-                # Filas de datos
-                for registro in datos_reporte['datos']:
-                    fila = []
-                    for columna in datos_reporte['columnas']:
-                        key = self._normalizar_key(columna)
-                        valor = registro.get(key, '')
-                        
-                        # Formatear valores monetarios
-                        if isinstance(valor, (int, float)):
-                            if 'total' in key or 'monto' in key or 'precio' in key or 'vendido' in key:
-                                valor = f"Bs {valor:,.2f}"
-                            else:
-                                valor = f"{valor:,.2f}"
-                        
-                        fila.append(str(valor))
-                    
-                    datos_tabla.append(fila)
-                
-                # Crear tabla
-                tabla = Table(datos_tabla)
-                
-                # Estilo de la tabla
-                tabla.setStyle(TableStyle([
-                    # Encabezado
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    
-                    # Datos
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 1), (-1, -1), 9),
-                    ('TOPPADDING', (0, 1), (-1, -1), 6),
-                    ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-                    
-                    # Bordes
-                    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                    ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#1e40af')),
-                    
-                    # Alternar colores de fila
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f4f6')]),
-                ]))
-                
-                elementos.append(tabla)
-            else:
-                elementos.append(Paragraph("No hay datos para mostrar", styles['Normal']))
+            elementos.append(Paragraph(f"Reporte {indice + 1} de {total}", indicador_style))
         
-        # Construir PDF
-        doc.build(elementos)
-        buffer.seek(0)
-        return buffer
+        # Tablas de datos
+        elementos.extend(self._tablas(datos_reporte, ancho, formatear_enteros=True))
+        return elementos
+    
+    def generar_multiple(self, reportes: list, destino=None, procesos: int = None):
+        """
+        Generar PDF con múltiples reportes en el mismo documento
+        
+        Args:
+            reportes: Lista de diccionarios con datos de reportes
+            destino: Archivo binario donde escribir (por defecto uno temporal)
+            procesos: Procesos para renderizar las secciones en paralelo
+                      (por defecto settings.REPORTES_PDF_PROCESOS; 1 = en este proceso)
+        
+        Returns:
+            Archivo con el contenido del PDF, posicionado al inicio
+        """
+        destino = destino if destino is not None else tempfile.TemporaryFile(suffix='.pdf')
+        if procesos is None:
+            procesos = getattr(settings, 'REPORTES_PDF_PROCESOS', 1)
+        
+        if procesos > 1 and len(reportes) > 1 and PdfWriter is not None:
+            self._generar_en_paralelo(reportes, destino, procesos)
+        else:
+            doc = self._documento_multiple(destino)
+            elementos = []
+            for idx, datos_reporte in enumerate(reportes):
+                # Si no es el primer reporte, agregar salto de página
+                if idx > 0:
+                    elementos.append(PageBreak())
+                elementos.extend(self._elementos_seccion(datos_reporte, idx, len(reportes), doc.width))
+            doc.build(elementos)
+        
+        destino.seek(0)
+        return destino
+    
+    def _generar_en_paralelo(self, reportes: list, destino, procesos: int):
+        """Una sección por proceso, concatenadas en orden con pypdf"""
+        # Los procesos hijos reciben filas ya leídas (un QuerySet no viaja entre procesos)
+        secciones = [{**datos_reporte, 'datos': list(datos_reporte['datos'])} for datos_reporte in reportes]
+        
+        # spawn: el proceso web puede tener hilos y conexiones abiertas que no deben heredarse
+        contexto = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory(prefix='reporte-pdf-') as carpeta:
+            with ProcessPoolExecutor(max_workers=min(procesos, len(secciones)), mp_context=contexto) as pool:
+                rutas = list(pool.map(
+                    _seccion_pdf,
+                    secciones,
+                    range(len(secciones)),
+                    [len(secciones)] * len(secciones),
+                    [os.path.join(carpeta, f'seccion-{idx}.pdf') for idx in range(len(secciones))],
+                ))
+            
+            writer = PdfWriter()
+            for ruta in rutas:
+                writer.append(ruta)
+            writer.write(destino)
 
 
 class ExcelExporter:
-    """Exportador a Excel usando openpyxl"""
+    """
+    Exportador a Excel usando openpyxl en modo write-only
+    
+    Las filas se escriben a medida que se leen de datos_reporte['datos']
+    (lista o FilasReporte) y el libro se guarda en un archivo temporal, así la
+    memoria no crece con la cantidad de filas. Los anchos de columna se
+    calculan con las primeras FILAS_MUESTRA filas.
+    """
     
-    def generar(self, datos_reporte: Dict) -> BytesIO:
+    FILAS_MUESTRA = 200
+    FORMATO_MONEDA = '"Bs "#,##0.00'
+    FORMATO_NUMERO = '#,##0.00'
+    
+    def __init__(self):
+        borde = Side(style='thin')
+        self.estilos = {
+            'titulo': {'font': Font(size=16, bold=True, color="1e40af"), 'alignment': Alignment(horizontal='center')},
+            'subtitulo': {'font': Font(size=10, color="666666"), 'alignment': Alignment(horizontal='center')},
+            'info': {'font': Font(size=9), 'alignment': Alignment(horizontal='center')},
+            'indicador': {'font': Font(size=12, bold=True, color="1e40af"), 'alignment': Alignment(horizontal='center')},
+            'encabezado': {
+                'font': Font(bold=True, color="FFFFFF"),
+                'fill': PatternFill(start_color="1e40af", end_color="1e40af", fill_type="solid"),
+                'alignment': Alignment(horizontal='center'),
+            },
+        }
+        self.border = Border(left=borde, right=borde, top=borde, bottom=borde)
+        self.fill_alterno = PatternFill(start_color="f3f4f6", end_color="f3f4f6", fill_type="solid")
+    
+    def generar(self, datos_reporte: Dict, destino=None):
         """
         Generar Excel del reporte
         
         Args:
             datos_reporte: Diccionario con datos, columnas, título, etc.
+            destino: Archivo binario donde escribir (por defecto uno temporal)
         
         Returns:
-            BytesIO con el contenido del Excel
+            Archivo con el contenido del Excel, posicionado al inicio
         """
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.title = "Reporte"
-        
-        # Estilos
-        titulo_font = Font(size=16, bold=True, color="1e40af")
-        subtitulo_font = Font(size=10, color="666666")
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="1e40af", end_color="1e40af", fill_type="solid")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        fila_actual = 1
-        
-        # Título
-        col_count = len(datos_reporte['columnas'])
-        sheet.merge_cells(f'A{fila_actual}:{get_column_letter(col_count)}{fila_actual}')
-        cell_titulo = sheet[f'A{fila_actual}']
-        cell_titulo.value = datos_reporte['titulo']
-        cell_titulo.font = titulo_font
-        cell_titulo.alignment = Alignment(horizontal='center')
-        fila_actual += 1
-        
-        # Subtítulo
-        if datos_reporte.get('subtitulo'):
-            sheet.merge_cells(f'A{fila_actual}:{get_column_letter(col_count)}{fila_actual}')
-            cell_subtitulo = sheet[f'A{fila_actual}']
-            cell_subtitulo.value = datos_reporte['subtitulo']
-            cell_subtitulo.font = subtitulo_font
-            cell_subtitulo.alignment = Alignment(horizontal='center')
-            fila_actual += 1
-        
-        # Info
-        sheet.merge_cells(f'A{fila_actual}:{get_column_letter(col_count)}{fila_actual}')
-        cell_info = sheet[f'A{fila_actual}']
-        cell_info.value = f"Generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')} | Total de registros: {datos_reporte['total_registros']}"
-        cell_info.font = Font(size=9)
-        cell_info.alignment = Alignment(horizontal='center')
-        fila_actual += 2  # Espacio
-        
-        # Encabezados
-        for col_idx, columna in enumerate(datos_reporte['columnas'], start=1):
-            cell = sheet.cell(row=fila_actual, column=col_idx)
-            cell.value = columna
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = border
-        
-        fila_actual += 1
-        
-        # Datos
-        for registro in datos_reporte['datos']:
-            for col_idx, columna in enumerate(datos_reporte['columnas'], start=1):
-                key = self._normalizar_key(columna)
-                valor = registro.get(key, '')
-                
-                cell = sheet.cell(row=fila_actual, column=col_idx)
-                
-                # Establecer valor (mantener tipos para Excel)
-                if isinstance(valor, str) and valor.startswith('Bs '):
-                    # Convertir "Bs 1234.56" a número
-                    try:
-                        cell.value = float(valor.replace('Bs ', '').replace(',', ''))
-                        cell.number_format = '"Bs "#,##0.00'
-                    except:
-                        cell.value = valor
-                elif isinstance(valor, (int, float)):
-                    cell.value = valor
-                    if 'total' in key or 'monto' in key or 'precio' in key or 'vendido' in key:
-                        cell.number_format = '"Bs "#,##0.00'
-                    else:
-                        cell.number_format = '#,##0.00'
-                else:
-                    cell.value = str(valor)
-                
-                cell.border = border
-                
-                # Alternar colores
-                if fila_actual % 2 == 0:
-                    cell.fill = PatternFill(start_color="f3f4f6", end_color="f3f4f6", fill_type="solid")
-            
-            fila_actual += 1
-        
-        # Ajustar anchos de columna
-        for col_idx in range(1, col_count + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = 0
-            
-            for cell in sheet[col_letter]:
-                # Saltar celdas combinadas
-                if isinstance(cell, MergedCell):
-                    continue
-                try:
-                    if cell.value and len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            adjusted_width = min(max_length + 2, 50)
-            sheet.column_dimensions[col_letter].width = adjusted_width
-        
-        # Guardar en BytesIO
-        buffer = BytesIO()
-        workbook.save(buffer)
-        buffer.seek(0)
-        return buffer
+        workbook = openpyxl.Workbook(write_only=True)
+        self._escribir_hoja(workbook, datos_reporte, "Reporte")
+        return self._guardar(workbook, destino)
     
-    def generar_multiple(self, reportes: list) -> BytesIO:
+    def generar_multiple(self, reportes: list, destino=None):
         """
         Generar Excel con múltiples reportes en hojas separadas
         
         Args:
             reportes: Lista de diccionarios con datos de reportes
+            destino: Archivo binario donde escribir (por defecto uno temporal)
         
         Returns:
-            BytesIO con el contenido del Excel
+            Archivo con el contenido del Excel, posicionado al inicio
         """
-        workbook = openpyxl.Workbook()
-        # Eliminar la hoja por defecto
-        workbook.remove(workbook.active)
-        
-        # Estilos comunes
-        titulo_font = Font(size=16, bold=True, color="1e40af")
-        subtitulo_font = Font(size=10, color="666666")
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="1e40af", end_color="1e40af", fill_type="solid")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        workbook = openpyxl.Workbook(write_only=True)
         
         # Crear una hoja por cada reporte
         for idx, datos_reporte in enumerate(reportes):
             # Nombre de la hoja (limitado a 31 caracteres)
             titulo_hoja = datos_reporte.get('titulo', f'Reporte {idx + 1}')[:31]
-            sheet = workbook.create_sheet(title=titulo_hoja)
-            
-            col_count = len(datos_reporte['columnas'])
-            fila_actual = 1
-            
-            # Indicador de reporte múltiple
-            if len(reportes) > 1:
-                sheet.merge_cells(f'A{fila_actual}:{get_column_letter(col_count)}{fila_actual}')
-                cell_indicador = sheet[f'A{fila_actual}']
-                cell_indicador.value = f"Reporte {idx + 1} de {len(reportes)}"
-                cell_indicador.font = Font(size=12, bold=True, color="1e40af")
-                cell_indicador.alignment = Alignment(horizontal='center')
-                fila_actual += 1
-            
-            # Título
-            sheet.merge_cells(f'A{fila_actual}:{get_column_letter(col_count)}{fila_actual}')
-            cell_titulo = sheet[f'A{fila_actual}']
-            cell_titulo.value = datos_reporte['titulo']
-            cell_titulo.font = titulo_font
-            cell_titulo.alignment = Alignment(horizontal='center')
+            indicador = f"Reporte {idx + 1} de {len(reportes)}" if len(reportes) > 1 else None
+            self._escribir_hoja(workbook, datos_reporte, titulo_hoja, indicador)
+        
+        return self._guardar(workbook, destino)
+    
+    def _guardar(self, workbook, destino):
+        if destino is None:
+            destino = tempfile.TemporaryFile(suffix='.xlsx')
+        workbook.save(destino)
+        destino.seek(0)
+        return destino
+    
+    def _celda(self, sheet, valor, estilo=None):
+        cell = WriteOnlyCell(sheet, value=valor)
+        for atributo, objeto in (estilo or {}).items():
+            setattr(cell, atributo, objeto)
+        return cell
+    
+    def _escribir_hoja(self, workbook, datos_reporte: Dict, titulo_hoja: str, indicador: str = None):
+        """Escribir un reporte en una hoja nueva, fila por fila"""
+        sheet = workbook.create_sheet(title=titulo_hoja)
+        columnas = datos_reporte['columnas']
+        col_count = len(columnas)
+        ultima_columna = get_column_letter(col_count)
+        claves = [self._normalizar_key(columna) for columna in columnas]
+        
+        # Muestra de filas para los anchos: en write-only se fijan antes de escribir
+        filas = iter(datos_reporte['datos'])
+        muestra = list(islice(filas, self.FILAS_MUESTRA))
+        for col_idx, (columna, key) in enumerate(zip(columnas, claves), start=1):
+            max_length = max([len(str(columna))] + [len(str(r.get(key, ''))) for r in muestra])
+            sheet.column_dimensions[get_column_letter(col_idx)].width = min(max_length + 2, 50)
+        
+        # Encabezado del reporte (filas combinadas a lo ancho de la tabla)
+        fila_actual = 1
+        cabecera = []
+        if indicador:
+            cabecera.append((indicador, 'indicador'))
+        cabecera.append((datos_reporte['titulo'], 'titulo'))
+        if datos_reporte.get('subtitulo'):
+            cabecera.append((datos_reporte['subtitulo'], 'subtitulo'))
+        cabecera.append((
+            f"Generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')} | "
+            f"Total de registros: {datos_reporte['total_registros']}",
+            'info'
+        ))
+        for texto, estilo in cabecera:
+            sheet.append([self._celda(sheet, texto, self.estilos[estilo])])
+            sheet.merged_cells.add(f'A{fila_actual}:{ultima_columna}{fila_actual}')
             fila_actual += 1
+        sheet.append([])  # Espacio
+        fila_actual += 1
+        
+        # Encabezados
+        sheet.append([
+            self._celda(sheet, columna, {**self.estilos['encabezado'], 'border': self.border})
+            for columna in columnas
+        ])
+        fila_actual += 1
+        
+        # Datos
+        for registro in chain(muestra, filas):
+            estilo = {'border': self.border}
+            # Alternar colores
+            if fila_actual % 2 == 0:
+                estilo['fill'] = self.fill_alterno
             
-            # Subtítulo
-            if datos_reporte.get('subtitulo'):
-                sheet.merge_cells(f'A{fila_actual}:{get_column_letter(col_count)}{fila_actual}')
-                cell_subtitulo = sheet[f'A{fila_actual}']
-                cell_subtitulo.value = datos_reporte['subtitulo']
-                cell_subtitulo.font = subtitulo_font
-                cell_subtitulo.alignment = Alignment(horizontal='center')
-                fila_actual += 1
-            
-            # Info
-            sheet.merge_cells(f'A{fila_actual}:{get_column_letter(col_count)}{fila_actual}')
-            cell_info = sheet[f'A{fila_actual}']
-            cell_info.value = f"Generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')} | Total de registros: {datos_reporte['total_registros']}"
-            cell_info.font = Font(size=9)
-            cell_info.alignment = Alignment(horizontal='center')
-            fila_actual += 2  # Espacio
-            
-            # Encabezados
-            for col_idx, columna in enumerate(datos_reporte['columnas'], start=1):
-                cell = sheet.cell(row=fila_actual, column=col_idx)
-                cell.value = columna
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = border
-            
+            celdas = []
+            for key in claves:
+                valor, formato = self._valor_excel(registro.get(key, ''), key)
+                cell = self._celda(sheet, valor, estilo)
+                if formato:
+                    cell.number_format = formato
+                celdas.append(cell)
+            sheet.append(celdas)
             fila_actual += 1
-            
-            # Datos
-            for registro in datos_reporte['datos']:
-                for col_idx, columna in enumerate(datos_reporte['columnas'], start=1):
-                    key = self._normalizar_key(columna)
-                    valor = registro.get(key, '')
-                    
-                    cell = sheet.cell(row=fila_actual, column=col_idx)
-                    
-                    # Establecer valor (mantener tipos para Excel)
-                    if isinstance(valor, str) and valor.startswith('Bs '):
-                        # Convertir "Bs 1234.56" a número
-                        try:
-                            cell.value = float(valor.replace('Bs ', '').replace(',', ''))
-                            cell.number_format = '"Bs "#,##0.00'
-                        except:
-                            cell.value = valor
-                    elif isinstance(valor, (int, float)):
-                        cell.value = valor
-                        if 'total' in key or 'monto' in key or 'precio' in key or 'vendido' in key:
-                            cell.number_format = '"Bs "#,##0.00'
-                        else:
-                            cell.number_format = '#,##0.00'
-                    else:
-                        cell.value = str(valor)
-                    
-                    cell.border = border
-                    
-                    # Alternar colores
-                    if fila_actual % 2 == 0:
-                        cell.fill = PatternFill(start_color="f3f4f6", end_color="f3f4f6", fill_type="solid")
-                
-                fila_actual += 1
-            
-            # Ajustar anchos de columna
-            for col_idx in range(1, col_count + 1):
-                col_letter = get_column_letter(col_idx)
-                max_length = 0
-                
-                for cell in sheet[col_letter]:
-                    # Saltar celdas combinadas
-                    if isinstance(cell, MergedCell):
-                        continue
-                    try:
-                        if cell.value and len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                
-                adjusted_width = min(max_length + 2, 50)
-                sheet.column_dimensions[col_letter].width = adjusted_width
-        
-        # Guardar en BytesIO
-        buffer = BytesIO()
-        workbook.save(buffer)
-        buffer.seek(0)
-        return buffer
+    
+    def _valor_excel(self, valor, key: str):
+        """Valor de la celda (manteniendo tipos para Excel) y su formato numérico"""
+        es_moneda = 'total' in key or 'monto' in key or 'precio' in key or 'vendido' in key
+        if isinstance(valor, str) and valor.startswith('Bs '):
+            # Convertir "Bs 1234.56" a número
+            try:
+                return float(valor.replace('Bs ', '').replace(',', '')), self.FORMATO_MONEDA
+            except ValueError:
+                return valor, None
+        if isinstance(valor, (int, float)):
+            return valor, self.FORMATO_MONEDA if es_moneda else self.FORMATO_NUMERO
+        return str(valor), None
     
     def _normalizar_key(self, columna: str) -> str:
         """Convertir nombre de columna a key del diccionario"""
@@ -572,3 +481,33 @@ class ExcelExporter:
         # Remover acentos
         normalized = normalized.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
         return normalized
+
+
+CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+EXTENSIONES = {'pdf': 'pdf', 'excel': 'xlsx'}
+
+
+def exportar(reportes: list, formato: str):
+    """
+    Generar el archivo de uno o varios reportes
+    
+    Args:
+        reportes: Lista de resultados de ReporteGenerator.generar_datos()
+        formato: 'pdf' o 'excel'
+    
+    Returns:
+        tuple: (archivo temporal posicionado al inicio, nombre de archivo, content type)
+    """
+    exporter = PDFExporter() if formato == 'pdf' else ExcelExporter()
+    marca = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if len(reportes) > 1:
+        archivo = exporter.generar_multiple(reportes)
+        nombre = f"reportes_combinados_{marca}.{EXTENSIONES[formato]}"
+    else:
+        archivo = exporter.generar(reportes[0])
+        titulo = reportes[0].get('titulo', 'reporte').replace(' ', '_')
+        nombre = f"{titulo}_{marca}.{EXTENSIONES[formato]}"
+    return archivo, nombre, CONTENT_TYPES[formato]
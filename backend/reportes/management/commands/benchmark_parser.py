@@ -0,0 +1,85 @@
+"""
+Comando para medir el parser de prompts con prompts reales.
+
+Uso:
+    python manage.py benchmark_parser [--repeticiones 20] [--limite 1000]
+
+    El corpus son los prompts guardados en ReporteGenerado (los más recientes,
+    hasta --limite) más unos ejemplos fijos. Cada prompt pasa por el mismo
+    camino que las vistas: detectar_multiples_reportes() y luego
+    interpretar_prompt() por cada parte. Se informa el tiempo por prompt
+    sin caché (vaciándolo antes de cada pasada) y con el caché ya cargado.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from reportes.models import ReporteGenerado
+from reportes.prompt_parser import detectar_multiples_reportes, interpretar_prompt, limpiar_cache
+
+EJEMPLOS = [
+    'Quiero un reporte de ventas del mes de septiembre, agrupado por producto, en PDF',
+    'Reporte de ventas de los últimos 7 días en excel',
+    'Ventas por categoría de octubre y noviembre',
+    'Clientes que más compraron en los últimos 3 meses, con nombre del cliente y monto total',
+    'Productos más vendidos del 01/09/2024 al 30/09/2024 en hoja de cálculo',
+    'Reporte de ventas por cliente y también productos más vendidos en pantalla',
+    'Dos reportes: ventas por producto y ventas por cliente',
+    'Ventas agrupadas por fecha y categoría del periodo del 01/01/2024 al 31/03/2024',
+]
+
+
+def _interpretar(prompt):
+    return [interpretar_prompt(parte) for parte in detectar_multiples_reportes(prompt)]
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de interpretación de prompts con y sin caché'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=20,
+            help='Pasadas sobre el corpus (se toma la mejor)'
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=1000,
+            help='Prompts guardados a incluir en el corpus'
+        )
+
+    def _medir(self, corpus, repeticiones, vaciar):
+        mejor = None
+        for _ in range(repeticiones):
+            if vaciar:
+                limpiar_cache()
+            inicio = time.perf_counter()
+            for prompt in corpus:
+                _interpretar(prompt)
+            duracion = time.perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        return mejor / len(corpus) * 1_000_000
+
+    def handle(self, *args, **options):
+        repeticiones = max(options['repeticiones'], 1)
+        guardados = list(
+            ReporteGenerado.objects.exclude(prompt_original='')
+            .order_by('-created_at')
+            .values_list('prompt_original', flat=True)[:options['limite']]
+        )
+        corpus = guardados + EJEMPLOS
+        self.stdout.write(f'📝 Corpus: {len(corpus)} prompts ({len(guardados)} guardados)')
+
+        sin_cache = self._medir(corpus, repeticiones, vaciar=True)
+        for prompt in corpus:  # cargar el caché
+            _interpretar(prompt)
+        con_cache = self._medir(corpus, repeticiones, vaciar=False)
+        limpiar_cache()
+
+        self.stdout.write(f'  Sin caché: {sin_cache:8.1f} µs/prompt')
+        self.stdout.write(f'  Con caché: {con_cache:8.1f} µs/prompt')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(corpus)} prompts interpretados, caché {sin_cache / con_cache:.1f}x más rápido'
+        ))
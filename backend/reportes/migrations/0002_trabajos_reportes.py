@@ -0,0 +1,40 @@
+# Generated by Django 5.0.7 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+
+def marcar_historial_completado(apps, schema_editor):
+    # Los reportes anteriores a los trabajos en segundo plano ya estaban generados
+    ReporteGenerado = apps.get_model('reportes', 'ReporteGenerado')
+    ReporteGenerado.objects.update(estado='COMPLETADO')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='clave',
+            field=models.CharField(blank=True, db_index=True, help_text='Hash de los parámetros interpretados: reportes iguales comparten archivo', max_length=64, verbose_name='Clave'),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='Error'),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='finalizado_en',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Finalizado el'),
+        ),
+        migrations.RunPython(marcar_historial_completado, migrations.RunPython.noop),
+    ]
@@ -8,6 +8,10 @@ class ReporteGenerado(models.Model):
     """
     Modelo para almacenar historial de reportes generados.
     Permite auditoría y reutilización de reportes previos.
+
+    También es el trabajo de generación en segundo plano: POST
+    /api/reportes/solicitar/ lo crea PENDIENTE y la tarea
+    reportes.generar_reporte guarda el archivo y lo deja COMPLETADO.
     """
     TIPO_CHOICES = [
         ('ventas', 'Ventas'),
@@ -22,6 +26,14 @@ class ReporteGenerado(models.Model):
         ('json', 'JSON'),
     ]
 
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+    ESTADOS_ACTIVOS = ('PENDIENTE', 'EN_PROCESO')
+
     AGRUPACION_CHOICES = [
         ('producto', 'Por Producto'),
         ('cliente', 'Por Cliente'),
@@ -78,10 +90,32 @@ class ReporteGenerado(models.Model):
         null=True,
         blank=True
     )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='PENDIENTE',
+        verbose_name='Estado'
+    )
+    clave = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name='Clave',
+        help_text='Hash de los parámetros interpretados: reportes iguales comparten archivo'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Error'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Fecha de Generación'
     )
+    finalizado_en = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Finalizado el'
+    )
 
     class Meta:
         verbose_name = 'Reporte Generado'
@@ -1,106 +1,189 @@
 """
 Servicio para interpretar prompts de texto y extraer parámetros de reportes
+
+interpretar_comando se llama en cada frase dictada, así que todo el trabajo
+que no depende del prompt se hace al importar el módulo:
+
+- Las expresiones regulares se compilan una sola vez
+- Las palabras clave (tipos, formatos, campos, "de <mes>") se buscan una
+  sola vez por prompt (_Vocabulario) y los detectores consultan ese conjunto
+- El análisis de cada prompt normalizado queda en un caché LRU; las fechas
+  relativas ("últimos 7 días", el año en curso) se guardan como especificación
+  y se resuelven en cada llamada, así el caché no devuelve fechas viejas
+
+Benchmark con prompts reales: python manage.py benchmark_parser
 """
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from dateutil import parser as date_parser
+from dateutil.relativedelta import relativedelta
+
+# Prompts distintos que se recuerdan ya interpretados
+TAMANO_CACHE = 1024
+
+MESES_VALIDOS = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
+                 'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre')
+
+# detectar_multiples_reportes: separadores explícitos (alta confianza), en orden de
+# prioridad, con una subcadena que deben contener (descarta sin evaluar la expresión)
+SEPARADORES_EXPLICITOS = [
+    (literal, re.compile(separador, re.IGNORECASE)) for literal, separador in (
+        ('también', r'\s+y\s+también\s+'),
+        ('además', r'\s+y\s+además\s+'),
+        ('también', r'\s+también\s+quiero\s+'),
+        ('además', r'\s+además\s+quiero\s+'),
+        ('otro', r'\s+y\s+otro\s+'),
+        ('segundo', r'\s+y\s+segundo\s+'),
+        ('tercero', r'\s+y\s+tercero\s+'),
+        ('', r'[:;]\s+'),  # Dos puntos o punto y coma
+    )
+]
+# "<palabra> y <palabra>": se busca la conjunción y se retrocede hasta el inicio
+# de la palabra anterior (probar (\w+) en cada posición es lo más caro del parser)
+CONJUNCION_Y = re.compile(r'(?<=\w)\s+y\s+(\w+)')
+PATRON_TABLAS = re.compile(r'(?:tabla|reporte)\s+.*?\s+y\s+(?:otra\s+)?(?:tabla|reporte)')
+SEPARADOR_TABLAS = re.compile(r'\s+y\s+(?:otra\s+)?tabla', re.IGNORECASE)
+PREFIJO_TABLA = re.compile(r'^tabla\s+', re.IGNORECASE)
+PATRON_DOBLE = re.compile(
+    r'(?:ventas?|reportes?)\s+.*?\s+por\s+\w+\s+y\s+(?:productos?|clientes?|categorías?)\s+'
+    r'(?:más\s+vendidos?|top|mejores?|principales?)'
+)
+DIVISION_DOBLE = re.compile(
+    r'(.*?)\s+y\s+((?:productos?|clientes?|categorías?)\s+(?:más\s+vendidos?|top|mejores?|principales?).*)',
+    re.IGNORECASE
+)
+PATRON_CANTIDAD_REPORTES = re.compile(r'\d+\s+(?:reportes?|tablas?)')
+SEPARADOR_Y = re.compile(r'\s+y\s+', re.IGNORECASE)
+
+# PromptParser
+PATRONES_AGRUPACION = [
+    re.compile(r'agrupado por ([a-záéíóúñ]+)'),
+    re.compile(r'agrupar por ([a-záéíóúñ]+)'),
+    re.compile(r'por ([a-záéíóúñ]+)'),
+]
+_FECHA = r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})'
+PATRON_RANGO_FECHAS = re.compile(rf'del?\s+{_FECHA}\s+al?\s+{_FECHA}')
+PATRON_PERIODO = re.compile(rf'periodo del?\s+{_FECHA}\s+al?\s+{_FECHA}')
+PATRON_ULTIMOS = re.compile(r'últimos?\s+(\d+)\s+(día|dias|mes|meses)')
+ESPACIOS = re.compile(r'\s+')
+
+
+class _Vocabulario:
+    """
+    Palabras clave de todos los detectores, buscadas una sola vez por prompt
+
+    presentes() equivale a evaluar `palabra in texto` para cada palabra (la
+    búsqueda de subcadenas de CPython es más rápida que una expresión regular
+    con todas las palabras) y los detectores consultan el conjunto resultante
+    en lugar de recorrer el texto cada uno.
+    """
+
+    def __init__(self, palabras):
+        self.palabras = tuple(dict.fromkeys(palabras))
+
+    def presentes(self, texto: str) -> frozenset:
+        """Palabras del vocabulario que aparecen en el texto"""
+        return frozenset(palabra for palabra in self.palabras if palabra in texto)
+
+
+def _palabras_con_y(texto: str) -> Optional[Tuple[str, str]]:
+    """
+    Igual que re.search(r'(\w+)\s+y\s+(\w+)', texto).groups()
+
+    Returns:
+        (palabra anterior, palabra siguiente) de la primera "X y Z", o None
+    """
+    match = CONJUNCION_Y.search(texto)
+    if match is None:
+        return None
+    inicio = match.start()
+    # \w en patrones str = isalnum() o guion bajo
+    while inicio > 0 and (texto[inicio - 1].isalnum() or texto[inicio - 1] == '_'):
+        inicio -= 1
+    return texto[inicio:match.start()], match.group(1)
+
+
+def _normalizar(prompt: str) -> str:
+    """Minúsculas y espacios simples: clave del caché de prompts"""
+    return ESPACIOS.sub(' ', prompt.lower()).strip()
 
 
 def detectar_multiples_reportes(prompt: str) -> List[str]:
     """
     Detecta si el prompt solicita múltiples reportes y los separa.
-    
+
     Palabras clave:
     - "Y también", "Y además", "también quiero", "además quiero"
     - "2 reportes", "dos reportes", "3 reportes"
     - Separación con "Y" entre comandos distintos
-    
+
     Ejemplos que separan:
     - "ventas por categoría Y productos más vendidos"
     - "ventas por cliente Y también productos top"
     - "reporte de ventas Y otro de productos"
     """
+    return list(_detectar_multiples_reportes(prompt))
+
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def _detectar_multiples_reportes(prompt: str) -> Tuple[str, ...]:
     prompt_lower = prompt.lower()
-    
-    # Detectar indicadores numéricos
-    match_numero = re.search(r'(\d+|dos|tres|cuatro|cinco)\s+reportes?', prompt_lower)
-    if match_numero:
-        # Si dice explícitamente cuántos reportes
-        cantidad_texto = match_numero.group(1)
-        cantidad_map = {'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5}
-        cantidad = cantidad_map.get(cantidad_texto, int(cantidad_texto) if cantidad_texto.isdigit() else 1)
-    
+
     # Buscar separadores explícitos (alta confianza)
-    separadores_explicitos = [
-        r'\s+y\s+también\s+',
-        r'\s+y\s+además\s+',
-        r'\s+también\s+quiero\s+',
-        r'\s+además\s+quiero\s+',
-        r'\s+y\s+otro\s+',
-        r'\s+y\s+segundo\s+',
-        r'\s+y\s+tercero\s+',
-        r'[:;]\s+',  # Dos puntos o punto y coma
-    ]
-    
-    for separador in separadores_explicitos:
-        if re.search(separador, prompt_lower):
+    for literal, separador in SEPARADORES_EXPLICITOS:
+        if literal in prompt_lower and separador.search(prompt_lower):
             # Dividir por el separador
-            partes = re.split(separador, prompt, flags=re.IGNORECASE)
+            partes = separador.split(prompt)
             # Limpiar y retornar
-            return [parte.strip() for parte in partes if parte.strip()]
-    
+            return tuple(parte.strip() for parte in partes if parte.strip())
+
     # IMPORTANTE: Verificar primero si es un rango de meses (NO separar)
     # "octubre y noviembre" = 1 reporte con rango de fechas
-    meses_validos = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 
-                     'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre']
-    patron_rango_meses = r'(\w+)\s+y\s+(\w+)'
-    match_meses = re.search(patron_rango_meses, prompt_lower)
-    if match_meses:
-        palabra1 = match_meses.group(1)
-        palabra2 = match_meses.group(2)
+    par = _palabras_con_y(prompt_lower)
+    if par:
+        palabra1, palabra2 = par
         # Si ambas palabras son meses, NO separar (es un rango de fechas)
-        if palabra1 in meses_validos and palabra2 in meses_validos:
-            return [prompt]
-    
+        if palabra1 in MESES_VALIDOS and palabra2 in MESES_VALIDOS:
+            return (prompt,)
+
     # Buscar patrón: "tabla ... y (otra) tabla ..."
     # Indica explícitamente dos tablas/reportes separados
-    patron_tablas = r'(?:tabla|reporte)\s+.*?\s+y\s+(?:otra\s+)?(?:tabla|reporte)'
-    if re.search(patron_tablas, prompt_lower):
+    if ('tabla' in prompt_lower or 'reporte' in prompt_lower) and PATRON_TABLAS.search(prompt_lower):
         # Dividir por " y otra tabla" o " y tabla"
-        partes = re.split(r'\s+y\s+(?:otra\s+)?tabla', prompt, flags=re.IGNORECASE)
+        partes = SEPARADOR_TABLAS.split(prompt)
         if len(partes) > 1:
             reportes = []
             for i, parte in enumerate(partes):
                 parte = parte.strip()
                 # Remover "tabla" del inicio si existe
-                parte = re.sub(r'^tabla\s+', '', parte, flags=re.IGNORECASE)
+                parte = PREFIJO_TABLA.sub('', parte)
                 if parte:
                     # Agregar contexto si es necesario
                     if i > 0 and not any(palabra in parte.lower() for palabra in ['reporte', 'mostrar', 'ventas', 'productos', 'quiero', 'ver']):
                         parte = f"mostrar {parte}"
                     reportes.append(parte)
             if len(reportes) > 1:
-                return reportes
-    
+                return tuple(reportes)
+
     # Buscar patrón: "X por Y y Z más vendidos/top/mejores"
     # Esto indica dos análisis diferentes: uno agrupado y otro de ranking
-    patron_doble = r'(?:ventas?|reportes?)\s+.*?\s+por\s+\w+\s+y\s+(?:productos?|clientes?|categorías?)\s+(?:más\s+vendidos?|top|mejores?|principales?)'
-    if re.search(patron_doble, prompt_lower):
+    if 'por' in prompt_lower and PATRON_DOBLE.search(prompt_lower):
         # Intentar dividir en dos partes
-        match = re.search(r'(.*?)\s+y\s+((?:productos?|clientes?|categorías?)\s+(?:más\s+vendidos?|top|mejores?|principales?).*)', prompt, flags=re.IGNORECASE)
+        match = DIVISION_DOBLE.search(prompt)
         if match:
             parte1 = match.group(1).strip()
             parte2 = match.group(2).strip()
             # Agregar contexto a la segunda parte si es necesario
             if not any(palabra in parte2.lower() for palabra in ['reporte', 'mostrar', 'ventas', 'quiero', 'ver']):
                 parte2 = f"mostrar {parte2}"
-            return [parte1, parte2]
-    
+            return (parte1, parte2)
+
     # Si menciona explícitamente múltiples reportes/tablas
-    if re.search(r'\d+\s+(?:reportes?|tablas?)', prompt_lower) or 'reportes' in prompt_lower or 'tablas' in prompt_lower:
+    if PATRON_CANTIDAD_REPORTES.search(prompt_lower) or 'reportes' in prompt_lower or 'tablas' in prompt_lower:
         # Dividir por " y " solo si hay contextos diferentes
-        partes_y = re.split(r'\s+y\s+', prompt, flags=re.IGNORECASE)
+        partes_y = SEPARADOR_Y.split(prompt)
         if len(partes_y) > 1:
             # Verificar que sean comandos diferentes (tienen palabras clave de reporte)
             comandos_validos = []
@@ -108,12 +191,12 @@ def detectar_multiples_reportes(prompt: str) -> List[str]:
                 parte_lower = parte.lower()
                 if any(palabra in parte_lower for palabra in ['reporte', 'mostrar', 'ventas', 'productos', 'clientes', 'quiero', 'ver']):
                     comandos_validos.append(parte.strip())
-            
+
             if len(comandos_validos) > 1:
-                return comandos_validos
-    
+                return tuple(comandos_validos)
+
     # Si no detectó múltiples reportes, retornar el prompt original
-    return [prompt]
+    return (prompt,)
 
 
 class PromptParser:
@@ -125,7 +208,7 @@ class PromptParser:
     - Formato de salida (PDF, Excel, pantalla)
     - Filtros adicionales
     """
-    
+
     # Palabras clave para tipo de reporte
     TIPOS_REPORTE = {
         'ventas': ['venta', 'ventas', 'pedido', 'pedidos', 'orden', 'ordenes'],
@@ -133,14 +216,14 @@ class PromptParser:
         'clientes': ['cliente', 'clientes', 'comprador', 'compradores', 'usuario', 'usuarios'],
         'categorias': ['categoría', 'categorias', 'categoria'],
     }
-    
+
     # Palabras clave para formato
     FORMATOS = {
         'pdf': ['pdf'],
         'excel': ['excel', 'xls', 'xlsx', 'hoja de cálculo', 'hoja'],
         'pantalla': ['pantalla', 'vista', 'ver', 'mostrar'],
     }
-    
+
     # Palabras clave para agrupación
     AGRUPACIONES = {
         'producto': ['producto', 'productos'],
@@ -149,18 +232,38 @@ class PromptParser:
         'fecha': ['fecha', 'día', 'dia', 'mes', 'año'],
         'estado': ['estado'],
     }
-    
+
+    # Campos comunes
+    CAMPOS = {
+        'nombre_cliente': ['nombre del cliente', 'cliente'],
+        'cantidad_compras': ['cantidad de compras', 'número de compras', 'compras'],
+        'monto_total': ['monto total', 'total pagado', 'total'],
+        'rango_fechas': ['rango de fechas', 'fechas'],
+        'producto': ['producto', 'nombre del producto'],
+        'cantidad': ['cantidad'],
+        'precio': ['precio'],
+    }
+
     # Meses en español
     MESES = {
         'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
         'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
         'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
     }
-    
+
+    # Todas las palabras clave que se buscan como subcadena, en un solo vocabulario
+    VOCABULARIO = _Vocabulario(
+        [palabra for palabras in TIPOS_REPORTE.values() for palabra in palabras]
+        + [palabra for palabras in FORMATOS.values() for palabra in palabras]
+        + [palabra for palabras in CAMPOS.values() for palabra in palabras]
+        # "mes de <mes>" contiene "de <mes>": alcanza con buscar este
+        + [f'de {mes}' for mes in MESES]
+    )
+
     def parse(self, prompt: str) -> Dict:
         """
         Parsear el prompt y extraer parámetros
-        
+
         Returns:
             {
                 'tipo': 'ventas',
@@ -173,173 +276,170 @@ class PromptParser:
                 'raw_prompt': prompt
             }
         """
-        prompt_lower = prompt.lower()
-        
-        resultado = {
-            'tipo': self._detectar_tipo(prompt_lower),
-            'formato': self._detectar_formato(prompt_lower),
-            'fecha_inicio': None,
-            'fecha_fin': None,
-            'agrupacion': self._detectar_agrupacion(prompt_lower),
+        analisis = _analizar(_normalizar(prompt))
+        fecha_inicio, fecha_fin = self._resolver_fechas(analisis['fechas'])
+
+        # Copias: quien llama puede modificar el resultado (p. ej. forzar el formato)
+        return {
+            'tipo': analisis['tipo'],
+            'formato': analisis['formato'],
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'agrupacion': list(analisis['agrupacion']),
             'filtros': {},
-            'campos': self._detectar_campos(prompt_lower),
+            'campos': list(analisis['campos']),
             'raw_prompt': prompt
         }
-        
-        # Detectar fechas
-        fecha_inicio, fecha_fin = self._detectar_fechas(prompt_lower)
-        resultado['fecha_inicio'] = fecha_inicio
-        resultado['fecha_fin'] = fecha_fin
-        
-        return resultado
-    
-    def _detectar_tipo(self, prompt: str) -> str:
+
+    def analizar(self, prompt_lower: str) -> Dict:
+        """
+        Todo lo que depende solo del texto (lo que guarda el caché)
+
+        Returns:
+            dict con tipo, formato, agrupacion y campos (tuplas) y fechas
+            (especificación para _resolver_fechas)
+        """
+        presentes = self.VOCABULARIO.presentes(prompt_lower)
+        return {
+            'tipo': self._detectar_tipo(presentes),
+            'formato': self._detectar_formato(presentes),
+            'agrupacion': tuple(self._detectar_agrupacion(prompt_lower)),
+            'campos': tuple(self._detectar_campos(presentes)),
+            'fechas': self._detectar_fechas(prompt_lower, presentes),
+        }
+
+    def _detectar_tipo(self, presentes: frozenset) -> str:
         """Detectar el tipo de reporte solicitado"""
         for tipo, palabras in self.TIPOS_REPORTE.items():
             for palabra in palabras:
-                if palabra in prompt:
+                if palabra in presentes:
                     return tipo
         return 'ventas'  # Por defecto
-    
-    def _detectar_formato(self, prompt: str) -> str:
+
+    def _detectar_formato(self, presentes: frozenset) -> str:
         """Detectar el formato de salida"""
         for formato, palabras in self.FORMATOS.items():
             for palabra in palabras:
-                if palabra in prompt:
+                if palabra in presentes:
                     return formato
         return 'pantalla'  # Por defecto
-    
+
     def _detectar_agrupacion(self, prompt: str) -> List[str]:
         """Detectar por qué campos agrupar"""
         agrupaciones = []
-        
+
         # Buscar "agrupado por X" o "por X"
-        patrones = [
-            r'agrupado por ([a-záéíóúñ]+)',
-            r'agrupar por ([a-záéíóúñ]+)',
-            r'por ([a-záéíóúñ]+)',
-        ]
-        
-        for patron in patrones:
-            matches = re.findall(patron, prompt)
+        for patron in PATRONES_AGRUPACION:
+            matches = patron.findall(prompt)
             for match in matches:
                 for key, palabras in self.AGRUPACIONES.items():
                     if match in palabras:
                         if key not in agrupaciones:
                             agrupaciones.append(key)
-        
+
         return agrupaciones if agrupaciones else ['fecha']  # Por defecto agrupar por fecha
-    
-    def _detectar_campos(self, prompt: str) -> List[str]:
+
+    def _detectar_campos(self, presentes: frozenset) -> List[str]:
         """Detectar qué campos mostrar"""
         campos = []
-        
-        # Campos comunes
-        campos_keywords = {
-            'nombre_cliente': ['nombre del cliente', 'cliente'],
-            'cantidad_compras': ['cantidad de compras', 'número de compras', 'compras'],
-            'monto_total': ['monto total', 'total pagado', 'total'],
-            'rango_fechas': ['rango de fechas', 'fechas'],
-            'producto': ['producto', 'nombre del producto'],
-            'cantidad': ['cantidad'],
-            'precio': ['precio'],
-        }
-        
-        for campo, keywords in campos_keywords.items():
+
+        for campo, keywords in self.CAMPOS.items():
             for keyword in keywords:
-                if keyword in prompt:
+                if keyword in presentes:
                     if campo not in campos:
                         campos.append(campo)
-        
+
         return campos
-    
-    def _detectar_fechas(self, prompt: str) -> Tuple[Optional[datetime], Optional[datetime]]:
-        """Detectar rangos de fechas en el prompt"""
-        fecha_inicio = None
-        fecha_fin = None
-        
+
+    def _detectar_fechas(self, prompt: str, presentes: frozenset) -> Optional[Tuple]:
+        """
+        Detectar rangos de fechas en el prompt
+
+        Returns:
+            None o una especificación que no depende del día en que se resuelve:
+            ('meses', mes_inicio, mes_fin), ('fechas', inicio, fin) o
+            ('ultimos', cantidad, unidad)
+        """
         # Patrón 1a: "mes de [mes1] y [mes2]" o "octubre y noviembre" (rango de meses)
-        patron_rango_meses = r'(?:mes de |de )?(\w+)\s+y\s+(\w+)'
-        match_rango = re.search(patron_rango_meses, prompt)
-        if match_rango:
-            mes1_str = match_rango.group(1).lower()
-            mes2_str = match_rango.group(2).lower()
-            
+        par = _palabras_con_y(prompt)
+        if par:
+            mes1_str = par[0].lower()
+            mes2_str = par[1].lower()
+
             # Verificar si ambos son meses válidos
             if mes1_str in self.MESES and mes2_str in self.MESES:
-                year = datetime.now().year
-                mes1_num = self.MESES[mes1_str]
-                mes2_num = self.MESES[mes2_str]
-                
-                # Inicio del primer mes
-                fecha_inicio = datetime(year, mes1_num, 1)
-                
-                # Fin del segundo mes
-                if mes2_num == 12:
-                    fecha_fin = datetime(year + 1, 1, 1)
-                else:
-                    fecha_fin = datetime(year, mes2_num + 1, 1)
-                
-                return fecha_inicio, fecha_fin
-        
+                return ('meses', self.MESES[mes1_str], self.MESES[mes2_str])
+
         # Patrón 1b: "mes de [mes]" (un solo mes)
         for mes_nombre, mes_num in self.MESES.items():
-            if f'mes de {mes_nombre}' in prompt or f'de {mes_nombre}' in prompt:
-                # Asumir año actual
-                year = datetime.now().year
-                fecha_inicio = datetime(year, mes_num, 1)
-                # Último día del mes
-                if mes_num == 12:
-                    fecha_fin = datetime(year + 1, 1, 1)
-                else:
-                    fecha_fin = datetime(year, mes_num + 1, 1)
-                return fecha_inicio, fecha_fin
-        
+            if f'de {mes_nombre}' in presentes:
+                return ('meses', mes_num, mes_num)
+
         # Patrón 2: "del DD/MM/YYYY al DD/MM/YYYY"
-        patron_rango = r'del?\s+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})\s+al?\s+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})'
-        match = re.search(patron_rango, prompt)
-        if match:
-            try:
-                fecha_inicio = date_parser.parse(match.group(1), dayfirst=True)
-                fecha_fin = date_parser.parse(match.group(2), dayfirst=True)
-                return fecha_inicio, fecha_fin
-            except:
-                pass
-        
         # Patrón 3: "periodo del ... al ..."
-        patron_periodo = r'periodo del?\s+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})\s+al?\s+(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})'
-        match = re.search(patron_periodo, prompt)
-        if match:
-            try:
-                fecha_inicio = date_parser.parse(match.group(1), dayfirst=True)
-                fecha_fin = date_parser.parse(match.group(2), dayfirst=True)
-                return fecha_inicio, fecha_fin
-            except:
-                pass
-        
+        for patron in (PATRON_RANGO_FECHAS, PATRON_PERIODO):
+            match = patron.search(prompt) if 'd' in prompt else None
+            if match:
+                try:
+                    fecha_inicio = date_parser.parse(match.group(1), dayfirst=True)
+                    fecha_fin = date_parser.parse(match.group(2), dayfirst=True)
+                    return ('fechas', fecha_inicio, fecha_fin)
+                except:
+                    pass
+
         # Patrón 4: "últimos N días/meses"
-        patron_ultimos = r'últimos?\s+(\d+)\s+(día|dias|mes|meses)'
-        match = re.search(patron_ultimos, prompt)
+        match = PATRON_ULTIMOS.search(prompt)
         if match:
-            cantidad = int(match.group(1))
-            unidad = match.group(2)
-            fecha_fin = datetime.now()
-            
-            if 'dia' in unidad:
-                from datetime import timedelta
-                fecha_inicio = fecha_fin - timedelta(days=cantidad)
-            elif 'mes' in unidad:
-                from dateutil.relativedelta import relativedelta
-                fecha_inicio = fecha_fin - relativedelta(months=cantidad)
-            
+            return ('ultimos', int(match.group(1)), match.group(2))
+
+        return None
+
+    def _resolver_fechas(self, fechas: Optional[Tuple]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Fechas concretas de una especificación de _detectar_fechas, a partir de hoy"""
+        if fechas is None:
+            return None, None
+
+        tipo, inicio, fin = fechas
+        if tipo == 'fechas':
+            return inicio, fin
+
+        if tipo == 'meses':
+            # Asumir año actual; el fin es el primer día del mes siguiente
+            year = datetime.now().year
+            fecha_inicio = datetime(year, inicio, 1)
+            if fin == 12:
+                fecha_fin = datetime(year + 1, 1, 1)
+            else:
+                fecha_fin = datetime(year, fin + 1, 1)
             return fecha_inicio, fecha_fin
-        
-        return None, None
+
+        # 'ultimos': N días o meses hasta ahora
+        cantidad, unidad = inicio, fin
+        fecha_inicio = None
+        fecha_fin = datetime.now()
+        if 'dia' in unidad:
+            fecha_inicio = fecha_fin - timedelta(days=cantidad)
+        elif 'mes' in unidad:
+            fecha_inicio = fecha_fin - relativedelta(months=cantidad)
+        return fecha_inicio, fecha_fin
+
+
+_PARSER = PromptParser()
+
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def _analizar(prompt_normalizado: str) -> Dict:
+    return _PARSER.analizar(prompt_normalizado)
+
+
+def limpiar_cache():
+    """Vaciar los cachés de prompts (tests y benchmark)"""
+    _analizar.cache_clear()
+    _detectar_multiples_reportes.cache_clear()
 
 
 def interpretar_prompt(prompt: str) -> Dict:
     """
     Función helper para interpretar un prompt
     """
-    parser = PromptParser()
-    return parser.parse(prompt)
+    return _PARSER.parse(prompt)
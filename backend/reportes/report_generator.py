@@ -1,28 +1,119 @@
 """
 Generador de reportes dinámicos basado en parámetros interpretados
+
+Los reportes de ventas se describen como consultas de reportes.consultas
+(dimensiones + medidas + filtros), que se leen de los rollups de analytics
+cuando pueden responderlas.
+
+Los resultados se guardan en caché por el hash de los parámetros que los
+definen (tipo, agrupación, rango de fechas, filtros):
+
+- Rangos que incluyen hoy (o sin fecha fin): la clave lleva el bloque de
+  REPORTES_CACHE_BLOQUE segundos en curso y las fechas truncadas a ese
+  bloque, así el resultado se recalcula en cada bloque nuevo y los prompts
+  relativos iguales ("últimos 7 días") comparten clave dentro del bloque
+- Rangos cerrados en el pasado: casi no cambian, se guardan
+  REPORTES_CACHE_HISTORICO_TTL segundos (un pedido antiguo que cambia de
+  estado se ve al vencer)
+
+Solo se guardan reportes de hasta REPORTES_CACHE_MAX_FILAS filas; los más
+grandes se siguen leyendo del queryset al exportar.
 """
-from django.db.models import Count, Sum, Avg, Q, F, Min, Max
-from django.db.models.functions import TruncDate, TruncMonth
-from datetime import datetime
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum, Q
+from datetime import date, datetime
 from typing import Dict, List
-from ventas.models import Pedido, ItemPedido
+from ventas.models import Pedido
 from productos.models import Producto
 from django.contrib.auth import get_user_model
 
+from .consultas import Consulta, FilasReporte
+
 User = get_user_model()
 
+# Estados en los que un pedido cuenta como venta en los reportes
+ESTADOS_VENTA = ['PAGADO', 'PROCESANDO', 'ENVIADO', 'ENTREGADO']
+
+
+def estados_venta() -> List[str]:
+    """
+    Estados de venta de los reportes (REPORTES_ESTADOS_VENTA)
+
+    Con los mismos que acumulan los rollups (PAGADO y ENTREGADO) los reportes
+    de ventas se leen de las tablas de analytics.
+    """
+    return list(getattr(settings, 'REPORTES_ESTADOS_VENTA', ESTADOS_VENTA))
+
+
+def truncar_fechas(parametros: Dict, segundos: int) -> Dict:
+    """
+    Copia de los parámetros con fecha_inicio y fecha_fin truncadas a bloques
+    de `segundos`, para calcular claves
+
+    Las fechas de los prompts relativos ("últimos 7 días") salen de now() con
+    microsegundos: sin truncarlas dos prompts iguales nunca comparten clave.
+    """
+    truncados = dict(parametros)
+    for campo in ('fecha_inicio', 'fecha_fin'):
+        valor = truncados.get(campo)
+        if isinstance(valor, datetime):
+            truncados[campo] = datetime.fromtimestamp(valor.timestamp() // segundos * segundos)
+    return truncados
+
+
+# Parámetros que determinan los datos (el formato o el prompt original no)
+PARAMETROS_CACHE = ('tipo', 'agrupacion', 'fecha_inicio', 'fecha_fin', 'filtros')
+
+
+def clave_cache(parametros: Dict):
+    """
+    Clave de caché y tiempo de vida para los datos de un reporte
+    
+    Returns:
+        tuple: (clave, segundos)
+    """
+    fecha_fin = parametros.get('fecha_fin')
+    if isinstance(fecha_fin, date) and not isinstance(fecha_fin, datetime):
+        fecha_fin = datetime.combine(fecha_fin, datetime.max.time())
+    # Un "últimos 7 días" termina en el now() del parseo, ya pasado: cuenta el día
+    abierto = fecha_fin is None or fecha_fin >= datetime.combine(date.today(), datetime.min.time())
+    bloque = getattr(settings, 'REPORTES_CACHE_BLOQUE', 300)
+    if abierto:
+        parametros = truncar_fechas(parametros, bloque)
+
+    canonicos = {campo: parametros.get(campo) for campo in PARAMETROS_CACHE}
+    canonicos['tipo'] = canonicos['tipo'] or 'ventas'
+    # El orden en que se nombran las agrupaciones no cambia el reporte
+    canonicos['agrupacion'] = sorted(canonicos['agrupacion'] or [])
+    canonicos['filtros'] = canonicos['filtros'] or {}
+    canonicos['estados'] = sorted(estados_venta())
+    texto = json.dumps(canonicos, sort_keys=True, cls=DjangoJSONEncoder, separators=(',', ':'))
+    clave = f"reportes:datos:{hashlib.sha256(texto.encode('utf-8')).hexdigest()}"
+    
+    if abierto:
+        return f"{clave}:{int(time.time() // bloque)}", bloque
+    return clave, getattr(settings, 'REPORTES_CACHE_HISTORICO_TTL', 86400)
+
 
 class ReporteGenerator:
     """
     Generador de consultas y datos para reportes
     """
     
-    def generar_datos(self, parametros: Dict) -> Dict:
+    def generar_datos(self, parametros: Dict, iterar: bool = False) -> Dict:
         """
         Generar los datos del reporte según los parámetros
         
         Args:
             parametros: Diccionario con tipo, fechas, agrupación, etc.
+            iterar: Devolver 'datos' como FilasReporte (se leen al recorrerlas)
+                    en lugar de una lista; para exportar a archivo. Los
+                    reportes que entran en caché se devuelven como lista
         
         Returns:
             {
@@ -33,56 +124,77 @@ class ReporteGenerator:
                 'total_registros': N
             }
         """
+        clave, ttl = clave_cache(parametros)
+        reporte = cache.get(clave)
+        if reporte is not None:
+            reporte['parametros'] = parametros
+            return reporte
+        
         tipo = parametros.get('tipo', 'ventas')
         
         if tipo == 'ventas':
-            return self._generar_reporte_ventas(parametros)
+            reporte = self._generar_reporte_ventas(parametros)
         elif tipo == 'productos':
-            return self._generar_reporte_productos(parametros)
+            reporte = self._generar_reporte_productos(parametros)
         elif tipo == 'clientes':
-            return self._generar_reporte_clientes(parametros)
+            reporte = self._generar_reporte_clientes(parametros)
         else:
-            return self._generar_reporte_ventas(parametros)
+            reporte = self._generar_reporte_ventas(parametros)
+        
+        # iter(): list() pediría len() a FilasReporte, un COUNT innecesario
+        if not iterar:
+            reporte['datos'] = list(iter(reporte['datos']))
+        reporte['total_registros'] = len(reporte['datos'])
+        if reporte['total_registros'] <= getattr(settings, 'REPORTES_CACHE_MAX_FILAS', 5000):
+            if iterar:
+                reporte['datos'] = list(iter(reporte['datos']))
+            cache.set(clave, {**reporte, 'parametros': None}, ttl)
+        return reporte
+    
+    def _consulta(self, params: Dict, fuente: str, dimensiones: List[str], medidas: List[str],
+                  orden: List[str]) -> Consulta:
+        """Consulta de ventas con el rango de fechas y los estados de venta"""
+        return Consulta(
+            fuente,
+            dimensiones=dimensiones,
+            medidas=medidas,
+            desde=params.get('fecha_inicio'),
+            hasta=params.get('fecha_fin'),
+            estados=estados_venta(),
+            orden=orden,
+        )
     
     def _generar_reporte_ventas(self, params: Dict) -> Dict:
         """Generar reporte de ventas"""
-        queryset = Pedido.objects.filter(estado__in=['PAGADO', 'PROCESANDO', 'ENVIADO', 'ENTREGADO'])
-        
-        # Aplicar filtro de fechas
-        if params.get('fecha_inicio'):
-            queryset = queryset.filter(creado__gte=params['fecha_inicio'])
-        if params.get('fecha_fin'):
-            queryset = queryset.filter(creado__lte=params['fecha_fin'])
-        
         agrupacion = params.get('agrupacion', [])
         
         # Caso 1: Agrupado por producto
         if 'producto' in agrupacion:
-            datos = self._agrupar_por_producto(queryset, params)
+            datos = self._agrupar_por_producto(params)
             columnas = ['Producto', 'Cantidad Vendida', 'Total Ventas', 'Precio Promedio']
             titulo = 'Reporte de Ventas por Producto'
         
         # Caso 2: Agrupado por cliente
         elif 'cliente' in agrupacion:
-            datos = self._agrupar_por_cliente(queryset, params)
+            datos = self._agrupar_por_cliente(params)
             columnas = ['Cliente', 'Cantidad de Compras', 'Monto Total', 'Rango de Fechas']
             titulo = 'Reporte de Ventas por Cliente'
         
         # Caso 3: Agrupado por fecha
         elif 'fecha' in agrupacion or not agrupacion:
-            datos = self._agrupar_por_fecha(queryset, params)
+            datos = self._agrupar_por_fecha(params)
             columnas = ['Fecha', 'Cantidad de Pedidos', 'Total Vendido', 'Ticket Promedio']
             titulo = 'Reporte de Ventas Diarias'
         
         # Caso 4: Agrupado por categoría
         elif 'categoria' in agrupacion:
-            datos = self._agrupar_por_categoria(queryset, params)
+            datos = self._agrupar_por_categoria(params)
             columnas = ['Categoría', 'Cantidad Vendida', 'Total Ventas']
             titulo = 'Reporte de Ventas por Categoría'
         
         else:
             # Vista general
-            datos = self._vista_general_ventas(queryset, params)
+            datos = self._vista_general_ventas(params)
             columnas = ['Pedido', 'Cliente', 'Fecha', 'Total', 'Estado']
             titulo = 'Reporte General de Ventas'
         
@@ -94,170 +206,126 @@ class ReporteGenerator:
             'columnas': columnas,
             'titulo': titulo,
             'subtitulo': subtitulo,
-            'total_registros': len(datos),
             'parametros': params
         }
     
-    def _agrupar_por_producto(self, queryset, params) -> List[Dict]:
+    def _agrupar_por_producto(self, params) -> FilasReporte:
         """Agrupar ventas por producto"""
-        items = ItemPedido.objects.filter(
-            pedido__in=queryset
-        ).values(
-            'producto__nombre'
-        ).annotate(
-            cantidad_vendida=Sum('cantidad'),
-            total_ventas=Sum(F('cantidad') * F('precio_unitario')),
-            precio_promedio=Avg('precio_unitario')
-        ).order_by('-total_ventas')
-        
-        return [
-            {
-                'producto': item['producto__nombre'],
-                'cantidad_vendida': item['cantidad_vendida'],
-                'total_ventas': float(item['total_ventas'] or 0),
-                'precio_promedio': float(item['precio_promedio'] or 0)
-            }
-            for item in items
-        ]
+        consulta = self._consulta(
+            params, 'items', ['producto'], ['cantidad_vendida', 'total_ventas', 'precio_promedio'],
+            orden=['-total_ventas']
+        )
+        return consulta.filas(lambda item: {
+            'producto': item['producto_nombre'],
+            'cantidad_vendida': item['cantidad_vendida'],
+            'total_ventas': float(item['total_ventas'] or 0),
+            'precio_promedio': float(item['precio_promedio'] or 0)
+        })
     
-    def _agrupar_por_cliente(self, queryset, params) -> List[Dict]:
+    def _agrupar_por_cliente(self, params) -> FilasReporte:
         """Agrupar ventas por cliente"""
-        ventas = queryset.values(
-            'usuario__email',
-            'usuario__first_name',
-            'usuario__last_name'
-        ).annotate(
-            cantidad_compras=Count('id'),
-            monto_total=Sum('total'),
-            primera_compra=Min('creado'),
-            ultima_compra=Max('creado')
-        ).order_by('-monto_total')
-        
-        
-        ventas = queryset.values(
-            'usuario__email',
-            'usuario__first_name',
-            'usuario__last_name'
-        ).annotate(
-            cantidad_compras=Count('id'),
-            monto_total=Sum('total'),
-            primera_compra=Min('creado'),
-            ultima_compra=Max('creado')
-        ).order_by('-monto_total')
-        
-        return [
-            {
-                'cliente': f"{venta['usuario__first_name'] or ''} {venta['usuario__last_name'] or ''}".strip() or venta['usuario__email'],
-                'cantidad_compras': venta['cantidad_compras'],
-                'monto_total': float(venta['monto_total'] or 0),
-                'rango_fechas': f"{venta['primera_compra'].strftime('%d/%m/%Y')} - {venta['ultima_compra'].strftime('%d/%m/%Y')}"
-            }
-            for venta in ventas
-        ]
+        consulta = self._consulta(
+            params, 'pedidos', ['cliente'], ['cantidad_pedidos', 'monto_total', 'primera_compra', 'ultima_compra'],
+            orden=['-monto_total']
+        )
+        return consulta.filas(lambda venta: {
+            'cliente': f"{venta['cliente_nombre'] or ''} {venta['cliente_apellido'] or ''}".strip() or venta['cliente_email'],
+            'cantidad_compras': venta['cantidad_pedidos'],
+            'monto_total': float(venta['monto_total'] or 0),
+            'rango_fechas': f"{venta['primera_compra'].strftime('%d/%m/%Y')} - {venta['ultima_compra'].strftime('%d/%m/%Y')}"
+        })
     
-    def _agrupar_por_fecha(self, queryset, params) -> List[Dict]:
+    def _agrupar_por_fecha(self, params) -> FilasReporte:
         """Agrupar ventas por fecha"""
-        ventas = queryset.annotate(
-            fecha=TruncDate('creado')
-        ).values('fecha').annotate(
-            cantidad_pedidos=Count('id'),
-            total_vendido=Sum('total'),
-            ticket_promedio=Avg('total')
-        ).order_by('-fecha')
-        
-        return [
-            {
-                'fecha': venta['fecha'].strftime('%d/%m/%Y'),
-                'cantidad_pedidos': venta['cantidad_pedidos'],
-                'total_vendido': float(venta['total_vendido'] or 0),
-                'ticket_promedio': float(venta['ticket_promedio'] or 0)
-            }
-            for venta in ventas
-        ]
+        consulta = self._consulta(
+            params, 'pedidos', ['fecha'], ['cantidad_pedidos', 'monto_total', 'ticket_promedio'],
+            orden=['-fecha']
+        )
+        return consulta.filas(lambda venta: {
+            'fecha': venta['fecha'].strftime('%d/%m/%Y'),
+            'cantidad_pedidos': venta['cantidad_pedidos'],
+            'total_vendido': float(venta['monto_total'] or 0),
+            'ticket_promedio': float(venta['ticket_promedio'] or 0)
+        })
     
-    def _agrupar_por_categoria(self, queryset, params) -> List[Dict]:
+    def _agrupar_por_categoria(self, params) -> FilasReporte:
         """Agrupar ventas por categoría de producto"""
-        items = ItemPedido.objects.filter(
-            pedido__in=queryset
-        ).values(
-            'producto__categoria__nombre'
-        ).annotate(
-            cantidad_vendida=Sum('cantidad'),
-            total_ventas=Sum(F('cantidad') * F('precio_unitario'))
-        ).order_by('-total_ventas')
-        
-        return [
-            {
-                'categoria': item['producto__categoria__nombre'] or 'Sin categoría',
-                'cantidad_vendida': item['cantidad_vendida'],
-                'total_ventas': float(item['total_ventas'] or 0)
-            }
-            for item in items
-        ]
+        consulta = self._consulta(
+            params, 'items', ['categoria'], ['cantidad_vendida', 'total_ventas'],
+            orden=['-total_ventas']
+        )
+        return consulta.filas(lambda item: {
+            'categoria': item['categoria_nombre'] or 'Sin categoría',
+            'cantidad_vendida': item['cantidad_vendida'],
+            'total_ventas': float(item['total_ventas'] or 0)
+        })
     
-    def _vista_general_ventas(self, queryset, params) -> List[Dict]:
+    def _vista_general_ventas(self, params) -> FilasReporte:
         """Vista general de pedidos"""
+        queryset = Pedido.objects.filter(estado__in=estados_venta())
+        if params.get('fecha_inicio'):
+            queryset = queryset.filter(creado__gte=params['fecha_inicio'])
+        if params.get('fecha_fin'):
+            queryset = queryset.filter(creado__lte=params['fecha_fin'])
         pedidos = queryset.select_related('usuario').order_by('-creado')[:100]  # Límite de 100
         
-        return [
-            {
-                'numero_pedido': pedido.numero_pedido,
-                'cliente': pedido.usuario.email,
-                'fecha': pedido.creado.strftime('%d/%m/%Y %H:%M'),
-                'total': float(pedido.total),
-                'estado': pedido.get_estado_display()
-            }
-            for pedido in pedidos
-        ]
+        return FilasReporte(pedidos, lambda pedido: {
+            'numero_pedido': pedido.numero_pedido,
+            'cliente': pedido.usuario.email,
+            'fecha': pedido.creado.strftime('%d/%m/%Y %H:%M'),
+            'total': float(pedido.total),
+            'estado': pedido.get_estado_display()
+        })
     
     def _generar_reporte_productos(self, params: Dict) -> Dict:
         """Generar reporte de productos"""
-        queryset = Producto.objects.filter(activo=True)
+        queryset = Producto.objects.filter(activo=True).select_related('categoria')
         
-        datos = [
-            {
-                'producto': prod.nombre,
-                'sku': prod.sku,
-                'categoria': prod.categoria.nombre if prod.categoria else 'Sin categoría',
-                'precio': float(prod.precio),
-                'stock': prod.stock,
-                'stock_minimo': prod.stock_minimo
-            }
-            for prod in queryset.select_related('categoria')
-        ]
+        datos = FilasReporte(queryset, lambda prod: {
+            'producto': prod.nombre,
+            'sku': prod.sku,
+            'categoria': prod.categoria.nombre if prod.categoria else 'Sin categoría',
+            'precio': float(prod.precio),
+            'stock': prod.stock,
+            'stock_minimo': prod.stock_minimo
+        })
         
         return {
             'datos': datos,
             'columnas': ['Producto', 'SKU', 'Categoría', 'Precio', 'Stock', 'Stock Mínimo'],
             'titulo': 'Reporte de Productos',
             'subtitulo': self._generar_subtitulo(params),
-            'total_registros': len(datos),
             'parametros': params
         }
     
     def _generar_reporte_clientes(self, params: Dict) -> Dict:
-        """Generar reporte de clientes"""
-        queryset = User.objects.filter(is_active=True).exclude(is_superuser=True)
+        """
+        Generar reporte de clientes
         
-        datos = [
-            {
-                'cliente': f"{user.first_name or ''} {user.last_name or ''}".strip() or user.email,
-                'email': user.email,
-                'fecha_registro': user.date_joined.strftime('%d/%m/%Y'),
-                'total_pedidos': user.pedidos.count(),
-                'total_gastado': float(user.pedidos.filter(
-                    estado__in=['PAGADO', 'PROCESANDO', 'ENVIADO', 'ENTREGADO']
-                ).aggregate(total=Sum('total'))['total'] or 0)
-            }
-            for user in queryset
-        ]
+        Una sola consulta: los usuarios con sus pedidos contados y el monto de
+        las ventas sumado con agregación condicional (LEFT JOIN + GROUP BY).
+        """
+        usuarios = User.objects.filter(is_active=True).exclude(is_superuser=True)
+        clientes = usuarios.values(
+            'id', 'first_name', 'last_name', 'email', 'date_joined'
+        ).annotate(
+            total_pedidos=Count('pedidos'),
+            total_gastado=Sum('pedidos__total', filter=Q(pedidos__estado__in=estados_venta()))
+        ).order_by('id')
+        
+        datos = FilasReporte(clientes, lambda user: {
+            'cliente': f"{user['first_name'] or ''} {user['last_name'] or ''}".strip() or user['email'],
+            'email': user['email'],
+            'fecha_registro': user['date_joined'].strftime('%d/%m/%Y'),
+            'total_pedidos': user['total_pedidos'],
+            'total_gastado': float(user['total_gastado'] or 0)
+        }, consulta_total=usuarios)
         
         return {
             'datos': datos,
             'columnas': ['Cliente', 'Email', 'Fecha Registro', 'Total Pedidos', 'Total Gastado'],
             'titulo': 'Reporte de Clientes',
             'subtitulo': self._generar_subtitulo(params),
-            'total_registros': len(datos),
             'parametros': params
         }
     
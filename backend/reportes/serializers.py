@@ -52,6 +52,9 @@ class ReporteGeneradoSerializer(serializers.ModelSerializer):
             'formato_display',
             'archivo',
             'datos_json',
+            'estado',
+            'error',
             'created_at',
+            'finalizado_en',
         ]
         read_only_fields = ['id', 'created_at', 'usuario']
@@ -2,7 +2,8 @@
 GeneradorArchivos: Servicio para generar archivos PDF y Excel.
 Utiliza reportlab para PDF y openpyxl para Excel.
 """
-from typing import Dict, Any, List
+import tempfile
+from typing import Dict, Any, Iterable, List
 from io import BytesIO
 from datetime import datetime
 
@@ -16,7 +17,9 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 
 # Excel
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.utils import get_column_letter
 
 
 class GeneradorArchivos:
@@ -162,27 +165,32 @@ class GeneradorArchivos:
 
     def generar_excel(
         self,
-        datos: List[Dict[str, Any]],
+        datos: Iterable[Dict[str, Any]],
         titulo: str,
         subtitulo: str,
-        columnas: List[str]
-    ) -> BytesIO:
+        columnas: List[str],
+        destino=None
+    ):
         """
         Genera un archivo Excel con los datos del reporte.
         
+        Usa openpyxl en modo write-only: las filas se escriben a medida que
+        se recorren los datos (lista o iterador) y el libro se guarda en un
+        archivo temporal, con memoria acotada.
+        
         Args:
-            datos: Lista de diccionarios con los datos
+            datos: Filas (diccionarios) del reporte; se recorren una sola vez
             titulo: Título principal del reporte
             subtitulo: Subtítulo con período/filtros
             columnas: Lista de nombres de columnas
+            destino: Archivo binario donde escribir (por defecto uno temporal)
             
         Returns:
-            BytesIO: Buffer con el Excel generado
+            Archivo con el Excel generado, posicionado al inicio
         """
-        buffer = BytesIO()
-        wb = Workbook()
-        ws = wb.active
-        ws.title = 'Reporte'
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Reporte')
+        ultima_columna = get_column_letter(len(columnas))
         
         # Estilos
         titulo_font = Font(name='Arial', size=14, bold=True, color='1E40AF')
@@ -190,6 +198,9 @@ class GeneradorArchivos:
         header_font = Font(name='Arial', size=11, bold=True, color='FFFFFF')
         header_fill = PatternFill(start_color='1E40AF', end_color='1E40AF', fill_type='solid')
         data_font = Font(name='Arial', size=10)
+        centrado = Alignment(horizontal='center', vertical='center')
+        derecha = Alignment(horizontal='right')
+        izquierda = Alignment(horizontal='left')
         
         border_thin = Border(
             left=Side(style='thin'),
@@ -198,78 +209,70 @@ class GeneradorArchivos:
             bottom=Side(style='thin')
         )
         
-        # Título (fila 1)
-        ws.merge_cells('A1:' + chr(64 + len(columnas)) + '1')
-        cell_titulo = ws['A1']
-        cell_titulo.value = titulo
-        cell_titulo.font = titulo_font
-        cell_titulo.alignment = Alignment(horizontal='center', vertical='center')
+        def celda(valor, **estilo):
+            cell = WriteOnlyCell(ws, value=valor)
+            for atributo, objeto in estilo.items():
+                setattr(cell, atributo, objeto)
+            return cell
+        
+        # Anchos de columna (en write-only se fijan antes de escribir filas)
+        for col_idx in range(1, len(columnas) + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 18
         
-        # Subtítulo (fila 2)
-        ws.merge_cells('A2:' + chr(64 + len(columnas)) + '2')
-        cell_subtitulo = ws['A2']
-        cell_subtitulo.value = subtitulo
-        cell_subtitulo.font = subtitulo_font
-        cell_subtitulo.alignment = Alignment(horizontal='center', vertical='center')
+        # Título (fila 1) y subtítulo (fila 2)
+        ws.append([celda(titulo, font=titulo_font, alignment=centrado)])
+        ws.merged_cells.add(f'A1:{ultima_columna}1')
+        ws.append([celda(subtitulo, font=subtitulo_font, alignment=centrado)])
+        ws.merged_cells.add(f'A2:{ultima_columna}2')
         
         # Espacio
         ws.row_dimensions[3].height = 10
+        ws.append([])
         
         # Encabezados (fila 4)
-        fila_inicio_datos = 4
-        for col_idx, col_name in enumerate(columnas, start=1):
-            cell = ws.cell(row=fila_inicio_datos, column=col_idx)
-            cell.value = col_name
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = border_thin
-        
-        # Datos (desde fila 5)
-        fila_actual = fila_inicio_datos + 1
+        ws.append([
+            celda(col_name, font=header_font, fill=header_fill, alignment=centrado, border=border_thin)
+            for col_name in columnas
+        ])
         
+        # Datos (desde fila 5); claves resueltas una vez por fila (case-insensitive)
+        fila_actual = 5
         for item in datos:
-            for col_idx, col_name in enumerate(columnas, start=1):
-                # Buscar valor (case-insensitive)
-                valor = None
-                for key in item.keys():
-                    if key.lower() == col_name.lower():
-                        valor = item[key]
-                        break
-                
-                cell = ws.cell(row=fila_actual, column=col_idx)
-                cell.value = valor if valor is not None else '-'
-                cell.font = data_font
-                cell.border = border_thin
+            por_clave = {key.lower(): valor for key, valor in item.items()}
+            fila = []
+            for col_name in columnas:
+                valor = por_clave.get(col_name.lower())
+                cell = celda(valor if valor is not None else '-', font=data_font, border=border_thin)
                 
                 # Alineación según tipo
                 if isinstance(valor, (int, float)):
-                    cell.alignment = Alignment(horizontal='right')
+                    cell.alignment = derecha
                     if isinstance(valor, float):
                         cell.number_format = '#,##0.00'
                 else:
-                    cell.alignment = Alignment(horizontal='left')
-            
+                    cell.alignment = izquierda
+                fila.append(cell)
+            ws.append(fila)
             fila_actual += 1
         
-        # Ajustar anchos de columna
-        for col_idx in range(1, len(columnas) + 1):
-            col_letter = chr(64 + col_idx)
-            ws.column_dimensions[col_letter].width = 18
-        
         # Pie de página
         fila_pie = fila_actual + 2
-        ws.merge_cells(f'A{fila_pie}:' + chr(64 + len(columnas)) + str(fila_pie))
-        cell_pie = ws[f'A{fila_pie}']
+        ws.append([])
+        ws.append([])
         fecha_generacion = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-        cell_pie.value = f'Generado el {fecha_generacion} - SmartSales365'
-        cell_pie.font = Font(name='Arial', size=8, color='6B7280', italic=True)
-        cell_pie.alignment = Alignment(horizontal='center')
+        ws.append([celda(
+            f'Generado el {fecha_generacion} - SmartSales365',
+            font=Font(name='Arial', size=8, color='6B7280', italic=True),
+            alignment=Alignment(horizontal='center')
+        )])
+        ws.merged_cells.add(f'A{fila_pie}:{ultima_columna}{fila_pie}')
         
-        # Guardar en buffer
-        wb.save(buffer)
-        buffer.seek(0)
-        return buffer
+        # Guardar en archivo temporal
+        if destino is None:
+            destino = tempfile.TemporaryFile(suffix='.xlsx')
+        wb.save(destino)
+        destino.seek(0)
+        return destino
 
     def determinar_columnas(
         self,
@@ -5,7 +5,33 @@ Extrae parámetros de reportes desde comandos de voz o texto.
 import re
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+
+def _compilar_sinonimos(diccionario: Dict[str, List[str]], plantilla: str) -> Dict[str, List[re.Pattern]]:
+    """Compila una vez, en el orden original, el patrón de cada sinónimo"""
+    return {
+        clave: [re.compile(plantilla.format(sinonimo=sinonimo)) for sinonimo in sinonimos]
+        for clave, sinonimos in diccionario.items()
+    }
+
+
+# Patrones de extraer_periodo / extraer_filtros_adicionales
+PATRON_MES = re.compile(r'del mes de (\w+)')
+PATRON_ULTIMA_SEMANA = re.compile(r'última\s+semana|ultimo\s+semana')
+PATRON_ULTIMOS_DIAS = re.compile(r'últimos?\s+(\d+)\s+días?')
+PATRON_ESTE_MES = re.compile(r'este\s+mes|mes\s+actual')
+PATRON_ESTA_SEMANA = re.compile(r'esta\s+semana|semana\s+actual')
+PATRON_RANGO = re.compile(r'del\s+(\d+)\s+de\s+(\w+)\s+al\s+(\d+)\s+de\s+(\w+)')
+PATRON_HOY = re.compile(r'\bhoy\b')
+PATRON_ULTIMO_MES = re.compile(r'último\s+mes|ultimo\s+mes')
+PATRON_TOP = re.compile(r'top\s+(\d+)')
+PATRON_PRIMEROS = re.compile(r'primeros?\s+(\d+)')
+ORDENAMIENTOS = [
+    (re.compile(r'más\s+vend[oi]d[oa]s?'), '-cantidad'),
+    (re.compile(r'mayores?\s+ingres[oa]s?'), '-total'),
+    (re.compile(r'menos\s+vend[oi]d[oa]s?'), 'cantidad'),
+]
 
 
 class ParserService:
@@ -44,6 +70,14 @@ class ParserService:
         'ingresos': ['ingreso', 'ingresos', 'ganancia', 'ganancias', 'revenue'],
     }
 
+    # Patrones compilados al importar (antes se armaban en cada llamada)
+    PATRONES_AGRUPACION = _compilar_sinonimos(
+        AGRUPACIONES, r'\b(por|agrupado|agrupados|agrupadas|por)\s+{sinonimo}\b'
+    )
+    PATRONES_SINONIMO_AGRUPACION = _compilar_sinonimos(AGRUPACIONES, r'\b{sinonimo}\b')
+    PATRONES_FORMATO = _compilar_sinonimos(FORMATOS, r'\b{sinonimo}\b')
+    PATRONES_TIPO = _compilar_sinonimos(TIPOS_REPORTE, r'\b{sinonimo}\b')
+
     def __init__(self):
         """Inicializa el parser con la fecha actual"""
         self.hoy = datetime.now().date()
@@ -67,7 +101,7 @@ class ParserService:
         prompt_lower = prompt.lower()
         
         # Patrón: "del mes de [nombre_mes]"
-        match = re.search(r'del mes de (\w+)', prompt_lower)
+        match = PATRON_MES.search(prompt_lower)
         if match:
             mes_nombre = match.group(1)
             if mes_nombre in self.MESES:
@@ -92,7 +126,7 @@ class ParserService:
                 }
         
         # Patrón: "última semana" o "última semana"
-        if re.search(r'última\s+semana|ultimo\s+semana', prompt_lower):
+        if PATRON_ULTIMA_SEMANA.search(prompt_lower):
             inicio = self.hoy - timedelta(days=7)
             return {
                 'inicio': inicio,
@@ -101,7 +135,7 @@ class ParserService:
             }
         
         # Patrón: "últimos [N] días"
-        match = re.search(r'últimos?\s+(\d+)\s+días?', prompt_lower)
+        match = PATRON_ULTIMOS_DIAS.search(prompt_lower)
         if match:
             dias = int(match.group(1))
             inicio = self.hoy - timedelta(days=dias)
@@ -112,7 +146,7 @@ class ParserService:
             }
         
         # Patrón: "este mes" o "mes actual"
-        if re.search(r'este\s+mes|mes\s+actual', prompt_lower):
+        if PATRON_ESTE_MES.search(prompt_lower):
             inicio = datetime(self.hoy.year, self.hoy.month, 1).date()
             return {
                 'inicio': inicio,
@@ -121,7 +155,7 @@ class ParserService:
             }
         
         # Patrón: "esta semana"
-        if re.search(r'esta\s+semana|semana\s+actual', prompt_lower):
+        if PATRON_ESTA_SEMANA.search(prompt_lower):
             # Lunes de esta semana
             dias_desde_lunes = self.hoy.weekday()
             inicio = self.hoy - timedelta(days=dias_desde_lunes)
@@ -132,10 +166,7 @@ class ParserService:
             }
         
         # Patrón: "del [DD] de [mes] al [DD] de [mes]"
-        match = re.search(
-            r'del\s+(\d+)\s+de\s+(\w+)\s+al\s+(\d+)\s+de\s+(\w+)',
-            prompt_lower
-        )
+        match = PATRON_RANGO.search(prompt_lower)
         if match:
             dia_inicio = int(match.group(1))
             mes_inicio_nombre = match.group(2)
@@ -161,7 +192,7 @@ class ParserService:
                 }
         
         # Patrón: "hoy"
-        if re.search(r'\bhoy\b', prompt_lower):
+        if PATRON_HOY.search(prompt_lower):
             return {
                 'inicio': self.hoy,
                 'fin': self.hoy,
@@ -169,7 +200,7 @@ class ParserService:
             }
         
         # Patrón: "último mes"
-        if re.search(r'último\s+mes|ultimo\s+mes', prompt_lower):
+        if PATRON_ULTIMO_MES.search(prompt_lower):
             # Primer día del mes pasado
             primer_dia_este_mes = datetime(self.hoy.year, self.hoy.month, 1).date()
             inicio = (primer_dia_este_mes - relativedelta(months=1))
@@ -203,11 +234,12 @@ class ParserService:
         prompt_lower = prompt.lower()
         
         # Buscar palabras clave de agrupación
-        for agrupacion, sinonimos in self.AGRUPACIONES.items():
-            for sinonimo in sinonimos:
-                if re.search(rf'\b(por|agrupado|agrupados|agrupadas|por)\s+{sinonimo}\b', prompt_lower):
+        tiene_por = 'por' in prompt_lower
+        for agrupacion, patrones in self.PATRONES_AGRUPACION.items():
+            for patron, patron_sinonimo in zip(patrones, self.PATRONES_SINONIMO_AGRUPACION[agrupacion]):
+                if patron.search(prompt_lower):
                     return agrupacion
-                if re.search(rf'\b{sinonimo}\b', prompt_lower) and 'por' in prompt_lower:
+                if tiene_por and patron_sinonimo.search(prompt_lower):
                     return agrupacion
         
         return 'ninguno'
@@ -222,10 +254,9 @@ class ParserService:
         prompt_lower = prompt.lower()
         
         # Buscar palabras clave de formato
-        for formato, sinonimos in self.FORMATOS.items():
-            for sinonimo in sinonimos:
-                if re.search(rf'\b{sinonimo}\b', prompt_lower):
-                    return formato
+        for formato, patrones in self.PATRONES_FORMATO.items():
+            if any(patron.search(prompt_lower) for patron in patrones):
+                return formato
         
         # Por defecto: PDF
         return 'pdf'
@@ -240,10 +271,9 @@ class ParserService:
         prompt_lower = prompt.lower()
         
         # Buscar palabras clave de tipo de reporte
-        for tipo, sinonimos in self.TIPOS_REPORTE.items():
-            for sinonimo in sinonimos:
-                if re.search(rf'\b{sinonimo}\b', prompt_lower):
-                    return tipo
+        for tipo, patrones in self.PATRONES_TIPO.items():
+            if any(patron.search(prompt_lower) for patron in patrones):
+                return tipo
         
         # Por defecto: ventas
         return 'ventas'
@@ -259,20 +289,16 @@ class ParserService:
         filtros = {}
         
         # Patrón: "top [N]" o "primeros [N]"
-        match = re.search(r'top\s+(\d+)', prompt_lower)
-        if not match:
-            match = re.search(r'primeros?\s+(\d+)', prompt_lower)
+        match = PATRON_TOP.search(prompt_lower) or PATRON_PRIMEROS.search(prompt_lower)
         
         if match:
             filtros['limit'] = int(match.group(1))
         
         # Ordenamiento por ventas/ingresos
-        if re.search(r'más\s+vend[oi]d[oa]s?', prompt_lower):
-            filtros['orden'] = '-cantidad'
-        elif re.search(r'mayores?\s+ingres[oa]s?', prompt_lower):
-            filtros['orden'] = '-total'
-        elif re.search(r'menos\s+vend[oi]d[oa]s?', prompt_lower):
-            filtros['orden'] = 'cantidad'
+        for patron, orden in ORDENAMIENTOS:
+            if patron.search(prompt_lower):
+                filtros['orden'] = orden
+                break
         
         return filtros
 
@@ -1,12 +1,45 @@
 """
 QueryBuilder: Servicio para construir consultas dinámicas de Django ORM.
 Genera queries complejas con agrupaciones y agregaciones.
+
+Las agregaciones sobre TransaccionPago son consultas de reportes.consultas
+(fuente 'transacciones'), el mismo motor que usa ReporteGenerator.
 """
 
-from django.db.models import Sum, Count, Avg, Q
-from django.db.models.functions import TruncDate
 from typing import Dict, Any, List
 
+from ..consultas import Consulta
+
+MEDIDAS_VENTAS = ["total_vendido", "cantidad_ventas", "ticket_promedio"]
+
+# filtros['orden'] (columnas del resultado o de ParserService) -> medida
+ORDEN_MEDIDAS = {"total_gastado": "total_vendido", "total": "total_vendido", "cantidad": "cantidad_compras"}
+
+
+def _consulta_transacciones(parametros: Dict[str, Any], **kwargs) -> Consulta:
+    """Consulta de transacciones exitosas en el período de los parámetros"""
+    periodo = parametros.get("periodo", {})
+    tiene_periodo = bool(periodo.get("inicio") and periodo.get("fin"))
+    return Consulta(
+        "transacciones",
+        desde=periodo["inicio"] if tiene_periodo else None,
+        hasta=periodo["fin"] if tiene_periodo else None,
+        estados=["EXITOSO"],
+        **kwargs,
+    )
+
+
+def _orden_clientes(filtros: Dict[str, Any]) -> List[str]:
+    orden = filtros.get("orden", "-total_gastado")
+    signo = "-" if orden.startswith("-") else ""
+    campo = orden.lstrip("-")
+    return [signo + ORDEN_MEDIDAS.get(campo, campo)]
+
+
+def _nombre_cliente(fila: Dict[str, Any]) -> str:
+    nombre_completo = f"{fila['cliente_nombre'] or ''} {fila['cliente_apellido'] or ''}".strip()
+    return nombre_completo or fila["cliente_email"]
+
 
 class QueryBuilder:
     """
@@ -26,116 +59,55 @@ class QueryBuilder:
         Returns:
             List[Dict]: Lista de resultados con agregaciones
         """
-        from pagos.models import TransaccionPago
-
-        periodo = parametros.get("periodo", {})
         agrupacion = parametros.get("agrupacion", "ninguno")
         filtros = parametros.get("filtros", {})
+        limite = filtros.get("limit")
 
-        # Query base: transacciones exitosas en el período
-        query = TransaccionPago.objects.filter(estado="EXITOSO")
-
-        # Filtrar por período
-        if periodo.get("inicio") and periodo.get("fin"):
-            query = query.filter(created_at__range=[periodo["inicio"], periodo["fin"]])
-
-        # Agrupar según parámetro
-        if agrupacion == "producto":
-            # Como TransaccionPago no tiene relación directa con Producto, retornar resumen general
-            resultados = query.aggregate(
-                total_vendido=Sum("monto"),
-                cantidad_ventas=Count("id"),
-                ticket_promedio=Avg("monto"),
+        if agrupacion == "cliente":
+            # Agrupar por cliente (a través de pedido->usuario)
+            consulta = _consulta_transacciones(
+                parametros,
+                dimensiones=["cliente"],
+                medidas=["total_vendido", "cantidad_compras", "ticket_promedio"],
+                orden=_orden_clientes(filtros),
+                limite=limite,
             )
-
-            resultados_list = [
+            return [
                 {
-                    "concepto": "Total de ventas",
-                    "total_vendido": float(resultados["total_vendido"] or 0),
-                    "cantidad_ventas": resultados["cantidad_ventas"] or 0,
-                    "ticket_promedio": float(resultados["ticket_promedio"] or 0),
+                    "cliente": _nombre_cliente(item),
+                    "email": item["cliente_email"],
+                    "total_gastado": float(item["total_vendido"] or 0),
+                    "cantidad_compras": item["cantidad_compras"],
+                    "ticket_promedio": float(item["ticket_promedio"] or 0),
                 }
+                for item in consulta.compilar()
             ]
 
-        elif agrupacion == "cliente":
-            # Agrupar por cliente (a través de pedido->usuario)
-            resultados = (
-                query.values(
-                    "pedido__usuario__first_name",
-                    "pedido__usuario__last_name",
-                    "pedido__usuario__email",
-                )
-                .annotate(
-                    total_gastado=Sum("monto"),
-                    cantidad_compras=Count("id", distinct=True),
-                    ticket_promedio=Avg("monto"),
-                )
-                .order_by(filtros.get("orden", "-total_gastado"))
-            )
-
-            resultados_list = []
-            for item in resultados:
-                nombre_completo = f"{item['pedido__usuario__first_name'] or ''} {item['pedido__usuario__last_name'] or ''}".strip()
-                if not nombre_completo:
-                    nombre_completo = item["pedido__usuario__email"]
-
-                resultados_list.append(
-                    {
-                        "cliente": nombre_completo,
-                        "email": item["pedido__usuario__email"],
-                        "total_gastado": float(item["total_gastado"] or 0),
-                        "cantidad_compras": item["cantidad_compras"],
-                        "ticket_promedio": float(item["ticket_promedio"] or 0),
-                    }
-                )
-
-        elif agrupacion == "fecha":
-            # Agrupar por fecha
-            resultados = (
-                query.annotate(fecha_venta=TruncDate("created_at"))
-                .values("fecha_venta")
-                .annotate(
-                    total_vendido=Sum("monto"),
-                    cantidad_ventas=Count("id"),
-                    ticket_promedio=Avg("monto"),
-                )
-                .order_by("-fecha_venta")
+        if agrupacion == "fecha":
+            consulta = _consulta_transacciones(
+                parametros, dimensiones=["fecha"], medidas=MEDIDAS_VENTAS, orden=["-fecha"], limite=limite
             )
-
-            resultados_list = []
-            for item in resultados:
-                resultados_list.append(
-                    {
-                        "fecha": item["fecha_venta"].isoformat()
-                        if item["fecha_venta"]
-                        else None,
-                        "total_vendido": float(item["total_vendido"] or 0),
-                        "cantidad_ventas": item["cantidad_ventas"],
-                        "ticket_promedio": float(item["ticket_promedio"] or 0),
-                    }
-                )
-
-        else:
-            # Sin agrupación: totales generales
-            totales = query.aggregate(
-                total_vendido=Sum("monto"),
-                cantidad_ventas=Count("id"),
-                ticket_promedio=Avg("monto"),
-            )
-
-            resultados_list = [
+            return [
                 {
-                    "total_vendido": float(totales["total_vendido"] or 0),
-                    "cantidad_ventas": totales["cantidad_ventas"] or 0,
-                    "ticket_promedio": float(totales["ticket_promedio"] or 0),
+                    "fecha": item["fecha"].isoformat() if item["fecha"] else None,
+                    "total_vendido": float(item["total_vendido"] or 0),
+                    "cantidad_ventas": item["cantidad_ventas"],
+                    "ticket_promedio": float(item["ticket_promedio"] or 0),
                 }
+                for item in consulta.compilar()
             ]
 
-        # Aplicar límite si existe
-        if "limit" in filtros:
-            resultados_list = resultados_list[: filtros["limit"]]
-
-        return resultados_list
+        # Sin agrupación (o por producto: TransaccionPago no tiene relación
+        # directa con Producto): totales generales
+        totales = _consulta_transacciones(parametros, medidas=MEDIDAS_VENTAS).totales()
+        resultado = {
+            "total_vendido": float(totales["total_vendido"] or 0),
+            "cantidad_ventas": totales["cantidad_ventas"] or 0,
+            "ticket_promedio": float(totales["ticket_promedio"] or 0),
+        }
+        if agrupacion == "producto":
+            resultado = {"concepto": "Total de ventas", **resultado}
+        return [resultado][:limite]
 
     def construir_query_productos(
         self, parametros: Dict[str, Any]
@@ -185,78 +157,34 @@ class QueryBuilder:
         self, parametros: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
         """
-        Construye query para reporte de clientes.
+        Construye query para reporte de clientes (con transacciones exitosas).
         """
-        from django.contrib.auth import get_user_model
-
-        User = get_user_model()
-        periodo = parametros.get("periodo", {})
         filtros = parametros.get("filtros", {})
-
-        # Filtro de período
-        filtro_fecha = Q()
-        if periodo.get("inicio") and periodo.get("fin"):
-            filtro_fecha = Q(
-                pedidos__transacciones__creado__range=[
-                    periodo["inicio"],
-                    periodo["fin"],
-                ],
-                pedidos__transacciones__estado="EXITOSO",
-            )
-
-        # Query con anotaciones
-        query = (
-            User.objects.annotate(
-                total_gastado=Sum("pedidos__transacciones__monto", filter=filtro_fecha),
-                cantidad_compras=Count(
-                    "pedidos__transacciones", filter=filtro_fecha, distinct=True
-                ),
-            )
-            .filter(cantidad_compras__gt=0)
-            .order_by(filtros.get("orden", "-total_gastado"))
+        consulta = _consulta_transacciones(
+            parametros,
+            dimensiones=["cliente"],
+            medidas=["total_vendido", "cantidad_compras"],
+            orden=_orden_clientes(filtros),
+            limite=filtros.get("limit"),
         )
-
-        # Aplicar límite
-        if "limit" in filtros:
-            query = query[: filtros["limit"]]
-
-        resultados_list = []
-        for user in query:
-            resultados_list.append(
-                {
-                    "cliente": user.get_full_name() or user.email,
-                    "email": user.email,
-                    "total_gastado": float(user.total_gastado or 0),
-                    "cantidad_compras": user.cantidad_compras or 0,
-                }
-            )
-
-        return resultados_list
+        return [
+            {
+                "cliente": _nombre_cliente(item),
+                "email": item["cliente_email"],
+                "total_gastado": float(item["total_vendido"] or 0),
+                "cantidad_compras": item["cantidad_compras"] or 0,
+            }
+            for item in consulta.compilar()
+        ]
 
     def construir_query_ingresos(self, parametros: Dict[str, Any]) -> Dict[str, Any]:
         """
         Construye query para reporte de ingresos (resumen general).
         """
-        from pagos.models import TransaccionPago
-
-        periodo = parametros.get("periodo", {})
-
-        # Query base: transacciones exitosas
-        query = TransaccionPago.objects.filter(estado="EXITOSO")
-
-        # Filtrar por período
-        if periodo.get("inicio") and periodo.get("fin"):
-            query = query.filter(created_at__range=[periodo["inicio"], periodo["fin"]])
-
-        # Agregaciones
-        totales = query.aggregate(
-            total_ingresos=Sum("monto"),
-            cantidad_transacciones=Count("id"),
-            ticket_promedio=Avg("monto"),
-        )
+        totales = _consulta_transacciones(parametros, medidas=MEDIDAS_VENTAS).totales()
 
         return {
-            "total_ingresos": float(totales["total_ingresos"] or 0),
-            "cantidad_transacciones": totales["cantidad_transacciones"] or 0,
+            "total_ingresos": float(totales["total_vendido"] or 0),
+            "cantidad_transacciones": totales["cantidad_ventas"] or 0,
             "ticket_promedio": float(totales["ticket_promedio"] or 0),
         }
@@ -0,0 +1,170 @@
+"""
+Tareas en segundo plano de reportes
+
+POST /api/reportes/solicitar/ interpreta el prompt en el request (es rápido),
+crea un ReporteGenerado PENDIENTE y encola esta tarea. El worker consulta los
+datos, genera el PDF/Excel, lo guarda en ReporteGenerado.archivo y avisa al
+usuario con una notificación push; el cliente también puede consultar el
+estado en /api/reportes/trabajos/<id>/.
+
+Los reportes se identifican por el hash de sus parámetros interpretados
+(tipo, fechas ya resueltas, agrupación, filtros, formato): si dentro de
+REPORTES_REUTILIZAR_MINUTOS alguien ya generó el mismo, se reutiliza su archivo.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from tareas.registro import tarea
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_FECHA = ("fecha_inicio", "fecha_fin")
+
+
+def parametros_a_json(parametros_reportes):
+    """Parámetros interpretados serializables (fechas en ISO, sin el prompt original)"""
+    limpios = [
+        {clave: valor for clave, valor in parametros.items() if clave != "raw_prompt"}
+        for parametros in parametros_reportes
+    ]
+    return json.loads(json.dumps(limpios, cls=DjangoJSONEncoder))
+
+
+def parametros_desde_json(parametros_json):
+    """Inversa de parametros_a_json(): vuelve a convertir las fechas"""
+    parametros_reportes = []
+    for parametros in parametros_json:
+        parametros = dict(parametros)
+        for campo in CAMPOS_FECHA:
+            if parametros.get(campo):
+                parametros[campo] = datetime.fromisoformat(parametros[campo])
+        parametros_reportes.append(parametros)
+    return parametros_reportes
+
+
+def clave_reporte(parametros_json):
+    """
+    Hash estable de los parámetros: mismos parámetros -> mismo archivo
+
+    Las fechas se truncan a bloques de REPORTES_REUTILIZAR_MINUTOS, así dos
+    prompts relativos iguales ("últimos 7 días") dentro del mismo bloque
+    comparten clave aunque now() difiera en segundos.
+    """
+    from .report_generator import truncar_fechas
+
+    segundos = max(getattr(settings, "REPORTES_REUTILIZAR_MINUTOS", 10), 1) * 60
+    truncados = [
+        truncar_fechas(parametros, segundos) for parametros in parametros_desde_json(parametros_json)
+    ]
+    texto = json.dumps(truncados, sort_keys=True, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _dia(valor):
+    """periodo_inicio/periodo_fin son DateField"""
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def solicitar_reporte(usuario, prompt, parametros_reportes, formato):
+    """
+    Crear el trabajo de un reporte (o reutilizar uno igual reciente)
+
+    Args:
+        usuario: Quien lo solicita
+        prompt: Prompt original
+        parametros_reportes: Resultado de interpretar el prompt (uno o varios)
+        formato: 'pdf' o 'excel'
+
+    Returns:
+        tuple: (ReporteGenerado, reutilizado)
+    """
+    from .models import ReporteGenerado
+
+    parametros_json = parametros_a_json(parametros_reportes)
+    clave = clave_reporte(parametros_json)
+    desde = timezone.now() - timedelta(minutes=getattr(settings, "REPORTES_REUTILIZAR_MINUTOS", 10))
+    recientes = ReporteGenerado.objects.filter(clave=clave, created_at__gte=desde)
+
+    with transaction.atomic():
+        # El mismo usuario ya lo pidió y todavía se está generando
+        activo = recientes.filter(usuario=usuario, estado__in=ReporteGenerado.ESTADOS_ACTIVOS).first()
+        if activo:
+            return activo, True
+
+        primero = parametros_reportes[0]
+        reporte = ReporteGenerado(
+            usuario=usuario,
+            prompt_original=prompt,
+            tipo=primero.get("tipo", "ventas"),
+            periodo_inicio=_dia(primero.get("fecha_inicio")),
+            periodo_fin=_dia(primero.get("fecha_fin")),
+            agrupacion=(primero.get("agrupacion") or ["ninguno"])[0],
+            formato=formato,
+            datos_json={"parametros": parametros_json},
+            clave=clave,
+        )
+
+        # Alguien ya lo generó: se comparte el archivo
+        generado = recientes.filter(estado="COMPLETADO").exclude(archivo="").first()
+        if generado:
+            reporte.archivo = generado.archivo.name
+            reporte.estado = "COMPLETADO"
+            reporte.finalizado_en = timezone.now()
+            reporte.save()
+            return reporte, True
+
+        reporte.save()
+        generar_reporte.encolar(reporte_id=reporte.id)
+    return reporte, False
+
+
+@tarea("reportes.generar_reporte", max_intentos=1)
+def generar_reporte(reporte_id):
+    from notifications.utils import notificar_usuario
+
+    from .exporters import exportar
+    from .models import ReporteGenerado
+    from .report_generator import ReporteGenerator
+
+    reporte = ReporteGenerado.objects.select_related("usuario").filter(
+        id=reporte_id, estado="PENDIENTE"
+    ).first()
+    if reporte is None:
+        return
+
+    filas = ReporteGenerado.objects.filter(id=reporte.id)
+    filas.update(estado="EN_PROCESO")
+
+    try:
+        generator = ReporteGenerator()
+        reportes = [
+            generator.generar_datos(parametros, iterar=True)
+            for parametros in parametros_desde_json(reporte.datos_json["parametros"])
+        ]
+        archivo, nombre, _ = exportar(reportes, reporte.formato)
+        with archivo:
+            reporte.archivo.save(nombre, File(archivo), save=False)
+    except Exception as e:
+        logger.error(f"❌ Reporte #{reporte.id} falló: {e}")
+        filas.update(estado="FALLIDO", error=str(e), finalizado_en=timezone.now())
+        raise
+
+    filas.update(estado="COMPLETADO", archivo=reporte.archivo.name, finalizado_en=timezone.now())
+    logger.info(f"📄 Reporte #{reporte.id} generado: {reporte.archivo.name}")
+
+    notificar_usuario(
+        reporte.usuario,
+        titulo="📄 Reporte listo",
+        mensaje=f"Tu reporte {nombre} está listo para descargar",
+        tipo="info",
+        data={"reporte_id": reporte.id, "screen": "reportes"},
+    )
@@ -0,0 +1,583 @@
+import tempfile
+import time
+from datetime import date, datetime, time as hora, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
+
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from analytics import rollups
+from notifications.envio import TransporteFalso
+from notifications.models import DeviceToken
+from pagos.models import MetodoPago, TransaccionPago
+from productos.models import Categoria, Producto
+from tareas.models import Tarea
+from ventas.models import ItemPedido, Pedido
+
+from . import prompt_parser
+from .consultas import Consulta
+from .exporters import ExcelExporter, PDFExporter, PdfWriter
+from .models import ReporteGenerado
+from .report_generator import FilasReporte, ReporteGenerator, clave_cache
+from .services import GeneradorArchivos, QueryBuilder
+
+User = get_user_model()
+
+
+class ExportacionExcelTest(APITestCase):
+    """Excel en modo write-only a partir de filas iteradas"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        categoria = Categoria.objects.create(nombre="Oficina")
+        for i in range(3):
+            producto = Producto.objects.create(
+                nombre=f"Producto {i}", descripcion="-", precio=Decimal("10.00"), stock=5, categoria=categoria,
+            )
+            pedido = Pedido.objects.create(
+                usuario=self.admin, estado="PAGADO", subtotal=Decimal("20.00"), total=Decimal("20.00"),
+            )
+            ItemPedido.objects.create(pedido=pedido, producto=producto, precio_unitario=Decimal("10.00"), cantidad=2)
+        self.client.force_authenticate(user=self.admin)
+
+    @override_settings(REPORTES_CACHE_MAX_FILAS=0)
+    def test_datos_iterables_se_leen_al_exportar(self):
+        reporte = ReporteGenerator().generar_datos({"tipo": "ventas", "agrupacion": ["producto"]}, iterar=True)
+        self.assertIsInstance(reporte["datos"], FilasReporte)
+        self.assertEqual(reporte["total_registros"], 3)
+
+        archivo = ExcelExporter().generar(reporte)
+        hoja = openpyxl.load_workbook(archivo).active
+        self.assertEqual(hoja["A1"].value, "Reporte de Ventas por Producto")
+        self.assertIn("A1:D1", [str(rango) for rango in hoja.merged_cells.ranges])
+        self.assertEqual([c.value for c in hoja[5]], ["Producto", "Cantidad Vendida", "Total Ventas", "Precio Promedio"])
+        self.assertEqual(hoja["C6"].value, 20)
+        self.assertEqual(hoja["C6"].number_format, '"Bs "#,##0.00')
+        self.assertEqual(hoja.max_row, 8)
+
+    def test_generador_archivos_acepta_iterador(self):
+        filas = ({"Producto": f"P{i}", "Total": float(i)} for i in range(5000))
+        archivo = GeneradorArchivos().generar_excel(filas, "Titulo", "Sub", ["Producto", "Total"])
+        hoja = openpyxl.load_workbook(archivo).active
+        valores = list(hoja.iter_rows(min_row=5, max_row=6, values_only=True))
+        self.assertEqual(valores, [("P0", 0), ("P1", 1)])
+        # 4 filas de encabezado, 5000 de datos, 2 vacías y el pie
+        self.assertEqual(hoja.max_row, 5004 + 3)
+        self.assertEqual(hoja.cell(row=5007, column=1).value[:11], "Generado el")
+
+    def test_endpoint_excel_como_archivo(self):
+        respuesta = self.client.post(
+            "/api/reportes/generar/",
+            {"prompt": "reporte de ventas agrupado por producto", "formato": "excel"},
+            format="json",
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("attachment;", respuesta["Content-Disposition"])
+        hoja = openpyxl.load_workbook(BytesIO(b"".join(respuesta.streaming_content))).active
+        self.assertEqual(hoja["A6"].value, "Producto 0")
+
+
+class ExportacionPDFTest(APITestCase):
+    """PDF en tablas de tamaño acotado, escrito en un archivo temporal"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _reporte(self, filas, titulo="Ventas"):
+        return {
+            "titulo": titulo,
+            "subtitulo": "Período",
+            "columnas": ["Producto", "Total Ventas"],
+            "datos": ({"producto": f"P{i}", "total_ventas": float(i)} for i in range(filas)),
+            "total_registros": filas,
+        }
+
+    def _paginas(self, archivo):
+        from pypdf import PdfReader
+
+        return len(PdfReader(archivo).pages)
+
+    def test_datos_partidos_en_tablas_con_encabezado(self):
+        exporter = PDFExporter()
+        tablas = exporter._tablas(self._reporte(1000), 500, formatear_enteros=False)
+        self.assertEqual(len(tablas), 25)
+        for tabla in tablas:
+            self.assertEqual(tabla.repeatRows, 1)
+            self.assertEqual(tabla._cellvalues[0], ["Producto", "Total Ventas"])
+            self.assertLessEqual(len(tabla._cellvalues), PDFExporter.FILAS_POR_TABLA + 1)
+        self.assertEqual(tablas[-1]._cellvalues[-1], ["P999", "Bs 999.00"])
+        # Todas las tablas con los mismos anchos, dentro del ancho disponible
+        self.assertEqual(len({tuple(t._argW) for t in tablas}), 1)
+        self.assertLessEqual(sum(tablas[0]._argW), 500)
+
+    def test_sin_datos(self):
+        archivo = PDFExporter().generar(self._reporte(0))
+        self.assertEqual(archivo.read(5), b"%PDF-")
+
+    @skipIf(PdfWriter is None, "pypdf no instalado")
+    def test_multiple_en_paralelo_igual_que_secuencial(self):
+        exporter = PDFExporter()
+        secuencial = exporter.generar_multiple([self._reporte(300), self._reporte(100, "Otro")], procesos=1)
+        paralelo = exporter.generar_multiple([self._reporte(300), self._reporte(100, "Otro")], procesos=2)
+        self.assertEqual(self._paginas(paralelo), self._paginas(secuencial))
+        self.assertGreater(self._paginas(secuencial), 2)
+
+    def test_endpoint_pdf_como_archivo(self):
+        admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.client.force_authenticate(user=admin)
+        respuesta = self.client.post(
+            "/api/reportes/generar/",
+            {"prompt": "reporte de ventas agrupado por producto", "formato": "pdf"},
+            format="json",
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(respuesta.streaming_content).startswith(b"%PDF-"))
+
+
+@override_settings(NOTIFICACIONES_TRANSPORTE="notifications.envio.TransporteFalso")
+class TrabajosReporteTest(APITestCase):
+    """Reportes generados en segundo plano y guardados en ReporteGenerado.archivo"""
+
+    PROMPT = {"prompt": "reporte de ventas agrupado por producto", "formato": "excel"}
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        TransporteFalso.reiniciar()
+        cache.clear()
+
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        DeviceToken.objects.create(user=self.admin, token="token-admin")
+        categoria = Categoria.objects.create(nombre="Oficina")
+        producto = Producto.objects.create(
+            nombre="Lapicero", descripcion="-", precio=Decimal("10.00"), stock=5, categoria=categoria,
+        )
+        pedido = Pedido.objects.create(
+            usuario=self.admin, estado="PAGADO", subtotal=Decimal("20.00"), total=Decimal("20.00"),
+        )
+        ItemPedido.objects.create(pedido=pedido, producto=producto, precio_unitario=Decimal("10.00"), cantidad=2)
+        self.client.force_authenticate(user=self.admin)
+
+    def _drenar(self):
+        from tareas.worker import drenar
+
+        return drenar(tipos=["reportes.generar_reporte"])
+
+    def test_solicitar_generar_y_descargar(self):
+        respuesta = self.client.post("/api/reportes/solicitar/", self.PROMPT, format="json")
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = respuesta.data["reporte"]
+        self.assertEqual(trabajo["estado"], "PENDIENTE")
+        self.assertIsNone(trabajo["descarga_url"])
+
+        # Todavía no está listo
+        descarga = self.client.get(f"/api/reportes/trabajos/{trabajo['id']}/descargar/")
+        self.assertEqual(descarga.status_code, 409)
+
+        self.assertEqual(self._drenar(), 1)
+        estado = self.client.get(f"/api/reportes/trabajos/{trabajo['id']}/").data["reporte"]
+        self.assertEqual(estado["estado"], "COMPLETADO")
+        self.assertTrue(estado["descarga_url"].endswith(f"/api/reportes/trabajos/{trabajo['id']}/descargar/"))
+
+        descarga = self.client.get(f"/api/reportes/trabajos/{trabajo['id']}/descargar/")
+        self.assertEqual(descarga.status_code, 200)
+        hoja = openpyxl.load_workbook(BytesIO(b"".join(descarga.streaming_content))).active
+        self.assertEqual(hoja["A6"].value, "Lapicero")
+
+        # Aviso push al terminar
+        self.assertEqual(len(TransporteFalso.enviados), 1)
+        self.assertEqual(TransporteFalso.enviados[0]["data"]["reporte_id"], str(trabajo["id"]))
+
+    def test_parametros_iguales_reutilizan_el_archivo(self):
+        primero = self.client.post("/api/reportes/solicitar/", self.PROMPT, format="json").data["reporte"]
+        # Mientras se genera, el mismo usuario recibe el mismo trabajo
+        repetido = self.client.post("/api/reportes/solicitar/", self.PROMPT, format="json")
+        self.assertEqual(repetido.data["reporte"]["id"], primero["id"])
+        self.assertTrue(repetido.data["reutilizado"])
+        self._drenar()
+
+        otro = User.objects.create_user(username="gerente", password="x", is_staff=True)
+        self.client.force_authenticate(user=otro)
+        respuesta = self.client.post(
+            "/api/reportes/solicitar/",
+            {"prompt": "Reporte de ventas agrupado por producto", "formato": "excel"},
+            format="json",
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.data["reutilizado"])
+        reutilizado = ReporteGenerado.objects.get(id=respuesta.data["reporte"]["id"])
+        self.assertEqual(reutilizado.usuario, otro)
+        self.assertEqual(reutilizado.archivo.name, ReporteGenerado.objects.get(id=primero["id"]).archivo.name)
+        self.assertEqual(Tarea.objects.filter(tipo="reportes.generar_reporte").count(), 1)
+
+        # Otro formato es otro reporte
+        respuesta = self.client.post(
+            "/api/reportes/solicitar/", {**self.PROMPT, "formato": "pdf"}, format="json"
+        )
+        self.assertEqual(respuesta.status_code, 202)
+
+    def test_prompts_relativos_iguales_comparten_clave(self):
+        from .tareas import clave_reporte, parametros_a_json
+
+        def parametros(ahora):
+            return parametros_a_json([{
+                "tipo": "ventas", "fecha_inicio": ahora - timedelta(days=7), "fecha_fin": ahora,
+            }])
+
+        ahora = datetime(2024, 5, 20, 12, 0, 1, 123456)
+        self.assertEqual(
+            clave_reporte(parametros(ahora)), clave_reporte(parametros(ahora + timedelta(seconds=3)))
+        )
+        self.assertNotEqual(
+            clave_reporte(parametros(ahora)), clave_reporte(parametros(ahora + timedelta(days=1)))
+        )
+
+        prompt = {"prompt": "reporte de ventas de los últimos 7 días", "formato": "excel"}
+        primero = self.client.post("/api/reportes/solicitar/", prompt, format="json").data["reporte"]
+        repetido = self.client.post("/api/reportes/solicitar/", prompt, format="json")
+        self.assertEqual(repetido.data["reporte"]["id"], primero["id"])
+
+    def test_trabajo_de_otro_usuario_y_formato_pantalla(self):
+        trabajo = self.client.post("/api/reportes/solicitar/", self.PROMPT, format="json").data["reporte"]
+        self.client.force_authenticate(user=User.objects.create_user(username="otro", password="x"))
+        self.assertEqual(self.client.get(f"/api/reportes/trabajos/{trabajo['id']}/").status_code, 404)
+
+        respuesta = self.client.post(
+            "/api/reportes/solicitar/", {"prompt": "ventas por producto", "formato": "pantalla"}, format="json"
+        )
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class CacheDatosReporteTest(APITestCase):
+    """Datos de reportes en caché por parámetros normalizados"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.categoria = Categoria.objects.create(nombre="Oficina")
+        self._venta("Lapicero", cantidad=2)
+
+    def _venta(self, nombre, cantidad):
+        producto = Producto.objects.create(
+            nombre=nombre, descripcion="-", precio=Decimal("10.00"), stock=5, categoria=self.categoria,
+        )
+        pedido = Pedido.objects.create(
+            usuario=self.admin, estado="PAGADO", subtotal=Decimal("20.00"), total=Decimal("20.00"),
+        )
+        ItemPedido.objects.create(pedido=pedido, producto=producto, precio_unitario=Decimal("10.00"), cantidad=cantidad)
+
+    def test_mismos_parametros_no_consultan_de_nuevo(self):
+        generator = ReporteGenerator()
+        primero = generator.generar_datos({"tipo": "ventas", "agrupacion": ["producto"], "formato": "pdf"})
+        self.assertEqual(primero["total_registros"], 1)
+
+        # El formato, el prompt y el orden de las agrupaciones no cambian los datos
+        with self.assertNumQueries(0):
+            segundo = generator.generar_datos(
+                {"tipo": "ventas", "agrupacion": ["producto"], "formato": "excel", "raw_prompt": "otro"},
+                iterar=True,
+            )
+        self.assertEqual(segundo["datos"], primero["datos"])
+        self.assertEqual(segundo["parametros"]["raw_prompt"], "otro")
+        self.assertEqual(
+            clave_cache({"agrupacion": ["producto", "fecha"]}), clave_cache({"agrupacion": ["fecha", "producto"]})
+        )
+        self.assertNotEqual(
+            clave_cache({"agrupacion": ["producto"]})[0], clave_cache({"agrupacion": ["categoria"]})[0]
+        )
+
+    @override_settings(REPORTES_CACHE_BLOQUE=300, REPORTES_CACHE_HISTORICO_TTL=86400)
+    def test_rango_abierto_por_bloques_y_cerrado_con_vencimiento(self):
+        clave, ttl = clave_cache({"tipo": "ventas", "fecha_inicio": datetime(2020, 1, 1)})
+        self.assertEqual(ttl, 300)
+        clave_cerrada, ttl = clave_cache(
+            {"tipo": "ventas", "fecha_inicio": datetime(2020, 1, 1), "fecha_fin": datetime(2020, 2, 1)}
+        )
+        self.assertEqual(ttl, 86400)
+        self.assertEqual(clave_cerrada.count(":"), 2)
+        self.assertEqual(clave.count(":"), 3)
+
+        parametros = {"tipo": "ventas", "agrupacion": ["producto"]}
+        ReporteGenerator().generar_datos(parametros)
+        self._venta("Cuaderno", cantidad=1)
+        # Dentro del mismo bloque se sirve lo guardado
+        self.assertEqual(ReporteGenerator().generar_datos(parametros)["total_registros"], 1)
+        with mock.patch("reportes.report_generator.time.time", return_value=time.time() + 300):
+            self.assertEqual(ReporteGenerator().generar_datos(parametros)["total_registros"], 2)
+
+    @override_settings(REPORTES_CACHE_BLOQUE=300)
+    def test_prompts_relativos_iguales_comparten_clave(self):
+        """Las fechas de now() se truncan al bloque y el rango sigue abierto"""
+        def parametros(ahora):
+            return {"tipo": "ventas", "fecha_inicio": ahora - timedelta(days=7), "fecha_fin": ahora}
+
+        ahora = datetime.now().replace(hour=0, minute=0, second=1, microsecond=123456)
+        clave, ttl = clave_cache(parametros(ahora))
+        self.assertEqual(ttl, 300)
+        self.assertEqual(clave, clave_cache(parametros(ahora + timedelta(seconds=3)))[0])
+
+    @override_settings(REPORTES_CACHE_MAX_FILAS=0)
+    def test_reportes_grandes_no_se_guardan(self):
+        reporte = ReporteGenerator().generar_datos({"tipo": "ventas", "agrupacion": ["producto"]}, iterar=True)
+        self.assertIsInstance(reporte["datos"], FilasReporte)
+        self.assertIsNone(cache.get(clave_cache({"tipo": "ventas", "agrupacion": ["producto"]})[0]))
+
+
+class ReporteClientesTest(APITestCase):
+    """Reporte de clientes en una sola consulta agrupada"""
+
+    def setUp(self):
+        cache.clear()
+        self.clientes = []
+        for i in range(5):
+            cliente = User.objects.create_user(username=f"cliente{i}", email=f"c{i}@test.com", password="x")
+            for estado in ("PAGADO", "ENTREGADO", "CANCELADO"):
+                Pedido.objects.create(
+                    usuario=cliente, estado=estado, subtotal=Decimal("10.00"), total=Decimal("10.00"),
+                )
+            self.clientes.append(cliente)
+        User.objects.create_user(username="sin_pedidos", email="nuevo@test.com", password="x")
+        User.objects.create_superuser(username="root", email="root@test.com", password="x")
+
+    def test_una_consulta_sin_importar_la_cantidad_de_clientes(self):
+        with self.assertNumQueries(1):
+            reporte = ReporteGenerator().generar_datos({"tipo": "clientes"})
+
+        self.assertEqual(reporte["total_registros"], 6)
+        por_email = {fila["email"]: fila for fila in reporte["datos"]}
+        # Todos los pedidos cuentan; solo los de venta suman al monto
+        self.assertEqual(por_email["c0@test.com"]["total_pedidos"], 3)
+        self.assertEqual(por_email["c0@test.com"]["total_gastado"], 20.0)
+        self.assertEqual(por_email["nuevo@test.com"]["total_pedidos"], 0)
+        self.assertEqual(por_email["nuevo@test.com"]["total_gastado"], 0)
+        self.assertNotIn("root@test.com", por_email)
+
+    @override_settings(REPORTES_CACHE_MAX_FILAS=0)
+    def test_exportacion_lee_las_filas_de_la_misma_consulta(self):
+        # COUNT de usuarios, sin el JOIN ni las agregaciones
+        with self.assertNumQueries(1):
+            reporte = ReporteGenerator().generar_datos({"tipo": "clientes"}, iterar=True)
+        self.assertEqual(reporte["total_registros"], 6)
+        with self.assertNumQueries(1):
+            filas = list(reporte["datos"])
+        self.assertEqual(filas[0]["cliente"], "c0@test.com")
+
+    def test_ventas_por_cliente(self):
+        reporte = ReporteGenerator().generar_datos({"tipo": "ventas", "agrupacion": ["cliente"]})
+        self.assertEqual(reporte["total_registros"], 5)
+        self.assertEqual({fila["monto_total"] for fila in reporte["datos"]}, {20.0})
+
+
+class PromptParserTest(APITestCase):
+    """Patrones compilados y caché de prompts normalizados"""
+
+    def setUp(self):
+        prompt_parser.limpiar_cache()
+
+    def test_prompt_normalizado_usa_el_cache(self):
+        prompt_parser.interpretar_prompt("Ventas por producto en Excel")
+        parametros = prompt_parser.interpretar_prompt("  ventas POR producto   en excel ")
+
+        self.assertEqual(prompt_parser._analizar.cache_info().hits, 1)
+        self.assertEqual(parametros["formato"], "excel")
+        self.assertEqual(parametros["agrupacion"], ["producto"])
+        self.assertEqual(parametros["raw_prompt"], "  ventas POR producto   en excel ")
+
+    def test_cache_devuelve_copias_independientes(self):
+        primero = prompt_parser.interpretar_prompt("ventas por categoría con precio")
+        primero["agrupacion"].append("cliente")
+        primero["campos"].clear()
+
+        segundo = prompt_parser.interpretar_prompt("ventas por categoría con precio")
+        self.assertEqual(segundo["agrupacion"], ["categoria"])
+        self.assertEqual(segundo["campos"], ["precio"])
+
+    def test_fechas_relativas_se_resuelven_en_cada_llamada(self):
+        class Reloj(datetime):
+            ahora = datetime(2024, 5, 20, 12, 0)
+
+            @classmethod
+            def now(cls, tz=None):
+                return cls.ahora
+
+        with mock.patch.object(prompt_parser, "datetime", Reloj):
+            antes = prompt_parser.interpretar_prompt("ventas de los últimos 2 meses")
+            Reloj.ahora = datetime(2024, 8, 1, 9, 0)
+            despues = prompt_parser.interpretar_prompt("ventas de los últimos 2 meses")
+
+        self.assertEqual(prompt_parser._analizar.cache_info().hits, 1)
+        self.assertEqual((antes["fecha_inicio"], antes["fecha_fin"]),
+                         (datetime(2024, 3, 20, 12, 0), datetime(2024, 5, 20, 12, 0)))
+        self.assertEqual((despues["fecha_inicio"], despues["fecha_fin"]),
+                         (datetime(2024, 6, 1, 9, 0), datetime(2024, 8, 1, 9, 0)))
+
+    def test_rango_de_meses_y_fechas(self):
+        parametros = prompt_parser.interpretar_prompt("ventas de octubre y diciembre")
+        anio = datetime.now().year
+        self.assertEqual(parametros["fecha_inicio"], datetime(anio, 10, 1))
+        self.assertEqual(parametros["fecha_fin"], datetime(anio + 1, 1, 1))
+
+        parametros = prompt_parser.interpretar_prompt("ventas del 01/02/2024 al 15/03/2024")
+        self.assertEqual(parametros["fecha_inicio"], datetime(2024, 2, 1))
+        self.assertEqual(parametros["fecha_fin"], datetime(2024, 3, 15))
+
+    def test_detectar_multiples_reportes(self):
+        partes = prompt_parser.detectar_multiples_reportes(
+            "Reporte de ventas por producto y también clientes en excel"
+        )
+        self.assertEqual(partes, ["Reporte de ventas por producto", "clientes en excel"])
+        partes.append("otro")
+        self.assertEqual(
+            prompt_parser.detectar_multiples_reportes("reporte de ventas de octubre y noviembre"),
+            ["reporte de ventas de octubre y noviembre"],
+        )
+        self.assertEqual(len(prompt_parser.detectar_multiples_reportes(
+            "Reporte de ventas por producto y también clientes en excel"
+        )), 2)
+
+    def test_benchmark_parser(self):
+        ReporteGenerado.objects.create(
+            usuario=User.objects.create_user(username="u", password="x"),
+            prompt_original="ventas por cliente de los últimos 7 dias",
+            tipo="ventas", formato="pdf",
+        )
+        salida = StringIO()
+        call_command("benchmark_parser", repeticiones=1, stdout=salida)
+
+        self.assertIn("Corpus: 9 prompts (1 guardados)", salida.getvalue())
+        self.assertIn("Con caché", salida.getvalue())
+        self.assertEqual(prompt_parser._analizar.cache_info().currsize, 0)
+
+
+class ConsultasReporteTest(APITestCase):
+    """Motor de consultas: mismas filas desde los hechos o desde los rollups"""
+
+    def setUp(self):
+        cache.clear()
+        cliente = User.objects.create_user(username="cliente", email="c@test.com", password="x")
+        oficina = Categoria.objects.create(nombre="Oficina")
+        hogar = Categoria.objects.create(nombre="Hogar")
+        productos = [
+            Producto.objects.create(nombre=f"P{i}", descripcion="-", precio=Decimal("5.00"), stock=5,
+                                    categoria=categoria)
+            for i, categoria in enumerate((oficina, oficina, hogar))
+        ]
+        metodo = MetodoPago.objects.create(nombre="Efectivo", tipo="EFECTIVO")
+        self.pedidos = []
+        for dia, estado, cantidad in ((1, "PAGADO", 1), (1, "ENTREGADO", 2), (2, "PAGADO", 3), (3, "PROCESANDO", 4)):
+            pedido = Pedido.objects.create(
+                usuario=cliente, estado=estado, subtotal=Decimal("0"), total=Decimal(cantidad * 15),
+            )
+            ItemPedido.objects.create(pedido=pedido, producto=productos[0], precio_unitario=Decimal("5.00"),
+                                      cantidad=cantidad)
+            ItemPedido.objects.create(pedido=pedido, producto=productos[2], precio_unitario=Decimal("10.00"),
+                                      cantidad=cantidad)
+            Pedido.objects.filter(id=pedido.id).update(creado=datetime(2024, 3, dia, 10, 30))
+            TransaccionPago.objects.create(pedido=pedido, metodo_pago=metodo, estado="EXITOSO",
+                                           monto=pedido.total)
+            self.pedidos.append(pedido)
+        TransaccionPago.objects.update(creado=datetime(2024, 3, 1, 12, 0))
+        rollups.reconstruir()
+
+    def _filas(self, consulta):
+        with CaptureQueriesContext(connection) as consultas:
+            filas = list(consulta.compilar())
+        self.assertEqual(len(consultas), 1)
+        return filas, consultas[0]["sql"]
+
+    def test_rollup_con_estados_y_dias_completos(self):
+        medidas = ["cantidad_vendida", "total_ventas"]
+        rollup = Consulta("items", ["categoria"], medidas, desde=date(2024, 3, 1), hasta=date(2024, 3, 2),
+                          estados=["PAGADO", "ENTREGADO"], orden=["categoria_nombre"])
+        # Hasta las 23:59:59 (sin microsegundos) no es un día completo: se agrega ItemPedido
+        hechos = Consulta("items", ["categoria"], medidas, desde=datetime(2024, 3, 1),
+                          hasta=datetime(2024, 3, 2, 23, 59, 59), estados=["ENTREGADO", "PAGADO"],
+                          orden=["categoria_nombre"])
+
+        filas_rollup, sql_rollup = self._filas(rollup)
+        filas_hechos, sql_hechos = self._filas(hechos)
+
+        self.assertIn("analytics_ventadiariacategoria", sql_rollup)
+        self.assertIn("ventas_itempedido", sql_hechos)
+        self.assertEqual(filas_rollup, filas_hechos)
+        self.assertEqual(filas_rollup, [
+            {"categoria_nombre": "Hogar", "cantidad_vendida": 6, "total_ventas": Decimal("60.00")},
+            {"categoria_nombre": "Oficina", "cantidad_vendida": 6, "total_ventas": Decimal("30.00")},
+        ])
+
+    def test_medidas_sin_rollup_y_otros_estados_leen_los_hechos(self):
+        precio = Consulta("items", ["producto"], ["precio_promedio"], estados=["PAGADO", "ENTREGADO"])
+        otros_estados = Consulta("pedidos", ["fecha"], ["cantidad_pedidos"], estados=["PAGADO"])
+        self.assertEqual(precio.tabla().modelo, "ventas.ItemPedido")
+        self.assertEqual(otros_estados.tabla().modelo, "ventas.Pedido")
+
+    def test_dias_sin_ventas_no_aparecen(self):
+        consulta = Consulta("pedidos", ["fecha"], ["cantidad_pedidos", "monto_total", "ticket_promedio"],
+                            estados=["PAGADO", "ENTREGADO"], orden=["fecha"])
+        self.assertEqual(consulta.tabla().modelo, "analytics.VentaDiaria")
+        self.assertEqual([fila["fecha"] for fila in consulta.compilar()], [date(2024, 3, 1), date(2024, 3, 2)])
+        self.assertEqual(float(consulta.compilar()[0]["ticket_promedio"]), 22.5)
+
+        # Sale de venta: el rollup del día queda en 0 pero no se lista
+        pedido = self.pedidos[2]
+        pedido.refresh_from_db()
+        pedido.estado = "CANCELADO"
+        pedido.save()
+        self.assertEqual([fila["fecha"] for fila in consulta.compilar()], [date(2024, 3, 1)])
+        filas = consulta.filas(lambda fila: fila)
+        self.assertEqual(len(filas), 1)
+
+    @override_settings(REPORTES_ESTADOS_VENTA=["PAGADO", "ENTREGADO"])
+    def test_reporte_de_ventas_desde_los_rollups(self):
+        parametros = {
+            "tipo": "ventas", "agrupacion": ["fecha"],
+            "fecha_inicio": datetime(2024, 3, 1), "fecha_fin": datetime.combine(date(2024, 3, 31), hora.max),
+        }
+        with CaptureQueriesContext(connection) as consultas:
+            reporte = ReporteGenerator().generar_datos(parametros)
+
+        self.assertEqual(len(consultas), 1)
+        self.assertIn("analytics_ventadiaria", consultas[0]["sql"])
+        self.assertEqual(reporte["datos"], [
+            {"fecha": "02/03/2024", "cantidad_pedidos": 1, "total_vendido": 45.0, "ticket_promedio": 45.0},
+            {"fecha": "01/03/2024", "cantidad_pedidos": 2, "total_vendido": 45.0, "ticket_promedio": 22.5},
+        ])
+
+    def test_reporte_por_cliente_con_los_estados_por_defecto(self):
+        reporte = ReporteGenerator().generar_datos({"tipo": "ventas", "agrupacion": ["cliente"]})
+        self.assertEqual(reporte["datos"], [{
+            "cliente": "c@test.com", "cantidad_compras": 4, "monto_total": 150.0,
+            "rango_fechas": "01/03/2024 - 03/03/2024",
+        }])
+
+    def test_query_builder_de_transacciones(self):
+        builder = QueryBuilder()
+        periodo = {"inicio": date(2024, 3, 1), "fin": date(2024, 3, 1)}
+
+        por_cliente = builder.construir_query_ventas({"periodo": periodo, "agrupacion": "cliente"})
+        self.assertEqual(por_cliente, [{
+            "cliente": "c@test.com", "email": "c@test.com", "total_gastado": 150.0,
+            "cantidad_compras": 4, "ticket_promedio": 37.5,
+        }])
+        por_fecha = builder.construir_query_ventas({"periodo": periodo, "agrupacion": "fecha"})
+        self.assertEqual(por_fecha[0]["fecha"], "2024-03-01")
+        self.assertEqual(builder.construir_query_ingresos({"periodo": periodo})["cantidad_transacciones"], 4)
+        self.assertEqual(
+            builder.construir_query_clientes({"filtros": {"orden": "-cantidad", "limit": 1}})[0]["total_gastado"],
+            150.0,
+        )
+        fuera = builder.construir_query_ingresos({"periodo": {"inicio": date(2024, 4, 1), "fin": date(2024, 4, 2)}})
+        self.assertEqual(fuera["total_ingresos"], 0)
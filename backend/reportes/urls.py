@@ -5,6 +5,9 @@ app_name = 'reportes'
 
 urlpatterns = [
     path('generar/', views.generar_reporte, name='generar_reporte'),
+    path('solicitar/', views.solicitar_reporte, name='solicitar_reporte'),
+    path('trabajos/<int:reporte_id>/', views.estado_trabajo, name='estado_trabajo'),
+    path('trabajos/<int:reporte_id>/descargar/', views.descargar_trabajo, name='descargar_trabajo'),
     path('interpretar/', views.interpretar_comando, name='interpretar_comando'),
     path('historial/', views.historial_reportes, name='historial_reportes'),
 ]
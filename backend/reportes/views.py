@@ -1,15 +1,46 @@
+import os
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.http import HttpResponse
+from django.http import FileResponse
+from django.urls import reverse
 from .prompt_parser import interpretar_prompt, detectar_multiples_reportes
 from .report_generator import ReporteGenerator
-from .exporters import PDFExporter, ExcelExporter
+from .exporters import CONTENT_TYPES, exportar
 from .models import ReporteGenerado
 from .serializers import ReporteGeneradoSerializer
 
 
+def _interpretar_prompts(prompt, formato_forzado=None):
+    """
+    Separar el prompt en reportes e interpretar cada uno
+    
+    Returns:
+        tuple: (lista de parámetros, formato final)
+    """
+    # 1. Detectar si hay múltiples reportes en el prompt
+    prompts_separados = detectar_multiples_reportes(prompt)
+    print(f"📊 PROMPTS SEPARADOS: {len(prompts_separados)} reportes detectados")
+    for i, p in enumerate(prompts_separados, 1):
+        print(f"   Reporte {i}: {p}")
+    
+    # 2. Interpretar cada sub-prompt
+    parametros_reportes = []
+    for sub_prompt in prompts_separados:
+        parametros = interpretar_prompt(sub_prompt)
+        
+        # Forzar formato si se proporcionó
+        if formato_forzado:
+            parametros['formato'] = formato_forzado
+        parametros_reportes.append(parametros)
+    
+    # 3. Determinar formato final (el forzado o el del primer reporte)
+    formato = formato_forzado or parametros_reportes[0].get('formato', 'pantalla')
+    return parametros_reportes, formato
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generar_reporte(request):
@@ -41,33 +72,15 @@ def generar_reporte(request):
         print(f"🔍 PROMPT RECIBIDO: {prompt}")
         print(f"📄 FORMATO FORZADO: {formato_forzado}")
         
-        # 1. Detectar si hay múltiples reportes en el prompt
-        prompts_separados = detectar_multiples_reportes(prompt)
-        print(f"📊 PROMPTS SEPARADOS: {len(prompts_separados)} reportes detectados")
-        for i, p in enumerate(prompts_separados, 1):
-            print(f"   Reporte {i}: {p}")
+        # 1-3. Separar, interpretar y determinar el formato final
+        parametros_reportes, formato = _interpretar_prompts(prompt, formato_forzado)
         
-        # 2. Generar todos los reportes solicitados
-        reportes_generados = []
-        for sub_prompt in prompts_separados:
-            # Interpretar cada sub-prompt
-            parametros = interpretar_prompt(sub_prompt)
-            
-            # Forzar formato si se proporcionó
-            if formato_forzado:
-                parametros['formato'] = formato_forzado
-            
-            # Generar datos del reporte
-            generator = ReporteGenerator()
-            datos_reporte = generator.generar_datos(parametros)
-            reportes_generados.append(datos_reporte)
-        
-        # 3. Determinar formato final
-        if formato_forzado:
-            formato = formato_forzado
-        else:
-            # Usar el formato del primer reporte
-            formato = reportes_generados[0]['parametros'].get('formato', 'pantalla')
+        # Generar los datos; para archivos las filas se leen mientras se escriben
+        generator = ReporteGenerator()
+        reportes_generados = [
+            generator.generar_datos(parametros, iterar=formato in ('pdf', 'excel'))
+            for parametros in parametros_reportes
+        ]
         
         # 4. Si es pantalla y hay múltiples reportes
         if formato == 'pantalla':
@@ -85,46 +98,14 @@ def generar_reporte(request):
                     'reporte': reportes_generados[0]
                 })
         
-        # 5. Si es PDF o Excel (uno o múltiples reportes)
-        if formato == 'pdf':
-            from datetime import datetime
-            # Generar PDF con múltiples reportes
-            print(f"📄 GENERANDO PDF con {len(reportes_generados)} reporte(s)")
-            exporter = PDFExporter()
-            if len(reportes_generados) > 1:
-                print(f"   ✅ Usando generar_multiple() para {len(reportes_generados)} reportes")
-                buffer = exporter.generar_multiple(reportes_generados)
-                filename = f"reportes_combinados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            else:
-                print(f"   ⚠️ Usando generar() para 1 reporte")
-                buffer = exporter.generar(reportes_generados[0])
-                titulo = reportes_generados[0].get('titulo', 'reporte').replace(' ', '_')
-                filename = f"{titulo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            print(f"📥 Archivo generado: {filename}")
-            print(f"{'='*60}\n")
-            
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
+        # 5. Si es PDF o Excel (uno o múltiples reportes): archivo temporal escrito por bloques
+        print(f"📄 GENERANDO {formato.upper()} con {len(reportes_generados)} reporte(s)")
+        archivo, filename, content_type = exportar(reportes_generados, formato)
+        print(f"📥 Archivo generado: {filename}")
+        print(f"{'='*60}\n")
         
-        elif formato == 'excel':
-            from datetime import datetime
-            # Generar Excel con múltiples reportes
-            exporter = ExcelExporter()
-            if len(reportes_generados) > 1:
-                buffer = exporter.generar_multiple(reportes_generados)
-                filename = f"reportes_combinados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            else:
-                buffer = exporter.generar(reportes_generados[0])
-                titulo = reportes_generados[0].get('titulo', 'reporte').replace(' ', '_')
-                filename = f"{titulo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            
-            response = HttpResponse(
-                buffer.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
+        # FileResponse lo envía por bloques y cierra (borra) el temporal al terminar
+        return FileResponse(archivo, as_attachment=True, filename=filename, content_type=content_type)
     
     except Exception as e:
         return Response(
@@ -136,6 +117,95 @@ def generar_reporte(request):
         )
 
 
+def _trabajo(request, reporte):
+    """Estado de un trabajo de reporte con sus enlaces"""
+    datos = ReporteGeneradoSerializer(reporte).data
+    datos['estado_url'] = request.build_absolute_uri(reverse('reportes:estado_trabajo', args=[reporte.id]))
+    datos['descarga_url'] = (
+        request.build_absolute_uri(reverse('reportes:descargar_trabajo', args=[reporte.id]))
+        if reporte.estado == 'COMPLETADO' else None
+    )
+    return datos
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def solicitar_reporte(request):
+    """
+    POST /api/reportes/solicitar/
+    
+    Igual que /generar/ para PDF y Excel, pero el archivo se genera en segundo
+    plano. Responde de inmediato con el trabajo; cuando está listo el usuario
+    recibe una notificación push (o consulta estado_url) y lo baja de descarga_url.
+    
+    Body:
+    {
+        "prompt": "ventas de este mes por producto en pdf",
+        "formato": "pdf"  // opcional, se puede detectar del prompt
+    }
+    
+    Returns:
+        202 con el trabajo encolado, o 200 si se reutilizó un archivo reciente
+        con los mismos parámetros
+    """
+    from .tareas import solicitar_reporte as crear_trabajo
+    
+    prompt = request.data.get('prompt', '')
+    if not prompt:
+        return Response({'error': 'Debe proporcionar un prompt'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    parametros_reportes, formato = _interpretar_prompts(prompt, request.data.get('formato'))
+    if formato not in ('pdf', 'excel'):
+        return Response(
+            {'error': 'Los trabajos generan archivos: el formato debe ser pdf o excel'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    reporte, reutilizado = crear_trabajo(request.user, prompt, parametros_reportes, formato)
+    return Response(
+        {'success': True, 'reutilizado': reutilizado, 'reporte': _trabajo(request, reporte)},
+        status=status.HTTP_200_OK if reporte.estado == 'COMPLETADO' else status.HTTP_202_ACCEPTED
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estado_trabajo(request, reporte_id):
+    """
+    GET /api/reportes/trabajos/<id>/
+    
+    Estado de un reporte solicitado (PENDIENTE, EN_PROCESO, COMPLETADO, FALLIDO)
+    """
+    reporte = ReporteGenerado.objects.filter(id=reporte_id, usuario=request.user).first()
+    if reporte is None:
+        return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'success': True, 'reporte': _trabajo(request, reporte)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def descargar_trabajo(request, reporte_id):
+    """
+    GET /api/reportes/trabajos/<id>/descargar/
+    
+    Archivo de un reporte completado
+    """
+    reporte = ReporteGenerado.objects.filter(id=reporte_id, usuario=request.user).first()
+    if reporte is None:
+        return Response({'error': 'Reporte no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    if reporte.estado != 'COMPLETADO' or not reporte.archivo:
+        return Response(
+            {'error': 'El reporte todavía no está listo', 'estado': reporte.estado},
+            status=status.HTTP_409_CONFLICT
+        )
+    return FileResponse(
+        reporte.archivo.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(reporte.archivo.name),
+        content_type=CONTENT_TYPES[reporte.formato]
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def interpretar_comando(request):
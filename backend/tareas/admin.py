@@ -0,0 +1,29 @@
+"""
+Configuración del admin para las tareas en segundo plano
+"""
+from django.contrib import admin
+from django.utils import timezone
+from .models import Tarea
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    """Administración del outbox de tareas"""
+    list_display = ['id', 'tipo', 'estado', 'intentos', 'max_intentos', 'disponible_en', 'creado', 'completado_en']
+    list_filter = ['estado', 'tipo', 'creado']
+    search_fields = ['tipo', 'ultimo_error']
+    readonly_fields = ['creado', 'actualizado', 'completado_en', 'tomada_por', 'tomada_en', 'ultimo_error']
+    date_hierarchy = 'creado'
+    actions = ['reintentar']
+
+    @admin.action(description='Reintentar tareas seleccionadas')
+    def reintentar(self, request, queryset):
+        actualizadas = queryset.exclude(estado='EN_PROCESO').update(
+            estado='PENDIENTE',
+            intentos=0,
+            disponible_en=timezone.now(),
+            tomada_por='',
+            tomada_en=None,
+            completado_en=None,
+        )
+        self.message_user(request, f'{actualizadas} tareas reencoladas')
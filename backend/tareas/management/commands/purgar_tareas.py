@@ -0,0 +1,47 @@
+"""
+Comando para eliminar las tareas terminadas antiguas del outbox.
+
+Uso:
+    python manage.py purgar_tareas [--dias-completadas N] [--dias-muertas N] [--simular]
+
+    Los workers ya lo hacen cada hora; sirve para purgar a mano o desde cron
+    cuando no hay workers corriendo. Sin --simular ejecuta también las
+    limpiezas de settings.TAREAS_PURGAS.
+"""
+from django.core.management.base import BaseCommand
+
+from tareas.worker import ejecutar_purgas, purgar_terminadas
+
+
+class Command(BaseCommand):
+    help = 'Elimina las tareas COMPLETADA y MUERTA más antiguas que la retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias-completadas',
+            type=int,
+            default=None,
+            help='Días que se conservan las completadas (por defecto TAREAS_DIAS_COMPLETADAS)'
+        )
+        parser.add_argument(
+            '--dias-muertas',
+            type=int,
+            default=None,
+            help='Días que se conservan las muertas (por defecto TAREAS_DIAS_MUERTAS)'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo mostrar cuántas tareas se eliminarían'
+        )
+
+    def handle(self, *args, **options):
+        if options['simular']:
+            total = purgar_terminadas(options['dias_completadas'], options['dias_muertas'], simular=True)
+        else:
+            total = ejecutar_purgas(options['dias_completadas'], options['dias_muertas'])
+
+        if options['simular']:
+            self.stdout.write(f'🔍 Se eliminarían {total} tareas')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} tareas eliminadas'))
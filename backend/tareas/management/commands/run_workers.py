@@ -0,0 +1,120 @@
+"""
+Comando para ejecutar los workers de tareas en segundo plano.
+
+Uso:
+    python manage.py run_workers [--procesos N] [--lote N] [--intervalo S] [--tipos t1 t2] [--excluir t3]
+    python manage.py run_workers --una-vez
+
+    - Sin --una-vez: levanta N procesos que consumen el outbox hasta recibir SIGTERM/SIGINT
+    - Con --una-vez: drena las tareas disponibles en el proceso actual y termina
+    - --tipos / --excluir permiten separar pools (p. ej. uno dedicado a
+      analytics.entrenar_modelo con 1 proceso y el resto con --excluir)
+"""
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tareas.worker import bucle, drenar
+
+
+def _proceso_worker(detener, lote, intervalo, tipos, excluir):
+    """Punto de entrada de cada proceso hijo"""
+    # El padre coordina el apagado: el hijo termina la tarea en curso y sale
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    bucle(detener, lote=lote, intervalo=intervalo, tipos=tipos, excluir=excluir)
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los workers que procesan las tareas en segundo plano'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=getattr(settings, 'TAREAS_PROCESOS', 2),
+            help='Número de procesos worker'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=10,
+            help='Tareas que reclama cada worker por vuelta'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1.0,
+            help='Segundos de espera cuando no hay tareas'
+        )
+        parser.add_argument(
+            '--tipos',
+            nargs='*',
+            help='Procesar solo estos tipos de tarea'
+        )
+        parser.add_argument(
+            '--excluir',
+            nargs='*',
+            help='No procesar estos tipos de tarea'
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Drenar las tareas disponibles y terminar'
+        )
+
+    def handle(self, *args, **options):
+        tipos = options['tipos'] or None
+        excluir = options['excluir'] or None
+
+        if options['una_vez']:
+            ejecutadas = drenar(tipos=tipos, excluir=excluir)
+            self.stdout.write(self.style.SUCCESS(f'✅ {ejecutadas} tareas ejecutadas'))
+            return
+
+        procesos = max(1, options['procesos'])
+        detener = multiprocessing.Event()
+
+        # El handler solo marca un flag: llamar a detener.set() desde una señal
+        # puede bloquearse si el hilo principal está dentro de detener.wait()
+        senal_recibida = []
+        signal.signal(signal.SIGINT, lambda *_: senal_recibida.append(True))
+        signal.signal(signal.SIGTERM, lambda *_: senal_recibida.append(True))
+
+        # Los hijos no deben heredar las conexiones abiertas del padre
+        connections.close_all()
+
+        def lanzar():
+            proceso = multiprocessing.Process(
+                target=_proceso_worker,
+                args=(detener, options['lote'], options['intervalo'], tipos, excluir),
+                daemon=True,
+            )
+            proceso.start()
+            return proceso
+
+        workers = [lanzar() for _ in range(procesos)]
+        self.stdout.write(self.style.SUCCESS(f'👷 {procesos} workers iniciados'))
+
+        # Supervisar: relanzar los procesos que mueran inesperadamente
+        while not senal_recibida:
+            for i, proceso in enumerate(workers):
+                if not proceso.is_alive():
+                    self.stdout.write(self.style.WARNING(
+                        f'⚠️ Worker {proceso.pid} terminó (código {proceso.exitcode}), relanzando'
+                    ))
+                    workers[i] = lanzar()
+            time.sleep(1)
+
+        self.stdout.write('⏳ Deteniendo workers...')
+        detener.set()
+        limite = time.monotonic() + 30
+        for proceso in workers:
+            proceso.join(max(0, limite - time.monotonic()))
+            if proceso.is_alive():
+                proceso.terminate()
+        self.stdout.write(self.style.SUCCESS('👋 Workers detenidos'))
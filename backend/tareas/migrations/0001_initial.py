@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=100, verbose_name='Tipo')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADA', 'Completada'), ('MUERTA', 'Muerta')], default='PENDIENTE', max_length=20, verbose_name='Estado')),
+                ('intentos', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('max_intentos', models.PositiveIntegerField(default=5, verbose_name='Máximo de intentos')),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible desde')),
+                ('ultimo_error', models.TextField(blank=True, verbose_name='Último error')),
+                ('tomada_por', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('tomada_en', models.DateTimeField(blank=True, null=True, verbose_name='Tomada el')),
+                ('creado', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('actualizado', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('completado_en', models.DateTimeField(blank=True, null=True, verbose_name='Completada el')),
+            ],
+            options={
+                'verbose_name': 'Tarea',
+                'verbose_name_plural': 'Tareas',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='tareas_tare_estado_cbf474_idx'), models.Index(fields=['tipo', 'estado'], name='tareas_tare_tipo_29aa98_idx')],
+            },
+        ),
+    ]
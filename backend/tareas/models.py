@@ -0,0 +1,57 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tarea(models.Model):
+    """
+    Trabajo pendiente de ejecutar fuera del request (outbox transaccional).
+
+    Se inserta en la misma transacción que el cambio que lo origina, así que
+    solo existe si ese cambio se confirmó. Los workers (`manage.py run_workers`)
+    la reclaman, la ejecutan y la reintentan con backoff si falla.
+    """
+
+    ESTADO_CHOICES = [
+        ("PENDIENTE", "Pendiente"),
+        ("EN_PROCESO", "En proceso"),
+        ("COMPLETADA", "Completada"),
+        ("MUERTA", "Muerta"),  # Agotó sus intentos (dead-letter)
+    ]
+
+    tipo = models.CharField(max_length=100, verbose_name="Tipo")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Parámetros")
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default="PENDIENTE",
+        verbose_name="Estado",
+    )
+
+    # Reintentos
+    intentos = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    max_intentos = models.PositiveIntegerField(default=5, verbose_name="Máximo de intentos")
+    disponible_en = models.DateTimeField(
+        default=timezone.now, verbose_name="Disponible desde"
+    )
+    ultimo_error = models.TextField(blank=True, verbose_name="Último error")
+
+    # Reclamo por parte de un worker
+    tomada_por = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    tomada_en = models.DateTimeField(null=True, blank=True, verbose_name="Tomada el")
+
+    # Fechas
+    creado = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    actualizado = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+    completado_en = models.DateTimeField(null=True, blank=True, verbose_name="Completada el")
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        ordering = ["-creado"]
+        indexes = [
+            models.Index(fields=["estado", "disponible_en"]),
+            models.Index(fields=["tipo", "estado"]),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.estado})"
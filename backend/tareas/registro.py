@@ -0,0 +1,125 @@
+"""
+Registro de tipos de tarea y encolado en el outbox
+
+Cada app define sus tareas en un módulo `tareas.py` (se cargan automáticamente
+al iniciar Django):
+
+    from tareas.registro import tarea
+
+    @tarea("notificaciones.nuevo_pedido", max_intentos=5, concurrencia=4)
+    def nuevo_pedido(pedido_id):
+        ...
+
+y las encola desde cualquier parte, dentro de la transacción en curso:
+
+    nuevo_pedido.encolar(pedido_id=pedido.id)
+
+El payload debe ser serializable a JSON: se pasan IDs, nunca instancias.
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# tipo -> DefinicionTarea
+_REGISTRO = {}
+
+
+class DefinicionTarea:
+    """Función registrada como tarea y su política de ejecución"""
+
+    def __init__(
+        self, tipo, funcion, max_intentos=5, concurrencia=None,
+        backoff_base=10, backoff_max=3600, timeout=None,
+    ):
+        self.tipo = tipo
+        self.funcion = funcion
+        self.max_intentos = max_intentos
+        self.concurrencia = concurrencia  # Máximo de ejecuciones simultáneas (None = sin límite)
+        self.backoff_base = backoff_base  # Segundos antes del primer reintento
+        self.backoff_max = backoff_max
+        self.timeout = timeout  # Segundos para darla por huérfana (None = TAREAS_TIMEOUT_HUERFANAS)
+
+    def calcular_backoff(self, intentos):
+        """Espera exponencial (base * 2^(n-1)) con un 10% de jitter"""
+        espera = min(self.backoff_base * 2 ** max(intentos - 1, 0), self.backoff_max)
+        return timedelta(seconds=espera * random.uniform(1.0, 1.1))
+
+
+def tarea(tipo, max_intentos=5, concurrencia=None, backoff_base=10, backoff_max=3600, timeout=None):
+    """
+    Decorador que registra una función como tarea en segundo plano
+
+    Args:
+        tipo: Nombre estable de la tarea (se guarda en la BD)
+        max_intentos: Intentos antes de marcarla como MUERTA
+        concurrencia: Máximo de ejecuciones simultáneas entre todos los workers
+        backoff_base: Segundos de espera antes del primer reintento
+        backoff_max: Espera máxima entre reintentos
+        timeout: Segundos en EN_PROCESO tras los que se considera huérfana
+                 (para tareas largas; por defecto TAREAS_TIMEOUT_HUERFANAS)
+    """
+    def decorador(funcion):
+        if tipo in _REGISTRO and _REGISTRO[tipo].funcion is not funcion:
+            logger.warning(f"Tarea '{tipo}' registrada más de una vez; se usa la última")
+        _REGISTRO[tipo] = DefinicionTarea(
+            tipo, funcion, max_intentos, concurrencia, backoff_base, backoff_max, timeout
+        )
+        funcion.tipo = tipo
+        funcion.encolar = lambda retraso=0, **payload: encolar(tipo, retraso=retraso, **payload)
+        return funcion
+
+    return decorador
+
+
+def obtener_definicion(tipo):
+    """Definición registrada para `tipo` o None"""
+    return _REGISTRO.get(tipo)
+
+
+def tipos_registrados():
+    """Copia del registro completo {tipo: DefinicionTarea}"""
+    return dict(_REGISTRO)
+
+
+def encolar(tipo, retraso=0, **payload):
+    """
+    Guardar una tarea en el outbox
+
+    La fila se inserta en la transacción actual: si esta se revierte la tarea
+    desaparece con ella, y si se confirma un worker la ejecutará.
+
+    Args:
+        tipo: Tipo de tarea registrado con @tarea
+        retraso: Segundos a esperar antes de que esté disponible
+        **payload: Argumentos de la tarea (serializables a JSON)
+
+    Returns:
+        Tarea: La tarea creada
+    """
+    from .models import Tarea
+
+    definicion = _REGISTRO.get(tipo)
+    if definicion is None:
+        raise ValueError(f"Tipo de tarea no registrado: {tipo}")
+
+    nueva = Tarea.objects.create(
+        tipo=tipo,
+        payload=payload,
+        max_intentos=definicion.max_intentos,
+        disponible_en=timezone.now() + timedelta(seconds=retraso),
+    )
+
+    # Modo síncrono (desarrollo sin workers): ejecutar al confirmar la transacción
+    if getattr(settings, "TAREAS_SINCRONO", False) and not retraso:
+        from .worker import ejecutar_por_id
+
+        transaction.on_commit(lambda: ejecutar_por_id(nueva.id))
+
+    return nueva
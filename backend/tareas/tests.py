@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Tarea
+from .registro import encolar, tarea
+from .worker import drenar, purgar_terminadas, reclamar, recuperar_huerfanas
+
+EJECUCIONES = []
+
+
+@tarea("tests.registrar", max_intentos=3)
+def registrar(valor):
+    EJECUCIONES.append(valor)
+
+
+@tarea("tests.fallar", max_intentos=2, backoff_base=60)
+def fallar():
+    raise RuntimeError("fallo simulado")
+
+
+@tarea("tests.limitada", concurrencia=1)
+def limitada():
+    pass
+
+
+class TareaTest(TestCase):
+    """Tests para el outbox de tareas y su ejecución"""
+
+    def setUp(self):
+        EJECUCIONES.clear()
+
+    def test_encolar_y_drenar(self):
+        """Las tareas encoladas se ejecutan al drenar la cola"""
+        registrar.encolar(valor=1)
+        registrar.encolar(valor=2)
+
+        self.assertEqual(drenar(), 2)
+        self.assertEqual(EJECUCIONES, [1, 2])
+        self.assertEqual(Tarea.objects.filter(estado="COMPLETADA").count(), 2)
+
+    def test_tarea_revertida_no_se_encola(self):
+        """Si la transacción se revierte la tarea desaparece con ella"""
+        try:
+            with transaction.atomic():
+                registrar.encolar(valor=1)
+                raise ValueError("rollback")
+        except ValueError:
+            pass
+
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_tipo_no_registrado(self):
+        """No se puede encolar un tipo desconocido"""
+        with self.assertRaises(ValueError):
+            encolar("tests.no_existe")
+
+    def test_reintento_con_backoff(self):
+        """Una tarea fallida vuelve a PENDIENTE con disponible_en futuro"""
+        nueva = fallar.encolar()
+
+        drenar()
+
+        nueva.refresh_from_db()
+        self.assertEqual(nueva.estado, "PENDIENTE")
+        self.assertEqual(nueva.intentos, 1)
+        self.assertGreater(nueva.disponible_en, timezone.now() + timedelta(seconds=50))
+        self.assertIn("fallo simulado", nueva.ultimo_error)
+
+    def test_tarea_muerta_al_agotar_intentos(self):
+        """Al agotar los intentos la tarea pasa a MUERTA"""
+        nueva = fallar.encolar()
+
+        drenar(incluir_programadas=True)
+
+        nueva.refresh_from_db()
+        self.assertEqual(nueva.estado, "MUERTA")
+        self.assertEqual(nueva.intentos, 2)
+
+    def test_limite_de_concurrencia(self):
+        """No se reclaman más tareas de un tipo que su límite de concurrencia"""
+        for _ in range(3):
+            limitada.encolar()
+        registrar.encolar(valor=1)
+
+        tomadas = reclamar("worker-1", limite=10)
+        self.assertEqual(sorted(t.tipo for t in tomadas), ["tests.limitada", "tests.registrar"])
+        self.assertEqual(reclamar("worker-2", limite=10), [])
+
+    def test_excluir_tipos(self):
+        """Un pool con --excluir deja esos tipos para otro pool"""
+        limitada.encolar()
+        registrar.encolar(valor=1)
+
+        tomadas = reclamar("worker-1", limite=10, excluir=["tests.limitada"])
+        self.assertEqual([t.tipo for t in tomadas], ["tests.registrar"])
+        self.assertEqual(drenar(tipos=["tests.limitada"]), 1)
+
+    def test_recuperar_huerfanas(self):
+        """Las tareas abandonadas por un worker vuelven a PENDIENTE"""
+        nueva = registrar.encolar(valor=1)
+        reclamar("worker-1")
+        Tarea.objects.filter(id=nueva.id).update(
+            tomada_en=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(recuperar_huerfanas(timeout=60), 1)
+        nueva.refresh_from_db()
+        self.assertEqual(nueva.estado, "PENDIENTE")
+
+    def test_purgar_terminadas(self):
+        """Las completadas y muertas antiguas se eliminan; las pendientes nunca"""
+        ahora = timezone.now()
+
+        def crear(estado, dias):
+            return Tarea.objects.create(
+                tipo="tests.registrar", estado=estado, completado_en=ahora - timedelta(days=dias)
+            ).id
+
+        completada_vieja = crear("COMPLETADA", 10)
+        completada_reciente = crear("COMPLETADA", 1)
+        muerta = crear("MUERTA", 10)
+        pendiente = crear("PENDIENTE", 100)
+
+        self.assertEqual(purgar_terminadas(dias_completadas=7, dias_muertas=30, simular=True), 1)
+        call_command("purgar_tareas", dias_completadas=7, dias_muertas=5, stdout=StringIO())
+
+        restantes = set(Tarea.objects.values_list("id", flat=True))
+        self.assertEqual(restantes, {completada_reciente, pendiente})
+        self.assertNotIn(completada_vieja, restantes)
+        self.assertNotIn(muerta, restantes)
@@ -0,0 +1,342 @@
+"""
+Reclamo y ejecución de tareas del outbox
+
+Los workers reclaman lotes con SELECT ... FOR UPDATE SKIP LOCKED, de modo que
+varios procesos pueden consumir la misma tabla sin pisarse. Una tarea que
+falla vuelve a PENDIENTE con backoff exponencial; al agotar sus intentos
+queda MUERTA para revisarla desde el admin.
+"""
+
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Tarea
+from .registro import obtener_definicion, tipos_registrados
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock que serializa los reclamos con límite de concurrencia
+LOCK_RECLAMO = 727001
+# Filas por DELETE al purgar tareas terminadas
+TAMANO_LOTE_PURGA = 2000
+
+
+def identificador_worker():
+    """Identificador legible del proceso actual (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _bloquear_reclamo():
+    """Evitar que dos workers superen a la vez el límite de concurrencia"""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_RECLAMO])
+
+
+def reclamar(worker_id, limite=10, tipos=None, incluir_programadas=False, excluir=None):
+    """
+    Marcar como EN_PROCESO un lote de tareas disponibles
+
+    Args:
+        worker_id: Identificador del worker que las toma
+        limite: Máximo de tareas a reclamar
+        tipos: Restringir a estos tipos (opcional)
+        incluir_programadas: Tomar también las que aún no llegan a `disponible_en`
+        excluir: No tomar estos tipos (opcional; los atiende otro pool de workers)
+
+    Returns:
+        list[Tarea]: Tareas reclamadas, con `intentos` ya incrementado
+    """
+    ahora = timezone.now()
+    limites = {
+        tipo: definicion.concurrencia
+        for tipo, definicion in tipos_registrados().items()
+        if definicion.concurrencia
+    }
+
+    with transaction.atomic():
+        en_proceso = {}
+        if limites:
+            _bloquear_reclamo()
+            en_proceso = dict(
+                Tarea.objects.filter(estado="EN_PROCESO", tipo__in=limites)
+                .values_list("tipo")
+                .annotate(total=Count("id"))
+            )
+
+        queryset = Tarea.objects.select_for_update(skip_locked=True).filter(
+            estado="PENDIENTE"
+        )
+        if not incluir_programadas:
+            queryset = queryset.filter(disponible_en__lte=ahora)
+        if tipos:
+            queryset = queryset.filter(tipo__in=tipos)
+        if excluir:
+            queryset = queryset.exclude(tipo__in=excluir)
+        saturados = [t for t, maximo in limites.items() if en_proceso.get(t, 0) >= maximo]
+        if saturados:
+            queryset = queryset.exclude(tipo__in=saturados)
+
+        ids = []
+        for tarea_id, tipo in queryset.order_by("disponible_en", "id").values_list(
+            "id", "tipo"
+        )[:limite]:
+            if tipo in limites:
+                if en_proceso.get(tipo, 0) >= limites[tipo]:
+                    continue
+                en_proceso[tipo] = en_proceso.get(tipo, 0) + 1
+            ids.append(tarea_id)
+
+        if not ids:
+            return []
+
+        Tarea.objects.filter(id__in=ids).update(
+            estado="EN_PROCESO",
+            tomada_por=worker_id,
+            tomada_en=ahora,
+            intentos=F("intentos") + 1,
+        )
+
+    return list(Tarea.objects.filter(id__in=ids).order_by("disponible_en", "id"))
+
+
+def ejecutar(tarea):
+    """
+    Ejecutar una tarea ya reclamada y registrar el resultado
+
+    Returns:
+        bool: True si terminó sin errores
+    """
+    definicion = obtener_definicion(tarea.tipo)
+    if definicion is None:
+        _marcar_muerta(tarea, f"Tipo de tarea no registrado: {tarea.tipo}")
+        return False
+
+    try:
+        definicion.funcion(**tarea.payload)
+    except Exception as e:
+        error = traceback.format_exc()
+        if tarea.intentos >= tarea.max_intentos:
+            _marcar_muerta(tarea, error)
+            logger.error(
+                f"💀 Tarea {tarea.tipo} #{tarea.id} agotó sus {tarea.max_intentos} intentos: {e}"
+            )
+        else:
+            espera = definicion.calcular_backoff(tarea.intentos)
+            Tarea.objects.filter(id=tarea.id).update(
+                estado="PENDIENTE",
+                disponible_en=timezone.now() + espera,
+                ultimo_error=error,
+                tomada_por="",
+                tomada_en=None,
+            )
+            logger.warning(
+                f"⚠️ Tarea {tarea.tipo} #{tarea.id} falló (intento {tarea.intentos}/"
+                f"{tarea.max_intentos}), reintento en {int(espera.total_seconds())}s: {e}"
+            )
+        return False
+
+    Tarea.objects.filter(id=tarea.id).update(
+        estado="COMPLETADA", completado_en=timezone.now(), ultimo_error=""
+    )
+    return True
+
+
+def _marcar_muerta(tarea, error):
+    Tarea.objects.filter(id=tarea.id).update(
+        estado="MUERTA", ultimo_error=error, completado_en=timezone.now()
+    )
+
+
+def ejecutar_por_id(tarea_id):
+    """Reclamar y ejecutar una tarea concreta (modo síncrono)"""
+    tomadas = Tarea.objects.filter(id=tarea_id, estado="PENDIENTE").update(
+        estado="EN_PROCESO",
+        tomada_por=identificador_worker(),
+        tomada_en=timezone.now(),
+        intentos=F("intentos") + 1,
+    )
+    if not tomadas:
+        return False
+    return ejecutar(Tarea.objects.get(id=tarea_id))
+
+
+def recuperar_huerfanas(timeout=None):
+    """
+    Devolver a PENDIENTE las tareas de workers que murieron a mitad de ejecución
+
+    Las tareas registradas con timeout propio (p. ej. entrenamientos largos)
+    usan el suyo en lugar de `timeout`.
+
+    Args:
+        timeout: Segundos en EN_PROCESO tras los que se considera abandonada
+
+    Returns:
+        int: Tareas recuperadas
+    """
+    if timeout is None:
+        timeout = getattr(settings, "TAREAS_TIMEOUT_HUERFANAS", 600)
+    ahora = timezone.now()
+    propios = {
+        tipo: definicion.timeout
+        for tipo, definicion in tipos_registrados().items()
+        if definicion.timeout
+    }
+    vencidas = Q(tomada_en__lt=ahora - timedelta(seconds=timeout)) & ~Q(tipo__in=propios)
+    for tipo, segundos in propios.items():
+        vencidas |= Q(tipo=tipo, tomada_en__lt=ahora - timedelta(seconds=segundos))
+    huerfanas = Tarea.objects.filter(vencidas, estado="EN_PROCESO")
+
+    muertas = huerfanas.filter(intentos__gte=F("max_intentos")).update(
+        estado="MUERTA",
+        ultimo_error="Worker interrumpido durante el último intento",
+        completado_en=timezone.now(),
+    )
+    recuperadas = huerfanas.update(
+        estado="PENDIENTE",
+        ultimo_error="Worker interrumpido durante la ejecución",
+        tomada_por="",
+        tomada_en=None,
+    )
+    if muertas or recuperadas:
+        logger.warning(f"♻️ Tareas huérfanas: {recuperadas} recuperadas, {muertas} muertas")
+    return recuperadas
+
+
+def purgar_terminadas(dias_completadas=None, dias_muertas=None, simular=False):
+    """
+    Eliminar las tareas COMPLETADA y MUERTA antiguas
+
+    Las muertas se conservan más tiempo para poder revisarlas desde el admin.
+    Se borra por lotes para no bloquear la tabla que reclaman los workers.
+
+    Args:
+        dias_completadas: Días tras completarse (por defecto TAREAS_DIAS_COMPLETADAS)
+        dias_muertas: Días tras morir (por defecto TAREAS_DIAS_MUERTAS)
+        simular: Solo contar, sin eliminar
+
+    Returns:
+        int: Tareas eliminadas (o que se eliminarían)
+    """
+    if dias_completadas is None:
+        dias_completadas = getattr(settings, "TAREAS_DIAS_COMPLETADAS", 7)
+    if dias_muertas is None:
+        dias_muertas = getattr(settings, "TAREAS_DIAS_MUERTAS", 30)
+    ahora = timezone.now()
+    vencidas = Tarea.objects.filter(
+        Q(estado="COMPLETADA", completado_en__lt=ahora - timedelta(days=dias_completadas))
+        | Q(estado="MUERTA", completado_en__lt=ahora - timedelta(days=dias_muertas))
+    )
+
+    if simular:
+        return vencidas.count()
+
+    eliminadas = 0
+    while True:
+        ids = list(vencidas.values_list("id", flat=True)[:TAMANO_LOTE_PURGA])
+        if not ids:
+            break
+        eliminadas += Tarea.objects.filter(id__in=ids).delete()[0]
+    if eliminadas:
+        logger.info(f"🧹 {eliminadas} tareas terminadas eliminadas")
+    return eliminadas
+
+
+def ejecutar_purgas(dias_completadas=None, dias_muertas=None):
+    """
+    Purga periódica de los workers: tareas terminadas y las funciones de
+    settings.TAREAS_PURGAS (limpiezas de otras apps que no dependen de un
+    destino o tipo concreto)
+
+    Returns:
+        int: Tareas eliminadas
+    """
+    eliminadas = purgar_terminadas(dias_completadas, dias_muertas)
+    for ruta in getattr(settings, "TAREAS_PURGAS", []):
+        try:
+            import_string(ruta)()
+        except Exception as e:
+            logger.error(f"❌ Purga {ruta} falló: {e}")
+    return eliminadas
+
+
+def drenar(tipos=None, incluir_programadas=False, max_tareas=None, excluir=None):
+    """
+    Ejecutar en el proceso actual todas las tareas pendientes
+
+    Pensado para tests y comandos: no requiere workers corriendo.
+
+    Args:
+        tipos: Restringir a estos tipos (opcional)
+        incluir_programadas: Ejecutar también las que tienen `disponible_en` futuro
+            (incluye los reintentos, hasta que completen o mueran)
+        max_tareas: Detenerse tras ejecutar este número de tareas
+        excluir: No ejecutar estos tipos (opcional)
+
+    Returns:
+        int: Tareas ejecutadas
+    """
+    worker_id = identificador_worker()
+    ejecutadas = 0
+    while max_tareas is None or ejecutadas < max_tareas:
+        limite = 50 if max_tareas is None else min(50, max_tareas - ejecutadas)
+        lote = reclamar(worker_id, limite, tipos, incluir_programadas, excluir)
+        if not lote:
+            break
+        for tarea in lote:
+            ejecutar(tarea)
+            ejecutadas += 1
+    return ejecutadas
+
+
+def bucle(detener, lote=10, intervalo=1.0, tipos=None, excluir=None):
+    """
+    Bucle principal de un worker: reclamar, ejecutar, dormir si no hay trabajo
+
+    Cada minuto recupera las tareas huérfanas y cada hora ejecuta las purgas
+    (ejecutar_purgas).
+
+    Args:
+        detener: threading/multiprocessing Event que termina el bucle
+        lote: Tareas a reclamar por vuelta
+        intervalo: Segundos de espera cuando la cola está vacía
+        tipos: Restringir a estos tipos (opcional)
+        excluir: No tomar estos tipos (opcional)
+    """
+    worker_id = identificador_worker()
+    logger.info(f"👷 Worker {worker_id} iniciado")
+    ultima_recuperacion = None
+    ultima_purga = None
+
+    while not detener.is_set():
+        close_old_connections()
+        try:
+            ahora = timezone.now()
+            if ultima_recuperacion is None or ahora - ultima_recuperacion > timedelta(minutes=1):
+                recuperar_huerfanas()
+                ultima_recuperacion = ahora
+            if ultima_purga is None or ahora - ultima_purga > timedelta(hours=1):
+                ejecutar_purgas()
+                ultima_purga = ahora
+            tareas = reclamar(worker_id, lote, tipos, excluir=excluir)
+        except Exception as e:
+            logger.error(f"❌ Worker {worker_id} no pudo reclamar tareas: {e}")
+            detener.wait(intervalo * 5)
+            continue
+
+        for tarea in tareas:
+            ejecutar(tarea)
+
+        if not tareas:
+            detener.wait(intervalo)
+
+    logger.info(f"👋 Worker {worker_id} detenido")
@@ -89,9 +89,9 @@ class UniversalLoginView(APIView):
             modulo="AUTENTICACION",
         )
 
-        # Enviar notificación de login exitoso
+        # Encolar notificación de login exitoso (la envía un worker)
         try:
-            from notifications.utils import notificar_login_exitoso
+            from notifications.tareas import login_exitoso
 
             # Obtener info del dispositivo desde headers
             dispositivo_info = {
@@ -100,10 +100,10 @@ class UniversalLoginView(APIView):
                 "platform": request.data.get("platform", "web"),
             }
 
-            notificar_login_exitoso(user, dispositivo_info)
+            login_exitoso.encolar(usuario_id=user.id, dispositivo_info=dispositivo_info)
         except Exception as e:
-            # No fallar el login si falla la notificación
-            print(f"⚠️ Error enviando notificación de login: {e}")
+            # No fallar el login si falla el encolado
+            print(f"⚠️ Error encolando notificación de login: {e}")
 
         # Respuesta diferenciada según el tipo de usuario
         response_data = {
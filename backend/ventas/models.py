@@ -20,6 +20,20 @@ class Pedido(models.Model):
         ("REEMBOLSADO", "Reembolsado"),
     ]
 
+    # Transiciones permitidas: estado actual -> estados siguientes
+    TRANSICIONES_VALIDAS = {
+        "PENDIENTE": ["PAGADO", "CANCELADO"],
+        "PAGADO": ["PROCESANDO", "CANCELADO", "REEMBOLSADO"],
+        "PROCESANDO": ["ENVIADO", "CANCELADO"],
+        "ENVIADO": ["ENTREGADO"],
+        "ENTREGADO": ["REEMBOLSADO"],
+        "CANCELADO": [],
+        "REEMBOLSADO": [],
+    }
+
+    # Estados que se pueden aplicar en lote (no mueven stock)
+    ESTADOS_MASIVOS = ["PROCESANDO", "ENVIADO", "ENTREGADO"]
+
     numero_pedido = models.CharField(
         max_length=50, unique=True, editable=False, verbose_name="Número de pedido"
     )
@@ -87,6 +101,15 @@ class Pedido(models.Model):
             self.numero_pedido = f"ORD-{fecha}-{uid}"
         super().save(*args, **kwargs)
 
+    @classmethod
+    def estados_origen(cls, nuevo_estado):
+        """Estados desde los que se puede pasar a `nuevo_estado`"""
+        return [
+            estado
+            for estado, siguientes in cls.TRANSICIONES_VALIDAS.items()
+            if nuevo_estado in siguientes
+        ]
+
     def actualizar_estado(self, nuevo_estado):
         """Actualizar estado del pedido con fechas automáticas y gestión de stock"""
         estado_anterior = self.estado
@@ -131,15 +154,15 @@ class Pedido(models.Model):
 
         self.save()
 
-        # Enviar notificación de cambio de estado
+        # Encolar notificación de cambio de estado (la envía un worker)
         if estado_anterior != nuevo_estado:
-            try:
-                from notifications.utils import notificar_cambio_estado_pedido
+            from notifications.tareas import cambio_estado_pedido
 
-                notificar_cambio_estado_pedido(self, estado_anterior, nuevo_estado)
-            except Exception as e:
-                # No fallar la actualización si falla la notificación
-                print(f"⚠️ Error enviando notificación de cambio de estado: {e}")
+            cambio_estado_pedido.encolar(
+                pedido_id=self.id,
+                estado_anterior=estado_anterior,
+                estado_nuevo=nuevo_estado,
+            )
 
 
 class ItemPedido(models.Model):
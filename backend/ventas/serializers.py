@@ -286,3 +286,112 @@ class ActualizarEstadoPedidoSerializer(serializers.Serializer):
             instance.save()
         
         return instance
+
+
+class ActualizarEstadoMasivoSerializer(serializers.Serializer):
+    """
+    Serializer para cambiar el estado de muchos pedidos en una sola operación.
+    Solo admite estados que no mueven stock (ver Pedido.ESTADOS_MASIVOS).
+    """
+    pedidos = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000,
+        help_text='IDs de los pedidos a actualizar'
+    )
+    estado = serializers.ChoiceField(
+        choices=[
+            (estado, nombre) for estado, nombre in Pedido.ESTADO_CHOICES
+            if estado in Pedido.ESTADOS_MASIVOS
+        ]
+    )
+    notas_internas = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        max_length=500
+    )
+
+    def validate_pedidos(self, value):
+        """Eliminar IDs duplicados conservando el orden"""
+        return list(dict.fromkeys(value))
+
+    @transaction.atomic
+    def save(self):
+        """
+        Validar las transiciones de todos los pedidos en una pasada y aplicar
+        el cambio con un único UPDATE. Las notificaciones se encolan como una
+        sola tarea en la misma transacción.
+
+        Returns:
+            dict: {'actualizados': [...], 'rechazados': [...], 'no_encontrados': [...]}
+        """
+        from django.db.models import Case, F, TextField, Value, When
+        from django.db.models.functions import Coalesce, Concat
+        from django.utils import timezone
+
+        ids = self.validated_data['pedidos']
+        nuevo_estado = self.validated_data['estado']
+        notas_internas = self.validated_data.get('notas_internas', '')
+        origenes = Pedido.estados_origen(nuevo_estado)
+
+        # Bloquear las filas para que nadie cambie su estado mientras validamos
+        pedidos = list(
+            Pedido.objects.select_for_update()
+            .filter(id__in=ids)
+            .values('id', 'numero_pedido', 'usuario_id', 'estado')
+        )
+        encontrados = {p['id'] for p in pedidos}
+
+        validos = [p for p in pedidos if p['estado'] in origenes]
+        rechazados = [
+            {
+                'id': p['id'],
+                'numero_pedido': p['numero_pedido'],
+                'estado_actual': p['estado'],
+                'motivo': f"No se puede pasar de {p['estado']} a {nuevo_estado}",
+            }
+            for p in pedidos if p['estado'] not in origenes
+        ]
+
+        if validos:
+            ahora = timezone.now()
+            cambios = {'estado': nuevo_estado, 'actualizado': ahora}
+            if nuevo_estado == 'ENVIADO':
+                cambios['enviado_en'] = Coalesce(F('enviado_en'), Value(ahora))
+            elif nuevo_estado == 'ENTREGADO':
+                cambios['entregado_en'] = Coalesce(F('entregado_en'), Value(ahora))
+            if notas_internas:
+                cambios['notas_internas'] = Case(
+                    When(notas_internas='', then=Value(notas_internas)),
+                    default=Concat(
+                        F('notas_internas'),
+                        Value(f"\n{notas_internas}"),
+                        output_field=TextField(),
+                    ),
+                    output_field=TextField(),
+                )
+
+            # Filtrar de nuevo por estado de origen: el UPDATE es la fuente de verdad
+            Pedido.objects.filter(
+                id__in=[p['id'] for p in validos], estado__in=origenes
+            ).update(**cambios)
+
+            # El UPDATE no dispara signals: los rollups del dashboard se ajustan aquí
+            from analytics.rollups import registrar_cambio_estado
+
+            registrar_cambio_estado(validos, nuevo_estado)
+
+            # Una sola tarea para todo el lote; solo existe si el UPDATE se confirma
+            from notifications.tareas import cambio_estado_pedidos
+
+            cambio_estado_pedidos.encolar(pedidos=validos, estado_nuevo=nuevo_estado)
+
+        return {
+            'estado': nuevo_estado,
+            'actualizados': [
+                {'id': p['id'], 'numero_pedido': p['numero_pedido'], 'estado_anterior': p['estado']}
+                for p in validos
+            ],
+            'rechazados': rechazados,
+            'no_encontrados': [pid for pid in ids if pid not in encontrados],
+        }
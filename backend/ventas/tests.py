@@ -1,3 +1,128 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tareas.models import Tarea
+from tareas.worker import drenar
+
+from .models import Pedido
+
+User = get_user_model()
+
+
+class PedidoBulkEstadoTest(APITestCase):
+    """Tests para la actualización masiva de estados de pedidos"""
+
+    url = "/api/ventas/pedidos/bulk-estado/"
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="admin",
+            email="admin@test.com",
+            password="admin123",
+            is_staff=True,
+        )
+        self.cliente = User.objects.create_user(
+            username="cliente",
+            email="cliente@test.com",
+            password="cliente123",
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def _crear_pedido(self, estado):
+        return Pedido.objects.create(
+            usuario=self.cliente,
+            estado=estado,
+            subtotal=Decimal("100.00"),
+            total=Decimal("100.00"),
+        )
+
+    def test_actualiza_pedidos_validos(self):
+        """Los pedidos en estado origen válido pasan al nuevo estado"""
+        pedidos = [self._crear_pedido("PROCESANDO") for _ in range(3)]
+
+        response = self.client.post(
+            self.url,
+            {"pedidos": [p.id for p in pedidos], "estado": "ENVIADO"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["actualizados"]), 3)
+        for pedido in pedidos:
+            pedido.refresh_from_db()
+            self.assertEqual(pedido.estado, "ENVIADO")
+            self.assertIsNotNone(pedido.enviado_en)
+
+        # Una sola tarea de notificación para todo el lote
+        self.assertEqual(
+            Tarea.objects.filter(tipo="notificaciones.cambio_estado_pedidos").count(), 1
+        )
+        self.assertEqual(drenar(), 1)
+
+    def test_rechaza_transiciones_invalidas(self):
+        """Los pedidos con transición no permitida se reportan sin modificarse"""
+        valido = self._crear_pedido("PAGADO")
+        invalido = self._crear_pedido("PENDIENTE")
+
+        response = self.client.post(
+            self.url,
+            {
+                "pedidos": [valido.id, invalido.id, 999999],
+                "estado": "PROCESANDO",
+                "notas_internas": "Lote 42",
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [p["id"] for p in response.data["actualizados"]], [valido.id]
+        )
+        self.assertEqual(
+            [p["id"] for p in response.data["rechazados"]], [invalido.id]
+        )
+        self.assertEqual(response.data["no_encontrados"], [999999])
+
+        valido.refresh_from_db()
+        invalido.refresh_from_db()
+        self.assertEqual(valido.estado, "PROCESANDO")
+        self.assertIn("Lote 42", valido.notas_internas)
+        self.assertEqual(invalido.estado, "PENDIENTE")
+
+    def test_conserva_fecha_de_envio_existente(self):
+        """No se sobrescribe una fecha de envío ya registrada"""
+        pedido = self._crear_pedido("ENVIADO")
+        Pedido.objects.filter(id=pedido.id).update(enviado_en="2024-01-15T12:00:00Z")
+
+        self.client.post(
+            self.url, {"pedidos": [pedido.id], "estado": "ENTREGADO"}, format="json"
+        )
+
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.estado, "ENTREGADO")
+        self.assertEqual(pedido.enviado_en.year, 2024)
+        self.assertIsNotNone(pedido.entregado_en)
+
+    def test_estado_no_permitido_en_lote(self):
+        """Estados que mueven stock no se aceptan en lote"""
+        pedido = self._crear_pedido("PENDIENTE")
+
+        response = self.client.post(
+            self.url, {"pedidos": [pedido.id], "estado": "PAGADO"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requiere_admin(self):
+        """Un cliente no puede actualizar estados en lote"""
+        pedido = self._crear_pedido("PROCESANDO")
+        self.client.force_authenticate(user=self.cliente)
+
+        response = self.client.post(
+            self.url, {"pedidos": [pedido.id], "estado": "ENVIADO"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
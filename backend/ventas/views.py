@@ -9,6 +9,7 @@ from .serializers import (
     PedidoDetailSerializer,
     PedidoCreateSerializer,
     ActualizarEstadoPedidoSerializer,
+    ActualizarEstadoMasivoSerializer,
 )
 
 
@@ -25,9 +26,9 @@ class PedidoViewSet(viewsets.GenericViewSet):
         - list: Solo admin (IsAdminUser)
         - create: Autenticado (IsAuthenticated)
         - mis_pedidos, detalle: Autenticado (IsAuthenticated)
-        - actualizar_estado: Solo admin (IsAdminUser)
+        - actualizar_estado, bulk_estado: Solo admin (IsAdminUser)
         """
-        if self.action in ["list", "actualizar_estado"]:
+        if self.action in ["list", "actualizar_estado", "bulk_estado"]:
             permission_classes = [IsAdminUser]
         elif self.action in ["create", "mis_pedidos", "detalle", "rastrear"]:
             permission_classes = [IsAuthenticated]
@@ -43,6 +44,8 @@ class PedidoViewSet(viewsets.GenericViewSet):
             return PedidoListSerializer
         elif self.action == "actualizar_estado":
             return ActualizarEstadoPedidoSerializer
+        elif self.action == "bulk_estado":
+            return ActualizarEstadoMasivoSerializer
         return PedidoDetailSerializer
 
     def get_queryset(self):
@@ -157,14 +160,10 @@ class PedidoViewSet(viewsets.GenericViewSet):
         serializer.is_valid(raise_exception=True)
         pedido = serializer.save()
 
-        # Enviar notificaciones de nuevo pedido
-        try:
-            from notifications.utils import notificar_nuevo_pedido
+        # Encolar notificaciones de nuevo pedido (las envía un worker)
+        from notifications.tareas import nuevo_pedido
 
-            notificar_nuevo_pedido(pedido)
-        except Exception as e:
-            # No fallar la creación del pedido si falla la notificación
-            print(f"⚠️ Error enviando notificación de nuevo pedido: {e}")
+        nuevo_pedido.encolar(pedido_id=pedido.id)
 
         # Retornar los datos del serializer directamente (incluye to_representation)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -195,6 +194,38 @@ class PedidoViewSet(viewsets.GenericViewSet):
             }
         )
 
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-estado",
+        permission_classes=[IsAdminUser],
+    )
+    def bulk_estado(self, request):
+        """
+        POST /api/ventas/pedidos/bulk-estado/
+        Cambiar el estado de muchos pedidos a la vez (solo admin)
+
+        Body:
+        {
+            "pedidos": [12, 13, 14],
+            "estado": "ENVIADO",
+            "notas_internas": "Despacho turno tarde"
+        }
+
+        Los pedidos cuya transición no es válida se devuelven en "rechazados"
+        y no impiden que se actualicen los demás.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        resultado = serializer.save()
+
+        return Response(
+            {
+                "message": f"{len(resultado['actualizados'])} pedidos actualizados a {resultado['estado']}",
+                **resultado,
+            }
+        )
+
     @action(detail=True, methods=["get"])
     def rastrear(self, request, pk=None):
         """